@@ -1,9 +1,13 @@
 import yaml
+import json
 import logging
 import os
 import cms.db
 import cmscommon.constants
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
+from cmscommon.digest import path_digest
+from cmscontrib import touch
 from cmscontrib.loaders.base_loader import ContestLoader, TaskLoader, UserLoader, TeamLoader
 
 logger = logging.getLogger(__name__)
@@ -13,6 +17,28 @@ class HashcodeLoader(ContestLoader, TaskLoader, UserLoader, TeamLoader):
     short_name = "hashcode_yaml"
     description = "Google Hashcode yaml-based format"
 
+    # Name of the file, in the directory of each task, mapping the
+    # files of the task to their (size, mtime, digest) at the last
+    # import. Files whose size and mtime did not change are not hashed
+    # again, and a task whose files all did not change is not reloaded.
+    MANIFEST_FILENAME = ".import_manifest.json"
+    # Name of the file, in the directory of each task, that exists from
+    # when the task is loaded until it is in the database: until then
+    # the manifest may describe files that were never imported.
+    IMPORT_ERROR_FILENAME = ".import_error"
+
+    # Number of threads hashing the files of a task (hashlib releases
+    # the GIL, so the files are effectively hashed in parallel).
+    HASHING_THREADS = os.cpu_count() or 1
+
+    def __init__(self, path, file_cacher, stored_digests=None):
+        super().__init__(path, file_cacher)
+        # Digests of the files known to be in the backend of the file
+        # cacher, so that each one is checked or stored once; the task
+        # loaders of a contest share the set of the contest loader.
+        self._stored_digests = stored_digests \
+            if stored_digests is not None else set()
+
     @staticmethod
     def detect(path):
         # Automatic detection disabled
@@ -37,7 +63,124 @@ class HashcodeLoader(ContestLoader, TaskLoader, UserLoader, TeamLoader):
     # TaskLoader interface
 
     def task_has_changed(self):
-        return True
+        if os.path.exists(os.path.join(self.path, self.IMPORT_ERROR_FILENAME)):
+            logger.warning("The previous import of task %s did not "
+                           "complete.", os.path.split(self.path)[1])
+            return True
+        manifest = self._load_manifest()
+        if manifest is None:
+            return True
+        current = dict((rel_path, self._stat(rel_path))
+                       for rel_path in self._task_files())
+        if current.keys() != manifest.keys():
+            return True
+        return any(tuple(manifest[rel_path][:2]) != stat
+                   for rel_path, stat in current.items())
+
+    def task_imported(self):
+        try:
+            os.remove(os.path.join(self.path, self.IMPORT_ERROR_FILENAME))
+        except FileNotFoundError:
+            pass
+
+    def _task_files(self):
+        """Return the paths (relative to the task directory) of all the
+        files that are imported from the task directory.
+
+        """
+        files = ["task.yaml",
+                 os.path.join("statement", "statement.pdf"),
+                 os.path.join("check", "checker")]
+        for filename in os.listdir(os.path.join(self.path, "input")):
+            files.append(os.path.join("input", filename))
+        if os.path.exists(os.path.join(self.path, "att")):
+            for filename in os.listdir(os.path.join(self.path, "att")):
+                files.append(os.path.join("att", filename))
+        return [f for f in files if os.path.isfile(os.path.join(self.path, f))]
+
+    def _stat(self, rel_path):
+        st = os.stat(os.path.join(self.path, rel_path))
+        return (st.st_size, st.st_mtime_ns)
+
+    def _load_manifest(self):
+        try:
+            with open(os.path.join(self.path, self.MANIFEST_FILENAME), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_manifest(self, manifest):
+        path = os.path.join(self.path, self.MANIFEST_FILENAME)
+        try:
+            with open(path + ".tmp", "w") as f:
+                json.dump(manifest, f, indent=1, sort_keys=True)
+            os.replace(path + ".tmp", path)
+        except OSError as error:
+            logger.warning("Cannot write %s: %s", path, error)
+
+    def _digest_files(self, rel_paths):
+        """Compute the digests of some files of the task.
+
+        Files whose size and mtime match those in the manifest of the
+        last import are not read; the others are hashed in a thread
+        pool. The manifest is then updated with all the given files.
+
+        rel_paths ([str]): paths relative to the task directory.
+
+        return ({str: str}): the digest of each file.
+
+        """
+        manifest = self._load_manifest() or dict()
+        stats = dict((rel_path, self._stat(rel_path)) for rel_path in rel_paths)
+        digests = dict()
+        to_hash = []
+        for rel_path, stat in stats.items():
+            entry = manifest.get(rel_path)
+            if entry is not None and tuple(entry[:2]) == stat:
+                digests[rel_path] = entry[2]
+            else:
+                to_hash.append(rel_path)
+
+        if len(to_hash) > 0:
+            logger.info("Hashing %d files of task %s.",
+                        len(to_hash), os.path.split(self.path)[1])
+            with ThreadPoolExecutor(self.HASHING_THREADS) as executor:
+                for rel_path, digest in zip(to_hash, executor.map(
+                        lambda p: path_digest(os.path.join(self.path, p)),
+                        to_hash)):
+                    digests[rel_path] = digest
+
+        self._save_manifest(dict(
+            (rel_path, list(stats[rel_path]) + [digests[rel_path]])
+            for rel_path in rel_paths))
+        return digests
+
+    def _store(self, rel_path, digest, desc):
+        """Make sure a file of the task is in the file cacher's backend.
+
+        The file is read and stored only if the backend does not have
+        its digest yet.
+
+        rel_path (str): path relative to the task directory.
+        digest (str): the digest of the file.
+        desc (str): the description to associate to the file.
+
+        return (str): the digest of the file.
+
+        """
+        if digest in self._stored_digests:
+            return digest
+        try:
+            self.file_cacher.get_size(digest)
+        except KeyError:
+            stored_digest = self.file_cacher.put_file_from_path(
+                os.path.join(self.path, rel_path), desc)
+            if stored_digest != digest:
+                # The file changed while we were importing it.
+                logger.warning("File %s changed during the import.", rel_path)
+                digest = stored_digest
+        self._stored_digests.add(digest)
+        return digest
 
     def get_task(self, get_statement):
         task_name = os.path.split(self.path)[1]
@@ -47,20 +190,26 @@ class HashcodeLoader(ContestLoader, TaskLoader, UserLoader, TeamLoader):
 
         task_conf = yaml.load(open(os.path.join(self.path, "task.yaml"), "r"), Loader=yaml.Loader)
 
+        # Removed by task_imported() once the task is in the database.
+        touch(os.path.join(self.path, self.IMPORT_ERROR_FILENAME))
+
+        input_filenames = sorted(os.listdir(os.path.join(self.path, "input")))
+        digests = self._digest_files(self._task_files())
+
         # Building task arguments
         args = dict()
         args["name"] = task_conf.get("name")
         args["title"] = task_conf.get("title")
 
         if get_statement:
-            statement_path = os.path.join(self.path, "statement", "statement.pdf")
-            digest = self.file_cacher.put_file_from_path(statement_path,
+            statement_path = os.path.join("statement", "statement.pdf")
+            digest = self._store(statement_path, digests[statement_path],
                     "Statement for task {}".format(task_name))
             args["statements"] = { "en": cms.db.Statement("en", digest) }
             args["primary_statements"] = ["en"]
 
         args["submission_format"] = []
-        for filename in sorted(os.listdir(os.path.join(self.path, "input"))):
+        for filename in input_filenames:
             basename = os.path.splitext(filename)[0]
             args["submission_format"].append("output_" + basename + ".txt")
 
@@ -70,7 +219,8 @@ class HashcodeLoader(ContestLoader, TaskLoader, UserLoader, TeamLoader):
         args["attachments"] = dict()
         if os.path.exists(os.path.join(self.path, "att")):
             for filename in os.listdir(os.path.join(self.path, "att")):
-                digest = self.file_cacher.put_file_from_path(os.path.join(self.path, "att", filename),
+                attachment_path = os.path.join("att", filename)
+                digest = self._store(attachment_path, digests[attachment_path],
                         "Attachment {} for task {}".format(filename, task_name))
                 args["attachments"][filename] = cms.db.Attachment(filename, digest)
 
@@ -81,18 +231,29 @@ class HashcodeLoader(ContestLoader, TaskLoader, UserLoader, TeamLoader):
         args["task"] = task_data
         args["description"] = "1.0"
         args["task_type"] = "OutputOnly"
-        args["task_type_parameters"] = ["comparator"]
+        # The checkers in src/checkers support the resident protocol;
+        # a scorer (see cms.grading.scorers) replaces the checker.
+        if "scorer" in task_conf:
+            args["task_type_parameters"] = \
+                ["scorer:{}".format(task_conf["scorer"])]
+        elif task_conf.get("resident_checker", False):
+            args["task_type_parameters"] = ["resident_comparator"]
+        else:
+            args["task_type_parameters"] = ["comparator"]
         args["score_type"] = "Sum"
         args["score_type_parameters"] = 1.0
         
-        checker_path = os.path.join(self.path, "check", "checker")
+        checker_path = os.path.join("check", "checker")
         args["managers"] = [ cms.db.Manager("checker", 
-            self.file_cacher.put_file_from_path(checker_path, "Checker for task {}".format(task_name))) ]
+            self._store(checker_path, digests[checker_path], "Checker for task {}".format(task_name))) ]
 
+        # Each input is the input, the correct output (for the checker)
+        # and an attachment, but it is stored only once.
         args["testcases"] = []
-        for filename in sorted(os.listdir(os.path.join(self.path, "input"))):
+        for filename in input_filenames:
             basename = os.path.splitext(filename)[0]
-            digest = self.file_cacher.put_file_from_path(os.path.join(self.path, "input", filename), 
+            input_path = os.path.join("input", filename)
+            digest = self._store(input_path, digests[input_path],
                     "Input {} for task {}".format(basename, task_name))
             args["testcases"].append( cms.db.Testcase(basename, True, digest, digest) )
             task_data.attachments.set( cms.db.Attachment(filename, digest) )
@@ -135,5 +296,6 @@ class HashcodeLoader(ContestLoader, TaskLoader, UserLoader, TeamLoader):
         return cms.db.Contest(**args), task_names, []
 
     def get_task_loader(self, taskname):
-        return HashcodeLoader(os.path.join(self.path, taskname), self.file_cacher)
+        return HashcodeLoader(os.path.join(self.path, taskname),
+                              self.file_cacher, self._stored_digests)
             
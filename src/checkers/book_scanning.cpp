@@ -1,5 +1,7 @@
 #include <cstdio>
 #include <cstdlib>
+#include <cstring>
+#include <string>
 #include <stdexcept>
 #include <vector>
 #include <chrono>
@@ -29,8 +31,8 @@ void assert_reason(bool x, char const* s, Args&&... args) {
   }
 }
 
-void parse_input() {
-  assert_reason(scanf("%d %d %d\n", &B, &L, &D) == 3, 
+void parse_input(FILE* in) {
+  assert_reason(fscanf(in, "%d %d %d\n", &B, &L, &D) == 3, 
     "[Input incorrect]: Failed to parse B, L, D.");
   assert_reason(B >= 1 && B <= 100000, 
     "[Input incorrect]: 1 <= B <= 100000, with B = %d.", B);
@@ -41,7 +43,7 @@ void parse_input() {
 
   book_scores.resize(B); 
   for(int i=0; i < B; ++i) {
-    assert_reason(scanf("%d", &book_scores[i]) == 1,
+    assert_reason(fscanf(in, "%d", &book_scores[i]) == 1,
       "[Input incorrect]: Failed to parse score of book at index %d", i);
     assert_reason(book_scores[i] >= 0 && book_scores[i] <= 100, 
       "[Input incorrect]: 0 <= book_scores[i] <= 100, with i = %d, book_scores[i] = %d", i, book_scores[i]);
@@ -49,7 +51,7 @@ void parse_input() {
 
   libraries.resize(L);
   for(int i=0; i < L; ++i) {
-    assert_reason(scanf("%d %d %d\n", &libraries[i].N, &libraries[i].T, &libraries[i].M) == 3, 
+    assert_reason(fscanf(in, "%d %d %d\n", &libraries[i].N, &libraries[i].T, &libraries[i].M) == 3, 
       "[Input incorrect]: Failed to parse N, T, M of library at index %d.", i);
     assert_reason(libraries[i].N >= 1 && libraries[i].N <= 100000,
       "[Input incorrect]: 1 <= libraries[i].N <= 100000, with i = %d, libraries[i].N = %d.", i, libraries[i].N);
@@ -62,7 +64,7 @@ void parse_input() {
 
     libraries[i].books.resize(libraries[i].N);
     for(int j=0; j < libraries[i].N; ++j) {
-      assert_reason(scanf("%d", &libraries[i].books[j]) == 1, 
+      assert_reason(fscanf(in, "%d", &libraries[i].books[j]) == 1, 
         "[Input incorrect]: Failed to parse book at index %d of library at index %d.", j, i);
 
       auto id = libraries[i].books[j];
@@ -94,15 +96,15 @@ struct signup {
 
 std::vector<signup> output_libraries;
 
-void parse_output() {
-  assert_reason(scanf("%d\n", &A) == 1, 
+void parse_output(FILE* in) {
+  assert_reason(fscanf(in, "%d\n", &A) == 1, 
       "[Output incorrect]: Failed to parse A.");
   assert_reason(A >= 0 && A <= L,
       "[Output incorrect]: 0 <= A <= L, with A = %d, L = %d.", A, L);
 
   output_libraries.resize(A);
   for(int i=0; i < A; ++i) {
-    assert_reason(scanf("%d %d\n", &output_libraries[i].Y, &output_libraries[i].K) == 2,
+    assert_reason(fscanf(in, "%d %d\n", &output_libraries[i].Y, &output_libraries[i].K) == 2,
       "[Output incorrect]: Failed to parse Y and K of library at index %d.", i);
 
     auto const Y = output_libraries[i].Y;
@@ -121,7 +123,7 @@ void parse_output() {
 
     output_libraries[i].books.resize(K);
     for(int j=0; j < K; ++j) {
-      assert_reason(scanf("%d", &output_libraries[i].books[j]) == 1, 
+      assert_reason(fscanf(in, "%d", &output_libraries[i].books[j]) == 1, 
         "[Output incorrect]: Failed to parse book at index %d of library Y = %d.", j, Y);
 
       auto id = output_libraries[i].books[j];
@@ -165,7 +167,50 @@ auto evaluate_output() {
   return score;
 }
 
+// Resident mode: parse the input once, then score many outputs. The path
+// of each output is read from a line of stdin, and the score and message
+// are written on two lines of stdout.
+int serve(char const* input_path) {
+  std::string input_error;
+  FILE* input = std::fopen(input_path, "r");
+  if(!input) {
+    input_error = "Input file not found.";
+  } else {
+    try {
+      parse_input(input);
+    } catch(std::invalid_argument& e) {
+      input_error = e.what();
+    }
+    std::fclose(input);
+  }
+
+  char path[4096];
+  while(std::fgets(path, sizeof(path), stdin)) {
+    path[std::strcspn(path, "\n")] = '\0';
+
+    if(!input_error.empty()) {
+      fprintf(stdout, "%d\n%s\n", 0, input_error.c_str());
+    } else if(FILE* output = std::fopen(path, "r")) {
+      try {
+        parse_output(output);
+        int score = evaluate_output();
+        fprintf(stdout, "%d\n[Output correct]: score = %d.\n", score, score);
+      } catch(std::invalid_argument& e) {
+        fprintf(stdout, "%d\n%s\n", 0, e.what());
+      }
+      std::fclose(output);
+    } else {
+      fprintf(stdout, "%d\n%s\n", 0, "Output file not found.");
+    }
+    fflush(stdout);
+  }
+  return 0;
+}
+
 int main(int argc, char** argv) {
+  if(argc == 4 && std::strcmp(argv[1], "--resident") == 0)
+    return serve(argv[2]);
+
   if(argc != 4) {
     fprintf(stdout, "%d\n", 0);
     fprintf(stderr, "Incorrect usage, need input and output file.");
@@ -179,7 +224,7 @@ int main(int argc, char** argv) {
       return 0;
     }
 
-    parse_input();
+    parse_input(stdin);
 
     if(!std::freopen(argv[3], "r", stdin)) {
       fprintf(stdout, "%d\n", 0);
@@ -187,7 +232,7 @@ int main(int argc, char** argv) {
       return 0;
     }
 
-    parse_output();
+    parse_output(stdin);
 
     int score = evaluate_output();
     fprintf(stdout, "%d\n", score);
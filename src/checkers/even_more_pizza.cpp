@@ -1,5 +1,7 @@
 #include <cstdio>
 #include <cstdlib>
+#include <cstring>
+#include <string>
 #include <stdexcept>
 #include <vector>
 #include <chrono>
@@ -23,8 +25,8 @@ void assert_reason(bool x, char const* s, Args&&... args) {
   }
 }
 
-void parse_input() {
-  assert_reason(scanf("%d %d %d %d\n", &M, &T2, &T3, &T4) == 4, 
+void parse_input(FILE* in) {
+  assert_reason(fscanf(in, "%d %d %d %d\n", &M, &T2, &T3, &T4) == 4, 
       "[Input incorrect]: Failed to parse M, T2, T3, T4.");
   assert_reason(M >= 1 && M <= 100000, "[Input incorrect]: Failed constraint 1 <= M <= 100000, with M = %d.", M);
   assert_reason(T2 >= 0 && T2 <= 100000, "[Input incorrect]: Failed constraint 0 <= T2 <= 50000, with T2 = %d.", T2);
@@ -34,12 +36,12 @@ void parse_input() {
   pizzas.resize(M);
   for(int i=0; i < M; ++i) {
     int I;
-    assert_reason(scanf("%d", &I) == 1, "[Input incorrect]: Failed to parse the number of ingredients of pizza %d.", i);
+    assert_reason(fscanf(in, "%d", &I) == 1, "[Input incorrect]: Failed to parse the number of ingredients of pizza %d.", i);
     assert_reason(I >= 1 && I <= 10000, "[Input incorrect]: The number of ingredients of pizza %d is too large.", i);
 
     char buffer[30];
     for(int j=0; j < I; ++j) {
-      assert_reason(scanf("%20s", buffer) == 1, "[Input incorrect]: Failed to parse ingredient %d of pizza %d.", j, i);
+      assert_reason(fscanf(in, "%20s", buffer) == 1, "[Input incorrect]: Failed to parse ingredient %d of pizza %d.", j, i);
       pizzas[i].emplace_back(buffer);
     }
   }
@@ -54,8 +56,8 @@ struct delivery {
 
 std::vector<delivery> deliveries;
 
-void parse_output() {
-  assert_reason(scanf("%d\n", &D) == 1, "[Output incorrect]: Failed to parse D.");
+void parse_output(FILE* in) {
+  assert_reason(fscanf(in, "%d\n", &D) == 1, "[Output incorrect]: Failed to parse D.");
   assert_reason(D >= 1 && D <= T2 + T3 + T4, "[Output incorrect]: Failed constraint 1 <= D <= T2 + T3 + T4, with D = %d", D);
   deliveries.resize(D);
   
@@ -63,7 +65,7 @@ void parse_output() {
   auto delivered = std::vector<bool>(M, false);
 
   for(int i=0; i < D; ++i) {
-    assert_reason(scanf("%d", &deliveries[i].L) == 1, "[Output incorrect]: Failed to parse L for delivery %d.", i);
+    assert_reason(fscanf(in, "%d", &deliveries[i].L) == 1, "[Output incorrect]: Failed to parse L for delivery %d.", i);
     auto& d = deliveries[i];
     assert_reason(d.L >= 2 && d.L <= 4, 
         "[Output incorrect]: Failed constraint 2 <= L <= 4 for delivery at index %d, with L = %d.", i, d.L);
@@ -74,7 +76,7 @@ void parse_output() {
 
     d.pizzas.resize(d.L);
     for(int j=0; j < d.L; ++j) {
-      assert_reason(scanf("%d", &d.pizzas[j]) == 1, 
+      assert_reason(fscanf(in, "%d", &d.pizzas[j]) == 1, 
           "[Output incorrect]: Invalid delivery at index %d. Failed to parse pizza at index %d.", i, j);
     }
 
@@ -106,7 +108,50 @@ auto evaluate_output() {
   return total_score;
 }
 
+// Resident mode: parse the input once, then score many outputs. The path
+// of each output is read from a line of stdin, and the score and message
+// are written on two lines of stdout.
+int serve(char const* input_path) {
+  std::string input_error;
+  FILE* input = std::fopen(input_path, "r");
+  if(!input) {
+    input_error = "Input file not found.";
+  } else {
+    try {
+      parse_input(input);
+    } catch(std::invalid_argument& e) {
+      input_error = e.what();
+    }
+    std::fclose(input);
+  }
+
+  char path[4096];
+  while(std::fgets(path, sizeof(path), stdin)) {
+    path[std::strcspn(path, "\n")] = '\0';
+
+    if(!input_error.empty()) {
+      fprintf(stdout, "%d\n%s\n", 0, input_error.c_str());
+    } else if(FILE* output = std::fopen(path, "r")) {
+      try {
+        parse_output(output);
+        long long score = evaluate_output();
+        fprintf(stdout, "%lld\n[Output correct]: score = %lld.\n", score, score);
+      } catch(std::invalid_argument& e) {
+        fprintf(stdout, "%d\n%s\n", 0, e.what());
+      }
+      std::fclose(output);
+    } else {
+      fprintf(stdout, "%d\n%s\n", 0, "Output file not found.");
+    }
+    fflush(stdout);
+  }
+  return 0;
+}
+
 int main(int argc, char** argv) {
+  if(argc == 4 && std::strcmp(argv[1], "--resident") == 0)
+    return serve(argv[2]);
+
   if(argc != 4) {
     fprintf(stdout, "%d\n", 0);
     fprintf(stderr, "Incorrect usage, need input and output file.");
@@ -120,7 +165,7 @@ int main(int argc, char** argv) {
       return 0;
     }
 
-    parse_input();
+    parse_input(stdin);
 
     if(!std::freopen(argv[3], "r", stdin)) {
       fprintf(stdout, "%d\n", 0);
@@ -128,7 +173,7 @@ int main(int argc, char** argv) {
       return 0;
     }
 
-    parse_output();
+    parse_output(stdin);
 
     long long score = evaluate_output();
     fprintf(stdout, "%lld\n", score);
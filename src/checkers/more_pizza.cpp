@@ -1,5 +1,7 @@
 #include <cstdio>
 #include <cstdlib>
+#include <cstring>
+#include <string>
 #include <stdexcept>
 #include <vector>
 #include <chrono>
@@ -20,11 +22,11 @@ void assert_reason(bool x, char const* s, Args&&... args) {
   }
 }
 
-void parse_input() {
-  assert_reason( scanf("%d %d\n", &M, &N) == 2, "[Input incorrect]: Failed to parse M, N.");
+void parse_input(FILE* in) {
+  assert_reason( fscanf(in, "%d %d\n", &M, &N) == 2, "[Input incorrect]: Failed to parse M, N.");
   slice_count.resize(N);
   for(int i=0; i < N; ++i) 
-    assert_reason(scanf("%d", &slice_count[i]) == 1, 
+    assert_reason(fscanf(in, "%d", &slice_count[i]) == 1, 
         "[Input incorrect]:  Failed to parse slice count at index %d.", i);
 
   for(int i=0; i < N; ++i)
@@ -39,14 +41,14 @@ int K; // the number of different pizza types to order
 long long S;
 std::vector<int> pizza_types;
 
-void parse_output() {
-  assert_reason(scanf("%d\n", &K) == 1, 
+void parse_output(FILE* in) {
+  assert_reason(fscanf(in, "%d\n", &K) == 1, 
       "[Output incorrect]: Failed to parse K.");
   assert_reason(K >= 0 && K < N, 
       "[Output incorrect]: Unsatisfied constraint 0 <= K <= N, with K = %d, N = %d.", K, N);
   pizza_types.resize(K);
   for(int i=0; i < K; ++i)
-    assert_reason(scanf("%d", &pizza_types[i]) == 1,
+    assert_reason(fscanf(in, "%d", &pizza_types[i]) == 1,
       "[Output incorrect]: Failed to parse the pizza type at index %d.", i);
 
   for(int i=0; i < K; ++i)
@@ -71,7 +73,50 @@ auto evaluate_output() {
   return S;
 }
 
+// Resident mode: parse the input once, then score many outputs. The path
+// of each output is read from a line of stdin, and the score and message
+// are written on two lines of stdout.
+int serve(char const* input_path) {
+  std::string input_error;
+  FILE* input = std::fopen(input_path, "r");
+  if(!input) {
+    input_error = "Input file not found.";
+  } else {
+    try {
+      parse_input(input);
+    } catch(std::invalid_argument& e) {
+      input_error = e.what();
+    }
+    std::fclose(input);
+  }
+
+  char path[4096];
+  while(std::fgets(path, sizeof(path), stdin)) {
+    path[std::strcspn(path, "\n")] = '\0';
+
+    if(!input_error.empty()) {
+      fprintf(stdout, "%d\n%s\n", 0, input_error.c_str());
+    } else if(FILE* output = std::fopen(path, "r")) {
+      try {
+        parse_output(output);
+        long long score = evaluate_output();
+        fprintf(stdout, "%lld\n[Output correct]: score = %lld.\n", score, score);
+      } catch(std::invalid_argument& e) {
+        fprintf(stdout, "%d\n%s\n", 0, e.what());
+      }
+      std::fclose(output);
+    } else {
+      fprintf(stdout, "%d\n%s\n", 0, "Output file not found.");
+    }
+    fflush(stdout);
+  }
+  return 0;
+}
+
 int main(int argc, char** argv) {
+  if(argc == 4 && std::strcmp(argv[1], "--resident") == 0)
+    return serve(argv[2]);
+
   if(argc != 4) {
     fprintf(stdout, "%d\n", 0);
     fprintf(stderr, "Incorrect usage, need input and output file.");
@@ -85,7 +130,7 @@ int main(int argc, char** argv) {
       return 0;
     }
 
-    parse_input();
+    parse_input(stdin);
 
     if(!std::freopen(argv[3], "r", stdin)) {
       fprintf(stdout, "%d\n", 0);
@@ -93,7 +138,7 @@ int main(int argc, char** argv) {
       return 0;
     }
 
-    parse_output();
+    parse_output(stdin);
 
     long long score = evaluate_output();
     fprintf(stdout, "%lld\n", score);
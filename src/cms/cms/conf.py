@@ -95,20 +95,59 @@ class Config:
         self.backdoor = False
         self.file_log_debug = False
         self.stream_log_detailed = False
+        # Maximum size of the local file cache of each service (in MiB;
+        # None means unbounded). Least recently used files are evicted.
+        self.fs_cache_max_size_mib = None
+        # Whether all the services of a host use the same local file
+        # cache, instead of one each.
+        self.shared_fs_cache = False
 
         # Database.
         self.database = "postgresql+psycopg2://cmsuser@localhost/cms"
         self.database_debug = False
         self.twophase_commit = False
 
+        # EvaluationService.
+        # Whether to reuse the outcomes of evaluations that only depend
+        # on the content of the files involved (e.g., output only).
+        self.outcome_cache = True
+        # Max number of outcomes kept (the least recently used are
+        # deleted first; None means unbounded).
+        self.outcome_cache_max_entries = 100_000
+        # Target wall time (in seconds) of the batches of operations
+        # sent to each Worker, according to the estimated costs.
+        self.evaluation_batch_target_time_s = 5.0
+        # Number of job groups sent to each Worker in advance, while it
+        # is executing another one (Workers accept as many).
+        self.worker_prefetch_depth = 1
+
         # Worker.
         self.keep_sandbox = True
         self.use_cgroups = True
         self.sandbox_implementation = 'isolate'
+        # Max number of resident checkers kept running by each Worker;
+        # there is one per testcase, and the testcases of a submission
+        # are evaluated in order, so it should be at least the number
+        # of testcases of a dataset.
+        self.max_resident_checkers = 16
+        # Number of job groups each Worker executes concurrently.
+        self.worker_slots = 1
+        # Number of initialized sandboxes each Worker keeps ready, and
+        # reuses after resetting them (0 to disable).
+        self.sandbox_pool_size = 2
 
         # Sandbox.
         # Max size of each writable file during an evaluation step, in KiB.
         self.max_file_size = 1024 * 1024  # 1 GiB
+        # How files are put in the sandbox from the local file cache:
+        # "link" (hard link, if the sandbox allows it, else as
+        # "reflink"), "reflink" (copy-on-write clone, else as "copy")
+        # or "copy".
+        self.sandbox_file_population = "link"
+        # Number of boxes of isolate (its num_boxes setting): box ids
+        # are leased from [10, isolate_num_boxes) to the sandboxes of
+        # all the services of a host.
+        self.isolate_num_boxes = 1000
         # Max processes, CPU time (s), memory (KiB) for compilation runs.
         self.compilation_sandbox_max_processes = 1000
         self.compilation_sandbox_max_time_s = 10.0
@@ -135,6 +174,9 @@ class Config:
         self.num_proxies_used = None
         self.max_submission_length = 100_000  # 100 KB
         self.max_input_length = 5_000_000  # 5 MB
+        # Whether the files of submissions and user tests are written to
+        # disk while they are received, rather than kept in memory.
+        self.stream_submission_uploads = True
         self.stl_path = "/usr/share/cppreference/doc/html/"
         # Prefix of 'shared-mime-info'[1] installation. It can be found
         # out using `pkg-config --variable=prefix shared-mime-info`, but
@@ -68,6 +68,8 @@ __all__ = [
     "UserTestExecutable",
     # printjob
     "PrintJob",
+    # taskscore
+    "ParticipationTaskScore",
     # init
     "init_db",
     # drop
@@ -81,7 +83,7 @@ __all__ = [
 
 # Instantiate or import these objects.
 
-version = 42
+version = 43
 
 engine = create_engine(config.database, echo=config.database_debug,
                        pool_timeout=60, pool_recycle=120)
@@ -104,6 +106,7 @@ from .submission import Submission, File, Token, SubmissionResult, \
 from .usertest import UserTest, UserTestFile, UserTestManager, \
     UserTestResult, UserTestExecutable
 from .printjob import PrintJob
+from .taskscore import ParticipationTaskScore
 
 from .init import init_db
 from .drop import drop_db
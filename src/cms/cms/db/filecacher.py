@@ -25,11 +25,15 @@
 """
 
 import atexit
+import fcntl
 import io
 import logging
 import os
 import tempfile
+import zlib
 from abc import ABCMeta, abstractmethod
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
 
 import gevent
 from sqlalchemy.exc import IntegrityError
@@ -72,6 +76,47 @@ def copyfileobj(source_fobj, destination_fobj,
         gevent.sleep(0)
 
 
+class PinnedFile:
+    """A file object of the local cache, keeping its digest pinned.
+
+    While the object is open, the FileCacher that returned it will not
+    evict the file from the local cache. All file methods are delegated
+    to the wrapped file object.
+
+    """
+
+    def __init__(self, fobj, release):
+        """Initialize.
+
+        fobj (fileobj): the file object to wrap.
+        release (function): called (once) when the file is closed.
+
+        """
+        self._fobj = fobj
+        self._release = release
+
+    def __getattr__(self, name):
+        return getattr(self._fobj, name)
+
+    def __iter__(self):
+        return iter(self._fobj)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, unused_exc_type, unused_exc_value, unused_traceback):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        if self._release is not None:
+            release, self._release = self._release, None
+            release()
+        self._fobj.close()
+
+
 class TombstoneError(RuntimeError):
     """An error that represents the file cacher trying to read
     files that have been deleted from the database.
@@ -484,6 +529,18 @@ class FileCacher:
     # CHUNK_SIZE should be a multiple of these values.
     CHUNK_SIZE = 16 * 1024  # 16 KiB
 
+    # Name of the directory, in config.cache_dir, of the local cache
+    # shared by all the services of the host (see config.shared_fs_cache),
+    # and of the directories therein containing the lock files. Each
+    # lock file guards the digests that hash to it: those in LOCKS_DIRNAME
+    # against concurrent loads (see _locked), those in PINS_DIRNAME
+    # against evictions (see pin).
+    SHARED_CACHE_DIRNAME = "fs-cache-shared"
+    LOCKS_DIRNAME = ".locks"
+    LOCKS = 256
+    PINS_DIRNAME = ".pins"
+    PINS = 4096
+
     def __init__(self, service=None, path=None, null=False):
         """Initialize.
 
@@ -492,8 +549,9 @@ class FileCacher:
 
         service (Service|None): the service we are running for. Only
             used if present to determine the location of the
-            file-system cache (and to provide the shard number to the
-            Sandbox... sigh!).
+            file-system cache, which is private to the service unless
+            config.shared_fs_cache is set (and to provide the shard
+            number to the Sandbox... sigh!).
         path (string|None): if specified, back the FileCacher with a
             file system-based storage instead of the default
             database-based one. The specified directory will be used
@@ -522,12 +580,25 @@ class FileCacher:
             # Delete this directory on exit since it has a random name and
             # won't be used again.
             atexit.register(lambda: rmtree(self.file_dir))
+        elif config.shared_fs_cache:
+            self.file_dir = os.path.join(
+                config.cache_dir, FileCacher.SHARED_CACHE_DIRNAME)
         else:
             self.file_dir = os.path.join(
                 config.cache_dir,
                 "fs-cache-%s-%d" % (service.name, service.shard))
         self._create_directory_or_die(self.file_dir)
 
+        # Whether other processes use the local cache too: if so, they
+        # coordinate through lock files so that each file is loaded
+        # from the backend only once.
+        self.shared = service is not None and config.shared_fs_cache
+        if self.shared:
+            self._create_directory_or_die(
+                os.path.join(self.file_dir, FileCacher.LOCKS_DIRNAME))
+            self._create_directory_or_die(
+                os.path.join(self.file_dir, FileCacher.PINS_DIRNAME))
+
         # Temp dir must be a subdirectory of file_dir to avoid cross-filesystem
         # moves.
         self.temp_dir = tempfile.mkdtemp(dir=self.file_dir, prefix="_temp")
@@ -535,6 +606,30 @@ class FileCacher:
         # Just to make sure it was created.
         self._create_directory_or_die(self.file_dir)
 
+        # Bookkeeping for the size of the local cache. The budget is
+        # in bytes, None meaning that the cache can grow indefinitely.
+        # With a shared cache, only the files loaded or used by this
+        # object are accounted for (and possibly evicted), so the
+        # budget applies to each process separately.
+        # Type: OrderedDict{str: int}, from least recently used.
+        self.max_size = None
+        if config.fs_cache_max_size_mib is not None:
+            self.max_size = config.fs_cache_max_size_mib * 1024 * 1024
+        self._entries = OrderedDict()
+        self._size = 0
+        # Number of open files and sandboxes using each digest and,
+        # with a shared cache, the file descriptors holding the shared
+        # lock that tells the other processes not to evict them.
+        self._pins = Counter()
+        self._pin_fds = dict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        # The files already in a shared cache belong to other processes
+        # as much as to this one.
+        if not self.shared:
+            self._scan_cache()
+
     @staticmethod
     def _create_directory_or_die(directory):
         """Create directory and ensure it exists, or raise a RuntimeError."""
@@ -543,6 +638,258 @@ class FileCacher:
             logger.error(msg)
             raise RuntimeError(msg)
 
+    def _open_lock_file(self, dirname, count, digest):
+        """Open the lock file guarding a digest in the shared cache.
+
+        dirname (str): the directory of the lock files.
+        count (int): the number of lock files in the directory.
+        digest (str): the digest to guard.
+
+        return (int): a file descriptor of the lock file.
+
+        """
+        path = os.path.join(
+            self.file_dir, dirname,
+            "%0*x" % (len("%x" % (count - 1)),
+                      zlib.crc32(digest.encode("utf-8")) % count))
+        return os.open(path, os.O_RDWR | os.O_CREAT, 0o660)
+
+    @staticmethod
+    def _flock(fd, operation, blocking=True):
+        """Lock a file with flock, without blocking other greenlets.
+
+        fd (int): a file descriptor of the file.
+        operation (int): fcntl.LOCK_EX or fcntl.LOCK_SH.
+        blocking (bool): whether to wait for the lock if it is held.
+
+        return (bool): whether the lock was acquired (always True if
+            blocking).
+
+        """
+        # flock would block all the greenlets, so we poll instead.
+        while True:
+            try:
+                fcntl.flock(fd, operation | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if not blocking:
+                    return False
+                gevent.sleep(0.01)
+
+    @contextmanager
+    def _locked(self, digest, blocking=True):
+        """Hold the lock of a digest in the shared local cache.
+
+        The lock is taken with flock on one of LOCKS lock files, so it
+        excludes other processes as well as other greenlets of this
+        one. Without a shared cache, it is always granted.
+
+        digest (str): the digest to lock.
+        blocking (bool): whether to wait for the lock if it is held.
+
+        yield (bool): whether the lock was acquired (always True if
+            blocking).
+
+        """
+        if not self.shared:
+            yield True
+            return
+        fd = self._open_lock_file(
+            FileCacher.LOCKS_DIRNAME, FileCacher.LOCKS, digest)
+        try:
+            if not self._flock(fd, fcntl.LOCK_EX, blocking):
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    @contextmanager
+    def _unpinned(self, digest):
+        """Hold the exclusive pin lock of a digest, if nobody pins it.
+
+        While held, no process can pin the digest. The pin lock files
+        are shared by many digests, so the lock may also be denied
+        because of a different digest: callers just skip it. Without
+        a shared cache, it is granted if this object does not pin the
+        digest.
+
+        digest (str): the digest to lock.
+
+        yield (bool): whether the lock was acquired.
+
+        """
+        if self._pins[digest] > 0:
+            yield False
+            return
+        if not self.shared:
+            yield True
+            return
+        fd = self._open_lock_file(
+            FileCacher.PINS_DIRNAME, FileCacher.PINS, digest)
+        try:
+            if not self._flock(fd, fcntl.LOCK_EX, blocking=False):
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def _scan_cache(self):
+        """Account for the files already present in the local cache.
+
+        Files are ordered by their last access time, as an
+        approximation of their usage before this object was created.
+
+        """
+        entries = []
+        with os.scandir(self.file_dir) as it:
+            for entry in it:
+                if not entry.is_file(follow_symlinks=False) \
+                        or entry.name.startswith("."):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                entries.append((stat.st_atime, entry.name, stat.st_size))
+        for _, digest, size in sorted(entries):
+            self._entries[digest] = size
+            self._size += size
+        self._evict_if_needed()
+
+    def _touch(self, digest, size=None):
+        """Mark a file of the local cache as the most recently used.
+
+        digest (str): the digest of the file.
+        size (int|None): the size of the file, if it has just been
+            (re)written; if None and the file is not known yet, it is
+            read from the file system.
+
+        """
+        if size is None and digest not in self._entries:
+            try:
+                size = os.stat(os.path.join(self.file_dir, digest)).st_size
+            except OSError:
+                return
+        if size is not None:
+            self._size += size - self._entries.get(digest, 0)
+            self._entries[digest] = size
+        self._entries.move_to_end(digest)
+        self._evict_if_needed(keep=digest)
+
+    def _forget(self, digest):
+        """Stop accounting for a file removed from the local cache.
+
+        digest (str): the digest of the file.
+
+        """
+        self._size -= self._entries.pop(digest, 0)
+
+    def _evict_if_needed(self, keep=None):
+        """Drop least recently used files until the budget is met.
+
+        Pinned files are never evicted, so the budget may be exceeded
+        if all files are in use.
+
+        keep (str|None): a digest not to evict (usually because the
+            caller is about to use it).
+
+        """
+        if self.max_size is None or self._size <= self.max_size:
+            return
+        for digest in list(self._entries.keys()):
+            if self._size <= self.max_size:
+                break
+            if digest != keep and self._try_drop(digest):
+                logger.debug("Evicted file %s from the local cache.",
+                             digest)
+                self._evictions += 1
+
+    def _try_drop(self, digest):
+        """Delete a file from the local cache, unless it is in use.
+
+        A file is in use if it is pinned (by any process, for a shared
+        cache) or another process of a shared cache is loading it.
+
+        digest (str): the digest of the file.
+
+        return (bool): whether the file was deleted.
+
+        """
+        with self._locked(digest, blocking=False) as locked, \
+                self._unpinned(digest) as unpinned:
+            if not locked or not unpinned:
+                return False
+            if self.shared and not os.path.exists(
+                    os.path.join(self.file_dir, digest)):
+                # Already evicted by another process.
+                self._forget(digest)
+                return False
+            self.drop(digest)
+            return True
+
+    def pin(self, digest):
+        """Prevent a file from being evicted from the local cache.
+
+        Every call must be matched by a call to unpin(). With a shared
+        cache, the first pin of a digest takes a shared lock on its pin
+        lock file, which other processes check before evicting.
+
+        digest (str): the digest of the file.
+
+        """
+        self._pins[digest] += 1
+        if self.shared and self._pins[digest] == 1:
+            fd = self._open_lock_file(
+                FileCacher.PINS_DIRNAME, FileCacher.PINS, digest)
+            try:
+                self._flock(fd, fcntl.LOCK_SH)
+            except BaseException:
+                os.close(fd)
+                self._pins[digest] -= 1
+                raise
+            self._pin_fds[digest] = fd
+
+    def unpin(self, digest):
+        """Undo a previous call to pin().
+
+        digest (str): the digest of the file.
+
+        """
+        self._pins[digest] -= 1
+        if self._pins[digest] <= 0:
+            del self._pins[digest]
+            fd = self._pin_fds.pop(digest, None)
+            if fd is not None:
+                # Closing the descriptor releases the lock.
+                os.close(fd)
+            self._evict_if_needed()
+
+    def get_cache_status(self):
+        """Return information about the local cache.
+
+        return (dict): size and budget (in bytes) and number of files
+            of the local cache, together with the number of hits,
+            misses and evictions since the creation of this object.
+
+        """
+        requests = self._hits + self._misses
+        return {
+            "size": self._size,
+            "max_size": self.max_size,
+            "files": len(self._entries),
+            "pinned_files": len(self._pins),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / requests if requests > 0 else None,
+            "evictions": self._evictions,
+            "shared": self.shared,
+        }
+
     def load(self, digest, if_needed=False):
         """Load the file with the given digest into the cache.
 
@@ -561,17 +908,24 @@ class FileCacher:
             raise TombstoneError()
         cache_file_path = os.path.join(self.file_dir, digest)
         if if_needed and os.path.exists(cache_file_path):
+            self._touch(digest)
             return
 
-        ftmp_handle, temp_file_path = tempfile.mkstemp(dir=self.temp_dir,
-                                                       text=False)
-        with open(ftmp_handle, 'wb') as ftmp, \
-                self.backend.get_file(digest) as fobj:
-            copyfileobj(fobj, ftmp, self.CHUNK_SIZE)
-
-        # Then move it to its real location (this operation is atomic
-        # by POSIX requirement)
-        os.rename(temp_file_path, cache_file_path)
+        with self._locked(digest):
+            # With a shared cache, another process might have loaded
+            # the file while we were waiting for the lock.
+            if not self.shared or not os.path.exists(cache_file_path):
+                ftmp_handle, temp_file_path = tempfile.mkstemp(
+                    dir=self.temp_dir, text=False)
+                with open(ftmp_handle, 'wb') as ftmp, \
+                        self.backend.get_file(digest) as fobj:
+                    copyfileobj(fobj, ftmp, self.CHUNK_SIZE)
+
+                # Then move it to its real location (this operation is
+                # atomic by POSIX requirement)
+                os.rename(temp_file_path, cache_file_path)
+            size = os.stat(cache_file_path).st_size
+        self._touch(digest, size)
 
     def get_file(self, digest):
         """Retrieve a file from the storage.
@@ -603,11 +957,53 @@ class FileCacher:
             logger.debug("File %s not in cache, downloading "
                          "from database.", digest)
 
+            self._misses += 1
             self.load(digest)
 
             logger.debug("File %s downloaded.", digest)
+        else:
+            self._hits += 1
+            self._touch(digest)
+
+        try:
+            fobj = open(cache_file_path, 'rb')
+        except FileNotFoundError:
+            # Evicted in the meantime by another process sharing the
+            # local cache.
+            self.load(digest)
+            fobj = open(cache_file_path, 'rb')
+        if self.max_size is None:
+            return fobj
+        self.pin(digest)
+        return PinnedFile(fobj, lambda: self.unpin(digest))
+
+    def get_cached_file_path(self, digest):
+        """Return the path of a file in the local cache.
+
+        The file is loaded into the local cache if needed. The caller
+        must not modify the file, nor rely on it existing for long,
+        as it may be evicted from the cache at any time.
 
-        return open(cache_file_path, 'rb')
+        digest (unicode): the digest of the file to get.
+
+        return (str): the path of the file in the local cache.
+
+        raise (KeyError): if the file cannot be found.
+        raise (TombstoneError): if the digest is the tombstone
+
+        """
+        if digest == Digest.TOMBSTONE:
+            raise TombstoneError()
+        cache_file_path = os.path.join(self.file_dir, digest)
+
+        if not os.path.exists(cache_file_path):
+            self._misses += 1
+            self.load(digest)
+        else:
+            self._hits += 1
+            self._touch(digest)
+
+        return cache_file_path
 
     def get_file_content(self, digest):
         """Retrieve a file from the storage.
@@ -737,20 +1133,45 @@ class FileCacher:
             digest = d.digest()
             dst.flush()
 
-            logger.debug("File has digest %s.", digest)
+        return self.put_file_from_temp_path(dst.name, digest, desc)
 
-            cache_file_path = os.path.join(self.file_dir, digest)
+    def put_file_from_temp_path(self, temp_path, digest, desc=""):
+        """Store a file, already in the temp dir, in the storage.
 
+        The file is moved into the file-system cache (or deleted, if
+        the cache already has it) and then stored in the backend. See
+        `put_file_from_fobj'.
+
+        temp_path (string): the path of the file, which must be in
+            temp_dir.
+        digest (unicode): the digest of the content of the file.
+        desc (unicode): the (optional) description to associate to the
+            file.
+
+        return (unicode): the digest of the stored file.
+
+        """
+        logger.debug("File has digest %s.", digest)
+
+        cache_file_path = os.path.join(self.file_dir, digest)
+
+        # Pinned so that other processes sharing the cache cannot evict
+        # the file between the check below and the end of the save.
+        self.pin(digest)
+        try:
             if not os.path.exists(cache_file_path):
-                os.rename(dst.name, cache_file_path)
+                os.rename(temp_path, cache_file_path)
             else:
-                os.unlink(dst.name)
+                os.unlink(temp_path)
+            self._touch(digest)
 
-        # Store the file in the backend. We do that even if the file
-        # was already in the cache (that is, we ignore the check above)
-        # because there's a (small) chance that the file got removed
-        # from the backend but somehow remained in the cache.
-        self.save(digest, desc)
+            # Store the file in the backend. We do that even if the file
+            # was already in the cache (that is, we ignore the check
+            # above) because there's a (small) chance that the file got
+            # removed from the backend but somehow remained in the cache.
+            self.save(digest, desc)
+        finally:
+            self.unpin(digest)
 
         return digest
 
@@ -842,23 +1263,38 @@ class FileCacher:
             os.unlink(cache_file_path)
         except OSError:
             pass
+        self._forget(digest)
 
     def purge_cache(self):
         """Empty the local cache.
 
+        A shared local cache is emptied only of the files loaded or
+        used by this object and not in use by other processes.
+
         """
+        if self.shared:
+            for digest in list(self._entries.keys()):
+                self._try_drop(digest)
+            return
         self.destroy_cache()
         if not mkdir(config.cache_dir) or not mkdir(self.file_dir):
             logger.error("Cannot create necessary directories.")
             raise RuntimeError("Cannot create necessary directories.")
+        self._entries.clear()
+        self._size = 0
 
     def destroy_cache(self):
         """Completely remove and destroy the cache.
 
         Nothing that could have been created by this object will be
-        left on disk. After that, this instance isn't usable anymore.
+        left on disk (except, for a shared local cache, the files that
+        other processes may be using). After that, this instance isn't
+        usable anymore.
 
         """
+        if self.shared:
+            rmtree(self.temp_dir)
+            return
         rmtree(self.file_dir)
 
     def list(self):
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Materialized scores of participations on tasks.
+
+"""
+
+from collections import defaultdict
+
+from sqlalchemy import event, inspect
+from sqlalchemy.schema import Column, ForeignKey
+from sqlalchemy.sql import and_, delete, select
+from sqlalchemy.types import Boolean, Float, Integer
+
+from . import Base, Session, Participation, Task, Dataset, Submission, \
+    Token, SubmissionResult
+
+
+class ParticipationTaskScore(Base):
+    """The score of a participation on a task.
+
+    A copy of what cms.grading.scoring.task_score computes (unrounded)
+    for the active dataset of the task, written by ScoringService. A
+    row is deleted, in the same transaction, by any change that could
+    make it wrong (see _invalidate_task_scores), so a row that exists
+    and refers to the active dataset is up to date; otherwise the
+    score has to be computed from the submissions.
+
+    """
+    __tablename__ = 'participation_task_scores'
+
+    # Participation (id) the score is of.
+    participation_id = Column(
+        Integer,
+        ForeignKey(Participation.id,
+                   onupdate="CASCADE", ondelete="CASCADE"),
+        primary_key=True)
+
+    # Task (id) the score is on.
+    task_id = Column(
+        Integer,
+        ForeignKey(Task.id,
+                   onupdate="CASCADE", ondelete="CASCADE"),
+        primary_key=True,
+        index=True)
+
+    # Dataset (id) whose results the scores were computed from.
+    dataset_id = Column(
+        Integer,
+        ForeignKey(Dataset.id,
+                   onupdate="CASCADE", ondelete="CASCADE"),
+        nullable=False,
+        index=True)
+
+    # The score (full, public, and only counting tokened submissions)
+    # and whether some submissions were not scored yet when it was
+    # computed.
+    score = Column(
+        Float,
+        nullable=False)
+    score_partial = Column(
+        Boolean,
+        nullable=False)
+    public_score = Column(
+        Float,
+        nullable=False)
+    public_score_partial = Column(
+        Boolean,
+        nullable=False)
+    tokened_score = Column(
+        Float,
+        nullable=False)
+    tokened_score_partial = Column(
+        Boolean,
+        nullable=False)
+
+    def get_score(self, public=False, only_tokened=False):
+        """Return one of the scores, as task_score would.
+
+        public (bool): return the public score.
+        only_tokened (bool): return the score of tokened submissions.
+
+        return ((float, bool)): the score, and whether it is partial.
+
+        """
+        if public:
+            return self.public_score, self.public_score_partial
+        elif only_tokened:
+            return self.tokened_score, self.tokened_score_partial
+        else:
+            return self.score, self.score_partial
+
+
+# Attributes of a SubmissionResult that task_score reads.
+_SCORE_ATTRS = ["score", "score_details",
+                "public_score", "public_score_details"]
+
+
+def _changed(obj, attrs):
+    state = inspect(obj)
+    return any(state.attrs[attr].history.has_changes() for attr in attrs)
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_task_scores(session, unused_flush_context):
+    """Delete the scores that the flushed changes could alter.
+
+    The participations involved are locked until the end of the
+    transaction: writers of scores lock them too before reading the
+    submissions, so they cannot store a score computed before these
+    changes were committed.
+
+    """
+    # Type: {(int, int)}: pairs of participation and task ids.
+    pairs = set()
+    # Type: {int}: ids of tasks whose scores are all invalid.
+    task_ids = set()
+
+    for obj in session.new:
+        if isinstance(obj, Submission):
+            pairs.add((obj.participation_id, obj.task_id))
+        elif isinstance(obj, Token):
+            pairs.add((obj.submission.participation_id,
+                       obj.submission.task_id))
+        elif isinstance(obj, SubmissionResult) and obj.score is not None:
+            pairs.add((obj.submission.participation_id,
+                       obj.submission.task_id))
+
+    for obj in session.dirty:
+        if isinstance(obj, Submission):
+            if _changed(obj, ["official", "participation_id", "task_id"]):
+                pairs.add((obj.participation_id, obj.task_id))
+        elif isinstance(obj, SubmissionResult):
+            if _changed(obj, _SCORE_ATTRS):
+                pairs.add((obj.submission.participation_id,
+                           obj.submission.task_id))
+        elif isinstance(obj, Task):
+            if _changed(obj, ["score_mode"]):
+                task_ids.add(obj.id)
+
+    for obj in session.deleted:
+        if isinstance(obj, Submission):
+            pairs.add((obj.participation_id, obj.task_id))
+        elif isinstance(obj, (Token, SubmissionResult)):
+            submission = obj.submission
+            if submission is not None:
+                pairs.add((submission.participation_id, submission.task_id))
+
+    if len(pairs) == 0 and len(task_ids) == 0:
+        return
+
+    connection = session.connection()
+    table = ParticipationTaskScore.__table__
+
+    # Always lock in the same order, to avoid deadlocks.
+    participation_ids = sorted(set(p_id for p_id, _ in pairs))
+    if len(participation_ids) > 0:
+        connection.execute(
+            select([Participation.id])
+            .where(Participation.id.in_(participation_ids))
+            .order_by(Participation.id)
+            .with_for_update())
+
+    by_task = defaultdict(set)
+    for participation_id, task_id in pairs:
+        if task_id not in task_ids:
+            by_task[task_id].add(participation_id)
+    for task_id, participation_ids in by_task.items():
+        connection.execute(delete(table).where(and_(
+            table.c.task_id == task_id,
+            table.c.participation_id.in_(participation_ids))))
+    if len(task_ids) > 0:
+        connection.execute(delete(table).where(
+            table.c.task_id.in_(task_ids)))
@@ -663,6 +663,21 @@ class JobGroup:
 
     @staticmethod
     def from_operations(operations, session):
+        # Load the objects with one query for each class; the list
+        # keeps them in the (weak) instance map of the session.
+        loaded = []
+        for cls, ids in [
+                (Submission, set(operation.object_id
+                                 for operation in operations
+                                 if operation.for_submission())),
+                (UserTest, set(operation.object_id
+                               for operation in operations
+                               if not operation.for_submission())),
+                (Dataset, set(operation.dataset_id
+                              for operation in operations))]:
+            if len(ids) > 0:
+                loaded += session.query(cls).filter(cls.id.in_(ids)).all()
+
         jobs = []
         for operation in operations:
             # The get_from_id method loads from the instance map (if the
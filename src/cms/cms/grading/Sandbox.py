@@ -19,11 +19,14 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import errno
+import fcntl
 import io
 import logging
 import os
 import resource
 import select
+import shutil
 import stat
 import tempfile
 from abc import ABCMeta, abstractmethod
@@ -33,6 +36,7 @@ import gevent
 from gevent import subprocess
 
 from cms import config, rmtree
+from cms.grading.boxids import BoxIdAllocator
 from cmscommon.commands import pretty_print_cmdline
 from cmscommon.datetime import monotonic_time
 
@@ -40,6 +44,10 @@ from cmscommon.datetime import monotonic_time
 logger = logging.getLogger(__name__)
 
 
+# The ioctl request to clone a file into another (as in linux/fs.h).
+FICLONE = 0x40049409
+
+
 class SandboxInterfaceException(Exception):
     pass
 
@@ -186,6 +194,12 @@ class SandboxBase(metaclass=ABCMeta):
     EXIT_TIMEOUT_WALL = 'wall timeout'
     EXIT_NONZERO_RETURN = 'nonzero return'
 
+    # Whether files from the storage can be hard links to the local
+    # cache of the FileCacher. This is safe only if the sandboxed
+    # processes cannot write to (or change the permissions of) files
+    # they don't own.
+    ALLOW_HARDLINKS = False
+
     def __init__(self, file_cacher, name=None, temp_dir=None):
         """Initialization.
 
@@ -216,6 +230,19 @@ class SandboxBase(metaclass=ABCMeta):
 
         self.max_processes = 1
 
+        # Real paths of the files that are hard links to the local
+        # cache, which must never be made writable; and whether the
+        # file system supports creating links and clones from the
+        # local cache (we stop trying at the first failure).
+        self._hardlinks = set()
+        self._can_link = True
+        self._can_reflink = True
+        # Digests of the files sharing their data with the local cache
+        # (links and clones), indexed by real path; they are pinned in
+        # the FileCacher until the files are removed, so that the cache
+        # does not evict them while they are in use.
+        self._pinned = dict()
+
         # Set common environment variables.
         # Specifically needed by Python, that searches the home for
         # packages.
@@ -365,8 +392,123 @@ class SandboxBase(metaclass=ABCMeta):
         executable (bool): to set permissions.
 
         """
-        with self.create_file(path, executable) as dest_fobj:
-            self.file_cacher.get_file_to_fobj(digest, dest_fobj)
+        population = config.sandbox_file_population
+        if population == "copy":
+            with self.create_file(path, executable) as dest_fobj:
+                self.file_cacher.get_file_to_fobj(digest, dest_fobj)
+            return
+
+        # Pinned before getting the path, so that the file cannot be
+        # evicted before we link it.
+        shared = False
+        self.file_cacher.pin(digest)
+        try:
+            cache_path = self.file_cacher.get_cached_file_path(digest)
+            if population == "link" and self.ALLOW_HARDLINKS \
+                    and self._link_from_cache(path, cache_path, executable):
+                shared = True
+                return
+            with self.create_file(path, executable) as dest_fobj:
+                shared = self._reflink_from_cache(dest_fobj, cache_path)
+                if not shared:
+                    self.file_cacher.get_file_to_fobj(digest, dest_fobj)
+        finally:
+            if shared:
+                self._pinned[self.relative_path(path)] = digest
+            else:
+                self.file_cacher.unpin(digest)
+
+    def _unpin_file(self, real_path):
+        """Unpin the digest of a file sharing data with the local cache.
+
+        real_path (string): the path of the file on the system.
+
+        """
+        digest = self._pinned.pop(real_path, None)
+        if digest is not None:
+            self.file_cacher.unpin(digest)
+
+    def _unpin_files(self):
+        """Unpin the digests of all the files sharing data with the
+        local cache, when they are about to be deleted.
+
+        """
+        for real_path in list(self._pinned.keys()):
+            self._unpin_file(real_path)
+
+    def _link_from_cache(self, path, cache_path, executable):
+        """Try to create a file in the sandbox as a hard link.
+
+        The file in the local cache is made read-only (and executable,
+        if requested) since it shares its permissions with the link.
+
+        path (string): relative path of the file inside the sandbox.
+        cache_path (string): path of the file in the local cache.
+        executable (bool): to set permissions.
+
+        return (bool): whether the link was created.
+
+        """
+        if not self._can_link:
+            return False
+        real_path = self.relative_path(path)
+        try:
+            mode = stat.S_IMODE(os.stat(cache_path).st_mode)
+            new_mode = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH \
+                | (mode & (stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH))
+            if executable:
+                new_mode |= stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH
+            if new_mode != mode:
+                os.chmod(cache_path, new_mode)
+            os.link(cache_path, real_path)
+        except OSError as error:
+            if error.errno in (errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP):
+                logger.debug("Cannot hard link files in sandbox (%s), "
+                             "falling back.", error)
+                self._can_link = False
+            return False
+        logger.debug("Linked file %s in sandbox.", path)
+        self._hardlinks.add(real_path)
+        return True
+
+    def _reflink_from_cache(self, dest_fobj, cache_path):
+        """Try to fill a file in the sandbox with a copy-on-write clone.
+
+        dest_fobj (file): the (empty) file in the sandbox.
+        cache_path (string): path of the file in the local cache.
+
+        return (bool): whether the clone was created.
+
+        """
+        if not self._can_reflink:
+            return False
+        try:
+            with open(cache_path, "rb") as src_fobj:
+                fcntl.ioctl(dest_fobj.fileno(), FICLONE, src_fobj.fileno())
+        except OSError as error:
+            if error.errno != errno.ENOENT:
+                logger.debug("Cannot clone files in sandbox (%s), "
+                             "falling back.", error)
+                self._can_reflink = False
+            return False
+        return True
+
+    def _unshare_file(self, real_path):
+        """Replace a hard link to the local cache with a private copy.
+
+        real_path (string): the path of the file on the system.
+
+        """
+        if real_path not in self._hardlinks:
+            return
+        temp_path = real_path + ".tmp"
+        with open(real_path, "rb") as src_fobj, \
+                open(temp_path, "wb") as dest_fobj:
+            shutil.copyfileobj(src_fobj, dest_fobj)
+        shutil.copymode(real_path, temp_path)
+        os.rename(temp_path, real_path)
+        self._hardlinks.discard(real_path)
+        self._unpin_file(real_path)
 
     def create_file_from_string(self, path, content, executable=False):
         """Write some data to a file in the sandbox.
@@ -472,7 +614,10 @@ class SandboxBase(metaclass=ABCMeta):
         path (string): relative path of the file inside the sandbox.
 
         """
-        os.remove(self.relative_path(path))
+        real_path = self.relative_path(path)
+        os.remove(real_path)
+        self._hardlinks.discard(real_path)
+        self._unpin_file(real_path)
 
     @abstractmethod
     def execute_without_std(self, command, wait=False):
@@ -508,6 +653,19 @@ class SandboxBase(metaclass=ABCMeta):
         """
         pass
 
+    def reset(self, name=None):
+        """Bring the sandbox back to the state it had when created.
+
+        Used to reuse a sandbox, instead of deleting it and creating a
+        new one. Sandboxes that cannot be reset return False.
+
+        name (string|None): the new name of the sandbox.
+
+        return (bool): whether the sandbox has been reset.
+
+        """
+        return False
+
     @abstractmethod
     def cleanup(self, delete=False):
         """Cleanup the sandbox.
@@ -822,6 +980,7 @@ class StupidSandbox(SandboxBase):
     def cleanup(self, delete=False):
         """See Sandbox.cleanup()."""
         # This sandbox doesn't have any cleanup, but we might want to delete.
+        self._unpin_files()
         if delete:
             logger.debug("Deleting sandbox in %s.", self._path)
             rmtree(self._path)
@@ -843,7 +1002,16 @@ class IsolateSandbox(SandboxBase):
        command number N.
 
     """
-    next_id = 0
+    # The allocator of the box ids of this process (see
+    # get_box_id_allocator).
+    box_id_allocator = None
+
+    # Sandboxed processes run as a different user, and cannot touch
+    # read-only files owned by us.
+    ALLOW_HARDLINKS = True
+
+    # Box ids below this are left to direct users of isolate.
+    FIRST_BOX_ID = 10
 
     # If the command line starts with this command name, we are just
     # going to execute it without sandboxing, and with all permissions
@@ -858,19 +1026,12 @@ class IsolateSandbox(SandboxBase):
         """
         SandboxBase.__init__(self, file_cacher, name, temp_dir)
 
-        # Isolate only accepts ids between 0 and 999 (by default). We assign
-        # the range [(shard+1)*10, (shard+2)*10) to each Worker and keep the
-        # range [0, 10) for other uses (command-line scripts like cmsMake or
-        # direct console users of isolate). Inside each range ids are assigned
-        # sequentially, with a wrap-around.
-        # FIXME This is the only use of FileCacher.service, and it's an
-        # improper use! Avoid it!
-        if file_cacher is not None and file_cacher.service is not None:
-            box_id = ((file_cacher.service.shard + 1) * 10
-                      + (IsolateSandbox.next_id % 10)) % 1000
-        else:
-            box_id = IsolateSandbox.next_id % 10
-        IsolateSandbox.next_id += 1
+        # Isolate only accepts ids between 0 and num_boxes - 1. We keep
+        # the range [0, 10) for direct console users of isolate, and
+        # lease the others to the sandboxes of all the processes of the
+        # host, until their cleanup (see BoxIdAllocator).
+        box_id = IsolateSandbox.get_box_id_allocator().acquire()
+        self._box_id_live = True
 
         # We create a directory "home" inside the outer temporary directory,
         # that will be bind-mounted to "/tmp" inside the sandbox (some
@@ -891,14 +1052,27 @@ class IsolateSandbox(SandboxBase):
         # Used for -M - the meta file ends up in the outer directory. The
         # actual filename will be <info_basename>.<execution_number>.
         self.info_basename = os.path.join(self._outer_dir, "run.log")
-        self.log = None
-        self.exec_num = -1
         self.cmd_file = os.path.join(self._outer_dir, "commands.log")
         logger.debug("Sandbox in `%s' created, using box `%s'.",
                      self._home, self.box_exec)
 
-        # Default parameters for isolate
         self.box_id = box_id           # -b
+        # The directory of the box created by isolate, as printed by
+        # isolate --init (None if unknown).
+        self._box_dir = None
+        self._set_defaults()
+
+        # Tell isolate to get the sandbox ready. We do our best to cleanup
+        # after ourselves, but we might have missed something if a previous
+        # worker was interrupted in the middle of an execution, so we issue an
+        # idempotent cleanup (which, unlike cleanup(), keeps the box id).
+        self._cleanup_isolate()
+        self.initialize_isolate()
+
+    def _set_defaults(self):
+        """Set the default parameters for isolate."""
+        self.log = None
+        self.exec_num = -1
         self.cgroup = config.use_cgroups  # --cg
         self.chdir = self._home_dest   # -c
         self.dirs = []                 # -d
@@ -928,12 +1102,7 @@ class IsolateSandbox(SandboxBase):
         # symlink to one out of many alternatives.
         self.maybe_add_mapped_directory("/etc/alternatives")
 
-        # Tell isolate to get the sandbox ready. We do our best to cleanup
-        # after ourselves, but we might have missed something if a previous
-        # worker was interrupted in the middle of an execution, so we issue an
-        # idempotent cleanup.
-        self.cleanup()
-        self.initialize_isolate()
+        self.max_processes = 1
 
     def add_mapped_directory(self, src, dest=None, options=None,
                              ignore_if_not_existing=False):
@@ -964,7 +1133,9 @@ class IsolateSandbox(SandboxBase):
         """
         os.chmod(self._home, 0o777)
         for filename in os.listdir(self._home):
-            os.chmod(os.path.join(self._home, filename), 0o777)
+            path = os.path.join(self._home, filename)
+            if path not in self._hardlinks:
+                os.chmod(path, 0o777)
 
     def allow_writing_none(self):
         """Set permissions in such a way that the user cannot write anything.
@@ -972,7 +1143,9 @@ class IsolateSandbox(SandboxBase):
         """
         os.chmod(self._home, 0o755)
         for filename in os.listdir(self._home):
-            os.chmod(os.path.join(self._home, filename), 0o755)
+            path = os.path.join(self._home, filename)
+            if path not in self._hardlinks:
+                os.chmod(path, 0o755)
 
     def allow_writing_only(self, inner_paths):
         """Set permissions in so that the user can write only some paths.
@@ -1003,10 +1176,13 @@ class IsolateSandbox(SandboxBase):
             outer_paths.append(outer_path)
 
         # If one of the specified file do not exists, we touch it to
-        # assign the correct permissions.
+        # assign the correct permissions; if it is linked to the local
+        # cache, we replace it with a copy.
         for path in outer_paths:
             if not os.path.exists(path):
                 open(path, "wb").close()
+            else:
+                self._unshare_file(path)
 
         # Close everything, then open only the specified.
         self.allow_writing_none()
@@ -1407,11 +1583,101 @@ class IsolateSandbox(SandboxBase):
             [self.box_exec]
             + (["--cg"] if self.cgroup else [])
             + ["--box-id=%d" % self.box_id, "--init"])
-        ret = subprocess.call(init_cmd)
-        if ret != 0:
+        proc = subprocess.Popen(init_cmd, stdout=subprocess.PIPE)
+        out, _ = proc.communicate()
+        if proc.returncode != 0:
             raise SandboxInterfaceException(
                 "Failed to initialize sandbox with command: %s "
-                "(error %d)" % (pretty_print_cmdline(init_cmd), ret))
+                "(error %d)" % (pretty_print_cmdline(init_cmd),
+                                proc.returncode))
+        # Isolate prints the path of the box, whose "box" subdirectory
+        # is writable by the sandboxed processes.
+        path = out.decode("utf-8", errors="replace").strip()
+        self._box_dir = os.path.join(path, "box") if path else None
+
+    def _box_dir_is_empty(self):
+        """Return whether the box of isolate is known to be empty.
+
+        return (bool): False if the sandboxed processes left files in
+            the box of isolate (outside of our home), or if we cannot
+            tell.
+
+        """
+        if self._box_dir is None:
+            return False
+        try:
+            return len(os.listdir(self._box_dir)) == 0
+        except OSError:
+            return False
+
+    def reset(self, name=None):
+        """See Sandbox.reset().
+
+        Only the content of the home directory and the logs are
+        deleted. Isolate's box is initialized again only if the
+        sandboxed processes wrote something in it.
+
+        """
+        if not self._box_id_live:
+            return False
+
+        try:
+            for filename in os.listdir(self._home):
+                path = os.path.join(self._home, filename)
+                if os.path.isdir(path) and not os.path.islink(path):
+                    # Fails on directories the sandboxed processes
+                    # did not let us write to.
+                    rmtree(path)
+                else:
+                    os.remove(path)
+            for filename in os.listdir(self._outer_dir):
+                if filename.startswith("run.log.") \
+                        or filename == "commands.log":
+                    os.remove(os.path.join(self._outer_dir, filename))
+        except OSError:
+            logger.debug("Cannot reset sandbox in %s.", self._outer_dir,
+                         exc_info=True)
+            return False
+
+        if not self._box_dir_is_empty():
+            logger.debug("Initializing again box %d.", self.box_id)
+            self._cleanup_isolate()
+            try:
+                self.initialize_isolate()
+            except SandboxInterfaceException:
+                logger.warning("Cannot initialize again box %d.",
+                               self.box_id, exc_info=True)
+                return False
+
+        self.name = name if name is not None else "unnamed"
+        self._hardlinks.clear()
+        self._unpin_files()
+        self._set_defaults()
+        self.allow_writing_all()
+        return True
+
+    @staticmethod
+    def get_box_id_allocator():
+        """Return the allocator of the box ids, creating it if needed.
+
+        return (BoxIdAllocator): the allocator used by the sandboxes of
+            this process.
+
+        """
+        if IsolateSandbox.box_id_allocator is None:
+            lock_path = os.path.join(config.temp_dir, "cms-isolate-box-ids")
+            IsolateSandbox.box_id_allocator = BoxIdAllocator(
+                IsolateSandbox.FIRST_BOX_ID, config.isolate_num_boxes,
+                lock_path)
+        return IsolateSandbox.box_id_allocator
+
+    def _cleanup_isolate(self):
+        """Tell isolate to cleanup the box."""
+        exe = [self.box_exec] \
+            + (["--cg"] if self.cgroup else []) \
+            + ["--box-id=%d" % self.box_id]
+        subprocess.call(exe + ["--cleanup"],
+                        stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
 
     def cleanup(self, delete=False):
         """See Sandbox.cleanup()."""
@@ -1435,8 +1701,11 @@ class IsolateSandbox(SandboxBase):
                 stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
 
         # Tell isolate to cleanup the sandbox.
-        subprocess.call(exe + ["--cleanup"],
-                        stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+        self._cleanup_isolate()
+        self._unpin_files()
+        if self._box_id_live:
+            self._box_id_live = False
+            IsolateSandbox.get_box_id_allocator().release(self.box_id)
 
         if delete:
             logger.debug("Deleting sandbox in %s.", self._outer_dir)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Allocation of the ids of isolate's boxes.
+
+Isolate identifies its boxes by a number in [0, num_boxes), and does
+not prevent two users from using the same box at the same time, which
+would make them interfere. Box ids are therefore leased, among all the
+processes of a host, through a lock file: the byte at offset i of the
+file is locked (with fcntl, see lockf(3)) by the process using box i.
+Locks are released by the kernel when their process dies, so leases of
+crashed processes are reclaimed automatically.
+
+"""
+
+import errno
+import fcntl
+import logging
+import os
+
+
+logger = logging.getLogger(__name__)
+
+
+class BoxIdAllocator:
+    """Lease the ids in a range to the sandboxes of this process.
+
+    Record locks belong to processes, and a process does not conflict
+    with itself: the ids leased by this process are kept in memory too.
+    Closing any descriptor of the lock file would release all the locks
+    of the process, so the file is opened only once.
+
+    """
+
+    def __init__(self, first_id, num_boxes, lock_path):
+        """Initialize the allocator.
+
+        first_id (int): the first id that can be leased.
+        num_boxes (int): one more than the last id that can be leased.
+        lock_path (str|None): the path of the host-wide lock file, or
+            None to only avoid conflicts within this process.
+
+        """
+        if not 0 <= first_id < num_boxes:
+            raise ValueError("Invalid range of box ids [%d, %d)."
+                             % (first_id, num_boxes))
+        self.first_id = first_id
+        self.num_boxes = num_boxes
+        self.lock_path = lock_path
+
+        self._fd = None
+        self._leased = set()
+        # Ids are tried starting from the one after the last leased,
+        # so that the boxes just released get some rest.
+        self._next_id = first_id
+
+    def _get_fd(self):
+        """Return the descriptor of the lock file, opening it if needed.
+
+        return (int|None): the descriptor, or None if the lock file is
+            disabled or cannot be opened.
+
+        """
+        if self._fd is None and self.lock_path is not None:
+            try:
+                self._fd = os.open(self.lock_path,
+                                   os.O_RDWR | os.O_CREAT | os.O_CLOEXEC,
+                                   0o660)
+            except OSError:
+                logger.warning("Cannot open lock file %s for the box ids, "
+                               "other processes might use the same boxes.",
+                               self.lock_path, exc_info=True)
+                self.lock_path = None
+        return self._fd
+
+    def _try_lock(self, box_id):
+        """Try to lock the byte of a box id in the lock file.
+
+        box_id (int): the id to lock.
+
+        return (bool): whether the lock has been acquired (always true
+            if there is no lock file).
+
+        """
+        fd = self._get_fd()
+        if fd is None:
+            return True
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, box_id)
+        except OSError as error:
+            if error.errno in (errno.EACCES, errno.EAGAIN):
+                return False
+            raise
+        return True
+
+    def acquire(self):
+        """Lease a box id not used by other sandboxes of the host.
+
+        return (int): the box id.
+
+        raise (OSError): if all the box ids are in use.
+
+        """
+        size = self.num_boxes - self.first_id
+        for i in range(size):
+            box_id = self.first_id + \
+                (self._next_id - self.first_id + i) % size
+            if box_id not in self._leased and self._try_lock(box_id):
+                self._leased.add(box_id)
+                self._next_id = box_id + 1
+                return box_id
+        raise OSError(errno.EBUSY,
+                      "All the box ids in [%d, %d) are in use."
+                      % (self.first_id, self.num_boxes))
+
+    def release(self, box_id):
+        """End the lease of a box id.
+
+        box_id (int): an id returned by acquire.
+
+        """
+        if box_id not in self._leased:
+            logger.warning("Releasing box id %d, which is not leased.",
+                           box_id)
+            return
+        self._leased.discard(box_id)
+        if self._fd is not None:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, box_id)
+
+    def get_leased(self):
+        """Return the box ids leased by this process.
+
+        return ({int}): the ids.
+
+        """
+        return set(self._leased)
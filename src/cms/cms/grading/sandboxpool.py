@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""A pool of sandboxes ready to be used, for a Worker.
+
+Creating an isolate sandbox and deleting it require several calls to
+isolate, which for short evaluations cost more than the evaluation
+itself. The pool keeps some sandboxes already initialized; when a
+sandbox is not needed anymore it is reset in the background (see
+SandboxBase.reset) and kept for another job.
+
+"""
+
+import logging
+from weakref import WeakKeyDictionary
+
+import gevent
+
+from cms.grading.Sandbox import Sandbox
+from cmscommon.datetime import monotonic_time
+
+
+logger = logging.getLogger(__name__)
+
+
+class SandboxPool:
+    """Keep up to a number of idle sandboxes, ready to be used.
+
+    """
+
+    # Number of times a sandbox is used before deleting it anyway, to
+    # bound the effects of what a reset might not clean.
+    MAX_USES = 100
+
+    def __init__(self, file_cacher, size):
+        """Initialize the pool.
+
+        file_cacher (FileCacher): the file cacher of the sandboxes.
+        size (int): the maximum number of idle sandboxes.
+
+        """
+        self.file_cacher = file_cacher
+        self.size = size
+
+        # Sandboxes ready to be used, and number of those being created
+        # or reset that will be.
+        self._idle = []
+        self._pending = 0
+        # Number of times each sandbox has been used.
+        self._uses = WeakKeyDictionary()
+        # Whether close was called: no sandbox is kept anymore.
+        self._closed = False
+
+        self._hits = 0
+        self._misses = 0
+        self._resets = 0
+        self._failed_resets = 0
+        self._retired = 0
+        self._total_reset_time = 0.0
+        self._max_reset_time = 0.0
+
+    def get(self, name=None):
+        """Return a sandbox, from the pool if possible.
+
+        name (str|None): name of the sandbox (which appears in the logs
+            and, for new sandboxes, in their path).
+
+        return (Sandbox): a sandbox ready to be used.
+
+        raise (OSError): if a new sandbox cannot be created.
+
+        """
+        if len(self._idle) > 0:
+            sandbox = self._idle.pop()
+            sandbox.name = name if name is not None else "unnamed"
+            self._hits += 1
+        else:
+            # The pool was too small for the current load (or this is
+            # the first request): make it grow while we create this one.
+            self._misses += 1
+            if not self._closed:
+                self._fill()
+            sandbox = Sandbox(self.file_cacher, name=name)
+        self._uses[sandbox] = self._uses.get(sandbox, 0) + 1
+        return sandbox
+
+    def put(self, sandbox):
+        """Give back a sandbox that is not needed anymore.
+
+        The sandbox is reset in the background, and kept in the pool if
+        that succeeds and the pool is not full; otherwise it is deleted.
+
+        sandbox (Sandbox): a sandbox returned by get.
+
+        """
+        self._pending += 1
+        gevent.spawn(self._recycle, sandbox)
+
+    def _recycle(self, sandbox):
+        """Reset a sandbox and keep it, or delete it.
+
+        sandbox (Sandbox): the sandbox to recycle.
+
+        """
+        try:
+            keep = not self._closed \
+                and len(self._idle) + self._pending <= self.size \
+                and self._uses.get(sandbox, 0) < SandboxPool.MAX_USES
+            if not keep:
+                self._retired += 1
+            else:
+                start_time = monotonic_time()
+                keep = sandbox.reset()
+                elapsed = monotonic_time() - start_time
+                if keep:
+                    self._resets += 1
+                    self._total_reset_time += elapsed
+                    self._max_reset_time = max(self._max_reset_time, elapsed)
+                else:
+                    self._failed_resets += 1
+            # The pool may have been closed during the reset.
+            if keep and not self._closed:
+                self._idle.append(sandbox)
+            else:
+                self._delete(sandbox)
+        finally:
+            self._pending -= 1
+
+    def _delete(self, sandbox):
+        """Delete a sandbox, logging errors.
+
+        sandbox (Sandbox): the sandbox to delete.
+
+        """
+        self._uses.pop(sandbox, None)
+        try:
+            sandbox.cleanup(delete=True)
+        except OSError:
+            logger.warning("Couldn't delete sandbox.", exc_info=True)
+
+    def _fill(self):
+        """Create in the background the sandboxes missing in the pool.
+
+        """
+        for _ in range(self.size - len(self._idle) - self._pending):
+            self._pending += 1
+            gevent.spawn(self._create)
+
+    def _create(self):
+        """Create a sandbox for the pool.
+
+        """
+        try:
+            sandbox = Sandbox(self.file_cacher, name="pool")
+        except Exception:
+            logger.warning("Couldn't create sandbox for the pool.",
+                           exc_info=True)
+        else:
+            if self._closed:
+                self._delete(sandbox)
+            else:
+                self._idle.append(sandbox)
+        finally:
+            self._pending -= 1
+
+    def close(self):
+        """Delete the idle sandboxes, and those given back from now on.
+
+        Sandboxes being created or reset are deleted when done.
+
+        """
+        self._closed = True
+        while len(self._idle) > 0:
+            self._delete(self._idle.pop())
+
+    def get_status(self):
+        """Return information about the pool.
+
+        return (dict): size and number of idle sandboxes, number of
+            sandboxes taken from the pool (hits) or created when it was
+            empty (misses), of resets (successful or not) and of
+            sandboxes deleted because full or used too many times, and
+            average and maximum duration (in seconds) of the resets.
+
+        """
+        requests = self._hits + self._misses
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "pending": self._pending,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / requests if requests > 0 else None,
+            "resets": self._resets,
+            "failed_resets": self._failed_resets,
+            "retired": self._retired,
+            "average_reset_time": self._total_reset_time / self._resets
+            if self._resets > 0 else None,
+            "max_reset_time": self._max_reset_time,
+        }
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Scorer for the book scanning problem (Hash Code 2020 qualification).
+
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from .abc import Scorer, ScorerError
+from .util import check, check_all, first_duplicate, parse_integers, \
+    ranges, walk_records
+
+
+class BookScanningInput(namedtuple("BookScanningInput",
+                                   "days book_scores signup_days "
+                                   "books_per_day library_sizes "
+                                   "library_books")):
+    """The parsed input: library_books contains, sorted, the values
+    library * number of books + book for each book of each library.
+
+    """
+    pass
+
+
+class BookScanning(Scorer):
+    """Scorer for the book scanning problem.
+
+    The day-by-day simulation is replaced by array operations: the
+    sign-up of each library starts after the cumulative sign-up time
+    of the previous ones, which determines how many of its books are
+    scanned; a boolean mask then counts each book only once.
+
+    """
+
+    def parse_input(self, data):
+        """See Scorer.parse_input."""
+        values = parse_integers(data)
+        check(len(values) >= 3,
+              "[Input incorrect]: Failed to parse B, L, D.")
+        books, libraries, days = (int(v) for v in values[:3])
+        check(1 <= books <= 100000,
+              "[Input incorrect]: 1 <= B <= 100000, with B = %d.", books)
+        check(1 <= libraries <= 100000,
+              "[Input incorrect]: 1 <= L <= 100000, with L = %d.", libraries)
+        check(1 <= days <= 100000,
+              "[Input incorrect]: 1 <= D <= 100000, with D = %d.", days)
+
+        check(len(values) >= 3 + books,
+              "[Input incorrect]: Failed to parse the scores of the books.")
+        book_scores = values[3:3 + books]
+        check_all((book_scores >= 0) & (book_scores <= 100),
+                  "[Input incorrect]: 0 <= book_scores[i] <= 100, with "
+                  "i = %d, book_scores[i] = %d", book_scores)
+
+        positions, sizes = walk_records(
+            values, 3 + books, libraries, 3, 0, (1, 100000),
+            "[Input incorrect]: Failed to parse library at index %d.",
+            "[Input incorrect]: 1 <= libraries[i].N <= 100000, with "
+            "i = %d, libraries[i].N = %d.")
+        signup_days = values[positions + 1]
+        check_all((signup_days >= 1) & (signup_days <= 100000),
+                  "[Input incorrect]: 1 <= libraries[i].T <= 100000, with "
+                  "i = %d, libraries[i].T = %d.", signup_days)
+        books_per_day = values[positions + 2]
+        check_all((books_per_day >= 1) & (books_per_day <= 100000),
+                  "[Input incorrect]: 1 <= libraries[i].M <= 100000, with "
+                  "i = %d, libraries[i].M = %d.", books_per_day)
+        check(sizes.sum() <= 1000000,
+              "[Input incorrect]: Total number of books = %d exceeds "
+              "1 million.", int(sizes.sum()))
+
+        library_books = values[ranges(positions + 3, sizes)]
+        check_all((library_books >= 0) & (library_books < books),
+                  "[Input incorrect]: Book at position %d among all the "
+                  "libraries has invalid id %d.", library_books)
+        owners = np.repeat(np.arange(libraries, dtype=np.int64), sizes)
+        keys = np.sort(owners * books + library_books)
+        duplicate = first_duplicate(keys)
+        if duplicate is not None:
+            raise ScorerError("[Input incorrect]: Book with id %d of library "
+                              "at index %d is duplicate.",
+                              duplicate % books, duplicate // books)
+
+        return BookScanningInput(days, book_scores, signup_days,
+                                 books_per_day, sizes, keys)
+
+    def score(self, parsed_input, data):
+        """See Scorer.score."""
+        books = len(parsed_input.book_scores)
+        libraries = len(parsed_input.library_sizes)
+
+        values = parse_integers(data)
+        check(len(values) >= 1, "[Output incorrect]: Failed to parse A.")
+        signups = int(values[0])
+        check(0 <= signups <= libraries,
+              "[Output incorrect]: 0 <= A <= L, with A = %d, L = %d.",
+              signups, libraries)
+
+        # Lengths are checked against the size of the library later,
+        # so here they are only bounded by the largest possible size.
+        positions, sizes = walk_records(
+            values, 1, signups, 2, 1, (1, 100000),
+            "[Output incorrect]: Failed to parse the sign-up at index %d.",
+            "[Output incorrect]: 1 <= K, with index = %d, K = %d.")
+        chosen = values[positions]
+        check_all((chosen >= 0) & (chosen < libraries),
+                  "[Output incorrect]: 0 <= Y < L, with index = %d, "
+                  "Y = %d.", chosen)
+        library_sizes = parsed_input.library_sizes[chosen]
+        check_all(sizes <= library_sizes,
+                  "[Output incorrect]: 1 <= K <= N, with index = %d, "
+                  "K = %d, N = %d.", sizes, library_sizes)
+
+        scanned = values[ranges(positions + 2, sizes)]
+        owners = np.repeat(np.arange(signups, dtype=np.int64), sizes)
+        keys = chosen[owners] * books + scanned
+        found = np.searchsorted(parsed_input.library_books, keys)
+        found[found == len(parsed_input.library_books)] = 0
+        check_all((scanned >= 0) & (scanned < books)
+                  & (parsed_input.library_books[found] == keys),
+                  "[Output incorrect]: Book at position %d among all the "
+                  "sign-ups with id %d is not in its library.", scanned)
+        duplicate = first_duplicate(np.sort(owners * books + scanned))
+        if duplicate is not None:
+            raise ScorerError("[Output incorrect]: Book with id %d of the "
+                              "sign-up at index %d is duplicate.",
+                              duplicate % books, duplicate // books)
+
+        # A library is signed up only if the previous sign-ups end
+        # before the last day; then it ships books until the last day.
+        signup_days = parsed_input.signup_days[chosen]
+        signup_start = np.cumsum(signup_days) - signup_days
+        shipping_days = parsed_input.days - signup_start - signup_days
+        shipped = np.clip(
+            np.minimum(shipping_days * parsed_input.books_per_day[chosen],
+                       sizes), 0, None)
+        shipped[signup_start >= parsed_input.days] = 0
+
+        order = np.arange(len(scanned), dtype=np.int64) \
+            - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        is_scanned = np.zeros(books, dtype=bool)
+        is_scanned[scanned[order < shipped[owners]]] = True
+        return int(parsed_input.book_scores[is_scanned].sum())
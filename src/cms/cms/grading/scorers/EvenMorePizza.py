@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Scorer for the even more pizza problem (Hash Code 2021 practice
+round).
+
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from .abc import Scorer, ScorerError
+from .util import check, check_all, first_duplicate, parse_integers, \
+    ranges, walk_records
+
+
+class EvenMorePizzaInput(namedtuple("EvenMorePizzaInput",
+                                    "teams ingredient_starts "
+                                    "ingredient_counts ingredients "
+                                    "distinct_ingredients")):
+    """The parsed input: ingredients are numbered, and those of each
+    pizza are a slice of the ingredients array.
+
+    """
+    pass
+
+
+class EvenMorePizza(Scorer):
+    """Scorer for the even more pizza problem: the score of each
+    delivery is the square of the number of distinct ingredients of its
+    pizzas, computed for all deliveries at once by counting the unique
+    (delivery, ingredient) pairs.
+
+    """
+
+    def parse_input(self, data):
+        """See Scorer.parse_input."""
+        tokens = data.split()
+        try:
+            pizzas, *teams = (int(token) for token in tokens[:4])
+        except ValueError:
+            teams = []
+        check(len(teams) == 3,
+              "[Input incorrect]: Failed to parse M, T2, T3, T4.")
+        check(1 <= pizzas <= 100000,
+              "[Input incorrect]: Failed constraint 1 <= M <= 100000, with "
+              "M = %d.", pizzas)
+        for size, count in enumerate(teams, 2):
+            check(0 <= count <= 100000,
+                  "[Input incorrect]: Failed constraint 0 <= T%d <= 50000, "
+                  "with T%d = %d.", size, size, count)
+
+        # Ingredient names are not integers: find the counts first.
+        starts = []
+        counts = []
+        pos = 4
+        for i in range(pizzas):
+            try:
+                count = int(tokens[pos])
+            except (IndexError, ValueError):
+                raise ScorerError("[Input incorrect]: Failed to parse the "
+                                  "number of ingredients of pizza %d.", i)
+            check(1 <= count <= 10000,
+                  "[Input incorrect]: The number of ingredients of pizza %d "
+                  "is too large.", i)
+            check(pos + 1 + count <= len(tokens),
+                  "[Input incorrect]: Failed to parse the ingredients of "
+                  "pizza %d.", i)
+            starts.append(pos + 1)
+            counts.append(count)
+            pos += 1 + count
+        starts = np.array(starts, dtype=np.int64)
+        counts = np.array(counts, dtype=np.int64)
+
+        names = np.array(tokens[4:pos])[ranges(starts - 4, counts)]
+        distinct_names, ingredients = np.unique(names, return_inverse=True)
+        return EvenMorePizzaInput(
+            teams, np.cumsum(counts) - counts, counts,
+            ingredients.astype(np.int64), len(distinct_names))
+
+    def score(self, parsed_input, data):
+        """See Scorer.score."""
+        pizzas = len(parsed_input.ingredient_counts)
+        teams = parsed_input.teams
+
+        values = parse_integers(data)
+        check(len(values) >= 1, "[Output incorrect]: Failed to parse D.")
+        deliveries = int(values[0])
+        check(1 <= deliveries <= sum(teams),
+              "[Output incorrect]: Failed constraint 1 <= D <= T2 + T3 + T4, "
+              "with D = %d", deliveries)
+
+        positions, sizes = walk_records(
+            values, 1, deliveries, 1, 0, (2, 4),
+            "[Output incorrect]: Failed to parse delivery %d.",
+            "[Output incorrect]: Failed constraint 2 <= L <= 4 for delivery "
+            "at index %d, with L = %d.")
+        for size, count in enumerate(teams, 2):
+            delivered = np.cumsum(sizes == size)
+            check_all(delivered <= count,
+                      "[Output incorrect]: Invalid delivery at index %d. Too "
+                      "many deliveries for teams of size %d.",
+                      np.full(deliveries, size))
+
+        delivered_pizzas = values[ranges(positions + 1, sizes)]
+        check_all((delivered_pizzas >= 0) & (delivered_pizzas < pizzas),
+                  "[Output incorrect]: Invalid pizza at position %d among "
+                  "all the deliveries, with index %d.", delivered_pizzas)
+        duplicate = first_duplicate(np.sort(delivered_pizzas))
+        if duplicate is not None:
+            raise ScorerError("[Output incorrect]: Pizza %d was delivered "
+                              "twice.", duplicate)
+
+        # Pair each ingredient of each delivered pizza with its delivery.
+        counts = parsed_input.ingredient_counts[delivered_pizzas]
+        ingredients = parsed_input.ingredients[ranges(
+            parsed_input.ingredient_starts[delivered_pizzas], counts)]
+        owners = np.repeat(
+            np.repeat(np.arange(deliveries, dtype=np.int64), sizes), counts)
+        pairs = np.sort(
+            owners * parsed_input.distinct_ingredients + ingredients)
+        # Owners are sorted, so they are also the owners of the sorted
+        # pairs; the first of equal pairs marks a distinct ingredient.
+        first = np.ones(len(pairs), dtype=bool)
+        first[1:] = pairs[1:] != pairs[:-1]
+        distinct = np.bincount(owners[first], minlength=deliveries)
+        return int((distinct * distinct).sum())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Scorer for the more pizza problem (Hash Code 2020 practice round).
+
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from .abc import Scorer, ScorerError
+from .util import check, check_all, first_duplicate, parse_integers
+
+
+MorePizzaInput = namedtuple("MorePizzaInput", "max_slices slice_counts")
+
+
+class MorePizza(Scorer):
+    """Scorer for the more pizza problem: the score is the total number
+    of slices of the pizzas ordered, computed with fancy indexing.
+
+    """
+
+    def parse_input(self, data):
+        """See Scorer.parse_input."""
+        values = parse_integers(data)
+        check(len(values) >= 2, "[Input incorrect]: Failed to parse M, N.")
+        max_slices, types = (int(v) for v in values[:2])
+        check(types >= 0, "[Input incorrect]: Failed to parse M, N.")
+        check(len(values) >= 2 + types,
+              "[Input incorrect]: Failed to parse slice count at index %d.",
+              len(values) - 2)
+        slice_counts = values[2:2 + types]
+        check_all(slice_counts <= max_slices,
+                  "[Input incorrect]: Slice count at index %d is greater "
+                  "than M (%d > %d)", slice_counts,
+                  np.full(types, max_slices))
+        check(bool((slice_counts[1:] >= slice_counts[:-1]).all()),
+              "[Input incorrect]: Slice counts are not sorted.")
+        return MorePizzaInput(max_slices, slice_counts)
+
+    def score(self, parsed_input, data):
+        """See Scorer.score."""
+        types = len(parsed_input.slice_counts)
+
+        values = parse_integers(data)
+        check(len(values) >= 1, "[Output incorrect]: Failed to parse K.")
+        ordered = int(values[0])
+        check(0 <= ordered < types,
+              "[Output incorrect]: Unsatisfied constraint 0 <= K <= N, with "
+              "K = %d, N = %d.", ordered, types)
+        check(len(values) >= 1 + ordered,
+              "[Output incorrect]: Failed to parse the pizza type at index "
+              "%d.", len(values) - 1)
+        pizza_types = values[1:1 + ordered]
+        check_all((pizza_types >= 0) & (pizza_types < types),
+                  "[Output incorrect]: Unsatisfied constraint 0 <= "
+                  "pizza_type[i] < N, with i = %d, pizza_type[i] = %d.",
+                  pizza_types)
+        duplicate = first_duplicate(np.sort(pizza_types))
+        if duplicate is not None:
+            raise ScorerError("[Output incorrect]: Duplicate pizza type %d.",
+                              duplicate)
+
+        slices = int(parsed_input.slice_counts[pizza_types].sum())
+        check(slices <= parsed_input.max_slices,
+              "[Output incorrect]: Sum of slice sizes exceedes M, with "
+              "sum = %d, M = %d.", slices, parsed_input.max_slices)
+        return slices
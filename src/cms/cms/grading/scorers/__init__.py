@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""In-process scorers for output only tasks.
+
+A scorer is an alternative to the checker of an OutputOnly task, for
+tasks whose score can be computed efficiently in Python: the Worker
+computes the outcome directly, without starting a sandbox, and parses
+each input only once.
+
+"""
+
+import logging
+from collections import OrderedDict
+
+from cms import plugin_list
+from .abc import Scorer, ScorerError
+
+
+logger = logging.getLogger(__name__)
+
+
+__all__ = [
+    "SCORERS", "get_scorer", "get_scorer_class", "score_output",
+    # abc
+    "Scorer", "ScorerError",
+]
+
+
+SCORERS = dict((cls.__name__, cls)
+               for cls in plugin_list("cms.grading.scorers"))
+
+
+# Number of parsed inputs kept in memory by each process.
+PARSED_INPUTS_CACHE_SIZE = 4
+
+
+# The inputs parsed by this process, indexed by scorer name and input
+# digest, from the least recently used. Values are either the parsed
+# input or the ScorerError raised when parsing it.
+_parsed_inputs = OrderedDict()
+
+
+def get_scorer_class(name):
+    """Load the Scorer class given as parameter."""
+    return SCORERS[name]
+
+
+def get_scorer(name):
+    """Construct the Scorer with the given name.
+
+    name (str): the name of the Scorer class.
+
+    return (Scorer): an instance of the correct Scorer class.
+
+    """
+    return get_scorer_class(name)()
+
+
+def score_output(file_cacher, name, input_digest, output_digest):
+    """Compute outcome and text of a user output with a scorer.
+
+    file_cacher (FileCacher): file cacher to use to get files.
+    name (str): the name of the Scorer class.
+    input_digest (str): digest of the input.
+    output_digest (str): digest of the user output.
+
+    return (float, [str]): outcome and text, in the same format as
+        those of a checker.
+
+    """
+    scorer = get_scorer(name)
+
+    key = (name, input_digest)
+    parsed_input = _parsed_inputs.pop(key, None)
+    if parsed_input is None:
+        try:
+            parsed_input = scorer.parse_input(
+                file_cacher.get_file_content(input_digest))
+        except ScorerError as error:
+            parsed_input = error
+    _parsed_inputs[key] = parsed_input
+    while len(_parsed_inputs) > PARSED_INPUTS_CACHE_SIZE:
+        _parsed_inputs.popitem(last=False)
+
+    try:
+        if isinstance(parsed_input, ScorerError):
+            raise parsed_input
+        score = scorer.score(parsed_input,
+                             file_cacher.get_file_content(output_digest))
+    except ScorerError as error:
+        return 0.0, [str(error)]
+    return float(score), ["[Output correct]: score = %s." % score]
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Base class for in-process scorers."""
+
+from abc import ABCMeta, abstractmethod
+
+
+class ScorerError(Exception):
+    """Raised when an input or a user output is not valid; the message
+    is shown to the contestant.
+
+    """
+
+    def __init__(self, message, *args):
+        super().__init__(message % args if args else message)
+
+
+class Scorer(metaclass=ABCMeta):
+    """Base class for scorers.
+
+    A scorer computes the score of the user outputs of a task, in place
+    of a checker. Since many outputs are scored against the same input,
+    parsing the input is a separate step, whose result is reused.
+
+    """
+
+    # To be increased whenever a change may give different scores to
+    # the same files, so that the outcomes computed before (e.g., those
+    # in the outcome cache of EvaluationService) are not reused.
+    VERSION = 1
+
+    @abstractmethod
+    def parse_input(self, data):
+        """Parse the input of a testcase.
+
+        data (bytes): the content of the input.
+
+        return (object): the parsed input, to pass to score().
+
+        raise (ScorerError): if the input is not valid.
+
+        """
+        pass
+
+    @abstractmethod
+    def score(self, parsed_input, data):
+        """Compute the score of a user output.
+
+        parsed_input (object): the result of parse_input().
+        data (bytes): the content of the user output.
+
+        return (int): the score.
+
+        raise (ScorerError): if the output is not valid.
+
+        """
+        pass
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Utilities to parse and validate files with NumPy."""
+
+import numpy as np
+
+from .abc import ScorerError
+
+
+_INT64_MIN = int(np.iinfo(np.int64).min)
+_INT64_MAX = int(np.iinfo(np.int64).max)
+
+
+def parse_integers(data):
+    """Parse the whitespace-separated integers at the start of data.
+
+    As scanf would, parsing stops at the first token that is not an
+    integer (or does not fit in 64 bits); it's then up to the caller
+    to complain if the integers read are not enough. The result does
+    not depend on the version of NumPy.
+
+    data (bytes): the content of a file.
+
+    return (np.ndarray): the integers, with dtype int64.
+
+    """
+    tokens = data.split()
+    # NumPy converts each token with int(), which also accepts digits
+    # separated by underscores.
+    if b"_" not in data:
+        try:
+            return np.array(tokens, dtype=np.int64)
+        except (ValueError, OverflowError):
+            pass
+    for i, token in enumerate(tokens):
+        if b"_" in token:
+            break
+        try:
+            value = int(token)
+        except ValueError:
+            break
+        if not _INT64_MIN <= value <= _INT64_MAX:
+            break
+    else:
+        i = len(tokens)
+    return np.array(tokens[:i], dtype=np.int64)
+
+
+def check(condition, message, *args):
+    """Raise a ScorerError if the condition is not satisfied.
+
+    condition (bool): the condition.
+    message (str): the message of the error, formatted with args.
+
+    raise (ScorerError): if condition is false.
+
+    """
+    if not condition:
+        raise ScorerError(message, *args)
+
+
+def check_all(conditions, message, *arrays):
+    """Raise a ScorerError if any of the conditions is not satisfied.
+
+    conditions (np.ndarray): an array of booleans.
+    message (str): the message of the error, formatted with the index
+        of the first false condition, followed by the value of each of
+        the arrays at that index.
+
+    raise (ScorerError): if any of the conditions is false.
+
+    """
+    if not conditions.all():
+        i = int(np.argmin(conditions))
+        raise ScorerError(message, i, *(int(a[i]) for a in arrays))
+
+
+def first_duplicate(sorted_values):
+    """Return a value appearing more than once in a sorted array.
+
+    sorted_values (np.ndarray): a sorted array.
+
+    return (int|None): the smallest duplicated value, or None if all
+        values are distinct.
+
+    """
+    duplicates = sorted_values[1:] == sorted_values[:-1]
+    if not duplicates.any():
+        return None
+    return int(sorted_values[1:][duplicates][0])
+
+
+def walk_records(values, start, count, header_size, length_offset,
+                 length_bounds, parse_message, length_message):
+    """Find the positions of consecutive variable-length records.
+
+    Each record starts with a header of header_size integers, the one
+    at length_offset being the number of integers following the
+    header. Finding where each record starts is inherently sequential,
+    so this runs in plain Python, looking only at the headers.
+
+    values (np.ndarray): the integers of the file.
+    start (int): the position of the first record.
+    count (int): the number of records.
+    header_size (int): the number of integers in the header.
+    length_offset (int): the position of the length in the header.
+    length_bounds ((int, int)): the minimum and maximum length.
+    parse_message (str): the message of the error raised when values
+        end before the records do, formatted with the record index.
+    length_message (str): the message of the error raised when a
+        length is out of bounds, formatted with the record index and
+        the length.
+
+    return (np.ndarray, np.ndarray): the position of the header and
+        the length of each record.
+
+    raise (ScorerError): if the records are not valid.
+
+    """
+    integers = values.tolist()
+    min_length, max_length = length_bounds
+    positions = []
+    lengths = []
+    pos = start
+    for i in range(count):
+        check(pos + header_size <= len(integers), parse_message, i)
+        length = integers[pos + length_offset]
+        check(min_length <= length <= max_length, length_message, i, length)
+        check(pos + header_size + length <= len(integers), parse_message, i)
+        positions.append(pos)
+        lengths.append(length)
+        pos += header_size + length
+    return (np.array(positions, dtype=np.int64),
+            np.array(lengths, dtype=np.int64))
+
+
+def ranges(starts, lengths):
+    """Return the concatenation of many ranges of indices.
+
+    starts (np.ndarray): the first index of each range.
+    lengths (np.ndarray): the length of each range.
+
+    return (np.ndarray): the indices of the first range, followed by
+        those of the second, and so on.
+
+    """
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) \
+        + np.arange(int(lengths.sum()), dtype=np.int64)
@@ -25,15 +25,17 @@
 
 from collections import namedtuple
 
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import joinedload
 
-from cms.db import Submission
+from cms.db import Participation, ParticipationTaskScore, Submission, Task
 from cmscommon.constants import \
     SCORE_MODE_MAX, SCORE_MODE_MAX_SUBTASK, SCORE_MODE_MAX_TOKENED_LAST
 
 
 __all__ = [
     "compute_changes_for_dataset", "task_score",
+    "cached_task_score", "get_task_score_rows", "update_task_score",
 ]
 
 
@@ -174,6 +176,103 @@ def task_score(participation, task,
     return score, partial
 
 
+def cached_task_score(participation, task, row,
+                      public=False, only_tokened=False, rounded=False):
+    """Return the score of a contest's user on a task, preferably
+    from its ParticipationTaskScore.
+
+    The parameters and the return value are as for task_score, which
+    is called if row is missing or refers to an old dataset.
+
+    row (ParticipationTaskScore|None): the stored score of the
+        participation on the task, if any.
+
+    """
+    if row is None or row.dataset_id != task.active_dataset_id:
+        return task_score(participation, task, public=public,
+                          only_tokened=only_tokened, rounded=rounded)
+    if public and only_tokened:
+        raise ValueError(
+            "Requested public task score restricted to tokened submissions.")
+    score, partial = row.get_score(public=public, only_tokened=only_tokened)
+    if rounded:
+        score = round(score, task.score_precision)
+    return score, partial
+
+
+def get_task_score_rows(session, contest_id=None, participation_id=None):
+    """Return the stored scores of some participations.
+
+    session (Session): the database session.
+    contest_id (int|None): if given, only return the scores of the
+        participations in this contest.
+    participation_id (int|None): if given, only return the scores of
+        this participation.
+
+    return ({(int, int): ParticipationTaskScore}): the scores, by
+        participation id and task id.
+
+    """
+    query = session.query(ParticipationTaskScore)
+    if contest_id is not None:
+        query = query.join(
+            Participation,
+            Participation.id == ParticipationTaskScore.participation_id)\
+            .filter(Participation.contest_id == contest_id)
+    if participation_id is not None:
+        query = query.filter(
+            ParticipationTaskScore.participation_id == participation_id)
+    return dict(((row.participation_id, row.task_id), row)
+                for row in query.all())
+
+
+def update_task_score(session, participation_id, task_id):
+    """Compute and store the score of a participation on a task.
+
+    The participation is locked (as _invalidate_task_scores in
+    cms.db.taskscore does before deleting a score) before reading its
+    submissions, so no concurrent change can be missed. The caller has
+    to commit the session.
+
+    session (Session): the database session, without pending changes.
+    participation_id (int): the id of the participation.
+    task_id (int): the id of the task.
+
+    """
+    # Discard what the session already loaded, to read it again after
+    # taking the lock.
+    session.expire_all()
+    participation = session.query(Participation)\
+        .filter(Participation.id == participation_id)\
+        .with_for_update()\
+        .first()
+    task = Task.get_from_id(task_id, session)
+    if participation is None or task is None \
+            or task.active_dataset_id is None:
+        return
+
+    score, score_partial = task_score(participation, task)
+    public_score, public_score_partial = \
+        task_score(participation, task, public=True)
+    tokened_score, tokened_score_partial = \
+        task_score(participation, task, only_tokened=True)
+    values = {
+        "dataset_id": task.active_dataset_id,
+        "score": score,
+        "score_partial": score_partial,
+        "public_score": public_score,
+        "public_score_partial": public_score_partial,
+        "tokened_score": tokened_score,
+        "tokened_score_partial": tokened_score_partial,
+    }
+    session.execute(
+        insert(ParticipationTaskScore.__table__)
+        .values(participation_id=participation_id, task_id=task_id,
+                **values)
+        .on_conflict_do_update(
+            index_elements=["participation_id", "task_id"], set_=values))
+
+
 def _task_score_max_tokened_last(score_details_tokened):
     """Compute score using the "max tokened last" score mode.
 
@@ -24,7 +24,8 @@ from .evaluation import EVALUATION_MESSAGES, evaluation_step, \
     human_evaluation_message
 from .messages import HumanMessage, MessageCollection
 from .stats import execution_stats, merge_execution_stats
-from .trusted import checker_step, extract_outcome_and_text, trusted_step
+from .trusted import ResidentChecker, checker_step, \
+    extract_outcome_and_text, trusted_step
 from .whitediff import _WHITES, _white_diff, white_diff_step,\
     white_diff_fobj_step
 
@@ -41,7 +42,8 @@ __all__ = [
     # stats_test.py
     "execution_stats", "merge_execution_stats",
     # trusted.py
-    "checker_step", "extract_outcome_and_text", "trusted_step",
+    "ResidentChecker", "checker_step", "extract_outcome_and_text",
+    "trusted_step",
     # whitediff.py
     "_WHITES", "_white_diff", "white_diff_step", "white_diff_fobj_step"
 ]
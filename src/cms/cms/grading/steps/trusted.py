@@ -33,10 +33,19 @@ In addition, texts only indicating success, partial success or wrong solution
 can be translated by writing "translate:x" where x is "success", "partial" or
 "wrong".
 
+A "resident checker" is a checker that, when invoked with the arguments
+"--resident input correct_output", parses the input once and then
+evaluates many user outputs: for each line written to its stdin (the
+path of a user output) it writes on stdout two lines, the outcome and
+the text of the standard manager output.
+
 """
 
 import logging
 
+import gevent
+import gevent.lock
+
 from cms import config
 from cms.grading.Sandbox import Sandbox
 from .evaluation import EVALUATION_MESSAGES
@@ -89,7 +98,7 @@ def extract_outcome_and_text(sandbox):
     """
     with sandbox.get_file_text(sandbox.stdout_file) as stdout_file:
         try:
-            outcome = stdout_file.readline().strip()
+            outcome = stdout_file.readline()
         except UnicodeDecodeError as error:
             logger.error("Manager stdout (outcome) is not valid UTF-8. %r",
                          error)
@@ -97,11 +106,28 @@ def extract_outcome_and_text(sandbox):
 
     with sandbox.get_file_text(sandbox.stderr_file) as stderr_file:
         try:
-            text = _filter_ansi_escape(stderr_file.readline().strip())
+            text = stderr_file.readline()
         except UnicodeDecodeError as error:
             logger.error("Manager stderr (text) is not valid UTF-8. %r", error)
             raise ValueError("Cannot decode the text.")
 
+    return _parse_outcome_and_text(outcome, text)
+
+
+def _parse_outcome_and_text(outcome, text):
+    """Interpret the outcome and text lines of a standard manager output.
+
+    outcome (str): the line containing the outcome.
+    text (str): the line containing the text.
+
+    return (float, [str]): outcome and text.
+
+    raise (ValueError): if the outcome is not a float.
+
+    """
+    outcome = outcome.strip()
+    text = _filter_ansi_escape(text.strip())
+
     try:
         outcome = float(outcome)
     except ValueError:
@@ -247,3 +273,131 @@ def checker_step(sandbox, checker_digest, input_digest, correct_output_digest,
         return False, None, None
 
     return True, outcome, text
+
+
+class ResidentChecker:
+    """A long-lived checker process, serving all the evaluations of a
+    testcase (see the module docstring for the protocol).
+
+    The input is parsed only once, instead of once per evaluation. The
+    process runs with the limits of trusted steps, except for the time
+    limit, which is applied to each request instead of to the whole
+    life of the process.
+
+    """
+
+    STDERR_FILENAME = "resident_stderr.txt"
+
+    def __init__(self, sandbox, checker_digest, input_digest,
+                 correct_output_digest):
+        """Start the checker.
+
+        sandbox (Sandbox): the sandbox to run the checker in, empty;
+            it is owned by this object from now on.
+        checker_digest (str): digest of the checker.
+        input_digest (str): digest of the input.
+        correct_output_digest (str): digest of the correct output.
+
+        """
+        self.sandbox = sandbox
+        self.requests = 0
+        # Serializes the requests, that can come from jobs executed
+        # concurrently (see config.worker_slots).
+        self._lock = gevent.lock.RLock()
+
+        sandbox.create_file_from_storage(CHECKER_FILENAME, checker_digest,
+                                         executable=True)
+        sandbox.create_file_from_storage(CHECKER_INPUT_FILENAME, input_digest)
+        sandbox.create_file_from_storage(CHECKER_CORRECT_OUTPUT_FILENAME,
+                                         correct_output_digest)
+
+        sandbox.preserve_env = True
+        sandbox.max_processes = config.trusted_sandbox_max_processes
+        sandbox.address_space = config.trusted_sandbox_max_memory_kib * 1024
+        sandbox.timeout = None
+        sandbox.wallclock_timeout = None
+        sandbox.stderr_file = ResidentChecker.STDERR_FILENAME
+
+        command = ["./%s" % CHECKER_FILENAME, "--resident",
+                   CHECKER_INPUT_FILENAME, CHECKER_CORRECT_OUTPUT_FILENAME]
+        self.popen = sandbox.execute_without_std(command, wait=False)
+
+    def is_alive(self):
+        """Return whether the checker can serve requests.
+
+        return (bool): True if the process is still running.
+
+        """
+        return self.popen is not None and self.popen.poll() is None
+
+    def check(self, user_output_digest):
+        """Evaluate a user output.
+
+        user_output_digest (str): digest of the user output.
+
+        return (bool, float|None, [str]|None): success (true if the
+            checker was able to check the solution successfully),
+            outcome and text (both None if success is False); on
+            failure, the checker is closed.
+
+        """
+        with self._lock:
+            return self._check(user_output_digest)
+
+    def _check(self, user_output_digest):
+        """See check()."""
+        if not self.is_alive():
+            self.close()
+            return False, None, None
+
+        filename = "user_output_%d.txt" % self.requests
+        self.requests += 1
+        self.sandbox.create_file_from_storage(filename, user_output_digest)
+
+        outcome = text = b""
+        try:
+            with gevent.Timeout(2 * config.trusted_sandbox_max_time_s + 1,
+                                False):
+                self.popen.stdin.write(("%s\n" % filename).encode("utf-8"))
+                self.popen.stdin.flush()
+                outcome = self.popen.stdout.readline()
+                text = self.popen.stdout.readline()
+        except OSError as error:
+            logger.error("Cannot communicate with resident checker: %r.",
+                         error)
+        finally:
+            self.sandbox.remove_file(filename)
+
+        # An incomplete answer means a timeout or a crash.
+        if not text.endswith(b"\n"):
+            logger.error("Resident checker timed out or terminated.")
+            self.close()
+            return False, None, None
+
+        try:
+            outcome, text = _parse_outcome_and_text(
+                outcome.decode("utf-8"), text.decode("utf-8"))
+        except (UnicodeDecodeError, ValueError) as error:
+            logger.error("Invalid output from resident checker: %s", error)
+            self.close()
+            return False, None, None
+
+        return True, outcome, text
+
+    def close(self, delete=True):
+        """Terminate the checker and clean up its sandbox.
+
+        delete (bool): whether to delete the sandbox.
+
+        """
+        with self._lock:
+            self._close(delete)
+
+    def _close(self, delete):
+        """See close()."""
+        if self.popen is not None:
+            if self.popen.poll() is None:
+                self.popen.kill()
+            self.popen.wait()
+            self.popen = None
+            self.sandbox.cleanup(delete=delete)
@@ -39,36 +39,90 @@ logger = logging.getLogger(__name__)
 _WHITES = [b' ', b'\t', b'\n', b'\x0b', b'\x0c', b'\r']
 
 
-def _white_diff_canonicalize(string):
-    """Convert the input string to a canonical form for the white diff
-    algorithm; that is, the strings a and b are mapped to the same
+# Whitespaces other than newlines are all equivalent to spaces.
+_TO_SPACES = bytes.maketrans(b''.join(_WHITES[1:2] + _WHITES[3:]),
+                             b' ' * (len(_WHITES) - 2))
+
+# Size of the blocks read from the files to compare.
+_BLOCK_SIZE = 1024 * 1024
+
+
+def _white_diff_canonicalize(string, line_start=False):
+    """Convert a piece of a file to a canonical form for the white diff
+    algorithm; that is, the pieces a and b are mapped to the same
     string by _white_diff_canonicalize() if and only if they have to be
     considered equivalent for the purposes of the white-diff
     algorithm.
 
-    More specifically, this function strips all the leading and
-    trailing whitespaces from s and collapse all the runs of
-    consecutive whitespaces into just one copy of one specific
-    whitespace.
+    More specifically, this function collapses each run of consecutive
+    whitespaces into the newlines it contains or, if there are none, a
+    single space. Leading spaces are stripped if the piece starts a
+    line. The piece must not end in the middle of a run of whitespaces.
 
-    string (str): the string to canonicalize.
-    return (str): the canonicalized string.
+    string (bytes): the piece to canonicalize.
+    line_start (bool): whether the piece starts a line.
+    return (bytes): the canonicalized piece.
 
     """
-    # Replace all the whitespaces with copies of " ", making the rest
-    # of the algorithm simpler
-    for char in _WHITES[1:]:
-        string = string.replace(char, _WHITES[0])
-
-    # Split the string according to " ", filter out empty tokens and
-    # join again the string using just one copy of the first
-    # whitespace; this way, runs of more than one whitespaces are
-    # collapsed into just one copy.
-    string = _WHITES[0].join([x for x in string.split(_WHITES[0])
-                              if len(x) > 0])
+    # Replace all the whitespaces but newlines with spaces, making the
+    # rest of the algorithm simpler.
+    string = string.translate(_TO_SPACES)
+
+    # Collapse the runs of spaces into one space (halving them at each
+    # step), then remove the spaces next to newlines.
+    while b"  " in string:
+        string = string.replace(b"  ", b" ")
+    string = string.replace(b" \n", b"\n").replace(b"\n ", b"\n")
+    if line_start:
+        string = string.lstrip(b" ")
     return string
 
 
+def _white_diff_chunks(fobj):
+    """Read a file and return its canonical form, in chunks.
+
+    The concatenation of the chunks is the canonical form of the whole
+    file, without trailing spaces (but possibly with trailing
+    newlines), as given by _white_diff_canonicalize(). At most two
+    blocks of the file are kept in memory.
+
+    fobj (fileobj): the file to read, opened in binary mode.
+
+    yield (bytes): the chunks of the canonical form.
+
+    """
+    line_start = True
+    # A run of whitespaces at the end of the data read so far, that
+    # might continue in the next block.
+    carry = b""
+    while True:
+        block = fobj.read(_BLOCK_SIZE)
+        if len(block) == 0:
+            break
+        data = carry + block.translate(_TO_SPACES)
+        end = len(data.rstrip(b" \n"))
+        if end == 0:
+            # Only whitespaces: keep their canonical form.
+            newlines = data.count(b"\n")
+            if newlines > 0:
+                yield b"\n" * newlines
+                line_start = True
+                carry = b""
+            else:
+                carry = b" "
+            continue
+        chunk = _white_diff_canonicalize(data[:end], line_start)
+        carry = data[end:]
+        line_start = False
+        if len(chunk) > 0:
+            yield chunk
+
+    # Trailing spaces do not count.
+    chunk = _white_diff_canonicalize(carry, line_start).rstrip(b" ")
+    if len(chunk) > 0:
+        yield chunk
+
+
 def _white_diff(output, res):
     """Compare the two output files. Two files are equal if for every
     integer i, line i of first file is equal to line i of second
@@ -80,34 +134,44 @@ def _white_diff(output, res):
     'sequence of characters ending with \n or EOF and beginning right
     after BOF or \n'. In particular, every line has *at most* one \n.
 
+    The files are read in large blocks, compared in their canonical
+    forms (see _white_diff_chunks), stopping at the first difference.
+
     output (file): the first file to compare.
     res (file): the second file to compare.
     return (bool): True if the two file are equal as explained above.
 
     """
-
+    output_chunks = _white_diff_chunks(output)
+    res_chunks = _white_diff_chunks(res)
+    lout = b""
+    lres = b""
     while True:
-        lout = output.readline()
-        lres = res.readline()
+        if len(lout) == 0:
+            lout = next(output_chunks, None)
+        if len(lres) == 0:
+            lres = next(res_chunks, None)
 
-        # Both files finished: comparison succeded
-        if len(lres) == 0 and len(lout) == 0:
+        # Both files finished: comparison succeded.
+        if lout is None and lres is None:
             return True
 
-        # Only one file finished: ok if the other contains only blanks
-        elif len(lres) == 0 or len(lout) == 0:
-            lout = lout.strip(b''.join(_WHITES))
-            lres = lres.strip(b''.join(_WHITES))
-            if len(lout) > 0 or len(lres) > 0:
+        # Only one file finished: ok if the other contains only blank
+        # lines.
+        elif lout is None or lres is None:
+            if len((lout or lres).strip(b"\n")) > 0:
                 return False
+            lout = b""
+            lres = b""
 
-        # Both file still have lines to go: ok if they agree except
-        # for the number of whitespaces
+        # Both files still have data to go: ok if they agree on the
+        # common part.
         else:
-            lout = _white_diff_canonicalize(lout)
-            lres = _white_diff_canonicalize(lres)
-            if lout != lres:
+            length = min(len(lout), len(lres))
+            if lout[:length] != lres[:length]:
                 return False
+            lout = lout[length:]
+            lres = lres[length:]
 
 
 def white_diff_fobj_step(output_fobj, correct_output_fobj):
@@ -26,6 +26,7 @@
 import logging
 
 from cms.grading.ParameterTypes import ParameterTypeChoice
+from cms.grading.scorers import SCORERS, get_scorer_class, score_output
 from . import TaskType, eval_output
 
 
@@ -43,8 +44,13 @@ class OutputOnly(TaskType):
     comparator.
 
     Parameters are a list of string with one element (for future
-    possible expansions), which maybe 'diff' or 'comparator', meaning that
-    the evaluation is done via white diff or via a comparator.
+    possible expansions), which maybe 'diff', 'comparator' or
+    'resident_comparator', meaning that the evaluation is done via white
+    diff, via a comparator, or via a comparator supporting the resident
+    protocol (see cms.grading.steps.trusted), kept running by the Worker
+    across evaluations. It may also be 'scorer:' followed by the name of
+    a Scorer plugin (see cms.grading.scorers), computing the outcome
+    inside the Worker.
 
     """
     # Codename of the checker, if it is used.
@@ -56,16 +62,24 @@ class OutputOnly(TaskType):
     # Constants used in the parameter definition.
     OUTPUT_EVAL_DIFF = "diff"
     OUTPUT_EVAL_CHECKER = "comparator"
+    OUTPUT_EVAL_RESIDENT_CHECKER = "resident_comparator"
+    OUTPUT_EVAL_SCORER_PREFIX = "scorer:"
 
     # Other constants to specify the task type behaviour and parameters.
     ALLOW_PARTIAL_SUBMISSION = True
+    OUTCOME_CACHEABLE = True
 
     _EVALUATION = ParameterTypeChoice(
         "Output evaluation",
         "output_eval",
         "",
         {OUTPUT_EVAL_DIFF: "Outputs compared with white diff",
-         OUTPUT_EVAL_CHECKER: "Outputs are compared by a comparator"})
+         OUTPUT_EVAL_CHECKER: "Outputs are compared by a comparator",
+         OUTPUT_EVAL_RESIDENT_CHECKER:
+             "Outputs are compared by a resident comparator",
+         **dict((OUTPUT_EVAL_SCORER_PREFIX + name,
+                 "Outputs are scored by the %s scorer" % name)
+                for name in sorted(SCORERS))})
 
     ACCEPTED_PARAMETERS = [_EVALUATION]
 
@@ -94,13 +108,45 @@ class OutputOnly(TaskType):
         return []
 
     def _uses_checker(self):
-        return self.output_eval == OutputOnly.OUTPUT_EVAL_CHECKER
+        return self.output_eval in (OutputOnly.OUTPUT_EVAL_CHECKER,
+                                    OutputOnly.OUTPUT_EVAL_RESIDENT_CHECKER)
+
+    def _uses_resident_checker(self):
+        return self.output_eval == OutputOnly.OUTPUT_EVAL_RESIDENT_CHECKER
+
+    def _get_scorer_name(self):
+        if not self.output_eval.startswith(
+                OutputOnly.OUTPUT_EVAL_SCORER_PREFIX):
+            return None
+        return self.output_eval[len(OutputOnly.OUTPUT_EVAL_SCORER_PREFIX):]
 
     @staticmethod
     def _get_user_output_filename(job):
         return OutputOnly.USER_OUTPUT_FILENAME_TEMPLATE % \
             job.operation.testcase_codename
 
+    def get_outcome_cache_key(self, job):
+        """See TaskType.get_outcome_cache_key."""
+        user_output_filename = self._get_user_output_filename(job)
+        if user_output_filename not in job.files:
+            return None
+
+        scorer_name = self._get_scorer_name()
+        if self._uses_checker():
+            if OutputOnly.CHECKER_CODENAME not in job.managers:
+                return None
+            evaluator = job.managers[OutputOnly.CHECKER_CODENAME].digest
+        elif scorer_name is not None:
+            if scorer_name not in SCORERS:
+                return None
+            evaluator = "%s@%d" % (self.output_eval,
+                                   get_scorer_class(scorer_name).VERSION)
+        else:
+            evaluator = self.output_eval
+
+        return (evaluator, job.input, job.output,
+                job.files[user_output_filename].digest)
+
     def compile(self, job, file_cacher):
         """See TaskType.compile."""
         # No compilation needed.
@@ -122,11 +168,24 @@ class OutputOnly(TaskType):
             job.plus = {}
             return
 
+        # Scorers need no sandbox and cannot fail.
+        scorer_name = self._get_scorer_name()
+        if scorer_name is not None:
+            outcome, text = score_output(
+                file_cacher, scorer_name, job.input,
+                job.files[user_output_filename].digest)
+            job.success = True
+            job.outcome = str(outcome)
+            job.text = text
+            job.plus = {}
+            return
+
         # First and only step: eval the user output.
         box_success, outcome, text = eval_output(
             file_cacher, job,
             OutputOnly.CHECKER_CODENAME if self._uses_checker() else None,
-            user_output_digest=job.files[user_output_filename].digest)
+            user_output_digest=job.files[user_output_filename].digest,
+            resident=self._uses_resident_checker())
 
         # Fill in the job with the results.
         job.success = box_success
@@ -57,6 +57,11 @@ class TaskType(metaclass=ABCMeta):
     # the non-provided files with the one in the previous submission.
     ALLOW_PARTIAL_SUBMISSION = False
 
+    # If OUTCOME_CACHEABLE is True, the outcome of an evaluation
+    # depends only on the files identified by get_outcome_cache_key(),
+    # hence it can be reused for other evaluations with the same key.
+    OUTCOME_CACHEABLE = False
+
     # A list of all the accepted parameters for this task type.
     # Each item is an instance of TaskTypeParameter.
     ACCEPTED_PARAMETERS = []
@@ -217,6 +222,22 @@ class TaskType(metaclass=ABCMeta):
         """
         pass
 
+    def get_outcome_cache_key(self, job):
+        """Return a key identifying the result of the given job.
+
+        Only meaningful if OUTCOME_CACHEABLE is True: task types whose
+        evaluations depend only on the content of the files involved
+        return a tuple of the relevant digests, allowing the outcome to
+        be reused for any other job with the same key.
+
+        job (EvaluationJob): the job to describe.
+
+        return ((str)|None): the key, or None if the outcome of the job
+            cannot be reused.
+
+        """
+        return None
+
     def execute_job(self, job, file_cacher):
         """Call compile() or execute() depending on the job passed
         when constructing the TaskType.
@@ -32,13 +32,17 @@ compilation and the evaluation are contained in the task type class.
 import logging
 import os
 import shutil
+from collections import OrderedDict
+
+import gevent.event
+import gevent.lock
 
 from cms import config
 from cms.grading import JobException
 from cms.grading.Job import CompilationJob, EvaluationJob
 from cms.grading.Sandbox import Sandbox
-from cms.grading.steps import EVALUATION_MESSAGES, checker_step, \
-    white_diff_fobj_step
+from cms.grading.steps import EVALUATION_MESSAGES, ResidentChecker, \
+    checker_step, white_diff_fobj_step
 
 
 logger = logging.getLogger(__name__)
@@ -47,6 +51,32 @@ logger = logging.getLogger(__name__)
 EVAL_USER_OUTPUT_FILENAME = "user_output.txt"
 
 
+# The resident checkers started by this process, indexed by the digests
+# of checker, input and correct output, from the least recently used.
+_resident_checkers = OrderedDict()
+# The resident checkers being started, indexed like _resident_checkers,
+# with the result waited for by other jobs needing the same checker.
+_starting_resident_checkers = dict()
+# Protects the two dictionaries above from the jobs executed
+# concurrently (see config.worker_slots); it is not held while starting
+# or closing checkers, so that those jobs don't wait for one another.
+_resident_checkers_lock = gevent.lock.RLock()
+
+# The pool of sandboxes of this process (see set_sandbox_pool).
+_sandbox_pool = None
+
+
+def set_sandbox_pool(pool):
+    """Set the pool from which sandboxes are taken and given back.
+
+    pool (SandboxPool|None): the pool, or None to always create and
+        delete sandboxes.
+
+    """
+    global _sandbox_pool
+    _sandbox_pool = pool
+
+
 def create_sandbox(file_cacher, name=None):
     """Create a sandbox, and return it.
 
@@ -59,7 +89,11 @@ def create_sandbox(file_cacher, name=None):
 
     """
     try:
-        sandbox = Sandbox(file_cacher, name=name)
+        if _sandbox_pool is not None \
+                and _sandbox_pool.file_cacher is file_cacher:
+            sandbox = _sandbox_pool.get(name=name)
+        else:
+            sandbox = Sandbox(file_cacher, name=name)
     except OSError:
         err_msg = "Couldn't create sandbox."
         logger.error(err_msg, exc_info=True)
@@ -82,6 +116,11 @@ def delete_sandbox(sandbox, success=True, keep_sandbox=False):
                        sandbox.get_root_path())
 
     delete = success and not config.keep_sandbox and not keep_sandbox
+    if delete and _sandbox_pool is not None \
+            and _sandbox_pool.file_cacher is sandbox.file_cacher:
+        # Deleted by the pool if it cannot be reused.
+        _sandbox_pool.put(sandbox)
+        return
     try:
         sandbox.cleanup(delete=delete)
     except OSError:
@@ -202,9 +241,115 @@ def check_manager_present(job, codename):
     return True
 
 
+def get_resident_checker(file_cacher, checker_digest, input_digest,
+                         correct_output_digest):
+    """Return a running resident checker for the given files.
+
+    Checkers are started on first use and then kept around; when there
+    are more than config.max_resident_checkers, the least recently used
+    is terminated.
+
+    file_cacher (FileCacher): file cacher to use to get files.
+    checker_digest (str): digest of the checker.
+    input_digest (str): digest of the input.
+    correct_output_digest (str): digest of the correct output.
+
+    return (ResidentChecker): the checker.
+
+    raise (JobException): if the sandbox cannot be created.
+
+    """
+    key = (checker_digest, input_digest, correct_output_digest)
+    to_close = []
+    with _resident_checkers_lock:
+        checker = _resident_checkers.pop(key, None)
+        if checker is not None and checker.is_alive():
+            _resident_checkers[key] = checker
+            return checker
+        if checker is not None:
+            to_close.append(checker)
+        starting = _starting_resident_checkers.get(key)
+        start = starting is None
+        if start:
+            starting = gevent.event.AsyncResult()
+            _starting_resident_checkers[key] = starting
+    _close_resident_checkers(to_close)
+
+    if not start:
+        # Another job is starting it.
+        return starting.get()
+
+    try:
+        checker = _start_resident_checker(file_cacher, key)
+    except Exception as error:
+        with _resident_checkers_lock:
+            del _starting_resident_checkers[key]
+        starting.set_exception(error)
+        raise
+
+    with _resident_checkers_lock:
+        del _starting_resident_checkers[key]
+        _resident_checkers[key] = checker
+        while len(_resident_checkers) > config.max_resident_checkers:
+            _, old_checker = _resident_checkers.popitem(last=False)
+            to_close.append(old_checker)
+    starting.set(checker)
+    _close_resident_checkers(to_close)
+
+    return checker
+
+
+def _start_resident_checker(file_cacher, key):
+    """Start a resident checker in a new sandbox.
+
+    file_cacher (FileCacher): file cacher to use to get files.
+    key ((str, str, str)): digests of checker, input and correct output.
+
+    return (ResidentChecker): the checker.
+
+    raise (JobException): if the sandbox cannot be created.
+
+    """
+    logger.info("Starting resident checker for input %s.", key[1])
+    # Not from the pool: the sandbox lives as long as the checker, which
+    # deletes it when closed.
+    try:
+        sandbox = Sandbox(file_cacher, name="resident")
+    except OSError:
+        err_msg = "Couldn't create sandbox."
+        logger.error(err_msg, exc_info=True)
+        raise JobException(err_msg)
+    try:
+        return ResidentChecker(sandbox, *key)
+    except Exception:
+        sandbox.cleanup(delete=True)
+        raise
+
+
+def _close_resident_checkers(checkers):
+    """Terminate some resident checkers.
+
+    checkers ([ResidentChecker]): the checkers to close, already removed
+        from _resident_checkers.
+
+    """
+    for checker in checkers:
+        checker.close(delete=not config.keep_sandbox)
+
+
+def close_resident_checkers():
+    """Terminate all the resident checkers started by this process.
+
+    """
+    with _resident_checkers_lock:
+        checkers = list(_resident_checkers.values())
+        _resident_checkers.clear()
+    _close_resident_checkers(checkers)
+
+
 def eval_output(file_cacher, job, checker_codename,
                 user_output_path=None, user_output_digest=None,
-                user_output_filename=""):
+                user_output_filename="", resident=False):
     """Evaluate ("check") a user output using a white diff or a checker.
 
     file_cacher (FileCacher): file cacher to use to get files.
@@ -217,6 +362,9 @@ def eval_output(file_cacher, job, checker_codename,
         using the path (exactly one must be non-None).
     user_output_filename (str): the filename the user was expected to write to,
         or empty if stdout (used to return an error to the user).
+    resident (bool): whether the checker supports the resident protocol
+        (only used with user_output_digest); if the resident checker
+        fails, the checker is run again in the usual way.
 
     return (bool, float|None, [str]|None): success (true if the checker was
         able to check the solution successfully), outcome and text (both None
@@ -240,6 +388,16 @@ def eval_output(file_cacher, job, checker_codename,
         if not check_manager_present(job, checker_codename):
             return False, None, None
 
+        if resident and user_output_digest is not None:
+            checker = get_resident_checker(
+                file_cacher, job.managers[checker_codename].digest,
+                job.input, job.output)
+            success, outcome, text = checker.check(user_output_digest)
+            if success:
+                return success, outcome, text
+            logger.warning("Resident checker failed, running the checker "
+                           "again in a new sandbox.")
+
         # Create a brand-new sandbox just for checking.
         sandbox = create_sandbox(file_cacher, name="check")
         job.sandboxes.append(sandbox.get_root_path())
@@ -262,6 +420,11 @@ def eval_output(file_cacher, job, checker_codename,
         return success, outcome, text
 
     else:
+        # Identical files are equal for the white diff too: no need to
+        # read them.
+        if user_output_digest is not None and user_output_digest == job.output:
+            return True, 1.0, [EVALUATION_MESSAGES.get("success").message]
+
         if user_output_path is not None:
             user_output_fobj = open(user_output_path, "rb")
         else:
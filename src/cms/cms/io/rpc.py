@@ -23,8 +23,10 @@ import functools
 import json
 import logging
 import socket
+import struct
 import traceback
 import uuid
+import zlib
 from weakref import WeakSet
 
 import gevent
@@ -77,6 +79,25 @@ class RemoteServiceBase:
     # attacks. XXX Check that this size is sensible.
     MAX_MESSAGE_SIZE = 1024 * 1024
 
+    # Messages are initially delimited by "\r\n". Clients then ask to
+    # switch to the binary framing by calling this pseudo-method as the
+    # first request on the connection: servers that do not know it
+    # reply with an error, and the connection stays line-based. In the
+    # binary framing each message is preceded by a header with some
+    # flags and its length, and may be compressed.
+    NEGOTIATE_FRAMING_METHOD = "__negotiate_framing"
+    BINARY_FRAMING = True
+    # Seconds the client waits for the reply to the negotiation before
+    # giving up and closing the connection.
+    NEGOTIATE_FRAMING_TIMEOUT = 10.0
+    _FRAME_HEADER = struct.Struct("!BI")
+    _FRAME_FLAG_ZLIB = 0x01
+    # Limit on the (uncompressed) size of messages in the binary
+    # framing, which carries the large payloads of Workers' jobs.
+    MAX_FRAME_SIZE = 64 * 1024 * 1024
+    # Messages shorter than this are never compressed.
+    COMPRESSION_THRESHOLD = 16 * 1024
+
     def __init__(self, remote_address):
         """Prepare to handle a connection with the given remote address.
 
@@ -98,6 +119,11 @@ class RemoteServiceBase:
         self._read_lock = gevent.lock.RLock()
         self._write_lock = gevent.lock.RLock()
 
+        # Whether the binary framing is in use on the current
+        # connection, and the compression it uses (None or "zlib").
+        self._binary_framing = False
+        self._compression = None
+
     @property
     def connected(self):
         """Return whether we're connected to the other endpoint.
@@ -149,8 +175,18 @@ class RemoteServiceBase:
             raise RuntimeError("Already connected.")
 
         self._socket = sock
+        # Each message is sent with a single write, so there is nothing
+        # to gain from Nagle's algorithm, which instead delays messages
+        # sent while the previous one is waiting to be acknowledged.
+        try:
+            self._socket.setsockopt(
+                socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError:
+            pass
         self._reader = self._socket.makefile('rb')
         self._writer = self._socket.makefile('wb')
+        self._binary_framing = False
+        self._compression = None
         self._connection_event.set()
         # IPv4 addresses have two elements (host and port), IPv6 ones
         # have 4 elements (host, port, flowinfo and scopeid). We will
@@ -212,8 +248,9 @@ class RemoteServiceBase:
     def _read(self):
         """Receive a message from the socket.
 
-        Read from the socket until a "\\r\\n" is found. That is what we
-        consider a "message" in the communication protocol.
+        Read from the socket until a "\\r\\n" is found, or, in the
+        binary framing, a whole frame. That is what we consider a
+        "message" in the communication protocol.
 
         return (bytes): the retrieved message.
 
@@ -227,6 +264,8 @@ class RemoteServiceBase:
             with self._read_lock:
                 if not self.connected:
                     raise OSError("Not connected.")
+                if self._binary_framing:
+                    return self._read_frame()
                 data = self._reader.readline(self.MAX_MESSAGE_SIZE)
                 # If there weren't a "\r\n" between the last message
                 # and the EOF we would have a false positive here.
@@ -250,10 +289,52 @@ class RemoteServiceBase:
 
         return data
 
+    def _read_frame(self):
+        """Receive a message in the binary framing.
+
+        return (bytes): the retrieved (uncompressed) message, or an
+            empty bytes object if the connection was closed.
+
+        raise (OSError): if reading fails or the frame is invalid.
+
+        """
+        header = self._reader.read(self._FRAME_HEADER.size)
+        if len(header) == 0:
+            return b""
+        if len(header) < self._FRAME_HEADER.size:
+            raise OSError("Truncated frame.")
+        flags, length = self._FRAME_HEADER.unpack(header)
+        if length > self.MAX_FRAME_SIZE:
+            logger.error(
+                "The client sent a message larger than %d bytes (that is "
+                "MAX_FRAME_SIZE). Consider raising that value if the "
+                "message seemed legit.", self.MAX_FRAME_SIZE)
+            self.finalize("Client misbehaving.")
+            raise OSError("Message too long.")
+        data = self._reader.read(length)
+        if len(data) < length:
+            raise OSError("Truncated frame.")
+        if flags & self._FRAME_FLAG_ZLIB:
+            decompressor = zlib.decompressobj()
+            try:
+                data = decompressor.decompress(data, self.MAX_FRAME_SIZE)
+            except zlib.error as error:
+                raise OSError("Invalid compressed frame: %s." % error)
+            if decompressor.unconsumed_tail:
+                self.finalize("Client misbehaving.")
+                raise OSError("Message too long.")
+            if not decompressor.eof or decompressor.unused_data:
+                raise OSError("Invalid compressed frame: truncated stream "
+                              "or trailing data.")
+        # The message must not be empty, as that means end of file.
+        return data if len(data) > 0 else b" "
+
     def _write(self, data):
         """Send a message to the socket.
 
-        Automatically append "\\r\\n" to make it a correct message.
+        Automatically append "\\r\\n" to make it a correct message or,
+        in the binary framing, prepend the frame header (compressing the
+        message if it is large and the connection allows it).
 
         data (bytes): the message to transmit.
 
@@ -263,26 +344,55 @@ class RemoteServiceBase:
         if not self.connected:
             raise OSError("Not connected.")
 
-        if len(data + b'\r\n') > self.MAX_MESSAGE_SIZE:
-            logger.error(
-                "A message wasn't sent to %r because it was larger than %d "
-                "bytes (that is MAX_MESSAGE_SIZE). Consider raising that "
-                "value if the message seemed legit.", self._repr_remote(),
-                self.MAX_MESSAGE_SIZE)
-            # No need to call finalize.
-            raise OSError("Message too long.")
-
-        try:
-            with self._write_lock:
+        with self._write_lock:
+            # The framing is decided with the lock held, as it may
+            # change while the connection is being negotiated. If the
+            # message is too long there is no need to call finalize.
+            frame = self._frame(data)
+            try:
                 if not self.connected:
                     raise OSError("Not connected.")
                 # Does the same as self._socket.sendall.
-                self._writer.write(data + b'\r\n')
+                self._writer.write(frame)
                 self._writer.flush()
-        except OSError as error:
-            self.finalize("Write failed.")
-            logger.warning("Failed writing to socket: %s.", error)
-            raise error
+            except OSError as error:
+                self.finalize("Write failed.")
+                logger.warning("Failed writing to socket: %s.", error)
+                raise error
+
+    def _frame(self, data):
+        """Delimit a message according to the current framing.
+
+        data (bytes): the message to transmit.
+
+        return (bytes): the data to write on the socket.
+
+        raise (OSError): if the message is too long.
+
+        """
+        if not self._binary_framing:
+            if len(data) + 2 > self.MAX_MESSAGE_SIZE:
+                logger.error(
+                    "A message wasn't sent to %r because it was larger than "
+                    "%d bytes (that is MAX_MESSAGE_SIZE). Consider raising "
+                    "that value if the message seemed legit.",
+                    self._repr_remote(), self.MAX_MESSAGE_SIZE)
+                raise OSError("Message too long.")
+            return data + b'\r\n'
+
+        if len(data) > self.MAX_FRAME_SIZE:
+            logger.error(
+                "A message wasn't sent to %r because it was larger than %d "
+                "bytes (that is MAX_FRAME_SIZE). Consider raising that value "
+                "if the message seemed legit.",
+                self._repr_remote(), self.MAX_FRAME_SIZE)
+            raise OSError("Message too long.")
+        flags = 0
+        if self._compression == "zlib" \
+                and len(data) >= self.COMPRESSION_THRESHOLD:
+            data = zlib.compress(data, 1)
+            flags |= self._FRAME_FLAG_ZLIB
+        return self._FRAME_HEADER.pack(flags, len(data)) + data
 
 
 class RemoteServiceServer(RemoteServiceBase):
@@ -331,6 +441,7 @@ class RemoteServiceServer(RemoteServiceBase):
         it's therefore advisable to spawn a greenlet to call it.
 
         """
+        first = True
         while True:
             try:
                 data = self._read()
@@ -341,8 +452,51 @@ class RemoteServiceServer(RemoteServiceBase):
                 self.finalize("Connection closed.")
                 break
 
+            # The framing can be negotiated only by the first message,
+            # and it is done before reading the next one, which may
+            # already use the new framing.
+            if first:
+                first = False
+                if self._negotiate_framing(data):
+                    continue
+
             gevent.spawn(self.process_data, data)
 
+    def _negotiate_framing(self, data):
+        """Handle the message if it asks to switch framing.
+
+        data (bytes): the first message read from the socket.
+
+        return (bool): whether the message was a negotiation request
+            (and therefore has been handled).
+
+        """
+        if not self.BINARY_FRAMING:
+            return False
+        try:
+            request = json.loads(data.decode('utf-8'))
+        except ValueError:
+            return False
+        if not isinstance(request, dict) \
+                or request.get("__method") != self.NEGOTIATE_FRAMING_METHOD \
+                or not isinstance(request.get("__data"), dict):
+            return False
+
+        compressions = request["__data"].get("compressions", [])
+        compression = "zlib" if "zlib" in compressions else None
+        response = {"__id": request.get("__id"),
+                    "__data": {"compression": compression},
+                    "__error": None}
+        try:
+            with self._write_lock:
+                self._write(json.dumps(response).encode('utf-8'))
+                self._binary_framing = True
+                self._compression = compression
+        except OSError:
+            # Log messages have already been produced.
+            pass
+        return True
+
     def process_data(self, data):
         """Handle the message.
 
@@ -496,10 +650,52 @@ class RemoteServiceClient(RemoteServiceBase):
                 gevent.sleep(self.auto_retry)
                 self._connect()
             if self.connected:
+                self._negotiate_framing()
                 self.run()
             if self.auto_retry is None:
                 break
 
+    def _negotiate_framing(self):
+        """Ask the server to switch to the binary framing.
+
+        Other writers wait for the negotiation to be over, and so do
+        readers, as the main loop isn't running yet. If the server does
+        not support the binary framing, the line-based one is kept. If
+        it does not reply within NEGOTIATE_FRAMING_TIMEOUT seconds the
+        connection is closed, as the server may switch framing anyway
+        when it eventually replies.
+
+        """
+        if not self.BINARY_FRAMING:
+            return
+        request = {"__id": uuid.uuid4().hex,
+                   "__method": self.NEGOTIATE_FRAMING_METHOD,
+                   "__data": {"compressions": ["zlib"]}}
+        timeout = gevent.Timeout(self.NEGOTIATE_FRAMING_TIMEOUT)
+        try:
+            with self._write_lock, timeout:
+                self._write(json.dumps(request).encode('utf-8'))
+                data = self._read()
+                if len(data) == 0:
+                    return
+                response = json.loads(data.decode('utf-8'))
+                if response.get("__error") is not None \
+                        or not isinstance(response.get("__data"), dict):
+                    logger.info("%s doesn't support the binary framing.",
+                                self._repr_remote())
+                    return
+                self._binary_framing = True
+                self._compression = response["__data"].get("compression")
+        except gevent.Timeout as error:
+            if error is not timeout:
+                raise
+            logger.warning("%s didn't reply to the framing negotiation.",
+                           self._repr_remote())
+            super().disconnect(reason="Framing negotiation timed out.")
+        except (OSError, ValueError, AttributeError):
+            # The main loop will notice the problems, if any.
+            pass
+
     def connect(self):
         """Connect and start the main loop.
 
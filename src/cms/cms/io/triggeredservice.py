@@ -118,9 +118,16 @@ class Executor(metaclass=ABCMeta):
             to_execute = [self._operation_queue.pop(wait=True)]
             if self._batch_executions:
                 max_operations = self.max_operations_per_batch()
+                max_cost = self.max_cost_per_batch()
+                cost = self.operation_cost(to_execute[0].item)
                 while not self._operation_queue.empty() and (
                         max_operations == 0 or
                         len(to_execute) < max_operations):
+                    if max_cost is not None:
+                        cost += self.operation_cost(
+                            self._operation_queue.top().item)
+                        if cost > max_cost:
+                            break
                     to_execute.append(self._operation_queue.pop())
 
             assert len(to_execute) > 0, "Expected at least one element."
@@ -163,6 +170,29 @@ class Executor(metaclass=ABCMeta):
         """
         return 0
 
+    def max_cost_per_batch(self):
+        """Return the maximum total cost of the operations in a batch.
+
+        If the service has batch executions, operations are added to
+        a batch (after the first) only while the sum of their costs,
+        as given by operation_cost(), does not exceed this value.
+
+        return (float|None): the maximum cost, or None to indicate no
+            limits.
+
+        """
+        return None
+
+    def operation_cost(self, item):
+        """Return the cost of an operation, see max_cost_per_batch.
+
+        item (QueueItem): the operation.
+
+        return (float): its cost.
+
+        """
+        return 1.0
+
     @abstractmethod
     def execute(self, entry):
         """Perform a single operation.
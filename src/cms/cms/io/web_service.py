@@ -30,6 +30,7 @@ from werkzeug.wsgi import DispatcherMiddleware, SharedDataMiddleware
 
 from cms.db.filecacher import FileCacher
 from cms.server.file_middleware import FileServerMiddleware
+from cms.server.upload_middleware import UploadMiddleware
 from .service import Service
 from .web_rpc import RPCMiddleware
 
@@ -55,10 +56,21 @@ class WebService(Service):
         auth_middleware = parameters.pop('auth_middleware', None)
         is_proxy_used = parameters.pop('is_proxy_used', None)
         num_proxies_used = parameters.pop('num_proxies_used', None)
+        upload_path_pattern = parameters.pop('upload_path_pattern', None)
 
         self.wsgi_app = tornado.wsgi.WSGIApplication(handlers, **parameters)
         self.wsgi_app.service = self
 
+        self.file_cacher = FileCacher(self)
+
+        # The files uploaded to the matching paths are streamed to the
+        # file cacher instead of being buffered by Tornado.
+        self.upload_middleware = None
+        if upload_path_pattern is not None:
+            self.upload_middleware = UploadMiddleware(
+                self.file_cacher, self.wsgi_app, upload_path_pattern)
+            self.wsgi_app = self.upload_middleware
+
         for entry in static_files:
             # TODO If we will introduce a flag to trigger autoreload in
             # Jinja2 templates, use it to disable the cache arg here.
@@ -67,7 +79,6 @@ class WebService(Service):
                 cache=True, cache_timeout=SECONDS_IN_A_YEAR,
                 fallback_mimetype="application/octet-stream")
 
-        self.file_cacher = FileCacher(self)
         self.wsgi_app = FileServerMiddleware(self.file_cacher, self.wsgi_app)
 
         if rpc_enabled:
@@ -31,8 +31,8 @@ import io
 
 from sqlalchemy.orm import joinedload
 
-from cms.db import Contest
-from cms.grading.scoring import task_score
+from cms.db import Contest, Participation, Submission
+from cms.grading.scoring import cached_task_score, get_task_score_rows
 from .base import BaseHandler, require_permission
 
 
@@ -45,15 +45,32 @@ class RankingHandler(BaseHandler):
         # This validates the contest id.
         self.safe_get_item(Contest, contest_id)
 
-        # This massive joined load gets all the information which we will need
-        # to generating the rankings.
-        self.contest = self.sql_session.query(Contest)\
+        # Most scores are stored by ScoringService; those of users that
+        # did not submit anything on a task are zero.
+        rows = get_task_score_rows(self.sql_session, contest_id=contest_id)
+        submitted = set(self.sql_session.query(
+            Submission.participation_id, Submission.task_id)
+            .join(Participation)
+            .filter(Participation.contest_id == contest_id)
+            .distinct()
+            .all())
+        query = self.sql_session.query(Contest)\
             .filter(Contest.id == contest_id)\
-            .options(joinedload('participations'))\
-            .options(joinedload('participations.submissions'))\
-            .options(joinedload('participations.submissions.token'))\
-            .options(joinedload('participations.submissions.results'))\
-            .first()
+            .options(joinedload('participations'))
+        self.contest = query.first()
+
+        # The others have to be computed from the submissions: in that
+        # case, this massive joined load gets all the information which
+        # we will need to generate the rankings.
+        tasks = dict((task.id, task) for task in self.contest.tasks)
+        if any(key not in rows
+               or rows[key].dataset_id != tasks[key[1]].active_dataset_id
+               for key in submitted if key[1] in tasks):
+            self.contest = query\
+                .options(joinedload('participations.submissions'))\
+                .options(joinedload('participations.submissions.token'))\
+                .options(joinedload('participations.submissions.results'))\
+                .first()
 
         # Preprocess participations: get data about teams, scores
         show_teams = False
@@ -64,7 +81,11 @@ class RankingHandler(BaseHandler):
             total_score = 0.0
             partial = False
             for task in self.contest.tasks:
-                t_score, t_partial = task_score(p, task, rounded=True)
+                if (p.id, task.id) in submitted:
+                    t_score, t_partial = cached_task_score(
+                        p, task, rows.get((p.id, task.id)), rounded=True)
+                else:
+                    t_score, t_partial = 0.0, False
                 p.scores.append((t_score, t_partial))
                 total_score += t_score
                 partial = partial or t_partial
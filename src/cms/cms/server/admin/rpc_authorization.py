@@ -29,6 +29,7 @@ RPCS_ALLOWED_FOR_AUTHENTICATED = [
     ("ResourceService", "get_resources"),
     ("EvaluationService", "workers_status"),
     ("EvaluationService", "queue_status"),
+    ("EvaluationService", "outcome_cache_status"),
     ("LogService", "last_messages"),
 ]
 
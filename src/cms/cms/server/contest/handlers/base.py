@@ -39,6 +39,7 @@ from werkzeug.http import parse_accept_header
 from cms.db import Contest
 from cms.locale import DEFAULT_TRANSLATION, choose_language_code
 from cms.server import CommonRequestHandler
+from cms.server.upload_middleware import UploadMiddleware
 from cmscommon.datetime import utc as utc_tzinfo
 
 
@@ -157,6 +158,23 @@ class BaseHandler(CommonRequestHandler):
         """Return whether CWS serves all contests."""
         return self.service.contest_id is None
 
+    def get_uploaded_files(self):
+        """Return the files sent with the request.
+
+        return ({str: [tornado.httputil.HTTPFile|UploadedFile]}): the
+            files, indexed by the name of their form field; they are
+            UploadedFile if the request was streamed to disk by the
+            UploadMiddleware, HTTPFile as parsed by Tornado otherwise.
+
+        """
+        key = self.request.headers.get(UploadMiddleware.UPLOADS_HEADER)
+        if key is None or self.service.upload_middleware is None:
+            return self.request.files
+        try:
+            return self.service.upload_middleware.get_uploads(key)
+        except KeyError:
+            raise tornado.web.HTTPError(400)
+
 
 class ContestListHandler(BaseHandler):
     def get(self):
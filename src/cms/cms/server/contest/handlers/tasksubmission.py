@@ -36,9 +36,9 @@ import tornado.web
 from sqlalchemy.orm import joinedload
 
 from cms import config, FEEDBACK_LEVEL_FULL
-from cms.db import Submission, SubmissionResult
+from cms.db import ParticipationTaskScore, Submission, SubmissionResult
 from cms.grading.languagemanager import get_language
-from cms.grading.scoring import task_score
+from cms.grading.scoring import cached_task_score
 from cms.server import multi_contest
 from cms.server.contest.submission import get_submission_count, \
     UnacceptableSubmission, accept_submission
@@ -80,7 +80,7 @@ class SubmitHandler(ContestHandler):
         try:
             submission = accept_submission(
                 self.sql_session, self.service.file_cacher, self.current_user,
-                task, self.timestamp, self.request.files,
+                task, self.timestamp, self.get_uploaded_files(),
                 self.get_argument("language", None), official)
             self.sql_session.commit()
         except UnacceptableSubmission as e:
@@ -123,10 +123,12 @@ class TaskSubmissionsHandler(ContestHandler):
             .options(joinedload(Submission.results))\
             .all()
 
-        public_score, is_public_score_partial = task_score(
-            participation, task, public=True, rounded=True)
-        tokened_score, is_tokened_score_partial = task_score(
-            participation, task, only_tokened=True, rounded=True)
+        row = self.sql_session.query(ParticipationTaskScore)\
+            .get((participation.id, task.id))
+        public_score, is_public_score_partial = cached_task_score(
+            participation, task, row, public=True, rounded=True)
+        tokened_score, is_tokened_score_partial = cached_task_score(
+            participation, task, row, only_tokened=True, rounded=True)
         # These two should be the same, anyway.
         is_score_partial = is_public_score_partial or is_tokened_score_partial
 
@@ -194,17 +196,24 @@ class SubmissionStatusHandler(ContestHandler):
             "task_is_score_partial" as partial info is the same for both.
 
         """
-        # Just to preload all information required to compute the task score.
-        self.sql_session.query(Submission)\
-            .filter(Submission.participation == participation)\
-            .filter(Submission.task == task)\
-            .options(joinedload(Submission.token))\
-            .options(joinedload(Submission.results))\
-            .all()
+        # The score stored by ScoringService, if up to date.
+        row = self.sql_session.query(ParticipationTaskScore)\
+            .get((participation.id, task.id))
+        if row is None or row.dataset_id != task.active_dataset_id:
+            # Just to preload all information required to compute the
+            # task score.
+            self.sql_session.query(Submission)\
+                .filter(Submission.participation == participation)\
+                .filter(Submission.task == task)\
+                .options(joinedload(Submission.token))\
+                .options(joinedload(Submission.results))\
+                .all()
         data["task_public_score"], public_score_is_partial = \
-            task_score(participation, task, public=True, rounded=True)
+            cached_task_score(participation, task, row,
+                              public=True, rounded=True)
         data["task_tokened_score"], tokened_score_is_partial = \
-            task_score(participation, task, only_tokened=True, rounded=True)
+            cached_task_score(participation, task, row,
+                              only_tokened=True, rounded=True)
         # These two should be the same, anyway.
         data["task_score_is_partial"] = \
             public_score_is_partial or tokened_score_is_partial
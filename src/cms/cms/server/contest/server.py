@@ -71,6 +71,8 @@ class ContestWebServer(WebService):
             "num_proxies_used": config.num_proxies_used,
             "xsrf_cookies": True,
         }
+        if config.stream_submission_uploads:
+            parameters["upload_path_pattern"] = r"/tasks/[^/]+/(submit|test)$"
 
         try:
             listen_address = config.contest_listen_address[shard]
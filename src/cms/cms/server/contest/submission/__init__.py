@@ -32,7 +32,7 @@ from .file_matching import InvalidFilesOrLanguage, match_files_and_language
 from .file_retrieval import ReceivedFile, InvalidArchive, \
     extract_files_from_archive, extract_files_from_tornado
 from .utils import fetch_file_digests_from_previous_submission, StorageFailed, \
-    store_local_copy
+    store_local_copy, store_received_file
 from .workflow import UnacceptableSubmission, accept_submission, \
     TestingNotAllowed, UnacceptableUserTest, accept_user_test
 
@@ -48,7 +48,7 @@ __all__ = [
     "InvalidFilesOrLanguage", "match_files_and_language",
     # utils.py
     "fetch_file_digests_from_previous_submission", "StorageFailed",
-    "store_local_copy",
+    "store_local_copy", "store_received_file",
     # workflow.py
     "UnacceptableSubmission", "accept_submission", "TestingNotAllowed",
     "UnacceptableUserTest", "accept_user_test",
@@ -38,14 +38,16 @@ from collections import namedtuple
 
 from patoolib.util import PatoolError
 
-from cmscommon.archive import Archive
+from cms.server.upload_middleware import UploadedFile
+from cmscommon.archive import Archive, ArchiveException
 
 
 # Represents a file received through HTTP from an HTML form.
 # codename (str|None): the name of the form field (in our case it's the
 #   filename-with-%l).
 # filename (str|None): the name the file had on the user's system.
-# content (bytes): the data of the file.
+# content (bytes|UploadedFile): the data of the file, or the file on disk
+#   holding it if it was streamed by the UploadMiddleware.
 ReceivedFile = namedtuple("ReceivedFile", ["codename", "filename", "content"])
 
 
@@ -64,7 +66,8 @@ def extract_files_from_archive(data):
     contents cannot have conflicting/duplicated paths) but the structure
     will be ignored and the files will be returned with their basename.
 
-    data (bytes): the raw contents of the archive.
+    data (bytes|UploadedFile): the raw contents of the archive, or the
+        uploaded file holding them.
 
     return ([ReceivedFile]): the files contained in the archive, with
         their filename filled in but their codename set to None.
@@ -73,7 +76,13 @@ def extract_files_from_archive(data):
         archive, its contents are invalid, or other issues.
 
     """
-    archive = Archive.from_raw_data(data)
+    if isinstance(data, UploadedFile):
+        try:
+            archive = Archive(data.path)
+        except ArchiveException:
+            archive = None
+    else:
+        archive = Archive.from_raw_data(data)
 
     if archive is None:
         raise InvalidArchive()
@@ -104,8 +113,9 @@ def extract_files_from_tornado(tornado_files):
     files look like they consist of just a compressed archive, extract
     it and return its contents instead.
 
-    tornado_files ({str: [tornado.httputil.HTTPFile]}): a bunch of
-        files, in Tornado's format.
+    tornado_files ({str: [tornado.httputil.HTTPFile|UploadedFile]}): a
+        bunch of files, in Tornado's format or as streamed to disk by
+        the UploadMiddleware.
 
     return ([ReceivedFile]): the same bunch of files, in our format
         (except if it was an archive: then it's the archive's contents).
@@ -115,10 +125,15 @@ def extract_files_from_tornado(tornado_files):
     """
     if len(tornado_files) == 1 and "submission" in tornado_files \
             and len(tornado_files["submission"]) == 1:
-        return extract_files_from_archive(tornado_files["submission"][0].body)
+        return extract_files_from_archive(
+            _get_content(tornado_files["submission"][0]))
 
     result = list()
     for codename, files in tornado_files.items():
         for f in files:
-            result.append(ReceivedFile(codename, f.filename, f.body))
+            result.append(ReceivedFile(codename, f.filename, _get_content(f)))
     return result
+
+
+def _get_content(f):
+    return f if isinstance(f, UploadedFile) else f.body
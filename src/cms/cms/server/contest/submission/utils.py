@@ -31,9 +31,12 @@
 
 import os.path
 import pickle
+import struct
+from shutil import copyfileobj
 
 from cms import config
 from cms.db import Submission, UserTest
+from cms.server.upload_middleware import UploadedFile
 from .check import get_latest_submission
 
 
@@ -103,6 +106,23 @@ class StorageFailed(Exception):
     pass
 
 
+def store_received_file(file_cacher, content, desc):
+    """Store a file sent in by a contestant.
+
+    file_cacher (FileCacher): the file cacher to store the file with.
+    content (bytes|UploadedFile): the content of the file, or the file
+        on disk holding it (which is moved in the cache, without being
+        read again).
+    desc (str): the description to associate to the file.
+
+    return (str): the digest of the file.
+
+    """
+    if isinstance(content, UploadedFile):
+        return content.store(desc)
+    return file_cacher.put_file_content(content, desc)
+
+
 def store_local_copy(path, participation, task, timestamp, files):
     """Write the files plus some metadata to a local backup
 
@@ -121,8 +141,9 @@ def store_local_copy(path, participation, task, timestamp, files):
     participation (Participation): the participation that submitted.
     task (Task): the task on which they submitted.
     timestamp (datetime): when the submission happened.
-    files ({str: bytes}): the files that were sent in: the keys are the
-        codenames (filenames-with-%l), the values are the contents.
+    files ({str: bytes|UploadedFile}): the files that were sent in: the
+        keys are the codenames (filenames-with-%l), the values are the
+        contents (or the files on disk holding them).
 
     raise (StorageFailed): in case of problems.
 
@@ -132,8 +153,44 @@ def store_local_copy(path, participation, task, timestamp, files):
                             participation.user.username)
         if not os.path.exists(path):
             os.makedirs(path)
+        data = (participation.contest.id, participation.user.id, task.id)
         with open(os.path.join(path, "%s" % timestamp), "wb") as f:
-            pickle.dump((participation.contest.id, participation.user.id,
-                         task.id, files), f)
+            if any(isinstance(content, UploadedFile)
+                   for content in files.values()):
+                _dump_streaming(data, files, f)
+            else:
+                pickle.dump(data + (files,), f)
     except OSError as e:
         raise StorageFailed("Failed to store local copy of submission: %s", e)
+
+
+def _dump_streaming(data, files, f):
+    """Write the same pickle as pickle.dump(data + (files,), f).
+
+    The contents of the uploaded files are copied from disk into the
+    pickle, rather than loaded in memory. The pickle uses protocol 3,
+    so the opcodes for the tuple, the dict and the bytes are written
+    explicitly (the other objects are pickled on their own, stripping
+    the protocol header and the final STOP).
+
+    data ((int, int, int)): the contest, user and task IDs.
+    files ({str: bytes|UploadedFile}): the files.
+    f (fileobj): the binary file to write to.
+
+    """
+    def dump_object(obj):
+        f.write(pickle.dumps(obj, protocol=3)[2:-1])
+
+    f.write(pickle.PROTO + bytes([3]) + pickle.MARK)
+    for obj in data:
+        dump_object(obj)
+    f.write(pickle.EMPTY_DICT + pickle.MARK)
+    for codename, content in files.items():
+        dump_object(codename)
+        if isinstance(content, UploadedFile):
+            f.write(pickle.BINBYTES + struct.pack("<I", len(content)))
+            with content.open() as src:
+                copyfileobj(src, f)
+        else:
+            dump_object(content)
+    f.write(pickle.SETITEMS + pickle.TUPLE + pickle.STOP)
@@ -36,7 +36,7 @@ from .check import check_max_number, check_min_interval
 from .file_matching import InvalidFilesOrLanguage, match_files_and_language
 from .file_retrieval import InvalidArchive, extract_files_from_tornado
 from .utils import fetch_file_digests_from_previous_submission, StorageFailed, \
-    store_local_copy
+    store_local_copy, store_received_file
 
 
 logger = logging.getLogger(__name__)
@@ -74,8 +74,8 @@ def accept_submission(sql_session, file_cacher, participation, task, timestamp,
     participation (Participation): the contestant who is submitting.
     task (Task): the task on which they are submitting.
     timestamp (datetime): the moment in time they submitted at.
-    tornado_files ({str: [tornado.httputil.HTTPFile]}): the files they
-        sent in.
+    tornado_files ({str: [tornado.httputil.HTTPFile|UploadedFile]}): the
+        files they sent in (see BaseHandler.get_uploaded_files).
     language_name (str|None): the language they declared their files are
         in (None means unknown and thus auto-detect).
     official (bool): whether the submission was sent in during a regular
@@ -177,8 +177,8 @@ def accept_submission(sql_session, file_cacher, participation, task, timestamp,
     # We now have to send all the files to the destination...
     try:
         for codename, content in files.items():
-            digest = file_cacher.put_file_content(
-                content,
+            digest = store_received_file(
+                file_cacher, content,
                 "Submission file %s sent by %s at %d." % (
                     codename, participation.user.username,
                     make_timestamp(timestamp)))
@@ -237,8 +237,8 @@ def accept_user_test(sql_session, file_cacher, participation, task, timestamp,
     participation (Participation): the contestant who is submitting.
     task (Task): the task on which they are submitting.
     timestamp (datetime): the moment in time they submitted at.
-    tornado_files ({str: [tornado.httputil.HTTPFile]}): the files they
-        sent in.
+    tornado_files ({str: [tornado.httputil.HTTPFile|UploadedFile]}): the
+        files they sent in (see BaseHandler.get_uploaded_files).
     language_name (str|None): the language they declared their files are
         in (None means unknown and thus auto-detect).
 
@@ -359,8 +359,8 @@ def accept_user_test(sql_session, file_cacher, participation, task, timestamp,
     # We now have to send all the files to the destination...
     try:
         for codename, content in files.items():
-            digest = file_cacher.put_file_content(
-                content,
+            digest = store_received_file(
+                file_cacher, content,
                 "Test file %s sent by %s at %d." % (
                     codename, participation.user.username,
                     make_timestamp(timestamp)))
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Middleware streaming uploaded files to disk.
+
+"""
+
+import logging
+import os
+import re
+import secrets
+import tempfile
+from io import BytesIO
+from urllib.parse import urlencode
+
+from werkzeug.formparser import parse_form_data
+
+from cmscommon.digest import Digester
+
+
+logger = logging.getLogger(__name__)
+
+
+class UploadedFile:
+    """A file received in a multipart request, stored on disk.
+
+    The content is written in a temporary file in the temp directory
+    of a file cacher, and hashed while it is written, so that it can
+    then be stored without being read again (see store()).
+
+    """
+
+    def __init__(self, file_cacher, filename):
+        """Create an empty file.
+
+        file_cacher (FileCacher): the cacher whose temp dir to use.
+        filename (str|None): the name the file had on the user's
+            system.
+
+        """
+        self.filename = filename
+        self._file_cacher = file_cacher
+        self._fobj = tempfile.NamedTemporaryFile(
+            "w+b", delete=False, dir=file_cacher.temp_dir)
+        self.path = self._fobj.name
+        self._digester = Digester()
+        self.size = 0
+        self.digest = None
+
+    def __len__(self):
+        return self.size
+
+    def write(self, data):
+        self._digester.update(data)
+        self.size += len(data)
+        return self._fobj.write(data)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self._fobj.seek(offset, whence)
+
+    def finish(self):
+        """Close the file, after all the content has been written."""
+        if self.digest is None:
+            self._fobj.close()
+            self.digest = self._digester.digest()
+
+    def open(self):
+        """Return a binary file object to read the content."""
+        return open(self.path, "rb")
+
+    def store(self, desc=""):
+        """Store the file in the file cacher, moving it there.
+
+        desc (str): the description to associate to the file.
+
+        return (str): the digest of the file.
+
+        """
+        self.finish()
+        return self._file_cacher.put_file_from_temp_path(
+            self.path, self.digest, desc)
+
+    def discard(self):
+        """Delete the file, unless it has been stored."""
+        self.finish()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class UploadMiddleware:
+    """Parse multipart requests, streaming their files to disk.
+
+    Tornado's WSGI adapter reads the whole body of a request in memory
+    before parsing it, so each uploaded file is kept in memory (even
+    more than once) while the request is handled.
+
+    For the requests whose path matches a given pattern, this
+    middleware parses the multipart body incrementally instead,
+    writing each file in the temp dir of the file cacher as it
+    arrives. The request is then passed on with only the other form
+    fields in its body, and a header with the key to retrieve the
+    files through get_uploads(). The files not stored by the handler
+    are deleted when the request is over.
+
+    """
+
+    UPLOADS_HEADER = "X-CMS-Uploads"
+    _UPLOADS_ENVIRON_KEY = "HTTP_X_CMS_UPLOADS"
+
+    def __init__(self, file_cacher, app, path_pattern):
+        """Create an instance.
+
+        file_cacher (FileCacher): the cacher to store the files with.
+        app (function): the WSGI application to wrap.
+        path_pattern (str): a regular expression matching the paths of
+            the requests whose files are to be streamed.
+
+        """
+        self.file_cacher = file_cacher
+        self.wrapped_app = app
+        self.path_pattern = re.compile(path_pattern)
+
+        # The files of the requests being handled, by key.
+        # Type: {str: {str: [UploadedFile]}}
+        self._uploads = dict()
+
+    def get_uploads(self, key):
+        """Return the files of a request.
+
+        key (str): the value of the UPLOADS_HEADER of the request.
+
+        return ({str: [UploadedFile]}): the files, indexed by the name
+            of their form field.
+
+        raise (KeyError): if the key is not valid.
+
+        """
+        return self._uploads[key]
+
+    def _must_stream(self, environ):
+        return environ.get("REQUEST_METHOD") == "POST" \
+            and environ.get("CONTENT_TYPE", "").startswith(
+                "multipart/form-data") \
+            and self.path_pattern.search(environ.get("PATH_INFO", ""))
+
+    def __call__(self, environ, start_response):
+        """Execute this instance as a WSGI application.
+
+        See the PEP for the meaning of parameters.
+
+        """
+        # Only this middleware can set the header.
+        environ.pop(self._UPLOADS_ENVIRON_KEY, None)
+        if not self._must_stream(environ):
+            return self.wrapped_app(environ, start_response)
+
+        created = list()
+
+        # Werkzeug passes the arguments by keyword.
+        def stream_factory(total_content_length, filename, content_type,
+                           content_length=None):
+            uploaded_file = UploadedFile(self.file_cacher, filename)
+            created.append(uploaded_file)
+            return uploaded_file
+
+        key = secrets.token_hex(16)
+        try:
+            _, form, files = parse_form_data(
+                environ, stream_factory=stream_factory)
+
+            uploads = dict()
+            for name, storage in files.items(multi=True):
+                # As Tornado does, consider fields without a file name
+                # as if no file was sent (and they might not even have
+                # been created through the stream factory).
+                if not storage.filename:
+                    continue
+                storage.stream.finish()
+                uploads.setdefault(name, []).append(storage.stream)
+            self._uploads[key] = uploads
+            logger.debug("Received %d files (%d bytes) for %s.",
+                         sum(len(v) for v in uploads.values()),
+                         sum(len(f) for v in uploads.values() for f in v),
+                         environ.get("PATH_INFO"))
+
+            body = urlencode(list(form.items(multi=True))).encode("ascii")
+            environ["wsgi.input"] = BytesIO(body)
+            environ["CONTENT_TYPE"] = "application/x-www-form-urlencoded"
+            environ["CONTENT_LENGTH"] = str(len(body))
+            environ[self._UPLOADS_ENVIRON_KEY] = key
+
+            # Tornado's WSGI adapter runs the handler to completion
+            # before returning, so afterwards the files are not needed.
+            return self.wrapped_app(environ, start_response)
+        finally:
+            self._uploads.pop(key, None)
+            for uploaded_file in created:
+                uploaded_file.discard()
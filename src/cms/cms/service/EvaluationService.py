@@ -31,25 +31,30 @@ the current ranking.
 """
 
 import logging
+import os
+import time
 from collections import defaultdict
 from datetime import timedelta
 from functools import wraps
 
 import gevent.lock
-from sqlalchemy import func
+from sqlalchemy import func, tuple_
 from sqlalchemy.exc import IntegrityError
 
-from cms import ServiceCoord, get_service_shards
+from cms import ServiceCoord, config, get_service_shards
 from cms.db import SessionGen, Digest, Dataset, Evaluation, Submission, \
     SubmissionResult, Testcase, UserTest, UserTestResult, get_submissions, \
     get_submission_results, get_datasets_to_judge
 from cms.grading.Job import JobGroup
+from cms.grading.tasktypes import get_task_type
 from cms.io import Executor, TriggeredService, rpc_method
+from cmscommon.datetime import monotonic_time
 from .esoperations import ESOperation, get_relevant_operations, \
-    get_submissions_operations, get_user_tests_operations, \
-    submission_get_operations, submission_to_evaluate, \
-    user_test_get_operations
+    get_submissions_operations, get_sweep_range, \
+    get_user_tests_operations, submission_get_operations, \
+    submission_to_evaluate, user_test_get_operations
 from .flushingdict import FlushingDict
+from .outcomecache import OutcomeCache
 from .workerpool import WorkerPool
 
 
@@ -101,17 +106,38 @@ class EvaluationExecutor(Executor):
         """Return the maximum number of operations per batch.
 
         We derive the number from the length of the queue divided by
-        the number of workers, with a cap at MAX_OPERATIONS_PER_BATCH.
+        the number of execution slots of the live and enabled workers,
+        with a cap at MAX_OPERATIONS_PER_BATCH.
 
         """
-        # TODO: len(self.pool) is the total number of workers,
-        # included those that are disabled.
-        ratio = len(self._operation_queue) // len(self.pool) + 1
+        workers = max(self.pool.get_live_slots(), 1)
+        ratio = len(self._operation_queue) // workers + 1
         ret = min(max(ratio, 1), EvaluationExecutor.MAX_OPERATIONS_PER_BATCH)
-        logger.info("Ratio is %d, executing %d operations together.",
-                    ratio, ret)
+        logger.info("Ratio is %d, executing at most %d operations "
+                    "together.", ratio, ret)
         return ret
 
+    def max_cost_per_batch(self):
+        """Return the maximum total cost of a batch.
+
+        Batches are packed to take about
+        config.evaluation_batch_target_time_s on a worker of average
+        speed among the live and enabled ones.
+
+        """
+        shards = self.pool.get_live_workers()
+        speed = sum(self.pool.cost_model.get_speed(shard)
+                    for shard in shards) / len(shards) if shards else 1.0
+        return config.evaluation_batch_target_time_s * speed
+
+    def operation_cost(self, item):
+        """Return the estimated cost of an operation.
+
+        item (ESOperation): the operation.
+
+        """
+        return self.pool.cost_model.get_cost(item)
+
     def execute(self, entries):
         """Execute a batch of operations in the queue.
 
@@ -132,16 +158,49 @@ class EvaluationExecutor(Executor):
                 # re-enqueue it.
                 operation.side_data = (entry.priority, entry.timestamp)
                 self._currently_executing.append(operation)
+        jobs = self._execute_from_outcome_cache()
         while len(self._currently_executing) > 0:
             self.pool.wait_for_workers()
             with self._current_execution_lock:
                 if len(self._currently_executing) == 0:
                     break
-                res = self.pool.acquire_worker(self._currently_executing)
+                res = self.pool.acquire_worker(self._currently_executing,
+                                               jobs=jobs)
                 if res is not None:
                     self._currently_executing = []
                     break
 
+    def _execute_from_outcome_cache(self):
+        """Complete the operations whose outcome is already known.
+
+        The results of the operations found in the outcome cache of
+        the service are handed directly to it, without involving any
+        worker.
+
+        return ({ESOperation: Job}|None): the jobs built for the
+            operations, if any, to send to the workers.
+
+        """
+        with self._current_execution_lock:
+            operations = list(self._currently_executing)
+        try:
+            cached_jobs, jobs = \
+                self.evaluation_service.get_cached_jobs(operations)
+        except Exception:
+            logger.error("Unexpected error when looking for operations in "
+                         "the outcome cache.", exc_info=True)
+            return None
+        for operation, job in cached_jobs:
+            with self._current_execution_lock:
+                # The operation might have been dequeued in the
+                # meantime, in which case its result is not needed.
+                if operation not in self._currently_executing:
+                    continue
+                self.evaluation_service.result_cache.add(
+                    operation, Result(job, True))
+                self._currently_executing.remove(operation)
+        return jobs
+
     def dequeue(self, operation):
         """Remove an item from the queue.
 
@@ -207,6 +266,10 @@ class EvaluationService(TriggeredService):
     # How often we check if a worker is connected.
     WORKER_CONNECTION_CHECK_TIME = timedelta(seconds=10)
 
+    # How often the sweeper looks at all the submissions and user
+    # tests, instead of only the recent ones (see _missing_operations).
+    FULL_SWEEP_INTERVAL = timedelta(minutes=30)
+
     # How many worker results we accumulate before processing them.
     RESULT_CACHE_SIZE = 100
     # The maximum time since the last result before processing.
@@ -224,6 +287,15 @@ class EvaluationService(TriggeredService):
             EvaluationService.MAX_FLUSHING_TIME_SECONDS,
             self.write_results)
 
+        # Cache holding the outcomes of the evaluations that depend
+        # only on the content of the files involved.
+        self.outcome_cache = None
+        if config.outcome_cache:
+            self.outcome_cache = OutcomeCache(
+                os.path.join(config.cache_dir,
+                             "outcome-cache-%s-%d" % (self.name, self.shard)),
+                config.outcome_cache_max_entries)
+
         # This lock is used to avoid inserting in the queue (which
         # itself is already thread-safe) an operation which is already
         # being processed. Such operation might be in one of the
@@ -247,6 +319,16 @@ class EvaluationService(TriggeredService):
         # operations in state 4.
         self.post_finish_lock = gevent.lock.RLock()
 
+        # State of the incremental sweeps (see _missing_operations):
+        # the smallest ids of submissions and user tests that the next
+        # sweep looks at (None for a full sweep), the largest ids seen
+        # so far, when the last full sweep started, and whether the next
+        # sweep must be a full one.
+        self._sweep_watermarks = None
+        self._sweep_max_ids = [0, 0]
+        self._last_full_sweep = None
+        self._full_sweep_requested = False
+
         self.scoring_service = self.connect_to(
             ServiceCoord("ScoringService", 0))
 
@@ -316,21 +398,69 @@ class EvaluationService(TriggeredService):
         evaluated for no good reasons. Put the missing operation in
         the queue.
 
+        Most sweeps are incremental: they only look at the submissions
+        and user tests with ids at least the watermarks, that are the
+        smallest ids that needed operations in the previous sweep, or
+        that were not seen by the sweep before (whose transactions
+        might have been still uncommitted). A full sweep is done every
+        FULL_SWEEP_INTERVAL, and when search_operations_not_done is
+        called (for example, for a dataset to judge added to a task
+        with old submissions).
+
         """
+        full = self._sweep_watermarks is None \
+            or self._full_sweep_requested \
+            or monotonic_time() - self._last_full_sweep \
+            >= EvaluationService.FULL_SWEEP_INTERVAL.total_seconds()
+        if full:
+            self._full_sweep_requested = False
+            self._last_full_sweep = monotonic_time()
+            min_ids = [None, None]
+        else:
+            min_ids = self._sweep_watermarks
+
         counter = 0
+        found = 0
+        examined = []
+        watermarks = []
         with SessionGen() as session:
+            for i, (cls, get_operations) in enumerate([
+                    (Submission, get_submissions_operations),
+                    (UserTest, get_user_tests_operations)]):
+                count, max_id = get_sweep_range(
+                    session, cls, self.contest_id, min_ids[i])
+                operations = get_operations(
+                    session, self.contest_id, min_id=min_ids[i])
+                for operation, timestamp, priority in operations:
+                    if self.enqueue(operation, timestamp, priority):
+                        counter += 1
+
+                watermark = self._sweep_max_ids[i] + 1
+                for operation, _, _ in operations:
+                    watermark = min(watermark, operation.object_id)
+                watermarks.append(watermark)
+                if max_id is not None:
+                    self._sweep_max_ids[i] = max(self._sweep_max_ids[i],
+                                                 max_id)
+                examined.append(count)
+                found += len(operations)
+
+        self._sweep_watermarks = watermarks
+        logger.info("%s sweep looked at %d submission(s) and %d user "
+                    "test(s) and found %d operation(s) to do, %d of them "
+                    "not queued.", "Full" if full else "Incremental",
+                    examined[0], examined[1], found, counter)
+        return counter
 
-            for operation, timestamp, priority in \
-                    get_submissions_operations(session, self.contest_id):
-                if self.enqueue(operation, timestamp, priority):
-                    counter += 1
+    @rpc_method
+    def search_operations_not_done(self):
+        """See TriggeredService.search_operations_not_done.
 
-            for operation, timestamp, priority in \
-                    get_user_tests_operations(session, self.contest_id):
-                if self.enqueue(operation, timestamp, priority):
-                    counter += 1
+        The next sweep is a full one.
 
-        return counter
+        """
+        self._full_sweep_requested = True
+        super().search_operations_not_done()
 
     @rpc_method
     def workers_status(self):
@@ -343,6 +473,18 @@ class EvaluationService(TriggeredService):
         """
         return self.get_executor().pool.get_status()
 
+    @rpc_method
+    def outcome_cache_status(self):
+        """Return the counters of the outcome cache.
+
+        returns ({str: int}|None): the hits, misses and stores of the
+            outcome cache, or None if it is disabled.
+
+        """
+        if self.outcome_cache is None:
+            return None
+        return self.outcome_cache.get_status()
+
     def check_workers_timeout(self):
         """We ask WorkerPool for the unresponsive workers, and we put
         again their operations in the queue.
@@ -390,12 +532,14 @@ class EvaluationService(TriggeredService):
         return super().enqueue(operation, priority, timestamp) > 0
 
     @with_post_finish_lock
-    def action_finished(self, data, shard, error=None):
+    def action_finished(self, data, shard, error=None, group_id=None):
         """Callback from a worker, to signal that is finished some
         action (compilation or evaluation).
 
         data (dict): the JobGroup, exported to dict.
         shard (int): the shard finishing the action.
+        group_id (int|None): the identifier given by the pool to the
+            group of operations sent to the worker.
 
         """
         # We notify the pool that the worker is available again for
@@ -406,7 +550,8 @@ class EvaluationService(TriggeredService):
         # this method and do nothing because in that case we know the
         # operation has returned to the queue and perhaps already been
         # reassigned to another worker.
-        to_ignore = self.get_executor().pool.release_worker(shard)
+        to_ignore = self.get_executor().pool.release_worker(
+            shard, group_id=group_id)
         if to_ignore is True:
             logger.info("Ignored result from worker %s as requested.", shard)
             return
@@ -439,6 +584,88 @@ class EvaluationService(TriggeredService):
                     logger.info("`%s' result ignored as requested", operation)
                 else:
                     self.result_cache.add(operation, Result(job, job.success))
+                    if job.success \
+                            and operation.type_ == ESOperation.EVALUATION:
+                        self._store_outcome(job)
+
+    def get_cached_jobs(self, operations):
+        """Return the jobs whose outcome is in the outcome cache.
+
+        operations ([ESOperation]): the operations to look for.
+
+        return ([(ESOperation, EvaluationJob)], {ESOperation: Job}|None):
+            the operations found in the cache, each with a job filled
+            with the results; and the jobs built for all the
+            operations, to be sent to the workers without building
+            them again (None if they were not needed).
+
+        """
+        evaluations = [operation for operation in operations
+                       if operation.type_ == ESOperation.EVALUATION]
+        if self.outcome_cache is None or len(evaluations) == 0:
+            return [], None
+
+        # Building the jobs is expensive, so we do it only if some of
+        # the evaluations have a task type that can reuse outcomes.
+        with SessionGen() as session:
+            datasets = session.query(Dataset).filter(Dataset.id.in_(
+                set(operation.dataset_id for operation in evaluations))).all()
+            if not any(dataset.task_type_object.OUTCOME_CACHEABLE
+                       for dataset in datasets):
+                return [], None
+            jobs = JobGroup.from_operations(operations, session).jobs
+
+        ret = []
+        for job in jobs:
+            if job.operation.type_ != ESOperation.EVALUATION:
+                continue
+            key = self._get_outcome_cache_key(job)
+            if key is None:
+                continue
+            cached = self.outcome_cache.get(key)
+            if cached is None:
+                continue
+            job.success = True
+            job.outcome, job.text = cached
+            job.plus = {}
+            ret.append((job.operation, job))
+
+        if len(ret) > 0:
+            logger.info("Found %d operation(s) in the outcome cache.",
+                        len(ret))
+        return ret, dict((job.operation, job) for job in jobs)
+
+    @staticmethod
+    def _get_outcome_cache_key(job):
+        """Return the outcome cache key of the job, if any.
+
+        job (EvaluationJob): the job.
+
+        return ((str)|None): the key, or None if the outcome of the
+            job cannot be cached.
+
+        """
+        task_type = get_task_type(job.task_type, job.task_type_parameters)
+        if not task_type.OUTCOME_CACHEABLE:
+            return None
+        return task_type.get_outcome_cache_key(job)
+
+    def _store_outcome(self, job):
+        """Store the outcome of a successful job in the outcome cache.
+
+        job (EvaluationJob): the job.
+
+        """
+        if self.outcome_cache is None:
+            return
+        try:
+            key = self._get_outcome_cache_key(job)
+        except Exception:
+            logger.warning("Couldn't compute outcome cache key for `%s'.",
+                           job.operation, exc_info=True)
+            return
+        if key is not None:
+            self.outcome_cache.put(key, job.outcome, job.text)
 
     @with_post_finish_lock
     def write_results(self, items):
@@ -455,6 +682,7 @@ class EvaluationService(TriggeredService):
 
         """
         logger.info("Starting commit process...")
+        start_time = time.time()
 
         # Reorganize the results by submission/usertest result and
         # operation type (i.e., group together the testcase
@@ -464,6 +692,22 @@ class EvaluationService(TriggeredService):
             t = (operation.type_, operation.object_id, operation.dataset_id)
             by_object_and_type[t].append((operation, result))
 
+        # The (object_id, dataset_id) pairs of the submission results
+        # and of the user test results involved.
+        submission_result_ids = set(
+            (object_id, dataset_id)
+            for type_, object_id, dataset_id in by_object_and_type.keys()
+            if type_ in [ESOperation.COMPILATION, ESOperation.EVALUATION])
+        user_test_result_ids = set(
+            (object_id, dataset_id)
+            for type_, object_id, dataset_id in by_object_and_type.keys()
+            if type_ not in [ESOperation.COMPILATION,
+                             ESOperation.EVALUATION])
+        evaluated_ids = set(
+            (object_id, dataset_id)
+            for type_, object_id, dataset_id in by_object_and_type.keys()
+            if type_ == ESOperation.EVALUATION)
+
         with SessionGen() as session:
             for key, operation_results in by_object_and_type.items():
                 type_, object_id, dataset_id = key
@@ -492,51 +736,125 @@ class EvaluationService(TriggeredService):
 
                 self.write_results_one_object_and_type(
                     session, object_result, operation_results)
+            write_time = time.time()
 
             logger.info("Committing evaluations...")
             session.commit()
+            commit_time = time.time()
 
-            num_testcases_per_dataset = dict()
-            for type_, object_id, dataset_id in by_object_and_type.keys():
-                if type_ == ESOperation.EVALUATION:
-                    if dataset_id not in num_testcases_per_dataset:
-                        num_testcases_per_dataset[dataset_id] = session\
-                            .query(func.count(Testcase.id))\
-                            .filter(Testcase.dataset_id == dataset_id).scalar()
-                    num_evaluations = session\
-                        .query(func.count(Evaluation.id)) \
-                        .filter(Evaluation.dataset_id == dataset_id) \
-                        .filter(Evaluation.submission_id == object_id).scalar()
-                    if num_evaluations == num_testcases_per_dataset[dataset_id]:
-                        submission_result = SubmissionResult.get_from_id(
-                            (object_id, dataset_id), session)
-                        submission_result.set_evaluation_outcome()
+            completed_ids = self.get_completed_evaluations(
+                session, evaluated_ids)
+            for submission_result in self.get_results(
+                    session, SubmissionResult, SubmissionResult.submission_id,
+                    completed_ids).values():
+                submission_result.set_evaluation_outcome()
+            completion_time = time.time()
 
             logger.info("Committing evaluation outcomes...")
             session.commit()
+            outcomes_time = time.time()
+
+            # The commit expired all the results: reload them at once.
+            submission_results = self.get_results(
+                session, SubmissionResult, SubmissionResult.submission_id,
+                submission_result_ids)
+            user_test_results = self.get_results(
+                session, UserTestResult, UserTestResult.user_test_id,
+                user_test_result_ids)
 
             logger.info("Ending operations for %s objects...",
                         len(by_object_and_type))
             for type_, object_id, dataset_id in by_object_and_type.keys():
+                if type_ in [ESOperation.COMPILATION, ESOperation.EVALUATION]:
+                    object_result = submission_results.get(
+                        (object_id, dataset_id))
+                else:
+                    object_result = user_test_results.get(
+                        (object_id, dataset_id))
+                if object_result is None:
+                    # Its submission, user test or dataset is missing,
+                    # and we already logged it.
+                    continue
+
                 if type_ == ESOperation.COMPILATION:
-                    submission_result = SubmissionResult.get_from_id(
-                        (object_id, dataset_id), session)
-                    self.compilation_ended(submission_result)
+                    self.compilation_ended(object_result)
                 elif type_ == ESOperation.EVALUATION:
-                    submission_result = SubmissionResult.get_from_id(
-                        (object_id, dataset_id), session)
-                    if submission_result.evaluated():
-                        self.evaluation_ended(submission_result)
+                    if object_result.evaluated():
+                        self.evaluation_ended(object_result)
                 elif type_ == ESOperation.USER_TEST_COMPILATION:
-                    user_test_result = UserTestResult.get_from_id(
-                        (object_id, dataset_id), session)
-                    self.user_test_compilation_ended(user_test_result)
+                    self.user_test_compilation_ended(object_result)
                 elif type_ == ESOperation.USER_TEST_EVALUATION:
-                    user_test_result = UserTestResult.get_from_id(
-                        (object_id, dataset_id), session)
-                    self.user_test_evaluation_ended(user_test_result)
+                    self.user_test_evaluation_ended(object_result)
+            end_time = time.time()
+
+        logger.info("Done writing %d results for %d objects in %.3f s "
+                    "(write %.3f s, commit %.3f s, completion %.3f s, "
+                    "outcomes commit %.3f s, ending %.3f s).",
+                    len(items), len(by_object_and_type),
+                    end_time - start_time, write_time - start_time,
+                    commit_time - write_time, completion_time - commit_time,
+                    outcomes_time - completion_time, end_time - outcomes_time)
+
+    @staticmethod
+    def get_results(session, cls, object_id_column, ids):
+        """Load at once the given submission or user test results.
+
+        session (Session): the DB session to use.
+        cls (type): SubmissionResult or UserTestResult.
+        object_id_column (Column): the column of cls referring to the
+            submission or user test.
+        ids ({(int, int)}): the (object id, dataset id) pairs of the
+            results to load.
+
+        return ({(int, int): SubmissionResult|UserTestResult}): the
+            results found, indexed by their (object id, dataset id).
+
+        """
+        if len(ids) == 0:
+            return dict()
+        results = session.query(cls)\
+            .filter(tuple_(object_id_column, cls.dataset_id).in_(ids))\
+            .all()
+        return dict(((getattr(r, object_id_column.key), r.dataset_id), r)
+                    for r in results)
+
+    @staticmethod
+    def get_completed_evaluations(session, ids):
+        """Find which submission results have all their evaluations.
+
+        A single grouped query compares, for all the given pairs at
+        once, the number of evaluations with the number of testcases
+        of the dataset.
 
-        logger.info("Done")
+        session (Session): the DB session to use.
+        ids ({(int, int)}): the (submission id, dataset id) pairs of
+            the submission results to check.
+
+        return ({(int, int)}): the pairs among ids having an
+            evaluation for each testcase.
+
+        """
+        if len(ids) == 0:
+            return set()
+        num_testcases = session\
+            .query(Testcase.dataset_id,
+                   func.count(Testcase.id).label("count"))\
+            .filter(Testcase.dataset_id.in_(
+                set(dataset_id for _, dataset_id in ids)))\
+            .group_by(Testcase.dataset_id)\
+            .subquery()
+        rows = session\
+            .query(Evaluation.submission_id, Evaluation.dataset_id)\
+            .join(num_testcases,
+                  num_testcases.c.dataset_id == Evaluation.dataset_id)\
+            .filter(tuple_(Evaluation.submission_id,
+                           Evaluation.dataset_id).in_(ids))\
+            .group_by(Evaluation.submission_id, Evaluation.dataset_id,
+                      num_testcases.c.count)\
+            .having(func.count(Evaluation.id) == num_testcases.c.count)\
+            .all()
+        return set((submission_id, dataset_id)
+                   for submission_id, dataset_id in rows)
 
     def write_results_one_object_and_type(
             self, session, object_result, operation_results):
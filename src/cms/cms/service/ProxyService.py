@@ -29,6 +29,7 @@
 
 import json
 import logging
+import random
 import string
 from urllib.parse import urljoin, urlsplit
 
@@ -37,6 +38,7 @@ import gevent.queue
 import requests
 import requests.exceptions
 from sqlalchemy import not_
+from sqlalchemy.orm import joinedload, subqueryload
 
 from cms import config
 from cms.db import SessionGen, Contest, Participation, Task, Submission, \
@@ -49,7 +51,15 @@ logger = logging.getLogger(__name__)
 
 
 class CannotSendError(Exception):
-    pass
+    """Raised when data could not be sent to a ranking.
+
+    status_code (int|None): the HTTP status of the response, or None
+        if there was no response.
+
+    """
+    def __init__(self, msg, status_code=None):
+        super().__init__(msg)
+        self.status_code = status_code
 
 
 def encode_id(entity_id):
@@ -68,7 +78,7 @@ def encode_id(entity_id):
     return encoded_id
 
 
-def safe_put_data(ranking, resource, data, operation):
+def safe_put_data(ranking, resource, data, operation, session=None):
     """Send some data to ranking using a PUT request.
 
     ranking (bytes): the URL of ranking server.
@@ -76,19 +86,25 @@ def safe_put_data(ranking, resource, data, operation):
     data (dict): the data to JSON-encode and send.
     operation (unicode): a human-readable description of the operation
         we're performing (to produce log messages).
+    session (requests.Session|None): the session to send the request
+        with, reusing its connections; if None, a new connection is
+        opened.
 
     raise (CannotSendError): in case of communication errors.
 
     """
+    if session is None:
+        session = requests
     try:
         url = urljoin(ranking, resource)
         # XXX With requests-1.2 auth is automatically extracted from
         # the URL: there is no need for this.
         auth = urlsplit(url)
-        res = requests.put(url, json.dumps(data),
-                           auth=(auth.username, auth.password),
-                           headers={'content-type': 'application/json'},
-                           verify=config.https_certfile)
+        res = session.put(url, json.dumps(data),
+                          auth=(auth.username, auth.password),
+                          headers={'content-type': 'application/json'},
+                          verify=config.https_certfile,
+                          timeout=ProxyExecutor.REQUEST_TIMEOUT)
     except requests.exceptions.RequestException as error:
         msg = "%s while %s: %s." % (type(error).__name__, operation, error)
         logger.warning(msg)
@@ -96,7 +112,7 @@ def safe_put_data(ranking, resource, data, operation):
     if 400 <= res.status_code < 600:
         msg = "Status %s while %s." % (res.status_code, operation)
         logger.warning(msg)
-        raise CannotSendError(msg)
+        raise CannotSendError(msg, res.status_code)
 
 
 class ProxyOperation(QueueItem):
@@ -121,11 +137,16 @@ class ProxyExecutor(Executor):
 
     It maintains a queue of data to send. At each "round" the queue is
     emptied (i.e. all jobs are fetched) and the data is then "combined"
-    to minimize the number of actual HTTP requests: they'll be at most
-    one per entity type.
+    to minimize the number of actual HTTP requests: all entity types
+    are sent in a single request to the bulk endpoint of the ranking,
+    or in one request per type to rankings that do not have it.
 
     Each entity type is identified by a integral class-level constant.
 
+    Each ranking has its own executor, so a ranking that is slow or
+    down does not delay the others. The data that could not be sent
+    is kept and sent again, together with the one queued meanwhile.
+
     """
 
     # We use a single queue for all the data we have to send to the
@@ -147,12 +168,21 @@ class ProxyExecutor(Executor):
         "submissions",
         "subchanges"]
 
+    # The resource path accepting all the entity types at once.
+    BULK_PATH = "bulk"
+
     # How many different entity types we know about.
     TYPE_COUNT = len(RESOURCE_PATHS)
 
     # How long we wait after having failed to push data to a ranking
-    # before trying again.
-    FAILURE_WAIT = 60.0
+    # before trying again: it starts from the minimum and doubles at
+    # each consecutive failure, up to the maximum; a random fraction
+    # of up to half of it is subtracted, so that retries spread out.
+    MIN_FAILURE_WAIT = 1.0
+    MAX_FAILURE_WAIT = 60.0
+
+    # How long we wait for the ranking to answer a request.
+    REQUEST_TIMEOUT = 60.0
 
     def __init__(self, ranking):
         """Create a proxy for the ranking at the given URL.
@@ -165,54 +195,138 @@ class ProxyExecutor(Executor):
         super().__init__(batch_executions=True)
 
         self._ranking = ranking
+        # The URL without the credentials, for the log messages.
+        url = urlsplit(ranking)
+        self._name = "%s://%s%s" % (
+            url.scheme, url.netloc.rpartition("@")[2], url.path)
+
+        # Keep the connections to the ranking open between requests.
+        self._session = requests.Session()
+
+        # The cumulative data that we will try to send to the ranking,
+        # built by combining items in the queue, by entity type.
+        self._data = list(dict() for i in range(self.TYPE_COUNT))
+        # Whether the ranking has the bulk endpoint (we assume so
+        # until it answers otherwise).
+        self._bulk = True
+        # The number of consecutive failures.
+        self._failures = 0
+
+    def _add(self, entry):
+        """Combine the data of a queue entry with the one to send.
+
+        entry (QueueEntry): the entry.
+
+        """
+        self._data[entry.item.type_].update(entry.item.data)
+
+    def _pending(self):
+        """Return whether there is data to send."""
+        return any(len(data) > 0 for data in self._data)
+
+    def _send(self):
+        """Send the data, clearing what has been sent.
+
+        raise (CannotSendError): in case of communication errors.
+
+        """
+        if self._bulk:
+            data = dict((self.RESOURCE_PATHS[i], self._data[i])
+                        for i in range(self.TYPE_COUNT)
+                        if len(self._data[i]) > 0)
+            operation = "sending %s to ranking %s" % (
+                ", ".join(sorted(data.keys())), self._name)
+            logger.debug(operation.capitalize())
+            try:
+                safe_put_data(self._ranking, "%s/" % self.BULK_PATH, data,
+                              operation, session=self._session)
+            except CannotSendError as error:
+                if error.status_code not in (404, 405):
+                    raise
+                logger.info("Ranking %s does not accept all the data in "
+                            "one request, sending it by type.", self._name)
+                self._bulk = False
+            else:
+                for data in self._data:
+                    data.clear()
+                return
+
+        for i in range(self.TYPE_COUNT):
+            # Send entities of type i.
+            if len(self._data[i]) > 0:
+                # We abuse the resource path as the English (plural)
+                # name for the entity type.
+                name = self.RESOURCE_PATHS[i]
+                operation = "sending %s to ranking %s" % (name, self._name)
+
+                logger.debug(operation.capitalize())
+                safe_put_data(self._ranking, "%s/" % name, self._data[i],
+                              operation, session=self._session)
+                self._data[i].clear()
+
+    def _failure_wait(self):
+        """Return how long to wait after the latest failure.
+
+        return (float): the time, in seconds.
+
+        """
+        wait = min(self.MAX_FAILURE_WAIT,
+                   self.MIN_FAILURE_WAIT * 2 ** (self._failures - 1))
+        return wait - random.uniform(0, wait / 2)
 
     def execute(self, entries):
-        """Consume (i.e. send) the data put in the queue, forever.
+        """Consume (i.e. send) the data put in the queue.
 
-        Pick all operations found in the queue (if there aren't any,
-        block waiting until there are), combine them and send HTTP
-        requests to the target ranking. Do it until something very bad
-        happens (i.e. some exception is raised). If communication fails
-        don't stop, just wait FAILURE_WAIT seconds before restarting
-        the loop.
+        Combine the given operations (and the data that could not be
+        sent before) and send HTTP requests to the target ranking. If
+        communication fails, wait (with exponential backoff) and try
+        again, adding what has been queued meanwhile, until the data
+        is sent. Data that the ranking rejects as invalid is dropped.
 
         Do all this cooperatively: yield at every blocking operation
-        (queue fetch, request send, failure wait, etc.). Since the
-        queue is joinable, also notify when the fetched jobs are done.
+        (request send, failure wait, etc.).
 
         entries ([QueueEntry]): entries containing the operations to
             perform.
 
         """
-        # The cumulative data that we will try to send to the ranking,
-        # built by combining items in the queue.
-        data = list(dict() for i in range(self.TYPE_COUNT))
-
         for entry in entries:
-            data[entry.item.type_].update(entry.item.data)
-
-        try:
-            for i in range(self.TYPE_COUNT):
-                # Send entities of type i.
-                if len(data[i]) > 0:
-                    # We abuse the resource path as the English
-                    # (plural) name for the entity type.
-                    name = self.RESOURCE_PATHS[i]
-                    operation = "sending %s to ranking %s" % (name,
-                                                              self._ranking)
-
-                    logger.debug(operation.capitalize())
-                    safe_put_data(
-                        self._ranking, "%s/" % name, data[i], operation)
-                    data[i].clear()
-
-        except CannotSendError:
-            # A log message has already been produced.
-            gevent.sleep(self.FAILURE_WAIT)
-        except:
-            # Whoa! That's unexpected!
-            logger.error("Unexpected error.", exc_info=True)
-            gevent.sleep(self.FAILURE_WAIT)
+            self._add(entry)
+
+        while self._pending():
+            try:
+                self._send()
+            except CannotSendError as error:
+                # A log message has already been produced.
+                if error.status_code is not None \
+                        and 400 <= error.status_code < 500 \
+                        and error.status_code not in (408, 429):
+                    logger.error("Ranking %s rejected the data, which "
+                                 "is dropped.", self._name)
+                    for data in self._data:
+                        data.clear()
+                    break
+            except Exception:
+                # Whoa! That's unexpected!
+                logger.error("Unexpected error.", exc_info=True)
+                for data in self._data:
+                    data.clear()
+                break
+            else:
+                if self._failures > 0:
+                    logger.info("Data sent to ranking %s after %d "
+                                "failed attempts.",
+                                self._name, self._failures)
+                self._failures = 0
+                break
+
+            self._failures += 1
+            wait = self._failure_wait()
+            logger.info("Trying again to send data to ranking %s in %.1f "
+                        "seconds.", self._name, wait)
+            gevent.sleep(wait)
+            while not self._operation_queue.empty():
+                self._add(self._operation_queue.pop())
 
 
 class ProxyService(TriggeredService):
@@ -461,21 +575,58 @@ class ProxyService(TriggeredService):
                              "unexistent submission id %s.", submission_id)
                 raise KeyError("Submission not found.")
 
-            if submission.participation.hidden:
-                logger.info("[submission_scored] Score for submission %d "
-                            "not sent because the participation is hidden.",
-                            submission_id)
-                return
+            self._submission_scored(submission)
 
-            if not submission.official:
-                logger.info("[submission_scored] Score for submission %d "
-                            "not sent because the submission is not official.",
-                            submission_id)
-                return
+    @rpc_method
+    def submissions_scored(self, submission_ids):
+        """Notice that some submissions have been scored.
 
-            # Update RWS.
-            for operation in self.operations_for_score(submission):
-                self.enqueue(operation)
+        Like submission_scored, for many submissions at once (usually
+        called by ScoringService after scoring a batch of submission
+        results).
+
+        submission_ids ([int]): the ids of the submissions that changed.
+
+        """
+        with SessionGen() as session:
+            submissions = session.query(Submission)\
+                .filter(Submission.id.in_(submission_ids))\
+                .options(joinedload(Submission.participation)
+                         .joinedload(Participation.user))\
+                .options(joinedload(Submission.task))\
+                .options(subqueryload(Submission.results))\
+                .all()
+
+            missing = set(submission_ids) - set(s.id for s in submissions)
+            if len(missing) > 0:
+                logger.error("[submissions_scored] Received score request "
+                             "for unexistent submission ids %s.",
+                             ", ".join("%d" % i for i in sorted(missing)))
+
+            for submission in submissions:
+                self._submission_scored(submission)
+
+    def _submission_scored(self, submission):
+        """Send the score of a submission to the rankings, if needed.
+
+        submission (Submission): the submission that has been scored.
+
+        """
+        if submission.participation.hidden:
+            logger.info("[submission_scored] Score for submission %d "
+                        "not sent because the participation is hidden.",
+                        submission.id)
+            return
+
+        if not submission.official:
+            logger.info("[submission_scored] Score for submission %d "
+                        "not sent because the submission is not official.",
+                        submission.id)
+            return
+
+        # Update RWS.
+        for operation in self.operations_for_score(submission):
+            self.enqueue(operation)
 
     @rpc_method
     def submission_tokened(self, submission_id):
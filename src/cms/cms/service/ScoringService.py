@@ -27,8 +27,13 @@
 
 import logging
 
+from sqlalchemy import tuple_
+from sqlalchemy.orm import joinedload, subqueryload
+
 from cms import ServiceCoord, config
-from cms.db import SessionGen, Submission, Dataset, get_submission_results
+from cms.db import SessionGen, Evaluation, Submission, SubmissionResult, \
+    get_submission_results
+from cms.grading.scoring import update_task_score
 from cms.io import Executor, TriggeredService, rpc_method
 from cmscommon.datetime import make_datetime
 from .scoringoperations import ScoringOperation, get_operations
@@ -38,78 +43,125 @@ logger = logging.getLogger(__name__)
 
 
 class ScoringExecutor(Executor):
+
+    # Maximum number of operations executed in a single transaction.
+    MAX_OPERATIONS_PER_BATCH = 100
+
     def __init__(self, proxy_service):
-        super().__init__()
+        super().__init__(batch_executions=True)
         self.proxy_service = proxy_service
 
-    def execute(self, entry):
-        """Assign a score to a submission result.
+    def max_operations_per_batch(self):
+        """See Executor.max_operations_per_batch."""
+        return ScoringExecutor.MAX_OPERATIONS_PER_BATCH
+
+    def execute(self, entries):
+        """Assign a score to some submission results.
+
+        This is the core of ScoringService: here we retrieve the results
+        from the database, check if they are in the correct status,
+        instantiate their ScoreType, compute their score, store them
+        back in the database and tell ProxyService to update RWS if
+        needed.
 
-        This is the core of ScoringService: here we retrieve the result
-        from the database, check if it is in the correct status,
-        instantiate its ScoreType, compute its score, store it back in
-        the database and tell ProxyService to update RWS if needed.
+        The results, with their submissions and evaluations, are loaded
+        with a few queries and stored in a single transaction. An
+        operation that cannot be performed is logged and skipped,
+        without affecting the others.
 
-        entry (QueueEntry): entry containing the operation to perform.
+        entries ([QueueEntry]): entries containing the operations to
+            perform.
 
         """
-        operation = entry.item
+        keys = list(dict.fromkeys(
+            (entry.item.submission_id, entry.item.dataset_id)
+            for entry in entries))
         with SessionGen() as session:
-            # Obtain submission.
-            submission = Submission.get_from_id(operation.submission_id,
-                                                session)
-            if submission is None:
-                raise ValueError("Submission %d not found in the database." %
-                                 operation.submission_id)
-
-            # Obtain dataset.
-            dataset = Dataset.get_from_id(operation.dataset_id, session)
-            if dataset is None:
-                raise ValueError("Dataset %d not found in the database." %
-                                 operation.dataset_id)
-
-            # Obtain submission result.
-            submission_result = submission.get_result(dataset)
-
-            # It means it was not even compiled (for some reason).
-            if submission_result is None:
-                raise ValueError("Submission result %d(%d) was not found." %
-                                 (operation.submission_id,
-                                  operation.dataset_id))
-
-            # Check if it's ready to be scored.
-            if not submission_result.needs_scoring():
-                if submission_result.scored():
-                    logger.info("Submission result %d(%d) is already scored.",
-                                operation.submission_id, operation.dataset_id)
-                    return
-                else:
-                    raise ValueError("The state of the submission result "
-                                     "%d(%d) doesn't allow scoring." %
-                                     (operation.submission_id,
-                                      operation.dataset_id))
-
-            # Instantiate the score type.
-            score_type = dataset.score_type_object
-
-            # Compute score and fill it in the database.
-            submission_result.score, \
-                submission_result.score_details, \
-                submission_result.public_score, \
-                submission_result.public_score_details, \
-                submission_result.ranking_score_details = \
-                score_type.compute_score(submission_result)
-
-            # Store it.
-            session.commit()
-
-            # If dataset is the active one, update RWS.
-            if dataset is submission.task.active_dataset:
+            submission_results = {
+                (sr.submission_id, sr.dataset_id): sr
+                for sr in session.query(SubmissionResult)
+                .filter(tuple_(SubmissionResult.submission_id,
+                               SubmissionResult.dataset_id).in_(keys))
+                .options(joinedload(SubmissionResult.submission)
+                         .joinedload(Submission.task))
+                .options(joinedload(SubmissionResult.dataset))
+                .options(subqueryload(SubmissionResult.evaluations)
+                         .joinedload(Evaluation.testcase))
+                .all()}
+
+            # The score types, by dataset id.
+            score_types = dict()
+            # The submissions scored on their active dataset.
+            active = []
+            for submission_id, dataset_id in keys:
+                submission_result = submission_results.get(
+                    (submission_id, dataset_id))
+
+                # It means it was not even compiled (for some reason).
+                if submission_result is None:
+                    logger.error("Submission result %d(%d) was not found.",
+                                 submission_id, dataset_id)
+                    continue
+
+                # Check if it's ready to be scored.
+                if not submission_result.needs_scoring():
+                    if submission_result.scored():
+                        logger.info("Submission result %d(%d) is already "
+                                    "scored.", submission_id, dataset_id)
+                    else:
+                        logger.error("The state of the submission result "
+                                     "%d(%d) doesn't allow scoring.",
+                                     submission_id, dataset_id)
+                    continue
+
+                # Instantiate the score type, and compute the score.
+                dataset = submission_result.dataset
+                try:
+                    if dataset.id not in score_types:
+                        score_types[dataset.id] = dataset.score_type_object
+                    score = score_types[dataset.id].compute_score(
+                        submission_result)
+                except Exception:
+                    logger.error("Unexpected error when scoring submission "
+                                 "result %d(%d).", submission_id, dataset_id,
+                                 exc_info=True)
+                    continue
+
+                # Fill it in the database.
+                submission_result.score, \
+                    submission_result.score_details, \
+                    submission_result.public_score, \
+                    submission_result.public_score_details, \
+                    submission_result.ranking_score_details = score
+
+                submission = submission_result.submission
+                if dataset.id == submission.task.active_dataset_id:
+                    active.append(submission)
+
+            # Read what we need before the commit expires the objects.
+            now = make_datetime()
+            for submission in active:
                 logger.info(
                     "Submission scored %.1f seconds after submission",
-                    (make_datetime() - submission.timestamp).total_seconds())
-                self.proxy_service.submission_scored(
-                    submission_id=submission.id)
+                    (now - submission.timestamp).total_seconds())
+            submission_ids = [submission.id for submission in active]
+            task_scores = sorted(set(
+                (submission.participation_id, submission.task_id)
+                for submission in active))
+
+            # Store them.
+            session.commit()
+
+            # Update the stored scores of the participations on the
+            # tasks (always in the same order, since they lock the
+            # participations), and RWS.
+            if len(task_scores) > 0:
+                for participation_id, task_id in task_scores:
+                    update_task_score(session, participation_id, task_id)
+                session.commit()
+            if len(submission_ids) > 0:
+                self.proxy_service.submissions_scored(
+                    submission_ids=submission_ids)
 
 
 class ScoringService(TriggeredService):
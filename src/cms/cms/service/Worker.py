@@ -27,13 +27,18 @@
 import logging
 import time
 
+import gevent
 import gevent.lock
 
+from cms import config
 from cms.db import SessionGen, Contest, enumerate_files
 from cms.db.filecacher import FileCacher, TombstoneError
 from cms.grading import JobException
 from cms.grading.Job import CompilationJob, EvaluationJob, JobGroup
+from cms.grading.sandboxpool import SandboxPool
 from cms.grading.tasktypes import get_task_type
+from cms.grading.tasktypes.util import close_resident_checkers, \
+    set_sandbox_pool
 from cms.io import Service, rpc_method
 
 
@@ -51,11 +56,23 @@ class Worker(Service):
     JOB_TYPE_COMPILATION = "compile"
     JOB_TYPE_EVALUATION = "evaluate"
 
-    def __init__(self, shard, fake_worker_time=None):
+    def __init__(self, shard, fake_worker_time=None, slots=None):
         Service.__init__(self, shard)
+        # Number of job groups executed concurrently, each in its own
+        # sandboxes (see IsolateSandbox), all using the same cache.
+        self.slots = slots if slots is not None else config.worker_slots
         self.file_cacher = FileCacher(self)
-
-        self.work_lock = gevent.lock.RLock()
+        # Initialized sandboxes, shared by the slots.
+        self.sandbox_pool = None
+        if config.sandbox_pool_size > 0:
+            self.sandbox_pool = SandboxPool(self.file_cacher,
+                                            config.sandbox_pool_size)
+            set_sandbox_pool(self.sandbox_pool)
+
+        self.work_lock = gevent.lock.BoundedSemaphore(self.slots)
+        # Number of job groups received while all the slots were
+        # busy, waiting for their turn (see execute_job_group).
+        self._queued_job_groups = 0
         self._last_end_time = None
         self._total_free_time = 0
         self._total_busy_time = 0
@@ -63,6 +80,19 @@ class Worker(Service):
 
         self._fake_worker_time = fake_worker_time
 
+    def run(self):
+        """See Service.run.
+
+        The sandboxes kept by this worker are deleted on shutdown.
+
+        """
+        try:
+            return Service.run(self)
+        finally:
+            close_resident_checkers()
+            if self.sandbox_pool is not None:
+                self.sandbox_pool.close()
+
     @rpc_method
     def precache_files(self, contest_id):
         """RPC to ask the worker to precache of files in the contest.
@@ -89,11 +119,66 @@ class Worker(Service):
 
         logger.info("Precaching finished.")
 
+    @rpc_method
+    def get_execution_slots(self):
+        """Return how many job groups this worker executes at once.
+
+        return (int): the number of execution slots.
+
+        """
+        return self.slots
+
+    @rpc_method
+    def file_cacher_status(self):
+        """Return information about the local file cache.
+
+        return (dict): see FileCacher.get_cache_status.
+
+        """
+        return self.file_cacher.get_cache_status()
+
+    @rpc_method
+    def sandbox_pool_status(self):
+        """Return information about the pool of sandboxes.
+
+        return (dict|None): see SandboxPool.get_status, or None if the
+            pool is disabled.
+
+        """
+        if self.sandbox_pool is None:
+            return None
+        return self.sandbox_pool.get_status()
+
+    def _warm_cache(self, job_group):
+        """Load in the local cache the files needed by a job group.
+
+        job_group (JobGroup): a job group waiting to be executed.
+
+        """
+        digests = set()
+        for job in job_group.jobs:
+            for files in (job.files, job.managers, job.executables):
+                digests.update(f.digest for f in files.values())
+            if isinstance(job, EvaluationJob):
+                digests.update(d for d in (job.input, job.output)
+                               if d is not None)
+        for digest in digests:
+            try:
+                self.file_cacher.load(digest, if_needed=True)
+            except (KeyError, TombstoneError):
+                # The job will deal with it.
+                pass
+
     @rpc_method
     def execute_job_group(self, job_group_dict):
         """Receive a group of jobs in a list format and executes them one by
         one.
 
+        Up to self.slots groups are executed concurrently. If all the
+        slots are busy, ES is sending this one in advance (up to
+        config.worker_prefetch_depth groups): it waits for its turn,
+        while the files it needs are loaded in the cache.
+
         job_group_dict ({}): a JobGroup exported to dict.
 
         return ({}): the same JobGroup in dict format, but containing
@@ -103,7 +188,20 @@ class Worker(Service):
         start_time = time.time()
         job_group = JobGroup.import_from_dict(job_group_dict)
 
-        if self.work_lock.acquire(False):
+        acquired = self.work_lock.acquire(False)
+        if not acquired \
+                and self._queued_job_groups < config.worker_prefetch_depth:
+            self._queued_job_groups += 1
+            warming = gevent.spawn(self._warm_cache, job_group)
+            try:
+                acquired = self.work_lock.acquire()
+                warming.join()
+            finally:
+                self._queued_job_groups -= 1
+            # The time spent waiting for the turn is not busy time.
+            start_time = time.time()
+
+        if acquired:
             try:
                 logger.info("Starting job group.")
                 for job in job_group.jobs:
@@ -140,8 +238,9 @@ class Worker(Service):
 
         else:
             err_msg = "Request received, but declined because of acquired " \
-                "lock (Worker is busy executing another job, this should " \
-                "not happen: check if there are more than one ES running, " \
+                "lock (Worker is busy executing another job and has " \
+                "already received the following ones, this should not " \
+                "happen: check if there are more than one ES running, " \
                 "or for bugs in ES."
             logger.warning(err_msg)
             self._finalize(start_time)
@@ -167,8 +266,9 @@ class Worker(Service):
         busy_time = end_time - start_time
         free_time = 0.0
         if self._last_end_time is not None:
-            free_time = start_time - self._last_end_time
-        self._last_end_time = end_time
+            # Zero if other slots were busy in the meantime.
+            free_time = max(start_time - self._last_end_time, 0.0)
+        self._last_end_time = max(end_time, self._last_end_time or 0.0)
         self._total_busy_time += busy_time
         self._total_free_time += free_time
         ratio = self._total_busy_time * 100.0 / \
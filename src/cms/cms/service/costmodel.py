@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Estimates of how long operations take on the workers.
+
+EvaluationService uses them to decide how many operations to send to
+a worker at once: batches should be long enough to amortize the
+overhead of each request, but short enough not to keep the other
+workers idle while the queue is emptied.
+
+"""
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class CostModel:
+    """Exponentially-weighted estimates of costs and worker speeds.
+
+    The cost of an operation is the wall time it takes on the workers,
+    and is tracked per operation type, dataset (hence task type) and
+    testcase; operations never seen fall back to the average of their
+    dataset, then of their type, then to DEFAULT_COST. The speed of a
+    worker is the ratio between the estimated cost of the batches it
+    completes and their wall time, so it is above 1 for workers faster
+    than the average.
+
+    """
+
+    # Weight of each new observation in the averages.
+    SMOOTHING = 0.3
+
+    # Cost (in seconds) of operations about which nothing is known.
+    DEFAULT_COST = 1.0
+
+    # Lower bound (in seconds) on the observed wall time of a batch.
+    MIN_TIME = 0.001
+
+    def __init__(self):
+        # Type: {(str, int, str|None): float}
+        self._operation_cost = dict()
+        # Type: {(str, int): float}
+        self._dataset_cost = dict()
+        # Type: {str: float}
+        self._type_cost = dict()
+        # Type: {int: float}
+        self._speed = dict()
+
+    @staticmethod
+    def _keys(operation):
+        """Return the keys of the operation in the three levels of
+        estimates, from the most to the least specific.
+
+        """
+        return ((operation.type_, operation.dataset_id,
+                 operation.testcase_codename),
+                (operation.type_, operation.dataset_id),
+                operation.type_)
+
+    def _estimates(self):
+        return (self._operation_cost, self._dataset_cost, self._type_cost)
+
+    def get_cost(self, operation):
+        """Return the estimated cost of an operation.
+
+        operation (ESOperation): the operation.
+
+        return (float): its cost, in seconds.
+
+        """
+        for estimates, key in zip(self._estimates(), self._keys(operation)):
+            if key in estimates:
+                return estimates[key]
+        return CostModel.DEFAULT_COST
+
+    def is_known(self, operation):
+        """Return whether the cost of the operation has been observed.
+
+        operation (ESOperation): the operation.
+
+        return (bool): True if the cost comes from previous executions
+            of the same operation type on the same testcase.
+
+        """
+        return self._keys(operation)[0] in self._operation_cost
+
+    def get_speed(self, shard):
+        """Return the estimated speed of a worker.
+
+        shard (int): the shard of the worker.
+
+        return (float): its speed, 1.0 if unknown.
+
+        """
+        return self._speed.get(shard, 1.0)
+
+    def record(self, shard, operations, elapsed):
+        """Update the estimates with a batch completed by a worker.
+
+        The wall time of the batch is split among its operations in
+        proportion to their current estimates. The speed of the worker
+        is updated only if all the operations had been observed before,
+        as the default estimates would make it meaningless.
+
+        shard (int): the shard of the worker.
+        operations ([ESOperation]): the operations of the batch.
+        elapsed (float): the wall time of the batch, in seconds.
+
+        """
+        if len(operations) == 0:
+            return
+        elapsed = max(elapsed, CostModel.MIN_TIME)
+        costs = [self.get_cost(operation) for operation in operations]
+        total_cost = sum(costs)
+
+        if all(self.is_known(operation) for operation in operations):
+            self._speed[shard] = self._smooth(
+                self._speed.get(shard), total_cost / elapsed)
+
+        for operation, cost in zip(operations, costs):
+            observed = elapsed * cost / total_cost
+            for estimates, key in zip(self._estimates(),
+                                      self._keys(operation)):
+                estimates[key] = self._smooth(estimates.get(key), observed)
+
+        logger.debug("Worker %s completed %d operations in %.3f s "
+                     "(estimated %.3f s, speed now %.2f).", shard,
+                     len(operations), elapsed, total_cost,
+                     self.get_speed(shard))
+
+    @staticmethod
+    def _smooth(old, new):
+        if old is None:
+            return new
+        return old + CostModel.SMOOTHING * (new - old)
@@ -28,7 +28,7 @@ compute sets of operations to do.
 
 import logging
 
-from sqlalchemy import case, literal
+from sqlalchemy import case, func, literal
 
 from cms.db import Dataset, Evaluation, Submission, SubmissionResult, \
     Task, Testcase, UserTest, UserTestResult
@@ -283,12 +283,14 @@ def get_relevant_operations(level, submissions, dataset_id=None):
     return operations
 
 
-def get_submissions_operations(session, contest_id=None):
+def get_submissions_operations(session, contest_id=None, min_id=None):
     """Return all the operations to do for submissions in the contest.
 
     session (Session): the database session to use.
     contest_id (int|None): the contest for which we want the operations.
         If none, get operations for any contest.
+    min_id (int|None): if not None, only look at the submissions with at
+        least this id.
 
     return ([ESOperation, float, int]): a list of operation, timestamp
         and priority.
@@ -300,6 +302,8 @@ def get_submissions_operations(session, contest_id=None):
         contest_filter = literal(True)
     else:
         contest_filter = Task.contest_id == contest_id
+    if min_id is not None:
+        contest_filter = contest_filter & (Submission.id >= min_id)
 
     # Retrieve the compilation operations for all submissions without
     # the corresponding result for a dataset to judge. Since we have
@@ -390,12 +394,14 @@ def get_submissions_operations(session, contest_id=None):
     return operations
 
 
-def get_user_tests_operations(session, contest_id=None):
+def get_user_tests_operations(session, contest_id=None, min_id=None):
     """Return all the operations to do for user tests in the contest.
 
     session (Session): the database session to use.
     contest_id (int|None): the contest for which we want the operations.
         If none, get operations for any contest.
+    min_id (int|None): if not None, only look at the user tests with at
+        least this id.
 
     return ([ESOperation, float, int]): a list of operation, timestamp
         and priority.
@@ -407,6 +413,8 @@ def get_user_tests_operations(session, contest_id=None):
         contest_filter = literal(True)
     else:
         contest_filter = Task.contest_id == contest_id
+    if min_id is not None:
+        contest_filter = contest_filter & (UserTest.id >= min_id)
 
     # Retrieve the compilation operations for all user tests without
     # the corresponding result for a dataset to judge. Since we have
@@ -489,6 +497,30 @@ def get_user_tests_operations(session, contest_id=None):
     return operations
 
 
+def get_sweep_range(session, cls, contest_id=None, min_id=None):
+    """Return how many submissions or user tests a sweep looks at.
+
+    session (Session): the database session to use.
+    cls (type): Submission or UserTest.
+    contest_id (int|None): the contest of the objects, or None for all
+        contests.
+    min_id (int|None): if not None, only count the objects with at
+        least this id.
+
+    return ((int, int|None)): the number of objects, and their largest
+        id (None if there are none).
+
+    """
+    query = session.query(func.count(cls.id), func.max(cls.id))\
+        .join(cls.task)
+    if contest_id is not None:
+        query = query.filter(Task.contest_id == contest_id)
+    if min_id is not None:
+        query = query.filter(cls.id >= min_id)
+    count, max_id = query.one()
+    return count, max_id
+
+
 class ESOperation(QueueItem):
 
     COMPILATION = "compile"
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Persistent cache for the outcomes of evaluations.
+
+Some evaluations (e.g., those of output only tasks) depend only on the
+content of the files involved, which are identified by their digests.
+If the same files are evaluated again, there is no need to bother a
+Worker: the outcome and text obtained the first time can be reused.
+
+"""
+
+import json
+import logging
+import os
+import tempfile
+
+from cmscommon.digest import bytes_digest
+
+
+logger = logging.getLogger(__name__)
+
+
+class OutcomeCache:
+    """A directory-backed map from keys to (outcome, text) pairs.
+
+    Keys are tuples of strings (usually digests); each entry is stored
+    in a small JSON file named after the digest of the key, so the
+    cache survives restarts of the service using it.
+
+    The number of entries can be bounded: when it is exceeded, the
+    least recently used entries (according to the modification time of
+    their files, updated on each hit) are deleted.
+
+    """
+
+    # Fraction of the maximum number of entries left after deleting
+    # the least recently used ones, so that the directory is scanned
+    # only once in a while.
+    PURGE_TARGET = 0.9
+
+    def __init__(self, path, max_entries=None):
+        """Initialize the cache.
+
+        path (str): the directory holding the entries; it is created
+            if it doesn't exist.
+        max_entries (int|None): the maximum number of entries, None
+            meaning unbounded.
+
+        """
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+        self.max_entries = max_entries
+        self._entries = len(self._list_entries())
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def _list_entries(self):
+        """Return the names of the files of the entries.
+
+        return ([str]): the file names, relative to self.path.
+
+        """
+        return [filename for filename in os.listdir(self.path)
+                if not filename.startswith(".")]
+
+    def _entry_path(self, key):
+        """Return the path of the file storing the entry for key.
+
+        key ((str)): the key.
+
+        return (str): the path.
+
+        """
+        return os.path.join(
+            self.path, bytes_digest("\0".join(key).encode("utf-8")))
+
+    def get(self, key):
+        """Return the entry for the given key, if present.
+
+        key ((str)): the key.
+
+        return ((str, [str])|None): the outcome and text stored for
+            the key, or None if there is no such entry.
+
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError):
+            logger.warning("Unreadable outcome cache entry for %s, "
+                           "ignoring it.", key, exc_info=True)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        try:
+            # Mark the entry as recently used.
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return data["outcome"], data["text"]
+
+    def put(self, key, outcome, text):
+        """Store the entry for the given key.
+
+        The file is written in a temporary location and then renamed,
+        so that concurrent readers never see partial entries.
+
+        key ((str)): the key.
+        outcome (str): the outcome of the evaluation.
+        text ([str]): the text of the evaluation.
+
+        """
+        entry_path = self._entry_path(key)
+        try:
+            is_new = not os.path.exists(entry_path)
+            with tempfile.NamedTemporaryFile(
+                    "wt", encoding="utf-8", delete=False,
+                    prefix=".tmp.", dir=self.path) as f:
+                json.dump({"outcome": outcome, "text": text}, f)
+            os.rename(f.name, entry_path)
+        except OSError:
+            logger.warning("Couldn't store outcome cache entry for %s.",
+                           key, exc_info=True)
+            return
+        self.stores += 1
+        if is_new:
+            self._entries += 1
+        if self.max_entries is not None \
+                and self._entries > self.max_entries:
+            self._purge(int(self.max_entries * OutcomeCache.PURGE_TARGET))
+
+    def _purge(self, target):
+        """Delete the least recently used entries.
+
+        target (int): the number of entries to keep.
+
+        """
+        entries = []
+        for filename in self._list_entries():
+            try:
+                mtime = os.stat(os.path.join(self.path, filename)).st_mtime
+            except OSError:
+                continue
+            entries.append((mtime, filename))
+        entries.sort()
+
+        deleted = 0
+        for _, filename in entries[:max(len(entries) - target, 0)]:
+            try:
+                os.remove(os.path.join(self.path, filename))
+            except OSError:
+                continue
+            deleted += 1
+        self._entries = len(entries) - deleted
+        self.evictions += deleted
+        logger.info("Deleted %d entries from the outcome cache.", deleted)
+
+    def get_status(self):
+        """Return the counters of the cache.
+
+        return ({str: int}): number of entries, and number of hits,
+            misses, stores and evictions since the creation of this
+            object.
+
+        """
+        return {
+            "entries": self._entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
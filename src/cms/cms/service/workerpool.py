@@ -25,21 +25,42 @@
 
 """
 
+import functools
+import itertools
 import logging
 import random
+from collections import deque
 from datetime import timedelta
 
 import gevent.lock
 from gevent.event import Event
 
+from cms import config
 from cms.db import SessionGen
 from cms.grading.Job import JobGroup
 from cmscommon.datetime import make_datetime, make_timestamp
+from .costmodel import CostModel
 
 
 logger = logging.getLogger(__name__)
 
 
+class _AssignedGroup:
+    """A group of operations sent to a worker, waiting for its results.
+
+    """
+    def __init__(self, id_, operations):
+        """id_ (int): unique identifier of the group.
+        operations ([ESOperation]): the operations of the group.
+
+        """
+        self.id = id_
+        self.operations = operations
+        # When the worker started executing the group (None if it is
+        # still waiting for a free execution slot).
+        self.start_time = None
+
+
 class WorkerPool:
     """This class keeps the state of the workers attached to ES, and
     allow the ES to get a usable worker when it needs it.
@@ -66,10 +87,20 @@ class WorkerPool:
         # operations are also discarded because we already re-assigned
         # it. Ignore is true if the next results coming from the
         # worker should be discarded. Operations is the list of
-        # operations currently executing. Operations to ignore is the
-        # list of operations to ignore in the next batch of results.
+        # operations currently assigned (executing, or prefetched).
+        # Operations to ignore is the list of operations to ignore in
+        # the next batches of results. Slots is the number of groups
+        # the worker executes concurrently, as advertised by it. Groups
+        # are the batches sent to the worker, in order: the first ones
+        # (up to the number of slots) are executing, the others are
+        # prefetched and will be executed as soon as a slot is free.
+        # Start time is the earliest start time of the executing ones.
         # Type: {int: [ESOperation]}
         self._operations = {}
+        # Type: {int: int}
+        self._slots = {}
+        # Type: {int: deque([_AssignedGroup])}
+        self._groups = {}
         # Type: {int: [ESOperation]}
         self._operations_to_ignore = {}
         # Type: {int: Datetime|None}
@@ -95,12 +126,19 @@ class WorkerPool:
         # the operations lists.
         self._operation_lock = gevent.lock.RLock()
 
+        # Source of the identifiers of the groups sent to the workers.
+        self._group_ids = itertools.count()
+
         # Event set when there are workers available to take jobs. It
         # is only guaranteed that if a worker is available, then this
         # event is set. In other words, the fact that this event is
         # set does not mean that there is a worker available.
         self._workers_available_event = Event()
 
+        # Estimates of the cost of the operations and of the speed of
+        # the workers, updated with each completed batch.
+        self.cost_model = CostModel()
+
     def __len__(self):
         return len(self._worker)
 
@@ -118,23 +156,81 @@ class WorkerPool:
         with self._operation_lock:
             operations = self._operations[shard]
             self._operations[shard] = new_operation
+            self._groups[shard].clear()
             if isinstance(operations, list):
                 for operation in operations:
                     del self._operations_reverse[operation]
 
+    def _remove_group(self, shard, group):
+        """Remove a finished group from a worker that has more groups
+        assigned.
+
+        shard (int): the worker from which to remove operations.
+        group (_AssignedGroup): the group, already out of the groups
+            of the worker.
+
+        """
+        with self._operation_lock:
+            self._operations[shard] = [
+                operation for operation in self._operations[shard]
+                if operation not in group.operations]
+            for operation in group.operations:
+                del self._operations_reverse[operation]
+
+    def _capacity(self, shard):
+        """Return how many groups a worker can have assigned.
+
+        shard (int): shard of the worker.
+
+        return (int): the groups it executes concurrently, plus those
+            it can receive in advance.
+
+        """
+        return self._slots[shard] + config.worker_prefetch_depth
+
     def _add_operations(self, shard, operations):
-        """Assigns new operations to a currently inactive worker.
+        """Assigns new operations to a worker with a free execution
+        slot, or to a busy one that can prefetch them.
 
         shard (int): shard of the worker.
         operations ([ESOperation]) operations to assign to the worker.
 
+        return (_AssignedGroup): the group of the operations.
+
         """
-        if self._operations[shard] != WorkerPool.WORKER_INACTIVE:
+        if self._operations[shard] == WorkerPool.WORKER_DISABLED \
+                or len(self._groups[shard]) >= self._capacity(shard):
             raise ValueError("Shard %s is already doing an operation.", shard)
+        group = _AssignedGroup(next(self._group_ids), list(operations))
         with self._operation_lock:
-            self._operations[shard] = operations
+            if self._operations[shard] == WorkerPool.WORKER_INACTIVE:
+                self._operations[shard] = list(operations)
+            else:
+                self._operations[shard] = \
+                    self._operations[shard] + list(operations)
+            self._groups[shard].append(group)
             for operation in operations:
                 self._operations_reverse[operation] = shard
+        self._start_groups(shard)
+        return group
+
+    def _start_groups(self, shard):
+        """Mark as started the groups that got an execution slot.
+
+        The worker executes the groups in the order they are sent, so
+        those in the first slots positions are executing.
+
+        shard (int): shard of the worker.
+
+        """
+        now = make_datetime()
+        for group in itertools.islice(self._groups[shard],
+                                      self._slots[shard]):
+            if group.start_time is None:
+                group.start_time = now
+        start_times = [group.start_time for group in self._groups[shard]
+                       if group.start_time is not None]
+        self._start_time[shard] = min(start_times) if start_times else None
 
     def wait_for_workers(self):
         """Wait until a worker might be available."""
@@ -154,6 +250,8 @@ class WorkerPool:
 
         # And we fill all data.
         self._operations[shard] = WorkerPool.WORKER_INACTIVE
+        self._slots[shard] = 1
+        self._groups[shard] = deque()
         self._operations_to_ignore[shard] = []
         self._start_time[shard] = None
         self._schedule_disabling[shard] = False
@@ -164,7 +262,8 @@ class WorkerPool:
     def on_worker_connected(self, worker_coord):
         """To be called when a worker comes alive after being
         offline. We use this callback to instruct the worker to
-        precache all files concerning the contest.
+        precache all files concerning the contest, and to ask how many
+        execution slots it has.
 
         worker_coord (ServiceCoord): the coordinates of the worker
                                      that came online.
@@ -176,6 +275,8 @@ class WorkerPool:
             self._worker[shard].precache_files(
                 contest_id=self._service.contest_id
             )
+        self._worker[shard].get_execution_slots(
+            callback=self._execution_slots_received, plus=shard)
         # We don't requeue the operation, because a connection lost
         # does not invalidate a potential result given by the worker
         # (as the problem was the connection and not the machine on
@@ -183,54 +284,116 @@ class WorkerPool:
         # so we wake up the consumers.
         self._workers_available_event.set()
 
-    def acquire_worker(self, operations):
+    def _execution_slots_received(self, data, shard, error=None):
+        """Callback for the get_execution_slots RPC of a worker.
+
+        data (int): the number of execution slots of the worker.
+        shard (int): the shard of the worker.
+        error (str|None): the error, if any (for example, with workers
+            that do not know the RPC, that have one slot).
+
+        """
+        if error is not None:
+            logger.warning("Cannot get the execution slots of worker %s, "
+                           "assuming it has one: %s.", shard, error)
+            return
+        self._slots[shard] = max(int(data), 1)
+        logger.info("Worker %s has %d execution slots.",
+                    shard, self._slots[shard])
+        self._start_groups(shard)
+        self._workers_available_event.set()
+
+    def _find_available_worker(self):
+        """Return a worker that can receive operations.
+
+        return (int|None): the shard of a connected and enabled worker
+            that can receive another group, choosing randomly among
+            those with the most free execution slots (possibly none, if
+            all can only prefetch the group), or None.
+
+        """
+        pool = [shard for shard, operations in self._operations.items()
+                if operations != WorkerPool.WORKER_DISABLED
+                and self._worker[shard].connected
+                and not self._schedule_disabling[shard]
+                and not self._ignore[shard]
+                and len(self._groups[shard]) < self._capacity(shard)]
+        if len(pool) == 0:
+            return None
+        most = max(self._slots[shard] - len(self._groups[shard])
+                   for shard in pool)
+        return random.choice([shard for shard in pool
+                              if self._slots[shard]
+                              - len(self._groups[shard]) == most])
+
+    def acquire_worker(self, operations, jobs=None):
         """Tries to assign an operation to an available worker. If no workers
         are available then this returns None, otherwise this returns
         the chosen worker.
 
+        Workers with free execution slots are preferred (a worker with
+        many slots receives many groups at once); otherwise, the
+        operations are sent to a busy worker that will execute them
+        after its current ones (see config.worker_prefetch_depth).
+
         operations ([ESOperation]): the operations to assign to a worker.
+        jobs ({ESOperation: Job}|None): the jobs of the operations, if
+            they have already been built; otherwise (or if some are
+            missing) they are built from the database.
 
         return (int|None): None if no workers are available, the worker
             assigned to the operation otherwise.
 
         """
         # We look for an available worker.
-        try:
-            shard = self.find_worker(WorkerPool.WORKER_INACTIVE,
-                                     require_connection=True,
-                                     random_worker=True)
-        except LookupError:
+        shard = self._find_available_worker()
+        if shard is None:
             self._workers_available_event.clear()
             return None
 
         # Then we fill the info for future memory.
-        self._add_operations(shard, operations)
+        group = self._add_operations(shard, operations)
 
-        logger.debug("Worker %s acquired.", shard)
-        self._start_time[shard] = make_datetime()
+        if group.start_time is None:
+            # The timeout starts when the worker gets to these.
+            logger.debug("Worker %s acquired for prefetching.", shard)
+        else:
+            logger.debug("Worker %s acquired.", shard)
 
-        with SessionGen() as session:
-            job_group_dict = \
-                JobGroup.from_operations(operations, session).export_to_dict()
+        if jobs is not None \
+                and all(operation in jobs for operation in operations):
+            job_group_dict = JobGroup(
+                [jobs[operation] for operation in operations]).export_to_dict()
+        else:
+            with SessionGen() as session:
+                job_group_dict = JobGroup.from_operations(
+                    operations, session).export_to_dict()
 
         logger.info("Asking worker %s to %s.", shard,
                     ", ".join("`%s'" % operation for operation in operations))
 
         self._worker[shard].execute_job_group(
             job_group_dict=job_group_dict,
-            callback=self._service.action_finished,
+            callback=functools.partial(self._service.action_finished,
+                                       group_id=group.id),
             plus=shard)
         return shard
 
-    def release_worker(self, shard):
+    def release_worker(self, shard, group_id=None):
         """To be called by ES when it receives a notification that an
         operation finished.
 
+        The results are for one of the groups of operations sent to
+        the worker; if it had others waiting, it starts executing the
+        next one.
+
         Note: if the worker is scheduled to be disabled, then we
         disable it, and notify the ES to discard the outcome obtained
         by the worker.
 
         shard (int): the worker to release.
+        group_id (int|None): the identifier of the group the results
+            are for, or None for the first one.
 
         return (bool|[ESOperation]): if boolean, whether the result is
             to be ignored; if a list, the list of operation for which
@@ -249,23 +412,69 @@ class WorkerPool:
 
         ret = self._ignore[shard]
         with self._operation_lock:
-            to_ignore = self._operations_to_ignore[shard]
-            self._operations_to_ignore[shard] = []
-        self._start_time[shard] = None
+            groups = self._groups[shard]
+            group = groups[0] if group_id is None else next(
+                (group for group in groups if group.id == group_id), None)
+            if group is None:
+                # The group was already given up (e.g., the worker
+                # disconnected in the meantime).
+                logger.warning("Ignoring results from worker %s for a group "
+                               "that is not assigned to it.", shard)
+                return True
+            groups.remove(group)
+            to_ignore = [operation
+                         for operation in self._operations_to_ignore[shard]
+                         if operation in group.operations]
+            self._operations_to_ignore[shard] = [
+                operation for operation in self._operations_to_ignore[shard]
+                if operation not in group.operations]
+        if ret is False and self._worker[shard].connected \
+                and group.start_time is not None:
+            elapsed = make_datetime() - group.start_time
+            self.cost_model.record(shard, group.operations,
+                                   elapsed.total_seconds())
         self._ignore[shard] = False
         if self._schedule_disabling[shard]:
             self._remove_operations(shard, WorkerPool.WORKER_DISABLED)
             self._schedule_disabling[shard] = False
             logger.info("Worker %s released and disabled.", shard)
+        elif len(self._groups[shard]) > 0:
+            # The slot is taken by the next group right away.
+            self._remove_group(shard, group)
+            self._workers_available_event.set()
+            logger.debug("Worker %s released a slot.", shard)
         else:
             self._remove_operations(shard, WorkerPool.WORKER_INACTIVE)
             self._workers_available_event.set()
             logger.debug("Worker %s released.", shard)
+        self._start_groups(shard)
         if ret is False and to_ignore != []:
             return to_ignore
         else:
             return ret
 
+    def get_live_workers(self):
+        """Return the workers that can receive operations.
+
+        return ([int]): the shards of the workers that are connected
+            and enabled (possibly busy).
+
+        """
+        return [shard for shard in self._worker
+                if self._worker[shard].connected
+                and self._operations[shard] != WorkerPool.WORKER_DISABLED
+                and not self._schedule_disabling[shard]]
+
+    def get_live_slots(self):
+        """Return the number of execution slots that can receive
+        operations.
+
+        return (int): the total execution slots of the workers
+            returned by get_live_workers.
+
+        """
+        return sum(self._slots[shard] for shard in self.get_live_workers())
+
     def find_worker(self, operation, require_connection=False,
                     random_worker=False):
         """Return a worker whose assigned operation is operation.
@@ -335,6 +544,7 @@ class WorkerPool:
                                for operation in self._operations[shard]]
                 if isinstance(self._operations[shard], list)
                 else self._operations[shard],
+                'slots': self._slots[shard],
                 'start_time': s_time}
         return result
 
@@ -460,6 +670,11 @@ class WorkerPool:
                         WorkerPool.WORKER_INACTIVE]:
                 if not self._ignore[shard]:
                     lost_operations += self._operations[shard]
+                # All the groups sent to the worker are lost.
+                with self._operation_lock:
+                    self._groups[shard] = deque([_AssignedGroup(
+                        next(self._group_ids),
+                        list(self._operations[shard]))])
                 self.release_worker(shard)
 
         return lost_operations
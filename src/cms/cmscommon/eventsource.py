@@ -34,6 +34,11 @@ __all__ = [
     ]
 
 
+# The message asking a client to discard its data and load it again,
+# because some of the events it needs cannot be delivered.
+REINIT = b"event:reinit\n\n"
+
+
 def format_event(id_, event, data):
     """Format the parameters to be sent on an event stream.
 
@@ -85,12 +90,17 @@ class Publisher:
     queue, and pushing new messages to all these queues.
 
     """
-    def __init__(self, size):
+    def __init__(self, size, queue_size=None):
         """Instantiate a new publisher.
 
         size (int): the number of messages to keep in cache.
+        queue_size (int|None): the maximum number of messages waiting
+            to be sent to a subscriber; when it is exceeded, they are
+            dropped and the subscriber is asked to reinit. None means
+            unbounded.
 
         """
+        self._queue_size = queue_size
         # We use a deque as it's efficient to add messages to one end
         # and have the ones at the other end be dropped when the total
         # number exceeds the given limit.
@@ -114,8 +124,18 @@ class Publisher:
         # Put into cache.
         self._cache.append((key, msg))
         # Send to all subscribers.
-        for queue in self._sub_queues:
-            queue.put(msg)
+        for queue in list(self._sub_queues):
+            if self._queue_size is not None \
+                    and queue.qsize() >= self._queue_size:
+                # The client is not keeping up: rather than holding
+                # more and more messages for it, drop them all and let
+                # it start again from a fresh copy of the data.
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put(REINIT)
+                self._sub_queues.discard(queue)
+            else:
+                queue.put(msg)
 
     def get_subscriber(self, last_event_id=None):
         """Obtain a new subscriber.
@@ -144,7 +164,7 @@ class Publisher:
                         queue.put(msg)
             else:
                 # Some events may be missing. Ask to reinit.
-                queue.put(b"event:reinit\n\n")
+                queue.put(REINIT)
         # Store the queue and return a subscriber bound to it.
         self._sub_queues.add(queue)
         return Subscriber(queue)
@@ -167,6 +187,9 @@ class Subscriber:
 
         """
         self._queue = queue
+        # Whether the subscriber was asked to reinit, and thus won't
+        # receive any more messages.
+        self.closed = False
 
     def get(self):
         """Retrieve new messages.
@@ -187,7 +210,11 @@ class Subscriber:
         # Fetch all items that are immediately available.
         try:
             while True:
-                yield self._queue.get_nowait()
+                msg = self._queue.get_nowait()
+                yield msg
+                if msg == REINIT:
+                    self.closed = True
+                    return
         except Empty:
             pass
 
@@ -212,12 +239,13 @@ class EventSource:
     _PING_TIMEOUT = 15
 
     _CACHE_SIZE = 250
+    _QUEUE_SIZE = None
 
     def __init__(self):
         """Create an event source.
 
         """
-        self._pub = Publisher(self._CACHE_SIZE)
+        self._pub = Publisher(self._CACHE_SIZE, self._QUEUE_SIZE)
 
     def send(self, event, data):
         """Send the event to the stream.
@@ -390,5 +418,9 @@ class EventSource:
                 if one_shot and got_sth:
                     break
 
+                # The client has to start again anyway.
+                if sub.closed:
+                    break
+
         # An empty iterable tells the server not to send anything.
         return []
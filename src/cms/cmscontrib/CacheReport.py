@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""This script reports how much space the local file caches of the
+services take on this host, and how much a shared cache (see the
+shared_fs_cache option) saves or would save, since the same files are
+usually stored in the caches of many services.
+
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+from cms import config
+from cms.db.filecacher import FileCacher
+
+
+logger = logging.getLogger()
+
+
+def scan_cache_dir(path):
+    """Return the files in a local cache directory.
+
+    path (str): the directory of the cache.
+
+    return ({str: int}): the size of each file, by digest.
+
+    """
+    files = dict()
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.name.startswith(".") \
+                    or not entry.is_file(follow_symlinks=False):
+                continue
+            files[entry.name] = entry.stat(follow_symlinks=False).st_size
+    return files
+
+
+def scan_caches(cache_dir):
+    """Return the files in all the local caches in a directory.
+
+    cache_dir (str): the directory containing the caches.
+
+    return ({str: {str: int}}): for each cache, the size of each of its
+        files, by digest.
+
+    """
+    caches = dict()
+    for name in sorted(os.listdir(cache_dir)):
+        path = os.path.join(cache_dir, name)
+        if name.startswith("fs-cache-") and os.path.isdir(path):
+            caches[name] = scan_cache_dir(path)
+    return caches
+
+
+def summarize(caches):
+    """Compute the occupancy of some caches.
+
+    caches ({str: {str: int}}): as returned by scan_caches.
+
+    return (dict): the total number of files and bytes, the number of
+        distinct files and their bytes, and the bytes that sharing
+        saves (that is, the bytes of the repeated copies).
+
+    """
+    sizes = dict()
+    total_files = total_size = 0
+    for files in caches.values():
+        total_files += len(files)
+        total_size += sum(files.values())
+        sizes.update(files)
+    unique_size = sum(sizes.values())
+    return {
+        "files": total_files,
+        "size": total_size,
+        "unique_files": len(sizes),
+        "unique_size": unique_size,
+        "savings": total_size - unique_size,
+    }
+
+
+def format_size(size):
+    """Return a human-readable representation of a size in bytes."""
+    if size < 1024:
+        return "%d B" % size
+    for unit in ["KiB", "MiB", "GiB"]:
+        size /= 1024
+        if size < 1024:
+            break
+    return "%.1f %s" % (size, unit)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Report the occupancy of the local file caches.")
+    parser.add_argument(
+        "-d", "--cache-dir", action="store", type=str,
+        default=config.cache_dir,
+        help="directory containing the caches (default: %s)"
+        % config.cache_dir)
+    args = parser.parse_args()
+
+    try:
+        caches = scan_caches(args.cache_dir)
+    except OSError as error:
+        logger.critical("Cannot read %s: %s.", args.cache_dir, error)
+        return 1
+
+    for name, files in caches.items():
+        print("%-40s %8d files %12s" % (
+            name, len(files), format_size(sum(files.values()))))
+
+    private = dict((name, files) for name, files in caches.items()
+                   if name != FileCacher.SHARED_CACHE_DIRNAME)
+    summary = summarize(private)
+    print()
+    print("Private caches: %d files, %s; %d distinct files, %s." % (
+        summary["files"], format_size(summary["size"]),
+        summary["unique_files"], format_size(summary["unique_size"])))
+    print("A shared cache would save %s (%.1f%%)." % (
+        format_size(summary["savings"]),
+        100.0 * summary["savings"] / summary["size"]
+        if summary["size"] > 0 else 0.0))
+
+    shared = caches.get(FileCacher.SHARED_CACHE_DIRNAME)
+    if shared is not None:
+        print("Shared cache: %d files, %s." % (
+            len(shared), format_size(sum(shared.values()))))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Check that the scores stored in participation_task_scores match the
+ones computed from the submissions, and optionally fix them.
+
+"""
+
+import argparse
+import logging
+import sys
+
+from sqlalchemy.orm import joinedload
+
+from cms.db import SessionGen, Contest, ask_for_contest
+from cms.grading.scoring import get_task_score_rows, task_score, \
+    update_task_score
+
+
+logger = logging.getLogger(__name__)
+
+
+def check_task_scores(session, contest_id):
+    """Compare the stored scores of a contest with the computed ones.
+
+    session (Session): the database session.
+    contest_id (int): the id of the contest.
+
+    return ([(int, int, str)]): the participation id, the task id and
+        a description of each stored score that is missing, refers to
+        an old dataset or is wrong.
+
+    """
+    rows = get_task_score_rows(session, contest_id=contest_id)
+    contest = session.query(Contest)\
+        .filter(Contest.id == contest_id)\
+        .options(joinedload('participations'))\
+        .options(joinedload('participations.submissions'))\
+        .options(joinedload('participations.submissions.token'))\
+        .options(joinedload('participations.submissions.results'))\
+        .first()
+
+    problems = list()
+    for participation in contest.participations:
+        for task in contest.tasks:
+            key = (participation.id, task.id)
+            row = rows.get(key)
+            if row is None:
+                # Scores are only stored after a submission is scored.
+                if any(s.task is task for s in participation.submissions):
+                    problems.append(key + ("missing",))
+                continue
+            if row.dataset_id != task.active_dataset_id:
+                problems.append(key + ("computed on dataset %d, not %s" % (
+                    row.dataset_id, task.active_dataset_id),))
+                continue
+            for name, kwargs in [("score", {}),
+                                 ("public score", {"public": True}),
+                                 ("tokened score", {"only_tokened": True})]:
+                expected = task_score(participation, task, **kwargs)
+                stored = row.get_score(**kwargs)
+                if stored != expected:
+                    problems.append(key + ("%s is %r, should be %r" % (
+                        name, stored, expected),))
+    return problems
+
+
+def fix_task_scores(contest_id, problems):
+    """Compute again the scores that have problems and store them.
+
+    contest_id (int): the id of the contest.
+    problems ([(int, int, str)]): as returned by check_task_scores.
+
+    """
+    pairs = sorted(set((p_id, t_id) for p_id, t_id, _ in problems))
+    with SessionGen() as session:
+        for participation_id, task_id in pairs:
+            update_task_score(session, participation_id, task_id)
+            session.commit()
+    logger.info("Stored %d scores of contest %d.", len(pairs), contest_id)
+
+
+def main():
+    """Parse arguments and launch process.
+
+    return (int): exit code of the program.
+
+    """
+    parser = argparse.ArgumentParser(
+        description="Check the scores of participations on tasks stored "
+        "by ScoringService against the submissions.")
+    parser.add_argument("-c", "--contest-id", action="store", type=int,
+                        help="id of the contest to check")
+    parser.add_argument("-f", "--fix", action="store_true",
+                        help="compute again and store the wrong scores")
+    args = parser.parse_args()
+
+    if args.contest_id is None:
+        args.contest_id = ask_for_contest()
+
+    with SessionGen() as session:
+        problems = check_task_scores(session, args.contest_id)
+    for participation_id, task_id, problem in problems:
+        logger.warning("Participation %d, task %d: %s.",
+                       participation_id, task_id, problem)
+    logger.info("Found %d stored scores with problems.", len(problems))
+
+    if args.fix and len(problems) > 0:
+        fix_task_scores(args.contest_id, problems)
+        return 0
+    return 0 if len(problems) == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
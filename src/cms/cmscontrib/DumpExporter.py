@@ -31,19 +31,25 @@ import gevent.monkey
 gevent.monkey.patch_all()  # noqa
 
 import argparse
+import io
 import json
 import logging
 import os
 import sys
 import tarfile
 import tempfile
+import time
+from collections import deque
 from datetime import date
+from shutil import copyfileobj
+
+import gevent.pool
 
 from sqlalchemy.types import \
     Boolean, Integer, Float, String, Unicode, DateTime, Interval, Enum
 from sqlalchemy.dialects.postgresql import ARRAY, CIDR, JSONB
 
-from cms import rmtree, utf8_decoder
+from cms import utf8_decoder
 from cms.db import version as model_version, Codename, Filename, \
     FilenameSchema, FilenameSchemaArray, Digest, SessionGen, Contest, User, \
     Task, Submission, UserTest, SubmissionResult, UserTestResult, PrintJob, \
@@ -74,22 +80,28 @@ def get_archive_info(file_name):
            }
     if not (file_name.endswith(".tar.gz")
             or file_name.endswith(".tar.bz2")
+            or file_name.endswith(".tar.xz")
             or file_name.endswith(".tar")
             or file_name.endswith(".zip")):
         return ret
 
+    # Archives are written as streams (see ArchiveWriter).
     if file_name.endswith(".tar"):
         ret["basename"] = os.path.basename(file_name[:-4])
         ret["extension"] = "tar"
-        ret["write_mode"] = "w:"
+        ret["write_mode"] = "w|"
     elif file_name.endswith(".tar.gz"):
         ret["basename"] = os.path.basename(file_name[:-7])
         ret["extension"] = "tar.gz"
-        ret["write_mode"] = "w:gz"
+        ret["write_mode"] = "w|gz"
     elif file_name.endswith(".tar.bz2"):
         ret["basename"] = os.path.basename(file_name[:-8])
         ret["extension"] = "tar.bz2"
-        ret["write_mode"] = "w:bz2"
+        ret["write_mode"] = "w|bz2"
+    elif file_name.endswith(".tar.xz"):
+        ret["basename"] = os.path.basename(file_name[:-7])
+        ret["extension"] = "tar.xz"
+        ret["write_mode"] = "w|xz"
     elif file_name.endswith(".zip"):
         ret["basename"] = os.path.basename(file_name[:-4])
         ret["extension"] = "zip"
@@ -127,6 +139,86 @@ def encode_value(type_, value):
         raise RuntimeError("Unknown SQLAlchemy column type: %s" % type_)
 
 
+class DirectoryWriter:
+
+    """Write the files of an export to a directory.
+
+    """
+
+    def __init__(self, path):
+        """Create the writer.
+
+        path (string): the directory, which must exist.
+
+        """
+        self.path = path
+
+    def add_directory(self, name):
+        """Create a directory.
+
+        name (string): its path, relative to the export.
+
+        """
+        os.makedirs(os.path.join(self.path, name), exist_ok=True)
+
+    def add_fobj(self, name, fobj, size):
+        """Write a file with the content of a file-object.
+
+        name (string): its path, relative to the export.
+        fobj (fileobj): a readable binary file-object.
+        size (int): the number of bytes to read from fobj.
+
+        """
+        with open(os.path.join(self.path, name), "wb") as dst:
+            copyfileobj(fobj, dst)
+
+    def close(self):
+        pass
+
+
+class ArchiveWriter:
+
+    """Write the files of an export to a tar archive, as a stream.
+
+    Each file is appended to the (possibly compressed) archive as soon
+    as it is available, without storing the export on disk before.
+    Paths are relative to a root directory in the archive.
+
+    """
+
+    def __init__(self, path, mode, root):
+        """Create the archive.
+
+        path (string): the path of the archive, which must not exist.
+        mode (string): the mode for tarfile.open, one of "w|*".
+        root (string): the name of the root directory.
+
+        """
+        self.root = root
+        self.archive = tarfile.open(path, mode)
+        self.add_directory("")
+
+    def _tarinfo(self, name):
+        info = tarfile.TarInfo(os.path.join(self.root, name).rstrip("/"))
+        info.mtime = time.time()
+        return info
+
+    def add_directory(self, name):
+        info = self._tarinfo(name)
+        info.type = tarfile.DIRTYPE
+        info.mode = 0o755
+        self.archive.addfile(info)
+
+    def add_fobj(self, name, fobj, size):
+        info = self._tarinfo(name)
+        info.mode = 0o644
+        info.size = size
+        self.archive.addfile(info, fobj)
+
+    def close(self):
+        self.archive.close()
+
+
 class DumpExporter:
 
     """This service exports every data that CMS knows. The process of
@@ -134,9 +226,14 @@ class DumpExporter:
 
     """
 
+    # Name of the file, in the export directory, listing the digests
+    # of the files already exported, to resume an interrupted export.
+    PROGRESS_FILENAME = ".progress"
+
     def __init__(self, contest_ids, export_target,
                  dump_files, dump_model, skip_generated,
-                 skip_submissions, skip_user_tests, skip_print_jobs):
+                 skip_submissions, skip_user_tests, skip_print_jobs,
+                 jobs=4, resume=False):
         if contest_ids is None:
             with SessionGen() as session:
                 contests = session.query(Contest).all()
@@ -160,6 +257,9 @@ class DumpExporter:
         self.skip_user_tests = skip_user_tests
         self.skip_print_jobs = skip_print_jobs
         self.export_target = export_target
+        # Number of files retrieved at the same time.
+        self.jobs = jobs
+        self.resume = resume
 
         # If target is not provided, we use the contest's name.
         if len(export_target) == 0:
@@ -173,8 +273,10 @@ class DumpExporter:
         """Run the actual export code."""
         logger.info("Starting export.")
 
-        export_dir = self.export_target
         archive_info = get_archive_info(self.export_target)
+        # Type: {str}: digests of the files already exported.
+        done = set()
+        progress = None
 
         if archive_info["write_mode"] != "":
             # We are able to write to this archive.
@@ -182,85 +284,168 @@ class DumpExporter:
                 logger.critical("The specified file already exists, "
                                 "I won't overwrite it.")
                 return False
-            export_dir = os.path.join(tempfile.mkdtemp(),
-                                      archive_info["basename"])
+            if self.resume:
+                logger.critical("Cannot resume an export to an archive.")
+                return False
+            writer = ArchiveWriter(self.export_target,
+                                   archive_info["write_mode"],
+                                   archive_info["basename"])
+
+        else:
+            export_dir = self.export_target
+            progress_path = os.path.join(export_dir, self.PROGRESS_FILENAME)
+            if self.resume and os.path.isdir(export_dir):
+                done = self.load_progress(progress_path)
+                logger.info("Resuming export, %d files already exported.",
+                            len(done))
+            else:
+                logger.info("Creating dir structure.")
+                try:
+                    os.mkdir(export_dir)
+                except OSError:
+                    logger.critical("The specified directory already "
+                                    "exists, I won't overwrite it.")
+                    return False
+            writer = DirectoryWriter(export_dir)
+            progress = open(progress_path, "at", encoding="utf-8")
 
-        logger.info("Creating dir structure.")
         try:
-            os.mkdir(export_dir)
-        except OSError:
-            logger.critical("The specified directory already exists, "
-                            "I won't overwrite it.")
-            return False
+            writer.add_directory("files")
+            writer.add_directory("descriptions")
 
-        files_dir = os.path.join(export_dir, "files")
-        descr_dir = os.path.join(export_dir, "descriptions")
-        os.mkdir(files_dir)
-        os.mkdir(descr_dir)
-
-        with SessionGen() as session:
-            # Export files.
-            logger.info("Exporting files.")
-            if self.dump_files:
-                for contest_id in self.contests_ids:
-                    contest = Contest.get_from_id(contest_id, session)
-                    files = enumerate_files(
-                        session, contest,
-                        skip_submissions=self.skip_submissions,
-                        skip_user_tests=self.skip_user_tests,
-                        skip_print_jobs=self.skip_print_jobs,
-                        skip_generated=self.skip_generated)
-                    for file_ in files:
-                        if not self.safe_get_file(file_,
-                                                  os.path.join(files_dir,
-                                                               file_),
-                                                  os.path.join(descr_dir,
-                                                               file_)):
-                            return False
-
-            # Export data in JSON format.
-            if self.dump_model:
-                logger.info("Exporting data to a JSON file.")
-
-                # We use strings because they'll be the keys of a JSON
-                # object
-                self.ids = {}
-                self.queue = []
-
-                data = dict()
-
-                for cls, lst in [(Contest, self.contests_ids),
-                                 (User, self.users_ids),
-                                 (Task, self.tasks_ids)]:
-                    for i in lst:
-                        obj = cls.get_from_id(i, session)
-                        self.get_id(obj)
-
-                # Specify the "root" of the data graph
-                data["_objects"] = list(self.ids.values())
-
-                while len(self.queue) > 0:
-                    obj = self.queue.pop(0)
-                    data[self.ids[obj.sa_identity_key]] = \
-                        self.export_object(obj)
-
-                data["_version"] = model_version
-
-                destination = os.path.join(export_dir, "contest.json")
-                with open(destination, "wt", encoding="utf-8") as fout:
-                    json.dump(data, fout, indent=4, sort_keys=True)
-
-        # If the admin requested export to file, we do that.
-        if archive_info["write_mode"] != "":
-            with tarfile.open(self.export_target,
-                              archive_info["write_mode"]) as archive:
-                archive.add(export_dir, arcname=archive_info["basename"])
-            rmtree(export_dir)
+            with SessionGen() as session:
+                # Export files.
+                logger.info("Exporting files.")
+                if self.dump_files:
+                    if not self.export_files(session, writer, done,
+                                             progress):
+                        return False
+
+                # Export data in JSON format.
+                if self.dump_model:
+                    logger.info("Exporting data to a JSON file.")
+                    # The archive needs the size of the file before
+                    # its content, so it is written to disk first.
+                    with tempfile.TemporaryFile(
+                            "w+t", encoding="utf-8") as fout:
+                        self.export_model(session, fout)
+                        fout.flush()
+                        size = fout.buffer.tell()
+                        fout.buffer.seek(0)
+                        writer.add_fobj("contest.json", fout.buffer, size)
+        finally:
+            writer.close()
+            if progress is not None:
+                progress.close()
+
+        if progress is not None:
+            os.remove(progress_path)
 
         logger.info("Export finished.")
 
         return True
 
+    @staticmethod
+    def load_progress(path):
+        """Return the digests listed in a progress file.
+
+        path (string): the path of the progress file.
+
+        return ({str}): the digests (none if the file does not exist).
+
+        """
+        try:
+            with open(path, "rt", encoding="utf-8") as fin:
+                # A line not terminated was being written when the
+                # export was interrupted.
+                return set(line[:-1] for line in fin if line.endswith("\n"))
+        except FileNotFoundError:
+            return set()
+
+    def export_files(self, session, writer, done, progress=None):
+        """Export the files of the contests.
+
+        The files are retrieved from the file cacher by a pool of
+        self.jobs greenlets, and written as they become available.
+
+        session (Session): the database session.
+        writer (DirectoryWriter|ArchiveWriter): where to write them.
+        done ({str}): digests of the files not to export again.
+        progress (fileobj|None): where to append the digests of the
+            files, once exported.
+
+        return (bool): True if all ok, False if something wrong.
+
+        """
+        # Type: [str]: the digests to export, in a stable order.
+        digests = list()
+        seen = set()
+        for contest_id in self.contests_ids:
+            contest = Contest.get_from_id(contest_id, session)
+            files = enumerate_files(
+                session, contest,
+                skip_submissions=self.skip_submissions,
+                skip_user_tests=self.skip_user_tests,
+                skip_print_jobs=self.skip_print_jobs,
+                skip_generated=self.skip_generated)
+            digests.extend(sorted(files - seen))
+            seen |= files
+
+        logger.info("Exporting %d files (%d already exported).",
+                    len(seen - done), len(seen & done))
+        digests = [digest for digest in digests if digest not in done]
+        pool = gevent.pool.Pool(self.jobs)
+        try:
+            for digest, ok in pool.imap_unordered(self.safe_load_file,
+                                                  digests):
+                if not ok or not self.write_file(writer, digest):
+                    return False
+                if progress is not None:
+                    progress.write("%s\n" % digest)
+                    progress.flush()
+        finally:
+            pool.kill()
+        return True
+
+    def export_model(self, session, fout):
+        """Write the data of the contests as a JSON object.
+
+        The object is written while the data graph is visited, one
+        exported object at a time, without keeping them all in memory.
+
+        session (Session): the database session.
+        fout (fileobj): a writable text file-object.
+
+        """
+        # We use strings because they'll be the keys of a JSON
+        # object
+        self.ids = {}
+        self.queue = deque()
+
+        for cls, lst in [(Contest, self.contests_ids),
+                         (User, self.users_ids),
+                         (Task, self.tasks_ids)]:
+            for i in lst:
+                obj = cls.get_from_id(i, session)
+                self.get_id(obj)
+
+        fout.write("{\n")
+        # Specify the "root" of the data graph
+        fout.write('    "_objects": %s,\n' % json.dumps(
+            list(self.ids.values())))
+        fout.write('    "_version": %d' % model_version)
+
+        while len(self.queue) > 0:
+            obj = self.queue.popleft()
+            # Strings in the JSON encoding cannot contain newlines, so
+            # this only indents the lines of the encoded object.
+            fout.write(",\n    %s: %s" % (
+                json.dumps(self.ids[obj.sa_identity_key]),
+                json.dumps(self.export_object(obj), indent=4,
+                           sort_keys=True).replace("\n", "\n    ")))
+
+        fout.write("\n}\n")
+
     def get_id(self, obj):
         obj_key = obj.sa_identity_key
         if obj_key not in self.ids:
@@ -342,40 +527,58 @@ class DumpExporter:
 
         return data
 
-    def safe_get_file(self, digest, path, descr_path=None):
+    def safe_load_file(self, digest):
 
-        """Get file from FileCacher ensuring that the digest is
-        correct.
+        """Load a file in the local cache of the FileCacher, ensuring
+        that the digest is correct.
 
         digest (string): the digest of the file to retrieve.
-        path (string): the path where to save the file.
-        descr_path (string): the path where to save the description.
 
-        return (bool): True if all ok, False if something wrong.
+        return ((string, bool)): the digest, and True if all ok, False
+            if something wrong.
 
         """
 
-        # TODO - Probably this method could be merged in FileCacher
-
         # First get the file
         try:
-            self.file_cacher.get_file_to_path(digest, path)
+            path = self.file_cacher.get_cached_file_path(digest)
         except Exception:
             logger.error("File %s could not retrieved from file server.",
                          digest, exc_info=True)
-            return False
+            return digest, False
 
         # Then check the digest
         calc_digest = path_digest(path)
         if digest != calc_digest:
             logger.critical("File %s has wrong hash %s.",
                             digest, calc_digest)
-            return False
+            return digest, False
+
+        return digest, True
+
+    def write_file(self, writer, digest):
+
+        """Write a file, and its description, to the export.
+
+        writer (DirectoryWriter|ArchiveWriter): where to write it.
+        digest (string): the digest of the file, loaded by
+            safe_load_file.
 
-        # If applicable, retrieve also the description
-        if descr_path is not None:
-            with open(descr_path, 'wt', encoding='utf-8') as fout:
-                fout.write(self.file_cacher.describe(digest))
+        return (bool): True if all ok, False if something wrong.
+
+        """
+
+        try:
+            with self.file_cacher.get_file(digest) as fobj:
+                writer.add_fobj(os.path.join("files", digest), fobj,
+                                os.fstat(fobj.fileno()).st_size)
+            description = self.file_cacher.describe(digest).encode("utf-8")
+        except Exception:
+            logger.error("File %s could not retrieved from file server.",
+                         digest, exc_info=True)
+            return False
+        writer.add_fobj(os.path.join("descriptions", digest),
+                        io.BytesIO(description), len(description))
 
         return True
 
@@ -399,6 +602,11 @@ def main():
                         help="don't export user tests")
     parser.add_argument("-P", "--no-print-jobs", action="store_true",
                         help="don't export print jobs")
+    parser.add_argument("-j", "--jobs", action="store", type=int, default=4,
+                        help="number of files to retrieve at the same time")
+    parser.add_argument("-r", "--resume", action="store_true",
+                        help="resume an interrupted export to a directory, "
+                             "skipping the files already exported")
     parser.add_argument("export_target", action="store",
                         type=utf8_decoder, nargs='?', default="",
                         help="target directory or archive for export")
@@ -412,7 +620,9 @@ def main():
                             skip_generated=args.no_generated,
                             skip_submissions=args.no_submissions,
                             skip_user_tests=args.no_user_tests,
-                            skip_print_jobs=args.no_print_jobs)
+                            skip_print_jobs=args.no_print_jobs,
+                            jobs=args.jobs,
+                            resume=args.resume)
     success = exporter.do_export()
     return 0 if success is True else 1
 
@@ -41,6 +41,8 @@ import os
 import sys
 from datetime import datetime, timedelta
 
+import gevent.pool
+
 from sqlalchemy.types import \
     Boolean, Integer, Float, String, Unicode, DateTime, Interval, Enum
 from sqlalchemy.dialects.postgresql import ARRAY, CIDR, JSONB
@@ -126,9 +128,15 @@ class DumpImporter:
 
     """
 
+    # Suffix of the path of the file, next to the import source,
+    # recording the progress of the import, to resume it if it is
+    # interrupted.
+    PROGRESS_SUFFIX = ".progress"
+
     def __init__(self, drop, import_source,
                  load_files, load_model, skip_generated,
-                 skip_submissions, skip_user_tests, skip_print_jobs):
+                 skip_submissions, skip_user_tests, skip_print_jobs,
+                 jobs=4, resume=False):
         self.drop = drop
         self.load_files = load_files
         self.load_model = load_model
@@ -139,6 +147,9 @@ class DumpImporter:
 
         self.import_source = import_source
         self.import_dir = import_source
+        # Number of files stored at the same time.
+        self.jobs = jobs
+        self.resume = resume
 
         self.file_cacher = FileCacher()
 
@@ -160,7 +171,20 @@ class DumpImporter:
 
             self.import_dir = os.path.join(self.import_dir, file_names[0])
 
-        if self.drop:
+        progress_path = self.import_source.rstrip(os.sep) \
+            + self.PROGRESS_SUFFIX
+        if self.resume:
+            imported_contest_id, done = self.load_progress(progress_path)
+            logger.info("Resuming import, %d files already imported.",
+                        len(done))
+        else:
+            imported_contest_id, done = None, set()
+        model_done = imported_contest_id is not None
+
+        if self.drop and model_done:
+            logger.info("Not dropping the database, since the data has "
+                        "already been imported.")
+        elif self.drop:
             logger.info("Dropping and recreating the database.")
             try:
                 if not (drop_db() and init_db()):
@@ -172,10 +196,24 @@ class DumpImporter:
                 logger.critical("Unable to access DB.", exc_info=True)
                 return False
 
-        with SessionGen() as session:
+        with open(progress_path, "at" if self.resume else "wt",
+                  encoding="utf-8") as progress, \
+                SessionGen() as session:
 
             # Import the contest in JSON format.
-            if self.load_model:
+            if self.load_model and model_done:
+                logger.info("Skipping the contest, already imported.")
+                contest_id = imported_contest_id
+                contest_files = set()
+                for id_ in contest_id:
+                    contest_files |= enumerate_files(
+                        session, Contest.get_from_id(id_, session),
+                        skip_submissions=self.skip_submissions,
+                        skip_user_tests=self.skip_user_tests,
+                        skip_print_jobs=self.skip_print_jobs,
+                        skip_generated=self.skip_generated)
+
+            elif self.load_model:
                 logger.info("Importing the contest from a JSON file.")
 
                 with open(os.path.join(self.import_dir,
@@ -280,6 +318,9 @@ class DumpImporter:
                             skip_generated=self.skip_generated)
 
                 session.commit()
+                progress.write("%s\n" % json.dumps(
+                    {"contest_ids": contest_id}))
+                progress.flush()
             else:
                 contest_id = None
                 contest_files = None
@@ -316,15 +357,34 @@ class DumpImporter:
                 if contest_files is not None:
                     files &= contest_files
 
-                for digest in files:
-                    file_ = os.path.join(files_dir, digest)
-                    desc = os.path.join(descr_dir, digest)
-                    if not self.safe_put_file(file_, desc):
-                        logger.critical("Unable to put file `%s' in the DB. "
-                                        "Aborting. Please remove the contest "
-                                        "from the database.", file_)
-                        # TODO: remove contest from the database.
-                        return False
+                logger.info("Importing %d files (%d already imported).",
+                            len(files - done), len(files & done))
+
+                def put_file(digest):
+                    return digest, self.safe_put_file(
+                        os.path.join(files_dir, digest),
+                        os.path.join(descr_dir, digest))
+
+                pool = gevent.pool.Pool(self.jobs)
+                try:
+                    for digest, ok in pool.imap_unordered(
+                            put_file, sorted(files - done)):
+                        if not ok:
+                            logger.critical(
+                                "Unable to put file `%s' in the DB. "
+                                "Aborting. Please remove the contest from "
+                                "the database, or fix the problem and "
+                                "resume the import.",
+                                os.path.join(files_dir, digest))
+                            # TODO: remove contest from the database.
+                            return False
+                        progress.write("%s\n" % json.dumps(
+                            {"digest": digest}))
+                        progress.flush()
+                finally:
+                    pool.kill()
+
+        os.remove(progress_path)
 
         # Clean up, if an archive was used
         if archive is not None:
@@ -338,6 +398,35 @@ class DumpImporter:
 
         return True
 
+    @staticmethod
+    def load_progress(path):
+        """Return what an interrupted import already did.
+
+        path (string): the path of the progress file.
+
+        return (([int]|None, {str})): the ids of the contests imported
+            (None if the data was not imported yet) and the digests of
+            the files already stored.
+
+        """
+        contest_id = None
+        done = set()
+        try:
+            with open(path, "rt", encoding="utf-8") as fin:
+                for line in fin:
+                    # A line not terminated was being written when the
+                    # import was interrupted.
+                    if not line.endswith("\n"):
+                        break
+                    entry = json.loads(line)
+                    if "contest_ids" in entry:
+                        contest_id = entry["contest_ids"]
+                    else:
+                        done.add(entry["digest"])
+        except FileNotFoundError:
+            pass
+        return contest_id, done
+
     def import_object(self, data):
 
         """Import objects from the given data (without relationships).
@@ -474,6 +563,11 @@ def main():
                         help="don't import user tests")
     parser.add_argument("-P", "--no-print-jobs", action="store_true",
                         help="don't import print jobs")
+    parser.add_argument("-j", "--jobs", action="store", type=int, default=4,
+                        help="number of files to store at the same time")
+    parser.add_argument("-r", "--resume", action="store_true",
+                        help="resume an interrupted import, skipping the "
+                             "data and files already imported")
     parser.add_argument("import_source", action="store", type=utf8_decoder,
                         help="source directory or compressed file")
 
@@ -486,7 +580,9 @@ def main():
                             skip_generated=args.no_generated,
                             skip_submissions=args.no_submissions,
                             skip_user_tests=args.no_user_tests,
-                            skip_print_jobs=args.no_print_jobs)
+                            skip_print_jobs=args.no_print_jobs,
+                            jobs=args.jobs,
+                            resume=args.resume)
     success = importer.do_import()
     return 0 if success is True else 1
 
@@ -98,6 +98,10 @@ class ContestImporter:
             contest.start = datetime.datetime(1970, 1, 1)
             contest.stop = datetime.datetime(1970, 1, 1)
 
+        # The loaders of the tasks fetched by _task_to_db, to notify
+        # once they are in the database.
+        self._task_loaders = []
+
         with SessionGen() as session:
             try:
                 contest = self._contest_to_db(
@@ -124,6 +128,8 @@ class ContestImporter:
             session.commit()
             contest_id = contest.id
 
+        for task_loader in self._task_loaders:
+            task_loader.task_imported()
         logger.info("Import finished (new contest id: %s).", contest_id)
         return True
 
@@ -204,6 +210,7 @@ class ContestImporter:
                     "Could not import task \"%s\"." % taskname)
 
             session.add(task)
+            self._task_loaders.append(task_loader)
 
         elif not task_loader.task_has_changed():
             # Task is in the DB and has not changed, nothing to do.
@@ -219,6 +226,7 @@ class ContestImporter:
                     "Could not reimport task \"%s\"." % taskname)
             logger.info("Task \"%s\" data has changed, updating it.", taskname)
             update_task(task, new_task, get_statements=not self.no_statements)
+            self._task_loaders.append(task_loader)
 
         else:
             # Task is in the DB, has changed, and the user didn't ask to update
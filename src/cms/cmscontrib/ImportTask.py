@@ -115,6 +115,7 @@ class TaskImporter:
             session.commit()
             task_id = task.id
 
+        self.loader.task_imported()
         logger.info("Import finished (new task id: %s).", task_id)
         return True
 
@@ -112,6 +112,17 @@ class TaskLoader(BaseLoader):
         """
         pass
 
+    def task_imported(self):
+        """Notify that the task returned by get_task() has been stored.
+
+        This is called after the task has been committed to the
+        database, so that a TaskLoader recording the state of the last
+        import (see task_has_changed()) does so only if the import
+        succeeded. The default implementation does nothing.
+
+        """
+        pass
+
 
 class UserLoader(BaseLoader):
     """Base class for deriving user loaders.
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""A class to update a dump created by CMS.
+
+Used by DumpImporter and DumpUpdater.
+
+This updater does nothing: version 43 adds the participation_task_scores
+table, which holds data computed from the submissions and is never
+dumped (it is filled again by ScoringService, or by cmsCheckTaskScores
+--fix). To add the table to an existing database run cmsInitDB, which
+only creates the missing tables.
+
+"""
+
+
+class Updater:
+
+    def __init__(self, data):
+        assert data["_version"] == 42
+        self.objs = data
+
+    def run(self):
+        return self.objs
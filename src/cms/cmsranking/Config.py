@@ -56,6 +56,19 @@ class Config:
 
         # Buffers
         self.buffer_size = 100  # Needs to be strictly positive.
+        # Max number of events waiting to be sent to a client before it
+        # is asked to reload its data (None means unbounded).
+        self.queue_size = 1000
+        # Seconds during which score changes are collected to be sent
+        # together (0 sends each of them at once).
+        self.score_window = 0.5
+
+        # Storage.
+        # How the data is kept on disk: "directory" (a file per entity)
+        # or "journal" (a snapshot plus a log of the changes; data in
+        # the "directory" format is migrated at startup, once and for
+        # all).
+        self.storage = "directory"
 
         # File system.
         # TODO: move to cmscommon as it is used both here and in cms/conf.py
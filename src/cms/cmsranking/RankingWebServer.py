@@ -43,6 +43,8 @@ from cmsranking.Config import Config
 from cmsranking.Contest import Contest
 from cmsranking.Entity import InvalidData
 from cmsranking.Scoring import ScoringStore
+from cmsranking.Snapshot import Snapshot
+from cmsranking.Storage import DirectoryStorage, JournalStorage
 from cmsranking.Store import Store
 from cmsranking.Subchange import Subchange
 from cmsranking.Submission import Submission
@@ -238,13 +240,131 @@ class StoreHandler:
         response.status_code = 204
 
 
+class BulkHandler:
+    """Create or update entities of several types in one request.
+
+    The request body maps the name of each type (as in the URLs of the
+    StoreHandlers, e.g. "users") to a dictionary of entities, as PUT
+    to that StoreHandler's list. The types are merged in an order that
+    respects their dependencies.
+
+    """
+
+    def __init__(self, stores, username, password, realm_name):
+        self.stores = stores
+        self.username = username
+        self.password = password
+        self.realm_name = realm_name
+
+        # The types that can be sent, in the order they are merged.
+        self.types = [
+            ("contests", stores["contest"]),
+            ("tasks", stores["task"]),
+            ("teams", stores["team"]),
+            ("users", stores["user"]),
+            ("submissions", stores["submission"]),
+            ("subchanges", stores["subchange"]),
+        ]
+
+        self.router = Map([
+            Rule("/", methods=["PUT"], endpoint="put"),
+        ], encoding_errors="strict")
+
+    def __call__(self, environ, start_response):
+        return self.wsgi_app(environ, start_response)
+
+    @responder
+    def wsgi_app(self, environ, start_response):
+        route = self.router.bind_to_environ(environ)
+        try:
+            endpoint, args = route.match()
+        except HTTPException as exc:
+            return exc
+
+        assert endpoint == "put"
+
+        request = Request(environ)
+        request.encoding_errors = "strict"
+
+        response = Response()
+
+        try:
+            self.put(request, response)
+        except HTTPException as exc:
+            return exc
+
+        return response
+
+    def authorized(self, request):
+        return request.authorization is not None and \
+            request.authorization.type == "basic" and \
+            request.authorization.username == self.username and \
+            request.authorization.password == self.password
+
+    def put(self, request, response):
+        if not self.authorized(request):
+            logger.info("Unauthorized request.",
+                        extra={'location': request.url,
+                               'details': repr(request.authorization)})
+            raise CustomUnauthorized(self.realm_name)
+        if request.mimetype != "application/json":
+            logger.warning("Unsupported MIME type.",
+                           extra={'location': request.url,
+                                  'details': request.mimetype})
+            raise UnsupportedMediaType()
+
+        try:
+            data = json.load(request.stream)
+        except (TypeError, ValueError):
+            logger.warning("Wrong JSON.",
+                           extra={'location': request.url})
+            raise BadRequest()
+
+        if not isinstance(data, dict) or \
+                not set(data.keys()) <= set(name for name, _ in self.types):
+            logger.warning("Invalid data: unknown types.",
+                           extra={'location': request.url,
+                                  'details': pprint.pformat(data)})
+            raise BadRequest()
+
+        # Types merged before an error stay merged: the sender is
+        # expected to send all the data again.
+        for name, store in self.types:
+            if name not in data:
+                continue
+            try:
+                store.merge_list(data[name])
+            except InvalidData as err:
+                logger.warning("Invalid data: [%s] %s" % (name, err),
+                               exc_info=False,
+                               extra={'location': request.url,
+                                      'details': pprint.pformat(data[name])})
+                raise BadRequest()
+
+        response.status_code = 204
+
+
 class DataWatcher(EventSource):
-    """Receive the messages from the entities store and redirect them."""
+    """Receive the messages from the entities store and redirect them.
 
-    def __init__(self, stores, buffer_size):
+    Score changes are held for score_window seconds: all those for the
+    same user and task in that time are sent as one, with the latest
+    value, and all of them together in a single score_batch event.
+
+    """
+
+    def __init__(self, stores, buffer_size, queue_size=None,
+                 score_window=0.0):
         self._CACHE_SIZE = buffer_size
+        self._QUEUE_SIZE = queue_size
         EventSource.__init__(self)
 
+        self._score_window = score_window
+        # The score changes not sent yet, by (user, task).
+        # Type: {(str, str): float}
+        self._pending_scores = dict()
+        self._flusher = None
+
         stores["contest"].add_create_callback(
             functools.partial(self.callback, "contest", "create"))
         stores["contest"].add_update_callback(
@@ -276,11 +396,39 @@ class DataWatcher(EventSource):
         stores["scoring"].add_score_callback(self.score_callback)
 
     def callback(self, entity, event, key, *args):
+        # Clients must see the scores in the order they changed with
+        # respect to the entities they refer to.
+        self.flush_scores()
         self.send(entity, "%s %s" % (event, key))
 
     def score_callback(self, user, task, score):
+        if self._score_window <= 0:
+            # FIXME Use score_precision.
+            self.send("score", "%s %s %0.2f" % (user, task, score))
+            return
+        # Re-inserting moves the key last, keeping the order of the
+        # latest changes.
+        self._pending_scores.pop((user, task), None)
+        self._pending_scores[(user, task)] = score
+        if self._flusher is None:
+            self._flusher = gevent.spawn_later(
+                self._score_window, self.flush_scores)
+
+    def flush_scores(self):
+        """Send the score changes held so far in a score_batch event.
+
+        """
+        if self._flusher is not None:
+            if self._flusher is not gevent.getcurrent():
+                self._flusher.kill(block=False)
+            self._flusher = None
+        if len(self._pending_scores) == 0:
+            return
         # FIXME Use score_precision.
-        self.send("score", "%s %s %0.2f" % (user, task, score))
+        self.send("score_batch", "\n".join(
+            "%s %s %0.2f" % (user, task, score)
+            for (user, task), score in self._pending_scores.items()))
+        self._pending_scores.clear()
 
 
 class SubListHandler:
@@ -329,10 +477,15 @@ class SubListHandler:
         return response(environ, start_response)
 
 
-class HistoryHandler:
+class SnapshotHandler:
+    """Serve a precomputed document, supporting conditional requests
+    and compression.
 
-    def __init__(self, stores):
-        self.scoring_store = stores["scoring"]
+    """
+
+    def __init__(self, get_payload):
+        """get_payload (function): return the Payload to serve."""
+        self.get_payload = get_payload
 
     def __call__(self, environ, start_response):
         return self.wsgi_app(environ, start_response)
@@ -344,12 +497,26 @@ class HistoryHandler:
         if request.accept_mimetypes.quality("application/json") <= 0:
             raise NotAcceptable()
 
-        result = list(self.scoring_store.get_global_history())
+        payload = self.get_payload()
 
         response = Response()
+        response.headers['Timestamp'] = "%0.6f" % payload.timestamp
+        response.set_etag(payload.etag)
+        # Clients must always revalidate, since the data changes.
+        response.headers['Cache-Control'] = "no-cache"
+        response.vary.add("Accept-Encoding")
+
+        if request.if_none_match.contains(payload.etag):
+            response.status_code = 304
+            return response(environ, start_response)
+
         response.status_code = 200
         response.mimetype = "application/json"
-        response.data = json.dumps(result)
+        if request.accept_encodings["gzip"] > 0:
+            response.content_encoding = "gzip"
+            response.data = payload.gzipped_data
+        else:
+            response.data = payload.data
 
         return response(environ, start_response)
 
@@ -474,11 +641,12 @@ class RootHandler:
 class RoutingHandler:
 
     def __init__(self, root_handler, event_handler, logo_handler,
-                 score_handler, history_handler):
+                 score_handler, history_handler, snapshot_handler):
         self.router = Map([
             Rule("/", methods=["GET"], endpoint="root"),
             Rule("/history", methods=["GET"], endpoint="history"),
             Rule("/scores", methods=["GET"], endpoint="scores"),
+            Rule("/snapshot", methods=["GET"], endpoint="snapshot"),
             Rule("/events", methods=["GET"], endpoint="events"),
             Rule("/logo", methods=["GET"], endpoint="logo"),
         ], encoding_errors="strict")
@@ -487,6 +655,7 @@ class RoutingHandler:
         self.logo_handler = logo_handler
         self.score_handler = score_handler
         self.history_handler = history_handler
+        self.snapshot_handler = snapshot_handler
         self.root_handler = root_handler
 
     def __call__(self, environ, start_response):
@@ -509,6 +678,8 @@ class RoutingHandler:
             return self.score_handler(environ, start_response)
         elif endpoint == "history":
             return self.history_handler(environ, start_response)
+        elif endpoint == "snapshot":
+            return self.snapshot_handler(environ, start_response)
 
 
 def main():
@@ -543,25 +714,34 @@ def main():
             print("Not removing directory %s." % config.lib_dir)
         return 0
 
+    if config.storage == "journal":
+        storage_class = JournalStorage
+    elif config.storage == "directory":
+        storage_class = DirectoryStorage
+    else:
+        logger.critical("Invalid storage %s.", config.storage)
+        return 1
+
     stores = dict()
 
     stores["subchange"] = Store(
-        Subchange, os.path.join(config.lib_dir, 'subchanges'), stores)
+        Subchange, os.path.join(config.lib_dir, 'subchanges'), stores,
+        storage_class=storage_class)
     stores["submission"] = Store(
         Submission, os.path.join(config.lib_dir, 'submissions'), stores,
-        [stores["subchange"]])
+        [stores["subchange"]], storage_class=storage_class)
     stores["user"] = Store(
         User, os.path.join(config.lib_dir, 'users'), stores,
-        [stores["submission"]])
+        [stores["submission"]], storage_class=storage_class)
     stores["team"] = Store(
         Team, os.path.join(config.lib_dir, 'teams'), stores,
-        [stores["user"]])
+        [stores["user"]], storage_class=storage_class)
     stores["task"] = Store(
         Task, os.path.join(config.lib_dir, 'tasks'), stores,
-        [stores["submission"]])
+        [stores["submission"]], storage_class=storage_class)
     stores["contest"] = Store(
         Contest, os.path.join(config.lib_dir, 'contests'), stores,
-        [stores["task"]])
+        [stores["task"]], storage_class=storage_class)
 
     stores["contest"].load_from_disk()
     stores["task"].load_from_disk()
@@ -573,14 +753,18 @@ def main():
     stores["scoring"] = ScoringStore(stores)
     stores["scoring"].init_store()
 
+    snapshot = Snapshot(stores)
+
     toplevel_handler = RoutingHandler(
         RootHandler(config.web_dir),
-        DataWatcher(stores, config.buffer_size),
+        DataWatcher(stores, config.buffer_size, config.queue_size,
+                    config.score_window),
         ImageHandler(
             os.path.join(config.lib_dir, '%(name)s'),
             os.path.join(config.web_dir, 'img', 'logo.png')),
         ScoreHandler(stores),
-        HistoryHandler(stores))
+        SnapshotHandler(snapshot.get_history),
+        SnapshotHandler(snapshot.get_snapshot))
 
     wsgi_app = SharedDataMiddleware(DispatcherMiddleware(
         toplevel_handler, {
@@ -609,6 +793,9 @@ def main():
                 os.path.join(config.lib_dir, 'flags', '%(name)s'),
                 os.path.join(config.web_dir, 'img', 'flag.png')),
             '/sublist': SubListHandler(stores),
+            '/bulk': BulkHandler(
+                stores,
+                config.username, config.password, config.realm_name),
         }), {'/': config.web_dir})
 
     servers = list()
@@ -628,4 +815,7 @@ def main():
         pass
     finally:
         gevent.joinall(list(gevent.spawn(s.stop) for s in servers))
+        for store in stores.values():
+            if isinstance(store, Store):
+                store.flush()
     return 0
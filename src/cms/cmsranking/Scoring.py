@@ -21,7 +21,6 @@
 
 import heapq
 import logging
-from itertools import zip_longest
 
 from cmscommon.constants import \
     SCORE_MODE_MAX, SCORE_MODE_MAX_SUBTASK, SCORE_MODE_MAX_TOKENED_LAST
@@ -40,24 +39,37 @@ class NumberSet:
 
     It can hold the same value multiple times.
 
-    This data structure could be implemented with a binary tree, but
-    at the moment we're actually using a standard python list.
+    The distinct values are kept in a binary heap, together with their
+    multiplicities; a removed value stays in the heap until it reaches
+    the top, so that all operations take O(log n) amortized time.
 
     """
     def __init__(self):
-        self._impl = list()
+        # The opposite of the values, to use heapq's min-heap.
+        self._heap = list()
+        # The multiplicity of each value in the heap (possibly zero).
+        self._count = dict()
 
     def insert(self, val):
-        self._impl.append(val)
+        if val in self._count:
+            self._count[val] += 1
+        else:
+            self._count[val] = 1
+            heapq.heappush(self._heap, -val)
 
     def remove(self, val):
-        self._impl.remove(val)
+        if self._count.get(val, 0) == 0:
+            raise ValueError("NumberSet.remove(x): x not in NumberSet")
+        self._count[val] -= 1
 
     def query(self):
-        return max(self._impl + [0.0])
+        while len(self._heap) > 0 and self._count[-self._heap[0]] == 0:
+            del self._count[-heapq.heappop(self._heap)]
+        return max(-self._heap[0], 0.0) if len(self._heap) > 0 else 0.0
 
     def clear(self):
-        del self._impl[:]
+        del self._heap[:]
+        self._count.clear()
 
 
 class Score:
@@ -88,6 +100,11 @@ class Score:
         # The last submitted submission (with at least one subchange).
         self._last = None
 
+        # For SCORE_MODE_MAX, a single set with the scores of all the
+        # submissions; for SCORE_MODE_MAX_SUBTASK, a set for each
+        # subtask with the scores of all the submissions on it.
+        self._maxima = list()
+
         # The history of score changes (the actual "output" of this
         # object).
         self._history = list()
@@ -100,6 +117,9 @@ class Score:
         # it's the last. Compute the new score and, if it changed,
         # append it to the history.
         s_id = change.submission
+        changes_maxima = change.score is not None or change.extra is not None
+        if changes_maxima:
+            self._remove_maxima(self._submissions[s_id])
         if self._submissions[s_id].token:
             self._released.remove(self._submissions[s_id].score)
         if change.score is not None:
@@ -110,21 +130,17 @@ class Score:
             self._submissions[s_id].extra = change.extra
         if self._submissions[s_id].token:
             self._released.insert(self._submissions[s_id].score)
+        if changes_maxima:
+            self._insert_maxima(self._submissions[s_id])
         if change.score is not None and \
                 (self._last is None or
                  self._submissions[s_id].time > self._last.time):
             self._last = self._submissions[s_id]
 
         if self._score_mode == SCORE_MODE_MAX:
-            score = max((submission.score
-                         for submission in self._submissions.values()),
-                        default=0.0)
+            score = self._maxima[0].query() if self._maxima else 0.0
         elif self._score_mode == SCORE_MODE_MAX_SUBTASK:
-            scores_by_submission = (map(float, s.extra or [s.score])
-                                    for s in self._submissions.values())
-            scores_by_subtask = zip_longest(*scores_by_submission,
-                                            fillvalue=0.0)
-            score = float(sum(max(s) for s in scores_by_subtask))
+            score = float(sum(maximum.query() for maximum in self._maxima))
         elif self._score_mode == SCORE_MODE_MAX_TOKENED_LAST:
             score = max(self._released.query(),
                         self._last.score if self._last is not None else 0.0)
@@ -134,6 +150,32 @@ class Score:
         if score != self.get_score():
             self._history.append((change.time, score))
 
+    def _get_maxima_values(self, submission):
+        # Return the values that the submission contributes to each
+        # set in self._maxima, in the current score mode.
+        if self._score_mode == SCORE_MODE_MAX:
+            return [submission.score]
+        elif self._score_mode == SCORE_MODE_MAX_SUBTASK:
+            return [float(s) for s in submission.extra or [submission.score]]
+        return []
+
+    def _insert_maxima(self, submission):
+        values = self._get_maxima_values(submission)
+        while len(self._maxima) < len(values):
+            self._maxima.append(NumberSet())
+        for maximum, value in zip(self._maxima, values):
+            maximum.insert(value)
+
+    def _remove_maxima(self, submission):
+        for maximum, value in zip(self._maxima,
+                                  self._get_maxima_values(submission)):
+            maximum.remove(value)
+
+    def _reset_maxima(self):
+        del self._maxima[:]
+        for sub in self._submissions.values():
+            self._insert_maxima(sub)
+
     def get_score(self):
         return self._history[-1][1] if len(self._history) > 0 else 0.0
 
@@ -148,6 +190,7 @@ class Score:
             sub.score = 0.0
             sub.token = False
             sub.extra = list()
+        self._reset_maxima()
 
         # Append each change, one at a time.
         for change in self._changes:
@@ -203,6 +246,7 @@ class Score:
         submission.token = False
         submission.extra = list()
         self._submissions[key] = submission
+        self._insert_maxima(submission)
 
     def update_submission(self, key, submission):
         # An updated submission may cause an update in history because
@@ -222,7 +266,9 @@ class Score:
             self.reset_history()
 
     def update_score_mode(self, score_mode):
-        self._score_mode = score_mode
+        if score_mode != self._score_mode:
+            self._score_mode = score_mode
+            self._reset_maxima()
 
 
 class ScoringStore:
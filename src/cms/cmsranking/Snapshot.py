@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import binascii
+import functools
+import gzip
+import json
+import os
+import time
+from collections import namedtuple
+
+
+class Payload(namedtuple("Payload",
+                         "etag timestamp data gzipped_data")):
+    """A serialized document, ready to be served.
+
+    etag (str): an opaque identifier of this version of the document.
+    timestamp (float): when the document was serialized (the data it
+        contains is up to date as of then).
+    data (bytes): the JSON document.
+    gzipped_data (bytes): the same, compressed with gzip.
+
+    """
+    pass
+
+
+class Snapshot:
+    """Precomputed dump of all the data of the ranking.
+
+    The snapshot contains the contests, tasks, teams and users and the
+    (positive) scores: all a client needs to start. It is kept up to
+    date by the callbacks of the stores: each entity is serialized
+    again only when it changes, and the whole document (and its
+    compressed version) is assembled again only when it is requested
+    after a change, so that serving it to many clients costs no more
+    than sending the same bytes. The global history, which clients
+    load only when needed, is cached in the same way.
+
+    """
+
+    ENTITIES = ["contest", "task", "team", "user"]
+
+    # Level of the gzip compression (each payload is compressed once,
+    # while a client waits for it).
+    COMPRESS_LEVEL = 6
+
+    def __init__(self, stores):
+        """stores ({str: Store|ScoringStore}): the stores of the RWS,
+            already loaded.
+
+        """
+        self._scoring_store = stores["scoring"]
+
+        # Distinguishes the ETags of this process from those of the
+        # previous ones, whose versions started from zero too.
+        self._instance = binascii.hexlify(os.urandom(4)).decode("ascii")
+        self._version = 0
+        self._history_version = 0
+
+        # Serialized JSON of each entity, by type and key.
+        # Type: {str: {str: str}}
+        self._entities = dict()
+        for name in Snapshot.ENTITIES:
+            store = stores[name]
+            self._entities[name] = dict(
+                (key, json.dumps(value))
+                for key, value in store.retrieve_list().items())
+            store.add_create_callback(
+                functools.partial(self._entity_changed, name))
+            store.add_update_callback(
+                functools.partial(self._entity_changed, name))
+            store.add_delete_callback(
+                functools.partial(self._entity_deleted, name))
+
+        # Type: {str: {str: float}}
+        self._scores = dict()
+        for user, tasks in self._scoring_store._scores.items():
+            for task, score in tasks.items():
+                self._score_changed(user, task, score.get_score())
+        self._scoring_store.add_score_callback(self._score_changed)
+
+        # The history can change even when no score does (for example,
+        # when a submission that was later improved is deleted).
+        for name in ["submission", "subchange"]:
+            for add_callback in [stores[name].add_create_callback,
+                                 stores[name].add_update_callback,
+                                 stores[name].add_delete_callback]:
+                add_callback(self._history_changed)
+
+        self._snapshot = None
+        self._history = None
+
+    def _entity_changed(self, name, key, *args):
+        # Creations pass the new entity, updates the old and the new.
+        self._entities[name][key] = json.dumps(args[-1].get())
+        self._version += 1
+
+    def _entity_deleted(self, name, key, unused_value):
+        self._entities[name].pop(key, None)
+        self._version += 1
+
+    def _score_changed(self, user, task, score):
+        if score > 0.0:
+            self._scores.setdefault(user, dict())[task] = score
+        elif task in self._scores.get(user, ()):
+            del self._scores[user][task]
+            if len(self._scores[user]) == 0:
+                del self._scores[user]
+        self._version += 1
+        self._history_changed()
+
+    def _history_changed(self, *unused_args):
+        self._history_version += 1
+
+    def _make_payload(self, version, data):
+        return Payload("%s-%d" % (self._instance, version), time.time(),
+                       data, gzip.compress(data, Snapshot.COMPRESS_LEVEL))
+
+    def get_history(self):
+        """Return the global history, as served by /history.
+
+        return (Payload): the JSON list of (user, task, time, score).
+
+        """
+        if self._history is None or self._history[0] != self._history_version:
+            data = json.dumps(list(
+                self._scoring_store.get_global_history())).encode("utf-8")
+            self._history = (self._history_version,
+                             self._make_payload(self._history_version, data))
+        return self._history[1]
+
+    def get_snapshot(self):
+        """Return the snapshot, assembling it if anything changed.
+
+        return (Payload): the snapshot.
+
+        """
+        if self._snapshot is not None and self._snapshot[0] == self._version:
+            return self._snapshot[1]
+
+        parts = list()
+        for name in Snapshot.ENTITIES:
+            parts.append('"%ss": {%s}' % (name, ", ".join(
+                "%s: %s" % (json.dumps(key), value)
+                for key, value in self._entities[name].items())))
+        parts.append('"scores": %s' % json.dumps(self._scores))
+        data = ("{%s}" % ", ".join(parts)).encode("utf-8")
+
+        payload = self._make_payload(self._version, data)
+        self._snapshot = (self._version, payload)
+        return payload
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Persistent storage of the entities of the ranking stores.
+
+A storage keeps the JSON data of the entities of one store, by key.
+Stores tell it about each change and read everything back from it at
+startup; it never parses the data into entities.
+
+"""
+
+import json
+import logging
+import os
+
+import gevent
+import gevent.lock
+from gevent.event import Event
+
+
+logger = logging.getLogger(__name__)
+
+
+class DirectoryStorage:
+    """Storage with one JSON file per entity, named after its key.
+
+    Every change is written to disk immediately.
+
+    """
+
+    def __init__(self, path):
+        """path (str): the directory holding the files."""
+        self._path = path
+
+    def load(self):
+        """Read all the entities.
+
+        return ({str: object}): the data of each entity, by key.
+
+        """
+        try:
+            os.mkdir(self._path)
+        except OSError:
+            # it's ok: it means the directory already exists
+            pass
+        return load_directory(self._path)
+
+    def put(self, key, data):
+        """Store the data of an entity, created or updated.
+
+        key (str): the key of the entity.
+        data (object): its JSON-serializable data.
+
+        """
+        try:
+            path = os.path.join(self._path, key + '.json')
+            with open(path, 'wt', encoding="utf-8") as rec:
+                json.dump(data, rec)
+        except OSError:
+            logger.error("I/O error occured while storing entity",
+                         exc_info=True)
+
+    def delete(self, key):
+        """Remove an entity.
+
+        key (str): the key of the entity.
+
+        """
+        try:
+            os.remove(os.path.join(self._path, key + '.json'))
+        except OSError:
+            logger.error("Unable to delete entity", exc_info=True)
+
+    def flush(self):
+        """Wait for all changes to be on disk."""
+        pass
+
+
+def load_directory(path):
+    """Read the entities stored by DirectoryStorage in a directory.
+
+    Files that cannot be read or parsed are logged and skipped.
+
+    path (str): the directory.
+
+    return ({str: object}): the data of each entity, by key.
+
+    """
+    result = dict()
+    try:
+        names = os.listdir(path)
+    except OSError:
+        # the path isn't a directory or is inaccessible
+        logger.error("Path is not a directory or is not accessible "
+                     "(or other I/O error occurred)", exc_info=True)
+        return result
+    for name in names:
+        # TODO check that the key is '[A-Za-z0-9_]+'
+        if name[-5:] == '.json' and name[:-5] != '':
+            try:
+                with open(os.path.join(path, name), 'rb') as rec:
+                    result[name[:-5]] = json.load(rec)
+            except OSError:
+                logger.error("I/O error occurred while loading entity",
+                             exc_info=True,
+                             extra={'location': os.path.join(path, name)})
+            except ValueError:
+                logger.error("Invalid JSON", exc_info=False,
+                             extra={'location': os.path.join(path, name)})
+    return result
+
+
+class JournalStorage:
+    """Storage as a compacted snapshot plus an append-only journal.
+
+    The snapshot (path + ".snapshot") is a JSON object with the data of
+    all entities at some point; the journal (path + ".journal") has a
+    line for each later change: ["put", key, data] or ["del", key].
+
+    Changes are only queued by put and delete, which return at once: a
+    writer greenlet appends all the queued ones to the journal, syncing
+    them to disk (in a thread) with a single fsync, and retries later
+    if that fails. When the journal grows larger than the snapshot by a
+    factor, a new snapshot is written (in a thread too) and the journal
+    is emptied.
+
+    If neither file exists but the directory of DirectoryStorage does,
+    its entities are imported into a new snapshot and the directory is
+    renamed to path + ".migrated".
+
+    """
+
+    # A new snapshot is written when the journal has this many times
+    # more lines than the entities in the snapshot (and at least
+    # COMPACT_MIN_LINES lines).
+    COMPACT_FACTOR = 2
+    COMPACT_MIN_LINES = 1000
+
+    # Seconds to wait before writing again the changes whose writing
+    # failed.
+    RETRY_DELAY = 5.0
+
+    def __init__(self, path):
+        """path (str): the prefix of the paths of the files."""
+        self._path = path
+        self._snapshot_path = path + ".snapshot"
+        self._journal_path = path + ".journal"
+
+        # The data of all the entities, as they will be once the queued
+        # changes are written.
+        # Type: {str: object}
+        self._data = dict()
+        # Type: [bytes]
+        self._queue = list()
+        self._queue_event = Event()
+        self._journal = None
+        self._journal_lines = 0
+        # Whether the journal has been closed after a failed write,
+        # which might have left a partial line.
+        self._journal_broken = False
+        self._writer = None
+        # Serializes the writes of the writer greenlet and of flush.
+        self._write_lock = gevent.lock.RLock()
+
+    def load(self):
+        """Read all the entities, and start accepting changes.
+
+        return ({str: object}): the data of each entity, by key.
+
+        """
+        if not os.path.exists(self._snapshot_path) \
+                and not os.path.exists(self._journal_path) \
+                and os.path.isdir(self._path):
+            self._migrate()
+
+        self._data = dict()
+        try:
+            with open(self._snapshot_path, "rb") as f:
+                self._data = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError):
+            logger.error("Unable to read the snapshot, ignoring it.",
+                         exc_info=True,
+                         extra={'location': self._snapshot_path})
+
+        self._journal_lines = 0
+        line = b"\n"
+        try:
+            with open(self._journal_path, "rb") as f:
+                for line in f:
+                    self._replay(line)
+        except FileNotFoundError:
+            pass
+
+        self._journal = open(self._journal_path, "ab")
+        if not line.endswith(b"\n"):
+            # Don't append to a partial last line.
+            self._journal.write(b"\n")
+        self._writer = gevent.spawn(self._write_loop)
+        return dict(self._data)
+
+    def _replay(self, line):
+        try:
+            change = json.loads(line.decode("utf-8"))
+            if change[0] == "put":
+                self._data[change[1]] = change[2]
+            elif change[0] == "del":
+                self._data.pop(change[1], None)
+            else:
+                raise ValueError("Unknown change %r." % change[0])
+        except (ValueError, IndexError, TypeError, UnicodeDecodeError):
+            if line.strip() != b"":
+                # Most likely the last line, written only in part when
+                # the server stopped.
+                logger.warning("Ignoring invalid journal line.",
+                               extra={'location': self._journal_path})
+            return
+        self._journal_lines += 1
+
+    def _migrate(self):
+        """Import the entities of DirectoryStorage from self._path."""
+        data = load_directory(self._path)
+        if len(data) == 0:
+            return
+        logger.info("Migrating %d entities from %s to a journal.",
+                    len(data), self._path)
+        self._write_snapshot(data)
+        os.rename(self._path, self._path + ".migrated")
+
+    def _write_snapshot(self, data):
+        tmp_path = self._snapshot_path + ".tmp"
+        with open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._snapshot_path)
+
+    def put(self, key, data):
+        """Store the data of an entity, created or updated.
+
+        key (str): the key of the entity.
+        data (object): its JSON-serializable data.
+
+        """
+        self._data[key] = data
+        self._enqueue(["put", key, data])
+
+    def delete(self, key):
+        """Remove an entity.
+
+        key (str): the key of the entity.
+
+        """
+        self._data.pop(key, None)
+        self._enqueue(["del", key])
+
+    def _enqueue(self, change):
+        self._queue.append(json.dumps(change).encode("utf-8") + b"\n")
+        self._queue_event.set()
+
+    def _write_loop(self):
+        while True:
+            self._queue_event.wait()
+            if not self._write_queue():
+                gevent.sleep(self.RETRY_DELAY)
+
+    def _write_queue(self):
+        """Write all the queued changes, compacting if needed.
+
+        return (bool): False if the changes could not be written; they
+            are queued again, to be retried.
+
+        """
+        with self._write_lock:
+            self._queue_event.clear()
+            if len(self._queue) == 0:
+                return True
+            lines, self._queue = self._queue, list()
+            try:
+                if self._journal_broken:
+                    self._journal = open(self._journal_path, "ab")
+                    self._journal_broken = False
+                    # Terminate the partial line the failure may have
+                    # left (empty lines are ignored).
+                    lines.insert(0, b"\n")
+                self._journal.write(b"".join(lines))
+                self._journal.flush()
+                gevent.get_hub().threadpool.apply(
+                    os.fsync, (self._journal.fileno(),))
+            except OSError:
+                logger.error("I/O error occured while writing the journal, "
+                             "retrying in %g seconds.", self.RETRY_DELAY,
+                             exc_info=True)
+                self._queue = lines + self._queue
+                self._queue_event.set()
+                self._close_broken_journal()
+                return False
+            self._journal_lines += len(lines)
+
+            if self._journal_lines >= max(
+                    self.COMPACT_MIN_LINES,
+                    self.COMPACT_FACTOR * len(self._data)):
+                self._compact()
+            return True
+
+    def _close_broken_journal(self):
+        """Close the journal after a failed write, discarding what is
+        left in its buffer; it is opened again by the next write.
+
+        """
+        if self._journal_broken:
+            return
+        self._journal_broken = True
+        try:
+            self._journal.close()
+        except OSError:
+            pass
+
+    def _compact(self):
+        """Write a new snapshot and empty the journal."""
+        # The snapshot has the changes queued before this point: they
+        # will be written to the new journal too, but replaying them
+        # again is harmless. The changes made while the snapshot is
+        # being written are only in the queue.
+        data = dict(self._data)
+        try:
+            gevent.get_hub().threadpool.apply(self._write_snapshot, (data,))
+            self._journal.truncate(0)
+        except OSError:
+            logger.error("I/O error occured while compacting the journal",
+                         exc_info=True)
+            return
+        self._journal_lines = 0
+
+    def flush(self):
+        """Write all the queued changes to disk."""
+        if self._journal is not None:
+            self._write_queue()
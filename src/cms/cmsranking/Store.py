@@ -16,7 +16,6 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import json
 import logging
 import os
 import re
@@ -24,6 +23,7 @@ import re
 from gevent.lock import RLock
 
 from cmsranking.Entity import Entity, InvalidKey, InvalidData
+from cmsranking.Storage import DirectoryStorage
 
 
 logger = logging.getLogger(__name__)
@@ -44,7 +44,8 @@ class Store:
     callbacks.
 
     """
-    def __init__(self, entity, path, all_stores, depends=None):
+    def __init__(self, entity, path, all_stores, depends=None,
+                 storage_class=DirectoryStorage):
         """Initialize an empty EntityStore.
 
         The entity definition given as argument will define what kind
@@ -52,6 +53,9 @@ class Store:
 
         entity (type): the class definition of the entities that will
             be stored
+        path (str): where the entities are persisted.
+        storage_class (type): how the entities are persisted (see
+            cmsranking.Storage); it is given the path.
 
         """
         if not issubclass(entity, Entity):
@@ -59,6 +63,7 @@ class Store:
                              "isn't a subclass of Entity")
         self._entity = entity
         self._path = path
+        self._storage = storage_class(path)
         self._all_stores = all_stores
         self._depends = depends if depends is not None else []
         self._store = dict()
@@ -70,31 +75,21 @@ class Store:
         """Load the initial data for this store from the disk.
 
         """
-        try:
-            os.mkdir(self._path)
-        except OSError:
-            # it's ok: it means the directory already exists
-            pass
-
-        try:
-            for name in os.listdir(self._path):
-                # TODO check that the key is '[A-Za-z0-9_]+'
-                if name[-5:] == '.json' and name[:-5] != '':
-                    with open(os.path.join(self._path, name), 'rb') as rec:
-                        item = self._entity()
-                        item.set(json.load(rec))
-                        item.key = name[:-5]
-                        self._store[name[:-5]] = item
-        except OSError:
-            # the path isn't a directory or is inaccessible
-            logger.error("Path is not a directory or is not accessible "
-                         "(or other I/O error occurred)", exc_info=True)
-        except ValueError:
-            logger.error("Invalid JSON", exc_info=False,
-                         extra={'location': os.path.join(self._path, name)})
-        except InvalidData as exc:
-            logger.error(str(exc), exc_info=False,
-                         extra={'location': os.path.join(self._path, name)})
+        for key, data in self._storage.load().items():
+            try:
+                item = self._entity()
+                item.set(data)
+                item.key = key
+                self._store[key] = item
+            except InvalidData as exc:
+                logger.error(str(exc), exc_info=False, extra={
+                    'location': os.path.join(self._path, key)})
+
+    def flush(self):
+        """Wait for all the changes to be persisted.
+
+        """
+        self._storage.flush()
 
     def add_create_callback(self, callback):
         """Add a callback to be called when entities are created.
@@ -153,13 +148,7 @@ class Store:
             for callback in self._create_callbacks:
                 callback(key, item)
             # reflect changes on the persistent storage
-            try:
-                path = os.path.join(self._path, key + '.json')
-                with open(path, 'wt', encoding="utf-8") as rec:
-                    json.dump(self._store[key].get(), rec)
-            except OSError:
-                logger.error("I/O error occured while creating entity",
-                             exc_info=True)
+            self._storage.put(key, item.get())
 
     def update(self, key, data):
         """Update an entity.
@@ -192,13 +181,7 @@ class Store:
             for callback in self._update_callbacks:
                 callback(key, old_item, item)
             # reflect changes on the persistent storage
-            try:
-                path = os.path.join(self._path, key + '.json')
-                with open(path, 'wt', encoding="utf-8") as rec:
-                    json.dump(self._store[key].get(), rec)
-            except OSError:
-                logger.error("I/O error occured while updating entity",
-                             exc_info=True)
+            self._storage.put(key, item.get())
 
     def merge_list(self, data_dict):
         """Merge a list of entities.
@@ -246,14 +229,7 @@ class Store:
                     for callback in self._update_callbacks:
                         callback(key, old_value, value)
                 # reflect changes on the persistent storage
-                try:
-                    path = os.path.join(self._path, key + '.json')
-                    with open(path, 'wt', encoding="utf-8") as rec:
-                        json.dump(value.get(), rec)
-                except OSError:
-                    logger.error(
-                        "I/O error occured while merging entity lists",
-                        exc_info=True)
+                self._storage.put(key, value.get())
 
     def delete(self, key):
         """Delete an entity.
@@ -282,10 +258,7 @@ class Store:
             for callback in self._delete_callbacks:
                 callback(key, old_value)
             # reflect changes on the persistent storage
-            try:
-                os.remove(os.path.join(self._path, key + '.json'))
-            except OSError:
-                logger.error("Unable to delete entity", exc_info=True)
+            self._storage.delete(key)
 
     def delete_list(self):
         """Delete all entities.
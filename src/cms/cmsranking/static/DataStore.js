@@ -60,24 +60,6 @@ var DataStore = new function () {
 
     self.contest_count = 0;
 
-    self.init_contests = function () {
-        $.ajax({
-            url: Config.get_contest_list_url(),
-            dataType: "json",
-            success: function (data, status, xhr) {
-                self.contest_init_time = parseFloat(xhr.getResponseHeader("Timestamp"));
-                for (var key in data) {
-                    self.create_contest(key, data[key]);
-                }
-                self.init_tasks();
-            },
-            error: function () {
-                console.error("Error while getting the list of contests");
-                self.update_network_status(4);
-            }
-        });
-    }
-
     self.contest_listener = function (event) {
         var cmd = event.data.split(" ");
         if (cmd[0] == "create") {
@@ -154,27 +136,6 @@ var DataStore = new function () {
 
     self.task_count = 0;
 
-    self.init_tasks = function () {
-        $.ajax({
-            url: Config.get_task_list_url(),
-            dataType: "json",
-            success: function (data, status, xhr) {
-                self.task_init_time = parseFloat(xhr.getResponseHeader("Timestamp"));
-                for (var key in data) {
-                    self.create_task(key, data[key]);
-                }
-                self.inits_todo -= 1;
-                if (self.inits_todo == 0) {
-                    self.init_scores();
-                }
-            },
-            error: function () {
-                console.error("Error while getting the list of tasks");
-                self.update_network_status(4);
-            }
-        });
-    }
-
     self.task_listener = function (event) {
         var cmd = event.data.split(" ");
         if (cmd[0] == "create") {
@@ -261,24 +222,6 @@ var DataStore = new function () {
 
     self.team_count = 0;
 
-    self.init_teams = function () {
-        $.ajax({
-            url: Config.get_team_list_url(),
-            dataType: "json",
-            success: function (data, status, xhr) {
-                self.team_init_time = parseFloat(xhr.getResponseHeader("Timestamp"));
-                for (var key in data) {
-                    self.create_team(key, data[key]);
-                }
-                self.init_users();
-            },
-            error: function () {
-                console.error("Error while getting the list of teams");
-                self.update_network_status(4);
-            }
-        });
-    }
-
     self.team_listener = function (event) {
         var cmd = event.data.split(" ");
         if (cmd[0] == "create") {
@@ -355,27 +298,6 @@ var DataStore = new function () {
 
     self.user_count = 0;
 
-    self.init_users = function () {
-        $.ajax({
-            url: Config.get_user_list_url(),
-            dataType: "json",
-            success: function (data, status, xhr) {
-                self.user_init_time = parseFloat(xhr.getResponseHeader("Timestamp"));
-                for (var key in data) {
-                    self.create_user(key, data[key]);
-                }
-                self.inits_todo -= 1;
-                if (self.inits_todo == 0) {
-                    self.init_scores();
-                }
-            },
-            error: function () {
-                console.error("Error while getting the list of users");
-                self.update_network_status(4);
-            }
-        });
-    }
-
     self.user_listener = function (event) {
         var cmd = event.data.split(" ");
         if (cmd[0] == "create") {
@@ -573,26 +495,6 @@ var DataStore = new function () {
 
     ////// Score
 
-    self.init_scores = function () {
-        $.ajax({
-            url: Config.get_score_url(),
-            dataType: "json",
-            success: function (data, status, xhr) {
-                self.score_init_time = parseFloat(xhr.getResponseHeader("Timestamp"));
-                for (var u_id in data) {
-                    for (var t_id in data[u_id]) {
-                        self.set_score(u_id, t_id, data[u_id][t_id]);
-                    }
-                }
-                self.init_ranks();
-            },
-            error: function () {
-                console.error("Error while getting the scores");
-                self.update_network_status(4);
-            }
-        });
-    };
-
     self.score_listener = function (event) {
         var data = event.data.split("\n");
         for (var idx in data) {
@@ -779,23 +681,52 @@ var DataStore = new function () {
     ////// Initialization
 
     /* The init process works this way:
-       - we start init_contests() and init_teams()
-       - they each start an asynchronous AJAX request
-       - when the requests end their data is processed and then, respectively,
-         init_tasks() and init_users() are called
-       - they also start an AJAX request and process its data
-       - when BOTH requests finish init_scores() is called
-       - it does again an AJAX request and processes its data
-       - at the end it calls init_ranks() which calls init_selections() which,
+       - we fetch the snapshot, which contains all the contests, tasks,
+         teams, users and scores, with a single AJAX request
+       - we create the entities in the order of their dependencies and then
+         set the scores
+       - at the end we call init_ranks() which calls init_selections() which,
          in turn, calls init_callback()
      */
 
     self.init = function (callback) {
-        self.inits_todo = 2;
         self.init_callback = callback;
 
-        self.init_contests();
-        self.init_teams();
+        $.ajax({
+            url: Config.get_snapshot_url(),
+            dataType: "json",
+            success: function (data, status, xhr) {
+                var init_time = parseFloat(xhr.getResponseHeader("Timestamp"));
+                self.contest_init_time = init_time;
+                self.task_init_time = init_time;
+                self.team_init_time = init_time;
+                self.user_init_time = init_time;
+                self.score_init_time = init_time;
+
+                for (var key in data["contests"]) {
+                    self.create_contest(key, data["contests"][key]);
+                }
+                for (var key in data["tasks"]) {
+                    self.create_task(key, data["tasks"][key]);
+                }
+                for (var key in data["teams"]) {
+                    self.create_team(key, data["teams"][key]);
+                }
+                for (var key in data["users"]) {
+                    self.create_user(key, data["users"][key]);
+                }
+                for (var u_id in data["scores"]) {
+                    for (var t_id in data["scores"][u_id]) {
+                        self.set_score(u_id, t_id, data["scores"][u_id][t_id]);
+                    }
+                }
+                self.init_ranks();
+            },
+            error: function () {
+                console.error("Error while getting the snapshot");
+                self.update_network_status(4);
+            }
+        });
     };
 
 
@@ -823,6 +754,7 @@ var DataStore = new function () {
         self.es.addEventListener("open", self.es_open_handler, false);
         self.es.addEventListener("error", self.es_error_handler, false);
         self.es.addEventListener("reload", self.es_reload_handler, false);
+        self.es.addEventListener("reinit", self.es_reload_handler, false);
         self.es.addEventListener("contest", function (event) {
             var timestamp = parseInt(event.lastEventId, 16) / 1000000;
             if (timestamp > self.contest_init_time) {
@@ -858,6 +790,13 @@ var DataStore = new function () {
             }
             self.last_event_id = event.lastEventId;
         }, false);
+        self.es.addEventListener("score_batch", function (event) {
+            var timestamp = parseInt(event.lastEventId, 16) / 1000000;
+            if (timestamp > self.score_init_time) {
+                self.score_listener(event);
+            }
+            self.last_event_id = event.lastEventId;
+        }, false);
     };
 
     self.update_network_status = function (state) {
@@ -900,13 +839,13 @@ var DataStore = new function () {
         }
     };
 
-    self.es_reload_handler = function () {
+    self.es_reload_handler = function (event) {
         if (self.es.readyState == self.es.OPEN) {
-            console.info("Received a 'reload' event");
+            console.info("Received a '" + event.type + "' event");
             self.es.close();
             self.update_network_status(3);
         } else {
-            console.error("EventSource shouldn't be in state " + self.es.readyState + " during a 'reload' event!");
+            console.error("EventSource shouldn't be in state " + self.es.readyState + " during a '" + event.type + "' event!");
         }
     };
 
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure the cost of sending job groups between ES and Workers.
+
+For job groups of 1, 10 and 100 evaluation jobs of an output only task
+(with results filled in, as sent back by Workers), time the export to
+dict, the JSON encoding and the framing of the message, and then the
+inverse steps, for the line-based framing and for the binary framing
+with and without compression, and report the size on the wire.
+
+"""
+
+import argparse
+import io
+import json
+import sys
+import time
+import uuid
+
+from cms import Address
+from cms.grading.Job import EvaluationJob, JobGroup
+from cms.db import File, Manager
+from cms.io.rpc import RemoteServiceBase
+from cms.service.esoperations import ESOperation
+
+
+def random_digest():
+    return uuid.uuid4().hex + uuid.uuid4().hex[:8]
+
+
+def make_job(testcase, num_files):
+    """Return an evaluation job as sent back by a Worker."""
+    files = dict(("output_%s.txt" % chr(ord("a") + i),
+                  File("output_%s.txt" % chr(ord("a") + i), random_digest()))
+                 for i in range(num_files))
+    return EvaluationJob(
+        operation=ESOperation(ESOperation.EVALUATION, 1234, 5,
+                              "%s" % testcase),
+        task_type="OutputOnly", task_type_parameters=["comparator"],
+        shard=3, sandboxes=["/tmp/cms-sandbox-%s" % uuid.uuid4().hex],
+        info="evaluate submission 1234 on testcase %s" % testcase,
+        files=files,
+        managers={"checker": Manager("checker", random_digest())},
+        input=random_digest(), output=random_digest(),
+        success=True, outcome="1234567.0",
+        text=["Output is partially correct; the score is %s out of %s "
+              "with %s of %s items placed", "1234567", "2000000", "812",
+              "1000"],
+        plus={"execution_time": 0.123, "execution_wall_clock_time": 0.456,
+              "execution_memory": 12345678})
+
+
+def make_client(binary_framing, compression):
+    client = RemoteServiceBase(Address("localhost", 0))
+    client._binary_framing = binary_framing
+    client._compression = compression
+    client._repr_remote = lambda: "benchmark"
+    return client
+
+
+def measure(group, client, repetitions):
+    """Return encode time, decode time (both in ms) and message size."""
+    start = time.monotonic()
+    for _ in range(repetitions):
+        frame = client._frame(
+            json.dumps(group.export_to_dict()).encode("utf-8"))
+    encode_time = (time.monotonic() - start) / repetitions
+
+    start = time.monotonic()
+    for _ in range(repetitions):
+        client._reader = io.BytesIO(frame)
+        if client._binary_framing:
+            data = client._read_frame()
+        else:
+            data = client._reader.readline()
+        JobGroup.import_from_dict(json.loads(data.decode("utf-8")))
+    decode_time = (time.monotonic() - start) / repetitions
+
+    return encode_time * 1000, decode_time * 1000, len(frame)
+
+
+FRAMINGS = [
+    ("line", False, None),
+    ("binary", True, None),
+    ("binary+zlib", True, "zlib"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the encoding of job groups over RPC.")
+    parser.add_argument(
+        "-r", "--repetitions", action="store", type=int, default=100,
+        help="number of times each job group is encoded (default 100)")
+    parser.add_argument(
+        "-f", "--files", action="store", type=int, default=6,
+        help="number of submitted files of each job (default 6)")
+    args = parser.parse_args()
+
+    print("%5s %-12s %10s %10s %10s" % (
+        "jobs", "framing", "encode ms", "decode ms", "bytes"))
+    for num_jobs in [1, 10, 100]:
+        group = JobGroup([make_job(i, args.files) for i in range(num_jobs)])
+        for name, binary_framing, compression in FRAMINGS:
+            client = make_client(binary_framing, compression)
+            try:
+                encode_time, decode_time, size = \
+                    measure(group, client, args.repetitions)
+            except OSError:
+                print("%5d %-12s %10s" % (num_jobs, name, "too long"))
+                continue
+            print("%5d %-12s %10.3f %10.3f %10d" % (
+                num_jobs, name, encode_time, decode_time, size))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
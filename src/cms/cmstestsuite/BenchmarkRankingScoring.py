@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure how fast the ranking web server replays a score history.
+
+Build a synthetic contest (few users, many submissions for each task,
+as in Hash Code-style contests) directly in the stores, then time
+ScoringStore.init_store, which RankingWebServer calls at startup to
+compute the scores from all the submissions and subchanges.
+
+"""
+
+import argparse
+import random
+import sys
+import time
+
+from cmscommon.constants import \
+    SCORE_MODE_MAX, SCORE_MODE_MAX_SUBTASK, SCORE_MODE_MAX_TOKENED_LAST
+from cmsranking.Scoring import ScoringStore
+from cmsranking.Store import Store
+from cmsranking.Subchange import Subchange
+from cmsranking.Submission import Submission
+from cmsranking.Task import Task
+
+
+SCORE_MODES = [SCORE_MODE_MAX, SCORE_MODE_MAX_SUBTASK,
+               SCORE_MODE_MAX_TOKENED_LAST]
+
+
+def make_stores(score_mode, users, tasks, submissions, subtasks, seed):
+    """Create the stores of a synthetic contest.
+
+    score_mode (str): the score mode of all the tasks.
+    users (int): number of users.
+    tasks (int): number of tasks.
+    submissions (int): total number of submissions, each with one
+        subchange, spread evenly over the users and the tasks.
+    subtasks (int): number of subtasks of each task.
+    seed (int): seed of the random generator.
+
+    return ({str: Store}): the stores for tasks, submissions and
+        subchanges.
+
+    """
+    rnd = random.Random(seed)
+    stores = dict()
+    # The stores are never loaded from disk, so the paths are unused.
+    stores["task"] = Store(Task, "tasks", stores)
+    stores["submission"] = Store(Submission, "submissions", stores)
+    stores["subchange"] = Store(Subchange, "subchanges", stores)
+
+    for t in range(tasks):
+        task = Task()
+        task.set({"name": "Task %d" % t, "short_name": "t%d" % t,
+                  "contest": "c", "max_score": 100.0 * subtasks,
+                  "score_precision": 0, "extra_headers": [],
+                  "order": t, "score_mode": score_mode})
+        task.key = "t%d" % t
+        stores["task"]._store[task.key] = task
+
+    for s in range(submissions):
+        key = "%07d" % s
+        submission = Submission()
+        submission.set({"user": "u%d" % rnd.randrange(users),
+                        "task": "t%d" % rnd.randrange(tasks),
+                        "time": s})
+        submission.key = key
+        stores["submission"]._store[key] = submission
+
+        # Scores slowly improve over time, with some noise.
+        extra = [rnd.randrange(100 * s // submissions + 1)
+                 for _ in range(subtasks)]
+        subchange = Subchange()
+        subchange.set({"submission": key, "time": s,
+                       "score": float(sum(extra)),
+                       "token": rnd.random() < 0.1,
+                       "extra": ["%d" % e for e in extra]})
+        subchange.key = key + "s"
+        stores["subchange"]._store[subchange.key] = subchange
+
+    return stores
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the replay of a synthetic score history "
+                    "in the ranking web server.")
+    parser.add_argument(
+        "-s", "--submissions", action="store", type=int, default=100000,
+        help="number of submissions (default 100000)")
+    parser.add_argument(
+        "-u", "--users", action="store", type=int, default=50,
+        help="number of users (default 50)")
+    parser.add_argument(
+        "-t", "--tasks", action="store", type=int, default=4,
+        help="number of tasks (default 4)")
+    parser.add_argument(
+        "--subtasks", action="store", type=int, default=6,
+        help="number of subtasks of each task (default 6)")
+    parser.add_argument(
+        "--seed", action="store", type=int, default=0,
+        help="seed of the random generator (default 0)")
+    args = parser.parse_args()
+
+    print("%-18s %10s %14s %10s" % (
+        "score mode", "replay s", "submissions/s", "changes"))
+    for score_mode in SCORE_MODES:
+        stores = make_stores(score_mode, args.users, args.tasks,
+                             args.submissions, args.subtasks, args.seed)
+        scoring_store = ScoringStore(stores)
+        changes = [0]
+
+        def count_change(unused_user, unused_task, unused_score):
+            changes[0] += 1
+        scoring_store.add_score_callback(count_change)
+
+        start = time.monotonic()
+        scoring_store.init_store()
+        elapsed = time.monotonic() - start
+        print("%-18s %10.2f %14.0f %10d" % (
+            score_mode, elapsed, args.submissions / elapsed, changes[0]))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure how fast the ranking web server stores and loads its data.
+
+For each kind of storage, create many subchanges in a store (as the
+PUTs sent by ProxyService do), timing each creation and the wait for
+all of them to be on disk; then time loading them again, as
+RankingWebServer does at startup.
+
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+
+from cmsranking.Storage import DirectoryStorage, JournalStorage
+from cmsranking.Store import Store
+from cmsranking.Subchange import Subchange
+
+
+STORAGES = [("directory", DirectoryStorage), ("journal", JournalStorage)]
+
+
+def percentile(values, fraction):
+    """Return the value at the given fraction of the sorted values.
+
+    values ([float]): the values, sorted.
+    fraction (float): between 0 and 1.
+
+    return (float): the percentile.
+
+    """
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def benchmark(storage_class, subchanges, base_dir):
+    """Time the creation and the loading of subchanges.
+
+    storage_class (type): the storage to use.
+    subchanges (int): the number of subchanges.
+    base_dir (str): an empty directory for the data.
+
+    return ((float, float, float, float)): the median and 99th
+        percentile of the latency of a creation, the time needed to
+        have all of them on disk, and the time to load them.
+
+    """
+    path = "%s/subchanges" % base_dir
+    # The subchanges are not checked against the submissions.
+    store = Store(Subchange, path, {}, storage_class=storage_class)
+    store.load_from_disk()
+
+    latencies = list()
+    start = time.monotonic()
+    for s in range(subchanges):
+        data = {"submission": "%07d" % s, "time": s,
+                "score": float(s % 100), "extra": ["%d" % (s % 100)]}
+        put_start = time.monotonic()
+        store.create("%07d" % s, data)
+        latencies.append(time.monotonic() - put_start)
+    store.flush()
+    write = time.monotonic() - start
+    latencies.sort()
+
+    store = Store(Subchange, path, {}, storage_class=storage_class)
+    start = time.monotonic()
+    store.load_from_disk()
+    load = time.monotonic() - start
+    assert len(store.retrieve_list()) == subchanges
+
+    return (percentile(latencies, 0.5), percentile(latencies, 0.99),
+            write, load)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the storages of the ranking web server.")
+    parser.add_argument(
+        "-s", "--subchanges", action="store", type=int, default=20000,
+        help="number of subchanges (default 20000)")
+    args = parser.parse_args()
+
+    print("%-10s %12s %12s %10s %10s" % (
+        "storage", "put p50 us", "put p99 us", "write s", "load s"))
+    for name, storage_class in STORAGES:
+        base_dir = tempfile.mkdtemp()
+        try:
+            p50, p99, write, load = benchmark(
+                storage_class, args.subchanges, base_dir)
+        finally:
+            shutil.rmtree(base_dir)
+        print("%-10s %12.1f %12.1f %10.2f %10.2f" % (
+            name, p50 * 1e6, p99 * 1e6, write, load))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
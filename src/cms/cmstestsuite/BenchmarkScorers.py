@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Compare the in-process scorers with the compiled checkers.
+
+For each input of the tasks having a scorer, generate a simple valid
+output, then score it both with the checker (as a Worker would, one
+process per evaluation) and with the scorer (parsing the input once,
+as a Worker would after the first evaluation), checking that the
+scores agree.
+
+"""
+
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from cms.grading.scorers import ScorerError
+from cms.grading.scorers.BookScanning import BookScanning
+from cms.grading.scorers.EvenMorePizza import EvenMorePizza
+from cms.grading.scorers.MorePizza import MorePizza
+
+
+logger = logging.getLogger(__name__)
+
+
+def book_scanning_output(parsed_input):
+    """Sign up all libraries in order, scanning all their books."""
+    books = len(parsed_input.book_scores)
+    lines = ["%d" % len(parsed_input.library_sizes)]
+    start = 0
+    for library, size in enumerate(parsed_input.library_sizes.tolist()):
+        keys = parsed_input.library_books[start:start + size]
+        lines.append("%d %d" % (library, size))
+        lines.append(" ".join(map(str, (keys - library * books).tolist())))
+        start += size
+    return "\n".join(lines) + "\n"
+
+
+def more_pizza_output(parsed_input):
+    """Order the largest pizzas that fit, but not all of them."""
+    chosen = []
+    slices = 0
+    for pizza_type in reversed(range(len(parsed_input.slice_counts))):
+        count = int(parsed_input.slice_counts[pizza_type])
+        if slices + count <= parsed_input.max_slices \
+                and len(chosen) + 1 < len(parsed_input.slice_counts):
+            chosen.append(pizza_type)
+            slices += count
+    return "%d\n%s\n" % (len(chosen), " ".join(map(str, sorted(chosen))))
+
+
+def even_more_pizza_output(parsed_input):
+    """Deliver consecutive pizzas, to the smallest teams first."""
+    lines = []
+    pizza = 0
+    pizzas = len(parsed_input.ingredient_counts)
+    for size, count in enumerate(parsed_input.teams, 2):
+        for _ in range(count):
+            if pizza + size > pizzas:
+                break
+            lines.append(" ".join(map(str, [size]
+                                      + list(range(pizza, pizza + size)))))
+            pizza += size
+    return "%d\n%s\n" % (len(lines), "\n".join(lines))
+
+
+TASKS = {
+    "book_scanning": (BookScanning, book_scanning_output),
+    "more_pizza": (MorePizza, more_pizza_output),
+    "even_more_pizza": (EvenMorePizza, even_more_pizza_output),
+}
+
+
+def run_checker(checker, input_path, output_path):
+    """Run a compiled checker, returning its outcome and text."""
+    process = subprocess.run([checker, input_path, input_path, output_path],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             check=True)
+    return (float(process.stdout.decode("utf-8").strip()),
+            process.stderr.decode("utf-8").strip())
+
+
+def benchmark(task, scorer_class, make_output, contest_dir, checker,
+              repetitions):
+    """Benchmark one task, return whether all scores agreed."""
+    input_dir = os.path.join(contest_dir, task, "input")
+    agreed = True
+    for filename in sorted(os.listdir(input_dir)):
+        input_path = os.path.join(input_dir, filename)
+        with open(input_path, "rb") as f:
+            input_data = f.read()
+        scorer = scorer_class()
+
+        start = time.monotonic()
+        try:
+            parsed_input = scorer.parse_input(input_data)
+        except ScorerError as error:
+            logger.warning("%s/%s: skipped, invalid input (%s).",
+                           task, filename, error)
+            continue
+        parse_time = time.monotonic() - start
+
+        output_data = make_output(parsed_input).encode("utf-8")
+        with tempfile.NamedTemporaryFile(suffix=".txt") as output_file:
+            output_file.write(output_data)
+            output_file.flush()
+
+            start = time.monotonic()
+            for _ in range(repetitions):
+                checker_score, _ = run_checker(checker, input_path,
+                                               output_file.name)
+            checker_time = (time.monotonic() - start) / repetitions
+
+        start = time.monotonic()
+        for _ in range(repetitions):
+            scorer_score = scorer.score(parsed_input, output_data)
+        score_time = (time.monotonic() - start) / repetitions
+
+        agreed &= checker_score == scorer_score
+        print("%-16s %-6s %10.1f %10.1f %10.1f %8.1fx %s" % (
+            task, filename, checker_time * 1000, parse_time * 1000,
+            score_time * 1000, checker_time / max(score_time, 1e-9),
+            "ok" if checker_score == scorer_score else
+            "MISMATCH (%s != %s)" % (checker_score, scorer_score)))
+    return agreed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the in-process scorers against the "
+                    "compiled checkers.")
+    parser.add_argument(
+        "contest_dir", action="store", type=str,
+        help="directory containing the tasks (e.g., contest/)")
+    parser.add_argument(
+        "checkers_dir", action="store", type=str,
+        help="directory containing the compiled checkers, named "
+             "<task>.out (e.g., build/src/checkers/)")
+    parser.add_argument(
+        "-r", "--repetitions", action="store", type=int, default=5,
+        help="number of times each output is scored (default 5)")
+    args = parser.parse_args()
+
+    print("%-16s %-6s %10s %10s %10s %9s" % (
+        "task", "input", "checker ms", "parse ms", "score ms", "speedup"))
+    agreed = True
+    for task, (scorer_class, make_output) in sorted(TASKS.items()):
+        checker = os.path.join(args.checkers_dir, "%s.out" % task)
+        if not os.path.exists(checker):
+            logger.warning("Checker %s not found, skipping task.", checker)
+            continue
+        agreed &= benchmark(task, scorer_class, make_output,
+                            args.contest_dir, checker, args.repetitions)
+
+    return 0 if agreed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Compare the block-based white diff with the line-based one.
+
+Generate a few kinds of multi-MB synthetic outputs, each together with
+a correct output that is equal to it for the white diff (or differs
+only at its very end, so that both have to be read entirely), then
+time the comparison of the two files with the current implementation
+and with the previous one, reading line by line, and report the
+throughput in MB/s of the user output.
+
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from cms.grading.steps import _WHITES, _white_diff
+
+
+def line_white_diff_canonicalize(string):
+    """The canonicalization of the line-based white diff."""
+    for char in _WHITES[1:]:
+        string = string.replace(char, _WHITES[0])
+    string = _WHITES[0].join([x for x in string.split(_WHITES[0])
+                              if len(x) > 0])
+    return string
+
+
+def line_white_diff(output, res):
+    """The line-based white diff, as it was before reading in blocks."""
+    while True:
+        lout = output.readline()
+        lres = res.readline()
+
+        if len(lres) == 0 and len(lout) == 0:
+            return True
+
+        elif len(lres) == 0 or len(lout) == 0:
+            lout = lout.strip(b''.join(_WHITES))
+            lres = lres.strip(b''.join(_WHITES))
+            if len(lout) > 0 or len(lres) > 0:
+                return False
+
+        else:
+            lout = line_white_diff_canonicalize(lout)
+            lres = line_white_diff_canonicalize(lres)
+            if lout != lres:
+                return False
+
+
+def numbers(rng, size, tokens_per_line):
+    """Lines of numbers separated by single spaces."""
+    lines = []
+    length = 0
+    while length < size:
+        line = b" ".join(b"%d" % rng.randrange(10 ** 9)
+                         for _ in range(tokens_per_line)) + b"\n"
+        lines.append(line)
+        length += len(line)
+    return b"".join(lines)
+
+
+def messy(rng, data):
+    """The same tokens, with random runs of whitespaces and CRLFs."""
+    lines = []
+    for line in data.split(b"\n"):
+        tokens = line.split(b" ")
+        lines.append(b"".join(
+            rng.choice([b" ", b"  ", b"\t", b" \t "]) + token
+            for token in tokens) + rng.choice([b"", b" ", b"\r"]))
+    return b"\n".join(lines)
+
+
+def make_cases(size, seed):
+    """Return the (name, expected, output, correct output) cases."""
+    rng = random.Random(seed)
+    lines = numbers(rng, size, 10)
+    long_line = numbers(rng, size, 1000000)
+    wrong = bytearray(lines)
+    wrong[-2:-1] = b"x"
+    return [
+        ("short lines, identical", True, lines, lines),
+        ("short lines, whitespaces", True, messy(rng, lines), lines),
+        ("short lines, wrong at end", False, bytes(wrong), lines),
+        ("one long line, identical", True, long_line, long_line),
+        ("one long line, whitespaces", True, messy(rng, long_line),
+         long_line),
+    ]
+
+
+def time_diff(diff, output_path, correct_output_path, repetitions):
+    """Return the result and the best time of diff over the two files."""
+    best = None
+    for _ in range(repetitions):
+        with open(output_path, "rb") as output, \
+                open(correct_output_path, "rb") as correct_output:
+            start = time.monotonic()
+            result = diff(output, correct_output)
+            elapsed = time.monotonic() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the white diff on synthetic outputs.")
+    parser.add_argument(
+        "-s", "--size", action="store", type=int, default=16,
+        help="approximate size of the outputs in MiB (default 16)")
+    parser.add_argument(
+        "-r", "--repetitions", action="store", type=int, default=3,
+        help="number of times each comparison is timed (default 3)")
+    parser.add_argument(
+        "--seed", action="store", type=int, default=0,
+        help="seed of the generated outputs (default 0)")
+    args = parser.parse_args()
+
+    print("%-28s %8s %10s %10s %9s" % (
+        "case", "MB", "line MB/s", "block MB/s", "speedup"))
+    agreed = True
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_path = os.path.join(temp_dir, "output.txt")
+        correct_output_path = os.path.join(temp_dir, "correct_output.txt")
+        for name, expected, output, correct_output in make_cases(
+                args.size * 1024 * 1024, args.seed):
+            with open(output_path, "wb") as f:
+                f.write(output)
+            with open(correct_output_path, "wb") as f:
+                f.write(correct_output)
+            mb = len(output) / 1000000
+
+            line_result, line_time = time_diff(
+                line_white_diff, output_path, correct_output_path,
+                args.repetitions)
+            block_result, block_time = time_diff(
+                _white_diff, output_path, correct_output_path,
+                args.repetitions)
+
+            ok = line_result == block_result == expected
+            agreed &= ok
+            print("%-28s %8.1f %10.1f %10.1f %8.1fx %s" % (
+                name, mb, mb / max(line_time, 1e-9),
+                mb / max(block_time, 1e-9),
+                line_time / max(block_time, 1e-9),
+                "ok" if ok else "MISMATCH (%s, %s, expected %s)" % (
+                    line_result, block_result, expected)))
+
+    return 0 if agreed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
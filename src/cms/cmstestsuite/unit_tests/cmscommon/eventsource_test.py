@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the Server-Sent Events pub-sub system."""
+
+import unittest
+
+from cmscommon.eventsource import REINIT, Publisher
+
+
+class TestPublisher(unittest.TestCase):
+
+    def test_broadcast(self):
+        pub = Publisher(10)
+        subs = [pub.get_subscriber(), pub.get_subscriber()]
+        pub.put("score", "u t 1.00")
+        for sub in subs:
+            msgs = list(sub.get())
+            self.assertEqual(len(msgs), 1)
+            self.assertIn(b"event:score\ndata:u t 1.00\n", msgs[0])
+
+    def test_replay_from_cache(self):
+        pub = Publisher(10)
+        pub.put("a", "1")
+        first_id = list(pub._cache)[0][0]
+        pub.put("b", "2")
+        msgs = list(pub.get_subscriber("%x" % first_id).get())
+        self.assertEqual(len(msgs), 1)
+        self.assertIn(b"event:b", msgs[0])
+
+    def test_reinit_when_missing_from_cache(self):
+        pub = Publisher(1)
+        sub = pub.get_subscriber("0")
+        self.assertEqual(list(sub.get()), [REINIT])
+        self.assertTrue(sub.closed)
+
+    def test_queue_size(self):
+        pub = Publisher(10, queue_size=2)
+        slow = pub.get_subscriber()
+        fast = pub.get_subscriber()
+        for i in range(2):
+            pub.put("a", "%d" % i)
+        self.assertEqual(len(list(fast.get())), 2)
+        self.assertFalse(slow.closed)
+
+        # The slow subscriber has two messages waiting: the third one
+        # makes it drop them and ask for a reinit.
+        pub.put("a", "2")
+        pub.put("a", "3")
+        self.assertEqual(list(slow.get()), [REINIT])
+        self.assertTrue(slow.closed)
+        self.assertEqual(len(list(fast.get())), 2)
+        self.assertFalse(fast.closed)
+
+    def test_queue_unbounded(self):
+        pub = Publisher(10)
+        sub = pub.get_subscriber()
+        for i in range(100):
+            pub.put("a", "%d" % i)
+        self.assertEqual(len(list(sub.get())), 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
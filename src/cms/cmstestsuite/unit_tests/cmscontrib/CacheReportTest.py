@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the CacheReport script"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from cmscontrib.CacheReport import scan_caches, summarize
+
+
+class TestCacheReport(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    def write(self, cache, digest, size):
+        path = os.path.join(self.cache_dir, cache)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, digest), "wb") as f:
+            f.write(b"x" * size)
+
+    def test_scan_and_summarize(self):
+        self.write("fs-cache-Worker-0", "a", 10)
+        self.write("fs-cache-Worker-0", "b", 5)
+        self.write("fs-cache-Worker-1", "a", 10)
+        self.write("fs-cache-ContestWebServer-0", "c", 1)
+        # Not caches, or not files of the caches.
+        self.write("other", "d", 100)
+        os.makedirs(os.path.join(self.cache_dir, "fs-cache-Worker-1",
+                                 "_temp123"))
+        self.write(os.path.join("fs-cache-Worker-1", ".locks"), "00", 0)
+
+        caches = scan_caches(self.cache_dir)
+
+        self.assertEqual(caches, {
+            "fs-cache-Worker-0": {"a": 10, "b": 5},
+            "fs-cache-Worker-1": {"a": 10},
+            "fs-cache-ContestWebServer-0": {"c": 1},
+        })
+        self.assertEqual(summarize(caches), {
+            "files": 4,
+            "size": 26,
+            "unique_files": 3,
+            "unique_size": 16,
+            "savings": 10,
+        })
+
+
+if __name__ == "__main__":
+    unittest.main()
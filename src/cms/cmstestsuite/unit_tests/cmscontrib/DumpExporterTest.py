@@ -20,6 +20,7 @@
 
 import json
 import os
+import tarfile
 import unittest
 
 # Needs to be first to allow for monkey patching the DB connection string.
@@ -85,7 +86,7 @@ class TestDumpExporter(DatabaseMixin, FileSystemMixin, unittest.TestCase):
         super().tearDown()
 
     def do_export(self, contest_ids, dump_files=True, skip_generated=False,
-                  skip_submissions=False):
+                  skip_submissions=False, resume=False):
         """Create an exporter and call do_export in a convenient way"""
         r = DumpExporter(
             contest_ids,
@@ -95,7 +96,8 @@ class TestDumpExporter(DatabaseMixin, FileSystemMixin, unittest.TestCase):
             skip_generated=skip_generated,
             skip_submissions=skip_submissions,
             skip_user_tests=False,
-            skip_print_jobs=False).do_export()
+            skip_print_jobs=False,
+            resume=resume).do_export()
         dump_path = os.path.join(self.target, "contest.json")
         try:
             with open(dump_path, "rt", encoding="utf-8") as f:
@@ -269,6 +271,47 @@ class TestDumpExporter(DatabaseMixin, FileSystemMixin, unittest.TestCase):
         self.assertNotInDump(SubmissionResult)
         self.assertFileNotInDump(self.exe_digest)
 
+    def test_export_archive(self):
+        """Test exporting to an archive."""
+        target = self.get_path("dump.tar.gz")
+        self.assertTrue(DumpExporter(
+            None, target, dump_files=True, dump_model=True,
+            skip_generated=False, skip_submissions=False,
+            skip_user_tests=False, skip_print_jobs=False).do_export())
+
+        with tarfile.open(target) as archive:
+            self.dump = json.load(archive.extractfile("dump/contest.json"))
+            self.assertEqual(archive.extractfile(
+                "dump/files/%s" % self.st_digest).read(), self.st_content)
+            self.assertIsNotNone(archive.extractfile(
+                "dump/descriptions/%s" % self.st_digest))
+        self.assertInDump(Contest, name=self.contest.name)
+        self.assertEqual(self.dump["_version"], version)
+
+    def test_resume(self):
+        """Test resuming an export, skipping the files already exported."""
+        self.makedirs("target")
+        with open(os.path.join(self.target, ".progress"), "wt",
+                  encoding="utf-8") as f:
+            # The last line is incomplete, so it is ignored.
+            f.write("%s\n%s" % (self.st_digest, self.exe_digest[:10]))
+        self.assertTrue(self.do_export(None, resume=True))
+
+        self.assertInDump(Statement, digest=self.st_digest)
+        self.assertFileNotInDump(self.st_digest)
+        self.assertFileInDump(self.exe_digest, self.exe_content)
+        self.assertFileInDump(self.file_digest, self.file_content)
+        self.assertFalse(
+            os.path.exists(os.path.join(self.target, ".progress")))
+
+    def test_dont_resume_to_archive(self):
+        target = self.get_path("dump.tar.gz")
+        self.assertFalse(DumpExporter(
+            None, target, dump_files=True, dump_model=True,
+            skip_generated=False, skip_submissions=False,
+            skip_user_tests=False, skip_print_jobs=False,
+            resume=True).do_export())
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -136,7 +136,8 @@ class TestDumpImporter(DatabaseMixin, FileSystemMixin, unittest.TestCase):
         super().tearDown()
 
     def do_import(self, drop=False, load_files=True,
-                  skip_generated=False, skip_submissions=False):
+                  skip_generated=False, skip_submissions=False,
+                  resume=False):
         """Create an importer and call do_import in a convenient way"""
         return DumpImporter(
             drop,
@@ -146,7 +147,8 @@ class TestDumpImporter(DatabaseMixin, FileSystemMixin, unittest.TestCase):
             skip_generated=skip_generated,
             skip_submissions=skip_submissions,
             skip_user_tests=False,
-            skip_print_jobs=False).do_import()
+            skip_print_jobs=False,
+            resume=resume).do_import()
 
     def write_dump(self, dump):
         destination = self.get_path("contest.json")
@@ -279,6 +281,26 @@ class TestDumpImporter(DatabaseMixin, FileSystemMixin, unittest.TestCase):
         self.assertFileNotInDb(TestDumpImporter.GENERATED_FILE_DIGEST)
         self.assertFileNotInDb(TestDumpImporter.NON_GENERATED_FILE_DIGEST)
 
+    def test_import_resume(self):
+        """Test resuming an import, skipping the files already imported."""
+        self.write_dump(TestDumpImporter.DUMP)
+        self.write_files(TestDumpImporter.FILES)
+        progress_path = self.base_dir + DumpImporter.PROGRESS_SUFFIX
+        with open(progress_path, "wt", encoding="utf-8") as f:
+            f.write('{"digest": "%s"}\n'
+                    % TestDumpImporter.GENERATED_FILE_DIGEST)
+        self.addCleanup(lambda: os.path.exists(progress_path)
+                        and os.remove(progress_path))
+        self.assertTrue(self.do_import(resume=True))
+
+        self.assertContestInDb("contestname", "contest description 你好",
+                               [("taskname", "task title")],
+                               [("username", "Last Name")])
+        self.assertFileNotInDb(TestDumpImporter.GENERATED_FILE_DIGEST)
+        self.assertFileInDb(
+            TestDumpImporter.NON_GENERATED_FILE_DIGEST, "subsource", b"source")
+        self.assertFalse(os.path.exists(progress_path))
+
     def test_import_old(self):
         """Test importing an old dump.
 
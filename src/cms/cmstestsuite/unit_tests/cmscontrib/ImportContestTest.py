@@ -19,6 +19,7 @@
 """Tests for the ImportContest script"""
 
 import unittest
+from unittest.mock import patch
 
 # Needs to be first to allow for monkey patching the DB connection string.
 from cmstestsuite.unit_tests.databasemixin import DatabaseMixin
@@ -196,6 +197,22 @@ class TestImportContest(DatabaseMixin, unittest.TestCase):
 
         self.assertFalse(ret)
 
+    @patch.object(TaskLoader, "task_imported")
+    def test_import_task_imported_notified(self, task_imported):
+        # The loader of a task is notified only once the task is in the DB.
+        name = "new_name"
+        contest = self.get_contest(name=name, description="new_desc")
+        task = self.get_task(name="new_task_name", contest=contest)
+        ret = self.do_import(contest, [(task, True)], [], import_tasks=False)
+        self.assertFalse(ret)
+        task_imported.assert_not_called()
+
+        contest = self.get_contest(name=name, description="new_desc")
+        task = self.get_task(name="new_task_name", contest=contest)
+        ret = self.do_import(contest, [(task, True)], [], import_tasks=True)
+        self.assertTrue(ret)
+        task_imported.assert_called_once_with()
+
     def test_import_task_in_db_already_attached_fail(self):
         # Completely new contest, but the task is already attached to another
         # contest in the DB.
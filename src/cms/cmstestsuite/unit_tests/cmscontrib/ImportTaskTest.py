@@ -19,6 +19,7 @@
 """Tests for the ImportTask script"""
 
 import unittest
+from unittest.mock import patch
 
 # Needs to be first to allow for monkey patching the DB connection string.
 from cmstestsuite.unit_tests.databasemixin import DatabaseMixin
@@ -156,6 +157,21 @@ class TestImportTask(DatabaseMixin, unittest.TestCase):
                             task_id=self.task_id,
                             dataset_ids=[self.dataset_id])
 
+    @patch.object(TaskLoader, "task_imported")
+    def test_task_imported_notified(self, task_imported):
+        # The loader is notified only once the task is in the DB.
+        new_task = self.get_task(name=self.task_name, title="new_title")
+        ret = self.do_import(new_task, self.contest_id, update=False,
+                             task_has_changed=True)
+        self.assertFalse(ret)
+        task_imported.assert_not_called()
+
+        new_task = self.get_task(name=self.task_name, title="new_title")
+        ret = self.do_import(new_task, self.contest_id, update=True,
+                             task_has_changed=True)
+        self.assertTrue(ret)
+        task_imported.assert_called_once_with()
+
     def test_task_exists_update(self):
         # Task exists, and we update it, attaching it to the same contest.
         # The existing dataset should be kept.
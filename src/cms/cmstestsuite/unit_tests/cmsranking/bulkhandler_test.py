@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the bulk endpoint of the ranking web server."""
+
+import json
+import os
+import unittest
+from base64 import b64encode
+
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+from cmscommon.constants import SCORE_MODE_MAX
+from cmstestsuite.unit_tests.filesystemmixin import FileSystemMixin
+from cmsranking.Contest import Contest
+from cmsranking.RankingWebServer import BulkHandler
+from cmsranking.Scoring import ScoringStore
+from cmsranking.Store import Store
+from cmsranking.Subchange import Subchange
+from cmsranking.Submission import Submission
+from cmsranking.Task import Task
+from cmsranking.Team import Team
+from cmsranking.User import User
+
+
+CONTEST = {"name": "Contest", "begin": 0, "end": 1000, "score_precision": 0}
+TASK = {"name": "Task", "short_name": "t", "contest": "c",
+        "max_score": 100.0, "score_precision": 0, "extra_headers": [],
+        "score_mode": SCORE_MODE_MAX, "order": 0}
+USER = {"f_name": "First", "l_name": "Last", "team": None}
+SUBMISSION = {"user": "u", "task": "t", "time": 10}
+
+
+class TestBulkHandler(FileSystemMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.stores = dict()
+        for name, entity in [("subchange", Subchange),
+                             ("submission", Submission),
+                             ("user", User), ("team", Team),
+                             ("task", Task), ("contest", Contest)]:
+            self.stores[name] = Store(
+                entity, os.path.join(self.base_dir, name), self.stores)
+            self.stores[name].load_from_disk()
+        self.stores["scoring"] = ScoringStore(self.stores)
+        self.stores["scoring"].init_store()
+        self.client = Client(
+            BulkHandler(self.stores, "usern4me", "passw0rd", "Realm"),
+            Response)
+
+    def put(self, data, password="passw0rd"):
+        auth = b64encode(("usern4me:%s" % password).encode("utf-8"))
+        return self.client.put(
+            "/", data=json.dumps(data), content_type="application/json",
+            headers={"Authorization": b"Basic " + auth})
+
+    def test_all_types(self):
+        # The order of the types in the request does not matter.
+        response = self.put({"submissions": {"s": SUBMISSION},
+                             "users": {"u": USER},
+                             "tasks": {"t": TASK},
+                             "contests": {"c": CONTEST}})
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.stores["submission"].retrieve("s"), SUBMISSION)
+        self.assertIn("u", self.stores["user"])
+
+    def test_update(self):
+        self.put({"contests": {"c": CONTEST}})
+        contest = dict(CONTEST, name="Other")
+        self.assertEqual(self.put({"contests": {"c": contest}}).status_code,
+                         204)
+        self.assertEqual(self.stores["contest"].retrieve("c"), contest)
+
+    def test_unauthorized(self):
+        self.assertEqual(
+            self.put({"contests": {"c": CONTEST}}, "wrong").status_code, 401)
+        self.assertNotIn("c", self.stores["contest"])
+
+    def test_unknown_type(self):
+        self.assertEqual(self.put({"flags": {}}).status_code, 400)
+
+    def test_inconsistent(self):
+        # The task refers to a contest that does not exist.
+        self.assertEqual(self.put({"tasks": {"t": TASK}}).status_code, 400)
+        self.assertNotIn("t", self.stores["task"])
+
+
+if __name__ == "__main__":
+    unittest.main()
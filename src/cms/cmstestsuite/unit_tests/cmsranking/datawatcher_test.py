@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the event stream of the ranking web server."""
+
+import unittest
+from unittest.mock import MagicMock
+
+import gevent
+
+from cmsranking.RankingWebServer import DataWatcher
+
+
+class TestDataWatcher(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.stores = dict((name, MagicMock()) for name in
+                           ["contest", "task", "team", "user", "scoring"])
+
+    def sent(self, watcher):
+        # Drop the id line and the final empty line.
+        return [msg.split(b"\n", 1)[1][:-1]
+                for _, msg in watcher._pub._cache]
+
+    def test_no_window(self):
+        watcher = DataWatcher(self.stores, 10)
+        watcher.score_callback("u", "t", 1.0)
+        watcher.score_callback("u", "t", 2.0)
+        self.assertEqual(self.sent(watcher), [
+            b"event:score\ndata:u t 1.00\n",
+            b"event:score\ndata:u t 2.00\n"])
+
+    def test_coalesce(self):
+        watcher = DataWatcher(self.stores, 10, score_window=0.01)
+        watcher.score_callback("u", "t1", 1.0)
+        watcher.score_callback("u", "t2", 5.0)
+        watcher.score_callback("u", "t1", 2.0)
+        self.assertEqual(self.sent(watcher), [])
+        gevent.sleep(0.05)
+        self.assertEqual(self.sent(watcher), [
+            b"event:score_batch\ndata:u t2 5.00\ndata:u t1 2.00\n"])
+        self.assertEqual(watcher._pending_scores, {})
+        self.assertIsNone(watcher._flusher)
+
+    def test_flush_before_entity_events(self):
+        watcher = DataWatcher(self.stores, 10, score_window=10)
+        watcher.score_callback("u", "t", 1.0)
+        watcher.callback("user", "delete", "u")
+        self.assertEqual(self.sent(watcher), [
+            b"event:score_batch\ndata:u t 1.00\n",
+            b"event:user\ndata:delete u\n"])
+        self.assertIsNone(watcher._flusher)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the scoring of the ranking web server."""
+
+import random
+import unittest
+from itertools import zip_longest
+
+from cmscommon.constants import \
+    SCORE_MODE_MAX, SCORE_MODE_MAX_SUBTASK, SCORE_MODE_MAX_TOKENED_LAST
+from cmsranking.Scoring import NumberSet, Score
+from cmsranking.Subchange import Subchange
+from cmsranking.Submission import Submission
+
+
+class TestNumberSet(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.numbers = NumberSet()
+
+    def test_empty(self):
+        self.assertEqual(self.numbers.query(), 0.0)
+
+    def test_max(self):
+        for val in [3.0, 7.5, 1.0]:
+            self.numbers.insert(val)
+        self.assertEqual(self.numbers.query(), 7.5)
+
+    def test_max_at_least_zero(self):
+        self.numbers.insert(-2.0)
+        self.assertEqual(self.numbers.query(), 0.0)
+
+    def test_remove(self):
+        for val in [3.0, 7.5, 7.5, 1.0]:
+            self.numbers.insert(val)
+        self.numbers.remove(7.5)
+        self.assertEqual(self.numbers.query(), 7.5)
+        self.numbers.remove(7.5)
+        self.assertEqual(self.numbers.query(), 3.0)
+        self.numbers.insert(7.5)
+        self.assertEqual(self.numbers.query(), 7.5)
+
+    def test_remove_missing(self):
+        self.numbers.insert(3.0)
+        with self.assertRaises(ValueError):
+            self.numbers.remove(4.0)
+        self.numbers.remove(3.0)
+        with self.assertRaises(ValueError):
+            self.numbers.remove(3.0)
+
+    def test_clear(self):
+        self.numbers.insert(3.0)
+        self.numbers.clear()
+        self.assertEqual(self.numbers.query(), 0.0)
+        with self.assertRaises(ValueError):
+            self.numbers.remove(3.0)
+
+    def test_random(self):
+        rnd = random.Random(42)
+        values = list()
+        for _ in range(2000):
+            if values and rnd.random() < 0.4:
+                val = values.pop(rnd.randrange(len(values)))
+                self.numbers.remove(val)
+            else:
+                val = float(rnd.randrange(50))
+                values.append(val)
+                self.numbers.insert(val)
+            self.assertEqual(self.numbers.query(), max(values + [0.0]))
+
+
+def expected_score(score_obj, score_mode):
+    """Compute the current score of score_obj from scratch."""
+    submissions = list(score_obj._submissions.values())
+    if score_mode == SCORE_MODE_MAX:
+        return max((s.score for s in submissions), default=0.0)
+    elif score_mode == SCORE_MODE_MAX_SUBTASK:
+        scores_by_subtask = zip_longest(
+            *(map(float, s.extra or [s.score]) for s in submissions),
+            fillvalue=0.0)
+        return float(sum(max(s) for s in scores_by_subtask))
+    else:
+        released = [s.score for s in submissions if s.token]
+        last = score_obj._last.score if score_obj._last is not None else 0.0
+        return max(released + [last, 0.0])
+
+
+class TestScore(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.rnd = random.Random(42)
+
+    def submission(self, time):
+        submission = Submission()
+        submission.user = "user"
+        submission.task = "task"
+        submission.time = time
+        return submission
+
+    def subchange(self, key, submission, time):
+        subchange = Subchange()
+        subchange.key = key
+        subchange.submission = submission
+        subchange.time = time
+        if self.rnd.random() < 0.8:
+            subchange.score = float(self.rnd.randrange(100))
+        if self.rnd.random() < 0.3:
+            subchange.token = True
+        if self.rnd.random() < 0.5:
+            subchange.extra = [str(self.rnd.randrange(30))
+                               for _ in range(self.rnd.randrange(4))]
+        return subchange
+
+    def replay(self, score_mode, submissions=50, changes=300):
+        """Replay a random history, checking the score at each step."""
+        score_obj = Score(score_mode)
+        for i in range(submissions):
+            score_obj.create_submission("%03d" % i, self.submission(i))
+        for i in range(changes):
+            # Mostly in order, sometimes in the past.
+            time = i if self.rnd.random() < 0.9 else self.rnd.randrange(i + 1)
+            score_obj.create_subchange("%04d" % i, self.subchange(
+                "%04d" % i, "%03d" % self.rnd.randrange(submissions), time))
+            self.assertEqual(score_obj.get_score(),
+                             expected_score(score_obj, score_mode))
+        return score_obj
+
+    def test_max(self):
+        self.replay(SCORE_MODE_MAX)
+
+    def test_max_subtask(self):
+        self.replay(SCORE_MODE_MAX_SUBTASK)
+
+    def test_max_tokened_last(self):
+        self.replay(SCORE_MODE_MAX_TOKENED_LAST)
+
+    def test_delete(self):
+        score_obj = self.replay(SCORE_MODE_MAX_SUBTASK)
+        for i in range(0, 300, 7):
+            score_obj.delete_subchange("%04d" % i)
+            self.assertEqual(score_obj.get_score(),
+                             expected_score(score_obj, SCORE_MODE_MAX_SUBTASK))
+        for i in range(0, 50, 3):
+            score_obj.delete_submission("%03d" % i)
+            self.assertEqual(score_obj.get_score(),
+                             expected_score(score_obj, SCORE_MODE_MAX_SUBTASK))
+
+    def test_update_score_mode(self):
+        score_obj = self.replay(SCORE_MODE_MAX)
+        score_obj.update_score_mode(SCORE_MODE_MAX_SUBTASK)
+        score_obj.create_subchange("9999", self.subchange("9999", "000", 999))
+        self.assertEqual(score_obj.get_score(),
+                         expected_score(score_obj, SCORE_MODE_MAX_SUBTASK))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the snapshot of the ranking web server."""
+
+import gzip
+import json
+import os
+import unittest
+
+from cmscommon.constants import SCORE_MODE_MAX
+from cmstestsuite.unit_tests.filesystemmixin import FileSystemMixin
+from cmsranking.Contest import Contest
+from cmsranking.Scoring import ScoringStore
+from cmsranking.Snapshot import Snapshot
+from cmsranking.Store import Store
+from cmsranking.Subchange import Subchange
+from cmsranking.Submission import Submission
+from cmsranking.Task import Task
+from cmsranking.Team import Team
+from cmsranking.User import User
+
+
+CONTEST = {"name": "Contest", "begin": 0, "end": 1000, "score_precision": 0}
+TASK = {"name": "Task", "short_name": "t", "contest": "c",
+        "max_score": 100.0, "score_precision": 0, "extra_headers": [],
+        "score_mode": SCORE_MODE_MAX, "order": 0}
+TEAM = {"name": "Team"}
+USER = {"f_name": "First", "l_name": "Last", "team": "tm"}
+
+
+class TestSnapshot(FileSystemMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.stores = dict()
+        for name, entity in [("subchange", Subchange),
+                             ("submission", Submission),
+                             ("user", User), ("team", Team),
+                             ("task", Task), ("contest", Contest)]:
+            self.stores[name] = Store(
+                entity, os.path.join(self.base_dir, name), self.stores)
+            self.stores[name].load_from_disk()
+        self.stores["contest"].create("c", CONTEST)
+        self.stores["task"].create("t", TASK)
+        self.stores["team"].create("tm", TEAM)
+        self.stores["user"].create("u", USER)
+        self.stores["scoring"] = ScoringStore(self.stores)
+        self.stores["scoring"].init_store()
+        self.snapshot = Snapshot(self.stores)
+
+    def submit(self, key, time, score):
+        self.stores["submission"].create(
+            key, {"user": "u", "task": "t", "time": time})
+        self.stores["subchange"].create(
+            "%s_%d" % (key, time), {"submission": key, "time": time,
+                                    "score": score, "extra": []})
+
+    def load(self, payload):
+        data = json.loads(payload.data.decode("utf-8"))
+        self.assertEqual(json.loads(gzip.decompress(payload.gzipped_data)
+                                    .decode("utf-8")), data)
+        return data
+
+    def test_initial(self):
+        data = self.load(self.snapshot.get_snapshot())
+        self.assertEqual(data["contests"],
+                         self.stores["contest"].retrieve_list())
+        self.assertEqual(data["tasks"], self.stores["task"].retrieve_list())
+        self.assertEqual(data["teams"], self.stores["team"].retrieve_list())
+        self.assertEqual(data["users"], self.stores["user"].retrieve_list())
+        self.assertEqual(data["scores"], {})
+
+    def test_cached(self):
+        payload = self.snapshot.get_snapshot()
+        self.assertIs(self.snapshot.get_snapshot(), payload)
+        self.assertIs(self.snapshot.get_history(),
+                      self.snapshot.get_history())
+
+    def test_entity_changes(self):
+        etag = self.snapshot.get_snapshot().etag
+        self.stores["team"].create("tm2", {"name": "Other"})
+        self.stores["user"].update("u", dict(USER, f_name="New"))
+        payload = self.snapshot.get_snapshot()
+        self.assertNotEqual(payload.etag, etag)
+        data = self.load(payload)
+        self.assertEqual(data["teams"]["tm2"]["name"], "Other")
+        self.assertEqual(data["users"]["u"]["f_name"], "New")
+
+        self.stores["team"].delete("tm2")
+        self.assertNotIn("tm2",
+                         self.load(self.snapshot.get_snapshot())["teams"])
+
+    def test_scores(self):
+        history_etag = self.snapshot.get_history().etag
+        self.submit("s1", 10, 30.0)
+        self.assertEqual(self.load(self.snapshot.get_snapshot())["scores"],
+                         {"u": {"t": 30.0}})
+        self.assertEqual(self.load(self.snapshot.get_history()),
+                         [["u", "t", 10, 30.0]])
+        self.assertNotEqual(self.snapshot.get_history().etag, history_etag)
+
+        # Scores that go back to zero are not listed.
+        self.stores["subchange"].delete("s1_10")
+        self.stores["submission"].delete("s1")
+        self.assertEqual(self.load(self.snapshot.get_snapshot())["scores"], {})
+
+    def test_history_without_score_change(self):
+        self.submit("s1", 10, 30.0)
+        self.submit("s2", 20, 30.0)
+        etag = self.snapshot.get_snapshot().etag
+        self.assertEqual(len(self.load(self.snapshot.get_history())), 1)
+        self.submit("s3", 5, 10.0)
+        self.assertEqual(len(self.load(self.snapshot.get_history())), 2)
+        self.assertEqual(self.snapshot.get_snapshot().etag, etag)
+
+    def test_etag_per_instance(self):
+        other = Snapshot(self.stores)
+        self.assertNotEqual(other.get_snapshot().etag,
+                            self.snapshot.get_snapshot().etag)
+
+
+if __name__ == "__main__":
+    unittest.main()
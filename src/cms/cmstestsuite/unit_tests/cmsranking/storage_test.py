@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the persistent storage of the ranking stores."""
+
+import json
+import os
+import unittest
+from unittest.mock import patch
+
+import gevent
+
+from cmstestsuite.unit_tests.filesystemmixin import FileSystemMixin
+from cmsranking.Storage import DirectoryStorage, JournalStorage
+from cmsranking.Store import Store
+from cmsranking.Team import Team
+
+
+class StorageMixin(FileSystemMixin):
+
+    storage_class = None
+
+    def setUp(self):
+        super().setUp()
+        self.path = self.get_path("teams")
+
+    def reopen(self, storage=None):
+        if storage is not None:
+            storage.flush()
+        storage = self.storage_class(self.path)
+        return storage, storage.load()
+
+    def test_roundtrip(self):
+        storage, data = self.reopen()
+        self.assertEqual(data, {})
+        storage.put("a", {"name": "A"})
+        storage.put("b", {"name": "B"})
+        storage.put("a", {"name": "AA"})
+        storage.delete("b")
+        storage, data = self.reopen(storage)
+        self.assertEqual(data, {"a": {"name": "AA"}})
+
+
+class TestDirectoryStorage(StorageMixin, unittest.TestCase):
+
+    storage_class = DirectoryStorage
+
+    def test_invalid_file(self):
+        self.makedirs("teams")
+        self.write_file("teams/a.json", b"{")
+        self.write_file("teams/b.json", b'{"name": "B"}')
+        self.assertEqual(self.reopen()[1], {"b": {"name": "B"}})
+
+
+class TestJournalStorage(StorageMixin, unittest.TestCase):
+
+    storage_class = JournalStorage
+
+    def test_put_does_not_write(self):
+        storage, _ = self.reopen()
+        storage.put("a", {"name": "A"})
+        self.assertEqual(os.path.getsize(self.path + ".journal"), 0)
+        # The writer greenlet writes the change as soon as it can run.
+        gevent.sleep(0.01)
+        self.assertEqual(self.reopen()[1], {"a": {"name": "A"}})
+
+    def test_group_commit(self):
+        storage, _ = self.reopen()
+        with patch("os.fsync") as fsync:
+            for i in range(10):
+                storage.put("k%d" % i, {"name": "%d" % i})
+            storage.flush()
+        fsync.assert_called_once()
+        self.assertEqual(len(self.reopen()[1]), 10)
+
+    def test_partial_line(self):
+        storage, _ = self.reopen()
+        storage.put("a", {"name": "A"})
+        storage.flush()
+        with open(self.path + ".journal", "ab") as f:
+            f.write(b'["put", "b", {"na')
+        storage, data = self.reopen()
+        self.assertEqual(data, {"a": {"name": "A"}})
+        storage.put("c", {"name": "C"})
+        self.assertEqual(self.reopen(storage)[1],
+                         {"a": {"name": "A"}, "c": {"name": "C"}})
+
+    def test_compaction(self):
+        storage, _ = self.reopen()
+        with patch.object(JournalStorage, "COMPACT_MIN_LINES", 5):
+            for i in range(4):
+                storage.put("a", {"name": "%d" % i})
+            storage.flush()
+            self.assertFalse(os.path.exists(self.path + ".snapshot"))
+            storage.put("b", {"name": "B"})
+            storage.flush()
+        self.assertEqual(os.path.getsize(self.path + ".journal"), 0)
+        with open(self.path + ".snapshot", "rt", encoding="utf-8") as f:
+            self.assertEqual(json.load(f),
+                             {"a": {"name": "3"}, "b": {"name": "B"}})
+        storage.delete("b")
+        self.assertEqual(self.reopen(storage)[1], {"a": {"name": "3"}})
+
+    def test_write_failure(self):
+        storage, _ = self.reopen()
+        storage.put("a", {"name": "A"})
+        storage.flush()
+        with patch("os.fsync", side_effect=OSError):
+            storage.put("b", {"name": "B"})
+            self.assertFalse(storage._write_queue())
+        # The change is still queued, and written by the next attempt
+        # after the line written in part.
+        with open(self.path + ".journal", "ab") as f:
+            f.write(b'["put", "b", {"na')
+        storage.put("c", {"name": "C"})
+        self.assertTrue(storage._write_queue())
+        self.assertEqual(self.reopen(storage)[1], {"a": {"name": "A"},
+                                                   "b": {"name": "B"},
+                                                   "c": {"name": "C"}})
+
+    def test_migration(self):
+        self.makedirs("teams")
+        self.write_file("teams/a.json", b'{"name": "A"}')
+        self.write_file("teams/b.json", b'{"name": "B"}')
+        storage, data = self.reopen()
+        self.assertEqual(data, {"a": {"name": "A"}, "b": {"name": "B"}})
+        self.assertFalse(os.path.exists(self.path))
+        self.assertTrue(os.path.isdir(self.path + ".migrated"))
+        storage.delete("a")
+        self.assertEqual(self.reopen(storage)[1], {"b": {"name": "B"}})
+
+
+class TestStore(FileSystemMixin, unittest.TestCase):
+
+    def test_journal(self):
+        path = self.get_path("teams")
+        store = Store(Team, path, {}, storage_class=JournalStorage)
+        store.load_from_disk()
+        store.create("a", {"name": "A"})
+        store.update("a", {"name": "AA"})
+        store.merge_list({"b": {"name": "B"}, "c": {"name": "C"}})
+        store.delete("c")
+        store.flush()
+
+        store = Store(Team, path, {}, storage_class=JournalStorage)
+        store.load_from_disk()
+        self.assertEqual(store.retrieve_list(),
+                         {"a": {"name": "AA"}, "b": {"name": "B"}})
+
+    def test_invalid_entity(self):
+        self.makedirs("teams")
+        self.write_file("teams/a.json", b'{"name": 1}')
+        self.write_file("teams/b.json", b'{"name": "B"}')
+        store = Store(Team, self.get_path("teams"), {})
+        store.load_from_disk()
+        self.assertEqual(store.retrieve_list(), {"b": {"name": "B"}})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -23,15 +23,21 @@
 
 """
 
+import multiprocessing
 import os
 import random
 import shutil
+import tempfile
 import unittest
 from io import BytesIO
+from unittest.mock import Mock, patch
+
+import gevent
 
 # Needs to be first to allow for monkey patching the DB connection string.
 from cmstestsuite.unit_tests.databasemixin import DatabaseMixin
 
+from cms import config
 from cms.db.filecacher import FileCacher
 from cmscommon.digest import Digester, bytes_digest
 
@@ -285,6 +291,26 @@ class TestFileCacherBase:
             else:
                 self.fail("Content differ.")
 
+    def test_file_from_temp_path(self):
+        """Store a file already written in the temp dir, which FC
+        should move into its local cache.
+
+        """
+        self.content = bytes(random.getrandbits(8) for _ in range(100))
+        digest = bytes_digest(self.content)
+        temp_path = os.path.join(self.file_cacher.temp_dir, "upload")
+        with open(temp_path, "wb") as f:
+            f.write(self.content)
+
+        data = self.file_cacher.put_file_from_temp_path(
+            temp_path, digest, "Test #006")
+
+        self.assertEqual(data, digest)
+        self.assertFalse(os.path.exists(temp_path))
+        self.check_stored_file(digest)
+        self.assertEqual(self.file_cacher.get_file_content(digest),
+                         self.content)
+
     def test_big_file(self):
         """Put a ~10MB file into the storage (using a specially
         crafted file-like object).
@@ -382,5 +408,183 @@ class TestFileCacherFS(TestFileCacherBase, unittest.TestCase):
         shutil.rmtree("fs-storage", ignore_errors=True)
 
 
+class TestFileCacherEviction(unittest.TestCase):
+    """Tests for the size budget of the local cache of FileCacher."""
+
+    def setUp(self):
+        super().setUp()
+        self.file_cacher = FileCacher(null=True)
+        self.file_cacher.max_size = 250
+
+    def tearDown(self):
+        shutil.rmtree(self.file_cacher.file_dir, ignore_errors=True)
+
+    def put(self):
+        return self.file_cacher.put_file_content(os.urandom(100))
+
+    def is_cached(self, digest):
+        return os.path.exists(os.path.join(self.file_cacher.file_dir, digest))
+
+    def test_evict_least_recently_used(self):
+        first = self.put()
+        second = self.put()
+        # Access the first file, so that the second becomes the least
+        # recently used.
+        self.file_cacher.get_file_content(first)
+        third = self.put()
+
+        self.assertTrue(self.is_cached(first))
+        self.assertFalse(self.is_cached(second))
+        self.assertTrue(self.is_cached(third))
+        status = self.file_cacher.get_cache_status()
+        self.assertEqual(status["size"], 200)
+        self.assertEqual(status["files"], 2)
+        self.assertEqual(status["evictions"], 1)
+        self.assertEqual(status["hits"], 1)
+
+    def test_open_files_are_not_evicted(self):
+        first = self.put()
+        fobj = self.file_cacher.get_file(first)
+        self.put()
+        self.put()
+
+        self.assertTrue(self.is_cached(first))
+        self.assertEqual(self.file_cacher.get_cache_status()["size"], 200)
+
+        # Once closed, the file can be evicted again.
+        fobj.close()
+        self.put()
+        self.assertFalse(self.is_cached(first))
+
+    def test_pinned_files_are_not_evicted(self):
+        first = self.put()
+        self.file_cacher.pin(first)
+        self.put()
+        self.put()
+
+        self.assertTrue(self.is_cached(first))
+
+        # Once unpinned, the file can be evicted again.
+        self.file_cacher.unpin(first)
+        self.put()
+        self.assertFalse(self.is_cached(first))
+
+
+class TestFileCacherShared(unittest.TestCase):
+    """Tests for the local cache shared by the services of a host."""
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        for name, value in [("cache_dir", self.cache_dir),
+                            ("shared_fs_cache", True)]:
+            patcher = patch.object(config, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        storage = os.path.join(self.cache_dir, "fs-storage")
+        self.first = self.file_cacher(storage, "Worker", 0)
+        self.second = self.file_cacher(storage, "ContestWebServer", 0)
+
+    @staticmethod
+    def file_cacher(storage, name, shard):
+        service = Mock(shard=shard)
+        service.name = name
+        file_cacher = FileCacher(service, path=storage)
+        file_cacher.backend.get_file = Mock(
+            wraps=file_cacher.backend.get_file)
+        return file_cacher
+
+    def test_same_directory(self):
+        self.assertTrue(self.first.shared)
+        self.assertEqual(self.first.file_dir, self.second.file_dir)
+        digest = self.first.put_file_content(b"content")
+        self.assertEqual(self.second.get_file_content(digest), b"content")
+        self.second.backend.get_file.assert_not_called()
+
+    def test_load_waits_for_other_process(self):
+        digest = self.first.put_file_content(b"content")
+        cache_path = os.path.join(self.first.file_dir, digest)
+        os.unlink(cache_path)
+
+        # While the file is being loaded by the first, the second waits
+        # and then finds it in the cache.
+        with self.first._locked(digest):
+            greenlet = gevent.spawn(self.second.load, digest)
+            gevent.sleep(0.05)
+            self.assertFalse(greenlet.ready())
+            with open(cache_path, "wb") as f:
+                f.write(b"content")
+        greenlet.get()
+        self.second.backend.get_file.assert_not_called()
+
+    def test_destroy_cache_keeps_shared_files(self):
+        digest = self.first.put_file_content(b"content")
+        self.first.destroy_cache()
+        self.assertFalse(os.path.exists(self.first.temp_dir))
+        self.assertEqual(self.second.get_file_content(digest), b"content")
+
+    def test_scan_and_purge_only_own_files(self):
+        digest = self.first.put_file_content(b"content")
+        storage = os.path.join(self.cache_dir, "fs-storage")
+        third = self.file_cacher(storage, "Worker", 1)
+        self.assertEqual(third.get_cache_status()["files"], 0)
+        third.purge_cache()
+        self.assertTrue(os.path.exists(os.path.join(third.file_dir, digest)))
+
+    def test_put_file_not_evicted_by_other_process(self):
+        # Another process tries to evict the file while it is saved.
+        dropped = []
+
+        def save(digest, desc=""):
+            dropped.append(self.first._try_drop(digest))
+            original_save(digest, desc)
+        original_save = self.second.save
+        self.second.save = save
+
+        digest = self.second.put_file_content(b"content")
+        self.assertEqual(dropped, [False])
+        self.assertTrue(os.path.exists(
+            os.path.join(self.second.file_dir, digest)))
+
+    @staticmethod
+    def pin_in_other_process(storage, digest, connection):
+        service = Mock(shard=0)
+        service.name = "Checker"
+        file_cacher = FileCacher(service, path=storage)
+        file_cacher.pin(digest)
+        connection.send("pinned")
+        if connection.recv() == "unpin":
+            file_cacher.unpin(digest)
+            connection.send("unpinned")
+            connection.recv()
+
+    def test_files_pinned_by_other_process_are_not_evicted(self):
+        digest = self.first.put_file_content(b"content")
+        cache_path = os.path.join(self.first.file_dir, digest)
+        self.first.max_size = 0
+
+        connection, child_connection = multiprocessing.Pipe()
+        process = multiprocessing.get_context("fork").Process(
+            target=self.pin_in_other_process,
+            args=(os.path.join(self.cache_dir, "fs-storage"), digest,
+                  child_connection))
+        process.start()
+        self.addCleanup(process.join)
+        self.addCleanup(connection.send, "exit")
+        self.assertEqual(connection.recv(), "pinned")
+
+        self.first._evict_if_needed()
+        self.assertTrue(os.path.exists(cache_path))
+        self.first.purge_cache()
+        self.assertTrue(os.path.exists(cache_path))
+
+        connection.send("unpin")
+        self.assertEqual(connection.recv(), "unpinned")
+        self.first._evict_if_needed()
+        self.assertFalse(os.path.exists(cache_path))
+        self.assertEqual(self.first.get_cache_status()["evictions"], 1)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -19,10 +19,17 @@
 
 """Tests for general utility functions."""
 
+import errno
 import io
+import os
+import shutil
+import stat
 import unittest
+from unittest.mock import patch
 
-from cms.grading.Sandbox import Truncator
+from cms import config
+from cms.db.filecacher import FileCacher
+from cms.grading.Sandbox import StupidSandbox, Truncator
 
 
 class TestTruncator(unittest.TestCase):
@@ -62,5 +69,117 @@ class TestTruncator(unittest.TestCase):
         self.perform_truncator_test(100, 40, 7)
 
 
+class LinkingStupidSandbox(StupidSandbox):
+    """A StupidSandbox that populates files with hard links."""
+    ALLOW_HARDLINKS = True
+
+
+class TestCreateFileFromStorage(unittest.TestCase):
+    """Test the population of the sandbox from the FileCacher."""
+
+    CONTENT = b"1 2 3\n" * 1000
+
+    def setUp(self):
+        self.file_cacher = FileCacher(null=True)
+        self.digest = self.file_cacher.put_file_content(self.CONTENT)
+        self.cache_path = os.path.join(self.file_cacher.file_dir,
+                                       self.digest)
+        self.sandbox_class = StupidSandbox
+
+    def tearDown(self):
+        shutil.rmtree(self.file_cacher.file_dir, ignore_errors=True)
+
+    def create(self, population, path="input.txt", executable=False):
+        # Keep the sandbox on the same filesystem as the cache.
+        sandbox = self.sandbox_class(
+            self.file_cacher, temp_dir=self.file_cacher.file_dir)
+        with patch.object(config, "sandbox_file_population", population):
+            sandbox.create_file_from_storage(path, self.digest, executable)
+        return sandbox, sandbox.relative_path(path)
+
+    def assertShared(self, real_path, shared):
+        self.assertEqual(
+            os.path.samefile(real_path, self.cache_path), shared)
+
+    def test_copy(self):
+        sandbox, real_path = self.create("copy")
+        self.assertEqual(sandbox.get_file_to_string("input.txt", None),
+                         self.CONTENT)
+        self.assertShared(real_path, False)
+
+    def test_reflink_falls_back_to_copy(self):
+        sandbox, real_path = self.create("reflink")
+        self.assertEqual(sandbox.get_file_to_string("input.txt", None),
+                         self.CONTENT)
+        self.assertShared(real_path, False)
+
+    def test_link_not_allowed(self):
+        # StupidSandbox runs processes as ourselves, so no hard links.
+        sandbox, real_path = self.create("link")
+        self.assertEqual(sandbox.get_file_to_string("input.txt", None),
+                         self.CONTENT)
+        self.assertShared(real_path, False)
+
+    def test_link(self):
+        self.sandbox_class = LinkingStupidSandbox
+        sandbox, real_path = self.create("link", executable=True)
+        self.assertEqual(sandbox.get_file_to_string("input.txt", None),
+                         self.CONTENT)
+        self.assertShared(real_path, True)
+        mode = stat.S_IMODE(os.stat(real_path).st_mode)
+        self.assertEqual(mode & 0o222, 0)
+        self.assertEqual(mode & 0o111, 0o111)
+        # The link is only removed, the cache is untouched.
+        sandbox.remove_file("input.txt")
+        self.assertEqual(self.file_cacher.get_file_content(self.digest),
+                         self.CONTENT)
+
+    def test_link_unshare(self):
+        self.sandbox_class = LinkingStupidSandbox
+        sandbox, real_path = self.create("link")
+        sandbox._unshare_file(real_path)
+        self.assertShared(real_path, False)
+        self.assertEqual(sandbox.get_file_to_string("input.txt", None),
+                         self.CONTENT)
+
+    def test_link_across_filesystems(self):
+        self.sandbox_class = LinkingStupidSandbox
+        with patch("os.link", side_effect=OSError(errno.EXDEV, "Cross-device")):
+            sandbox, real_path = self.create("link")
+        self.assertShared(real_path, False)
+        self.assertEqual(sandbox.get_file_to_string("input.txt", None),
+                         self.CONTENT)
+        self.assertFalse(sandbox._can_link)
+
+    def test_link_pins(self):
+        self.sandbox_class = LinkingStupidSandbox
+        self.file_cacher.max_size = len(self.CONTENT)
+        sandbox, real_path = self.create("link")
+        # Not evicted while the sandbox uses it, even over budget.
+        self.file_cacher.put_file_content(b"other")
+        self.assertTrue(os.path.exists(self.cache_path))
+
+        sandbox.remove_file("input.txt")
+        self.assertEqual(self.file_cacher.get_cache_status()["pinned_files"],
+                         0)
+        self.file_cacher.put_file_content(b"another")
+        self.assertFalse(os.path.exists(self.cache_path))
+
+    def test_link_unpinned_on_cleanup(self):
+        self.sandbox_class = LinkingStupidSandbox
+        sandbox, _ = self.create("link")
+        self.assertEqual(self.file_cacher.get_cache_status()["pinned_files"],
+                         1)
+        sandbox.cleanup(delete=True)
+        self.assertEqual(self.file_cacher.get_cache_status()["pinned_files"],
+                         0)
+
+    def test_copy_does_not_pin(self):
+        self.create("copy")
+        self.create("reflink", path="other.txt")
+        self.assertEqual(self.file_cacher.get_cache_status()["pinned_files"],
+                         0)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the allocation of box ids."""
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from cms.grading.boxids import BoxIdAllocator
+
+
+# Locks the byte of a box id in a lock file, then waits for stdin to be
+# closed.
+LOCKER = """
+import fcntl, os, sys
+fd = os.open(sys.argv[1], os.O_RDWR | os.O_CREAT)
+fcntl.lockf(fd, fcntl.LOCK_EX, 1, int(sys.argv[2]))
+print("locked", flush=True)
+sys.stdin.read()
+"""
+
+
+class TestBoxIdAllocator(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.lock_path = os.path.join(self.dir.name, "box-ids")
+
+    def allocator(self, first_id=10, num_boxes=13):
+        return BoxIdAllocator(first_id, num_boxes, self.lock_path)
+
+    def lock_in_other_process(self, box_id):
+        process = subprocess.Popen(
+            [sys.executable, "-c", LOCKER, self.lock_path, str(box_id)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.assertEqual(process.stdout.readline(), b"locked\n")
+        return process
+
+    def test_acquire_release(self):
+        allocator = self.allocator()
+        self.assertEqual(
+            [allocator.acquire() for _ in range(3)], [10, 11, 12])
+        with self.assertRaises(OSError):
+            allocator.acquire()
+        allocator.release(11)
+        self.assertEqual(allocator.acquire(), 11)
+        self.assertEqual(allocator.get_leased(), {10, 11, 12})
+
+    def test_round_robin(self):
+        allocator = self.allocator()
+        box_id = allocator.acquire()
+        allocator.release(box_id)
+        # The next id is preferred to the one just released.
+        self.assertEqual(allocator.acquire(), 11)
+
+    def test_other_process(self):
+        process = self.lock_in_other_process(10)
+        try:
+            allocator = self.allocator()
+            self.assertEqual(allocator.acquire(), 11)
+            self.assertEqual(allocator.acquire(), 12)
+            with self.assertRaises(OSError):
+                allocator.acquire()
+        finally:
+            process.stdin.close()
+            process.wait()
+        # The lease of a dead process is reclaimed.
+        self.assertEqual(allocator.acquire(), 10)
+
+    def test_released_to_other_processes(self):
+        allocator = self.allocator()
+        allocator.acquire()
+        allocator.release(10)
+        process = self.lock_in_other_process(10)
+        process.stdin.close()
+        process.wait()
+
+    def test_no_lock_file(self):
+        allocator = BoxIdAllocator(10, 12, None)
+        self.assertEqual(allocator.acquire(), 10)
+        self.assertEqual(allocator.acquire(), 11)
+
+    def test_invalid_range(self):
+        with self.assertRaises(ValueError):
+            BoxIdAllocator(10, 10, None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the pool of sandboxes."""
+
+import unittest
+from unittest.mock import Mock, patch
+
+import gevent
+
+from cms.grading.sandboxpool import SandboxPool
+
+
+class TestSandboxPool(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.created = []
+        patcher = patch("cms.grading.sandboxpool.Sandbox",
+                        side_effect=self.new_sandbox)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.file_cacher = Mock()
+        self.pool = SandboxPool(self.file_cacher, 2)
+
+    def new_sandbox(self, file_cacher, name=None):
+        sandbox = Mock()
+        sandbox.name = name
+        sandbox.reset.return_value = True
+        self.created.append(sandbox)
+        return sandbox
+
+    @staticmethod
+    def run_greenlets():
+        gevent.sleep(0)
+        gevent.sleep(0)
+
+    def test_fill(self):
+        sandbox = self.pool.get("first")
+        self.assertIs(sandbox, self.created[0])
+        self.run_greenlets()
+        self.assertEqual(len(self.created), 3)
+        # The next ones come from the pool.
+        self.assertIn(self.pool.get("second"), self.created[1:])
+        self.assertEqual(self.pool.get_status()["hits"], 1)
+        self.assertEqual(self.pool.get_status()["misses"], 1)
+
+    def test_reuse(self):
+        sandbox = self.pool.get()
+        self.run_greenlets()
+        self.pool.get()
+        self.pool.put(sandbox)
+        self.run_greenlets()
+        sandbox.reset.assert_called_once_with()
+        sandbox.cleanup.assert_not_called()
+        status = self.pool.get_status()
+        self.assertEqual(status["idle"], 2)
+        self.assertEqual(status["resets"], 1)
+        self.assertIsNotNone(status["average_reset_time"])
+
+    def test_full(self):
+        sandbox = self.pool.get()
+        self.run_greenlets()
+        self.pool.put(sandbox)
+        self.run_greenlets()
+        sandbox.reset.assert_not_called()
+        sandbox.cleanup.assert_called_once_with(delete=True)
+        self.assertEqual(self.pool.get_status()["retired"], 1)
+
+    def test_failed_reset(self):
+        sandbox = self.pool.get()
+        self.run_greenlets()
+        self.pool.get()
+        sandbox.reset.return_value = False
+        self.pool.put(sandbox)
+        self.run_greenlets()
+        sandbox.cleanup.assert_called_once_with(delete=True)
+        self.assertEqual(self.pool.get_status()["failed_resets"], 1)
+
+    def test_max_uses(self):
+        sandbox = self.pool.get()
+        self.run_greenlets()
+        self.pool.get()
+        self.pool._uses[sandbox] = SandboxPool.MAX_USES
+        self.pool.put(sandbox)
+        self.run_greenlets()
+        sandbox.reset.assert_not_called()
+        sandbox.cleanup.assert_called_once_with(delete=True)
+
+    def test_create_error(self):
+        with patch("cms.grading.sandboxpool.Sandbox",
+                   side_effect=OSError("No space left")):
+            with self.assertRaises(OSError):
+                self.pool.get()
+            self.run_greenlets()
+        status = self.pool.get_status()
+        self.assertEqual(status["idle"], 0)
+        self.assertEqual(status["pending"], 0)
+
+    def test_close(self):
+        sandbox = self.pool.get()
+        self.run_greenlets()
+        self.pool.close()
+        for idle_sandbox in self.created[1:]:
+            idle_sandbox.cleanup.assert_called_once_with(delete=True)
+        # Sandboxes given back after closing are not kept.
+        self.pool.put(sandbox)
+        self.run_greenlets()
+        sandbox.reset.assert_not_called()
+        sandbox.cleanup.assert_called_once_with(delete=True)
+        self.assertEqual(self.pool.get_status()["idle"], 0)
+
+    def test_close_while_resetting(self):
+        sandbox = self.pool.get()
+        self.run_greenlets()
+        self.pool.get()
+        sandbox.reset.side_effect = lambda: gevent.sleep(0.01) or True
+        self.pool.put(sandbox)
+        gevent.sleep(0)
+        self.pool.close()
+        gevent.sleep(0.02)
+        sandbox.cleanup.assert_called_once_with(delete=True)
+        self.assertEqual(self.pool.get_status()["idle"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the BookScanning scorer."""
+
+import unittest
+
+from cms.grading.scorers import ScorerError
+from cms.grading.scorers.BookScanning import BookScanning
+
+
+INPUT = b"""6 2 7
+1 2 3 6 5 4
+5 2 2
+0 1 2 3 4
+4 3 1
+0 2 3 5
+"""
+
+
+class TestBookScanning(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.scorer = BookScanning()
+        self.parsed_input = self.scorer.parse_input(INPUT)
+
+    def score(self, output):
+        return self.scorer.score(self.parsed_input, output)
+
+    def test_example(self):
+        self.assertEqual(self.score(b"2\n1 3\n5 2 3\n0 5\n0 1 2 3 4\n"), 16)
+
+    def test_books_limited_by_days(self):
+        # Library 1 signs up in 3 days, then ships one book per day.
+        self.assertEqual(self.score(b"1\n1 2\n5 3\n"), 10)
+        self.assertEqual(self.score(b"1\n1 4\n0 2 3 5\n"), 1 + 3 + 6 + 4)
+
+    def test_second_library_partially_scanned(self):
+        # Library 0 signs up on days 3-4 and ships its first book.
+        self.assertEqual(self.score(b"2\n1 1\n5\n0 1\n0\n"), 5)
+
+    def test_libraries_after_deadline_ignored(self):
+        scorer_input = self.scorer.parse_input(
+            b"2 2 3\n1 1\n1 3 1\n0\n1 1 1\n1\n")
+        self.assertEqual(
+            self.scorer.score(scorer_input, b"2\n0 1\n0\n1 1\n1\n"), 0)
+        self.assertEqual(
+            self.scorer.score(scorer_input, b"2\n1 1\n1\n0 1\n0\n"), 1)
+
+    def test_books_counted_once(self):
+        self.assertEqual(self.score(b"2\n0 1\n2\n1 1\n2\n"), 3)
+
+    def test_empty(self):
+        self.assertEqual(self.score(b"0\n"), 0)
+
+    def test_invalid_outputs(self):
+        for output in [b"", b"3\n", b"1\n2 1\n0\n", b"1\n0 6\n0 1 2 3 4 4\n",
+                       b"1\n0 2\n0 5\n", b"1\n0 2\n1 1\n", b"1\n0 2\n1\n",
+                       b"1\n0 2\n1 x\n"]:
+            with self.assertRaises(ScorerError, msg=output):
+                self.score(output)
+
+    def test_invalid_inputs(self):
+        for data in [b"6 2", b"6 2 7\n1 2 3 6 5 400\n5 2 2\n0 1 2 3 4\n",
+                     b"6 1 7\n1 2 3 6 5 4\n2 2 2\n0 0\n",
+                     b"6 1 7\n1 2 3 6 5 4\n2 2 2\n0 6\n",
+                     b"6 1 7\n1 2 3 6 5 4\n2 2 2\n0\n"]:
+            with self.assertRaises(ScorerError, msg=data):
+                self.scorer.parse_input(data)
+
+
+if __name__ == "__main__":
+    unittest.main()
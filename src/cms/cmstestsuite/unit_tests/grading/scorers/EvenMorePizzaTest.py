@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the EvenMorePizza scorer."""
+
+import unittest
+
+from cms.grading.scorers import ScorerError
+from cms.grading.scorers.EvenMorePizza import EvenMorePizza
+
+
+INPUT = b"""5 1 2 1
+3 onion pepper olive
+3 mushroom tomato basil
+3 chicken mushroom pepper
+3 tomato mushroom basil
+2 chicken basil
+"""
+
+
+class TestEvenMorePizza(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.scorer = EvenMorePizza()
+        self.parsed_input = self.scorer.parse_input(INPUT)
+
+    def score(self, output):
+        return self.scorer.score(self.parsed_input, output)
+
+    def test_example(self):
+        self.assertEqual(self.score(b"2\n2 1 4\n3 0 2 3\n"), 16 + 49)
+
+    def test_shared_ingredients_counted_once(self):
+        # Pizzas 1 and 3 have the same ingredients.
+        self.assertEqual(self.score(b"1\n2 1 3\n"), 9)
+
+    def test_invalid_outputs(self):
+        for output in [b"", b"0\n", b"5\n", b"1\n5 0 1 2 3 4\n",
+                       b"2\n2 0 1\n2 2 3\n", b"1\n2 0 0\n", b"1\n2 0 5\n",
+                       b"1\n3 0 1\n"]:
+            with self.assertRaises(ScorerError, msg=output):
+                self.score(output)
+
+    def test_invalid_inputs(self):
+        for data in [b"5 1 2", b"0 1 2 1\n", b"1 1 2 1\n3 onion pepper\n",
+                     b"1 1 2 1\nx onion\n"]:
+            with self.assertRaises(ScorerError, msg=data):
+                self.scorer.parse_input(data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the MorePizza scorer and the scorer infrastructure."""
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+from cms.grading.scorers import ScorerError, score_output
+from cms.grading.scorers.MorePizza import MorePizza
+
+
+INPUT = b"17 4\n2 5 6 8\n"
+
+
+class TestMorePizza(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.scorer = MorePizza()
+        self.parsed_input = self.scorer.parse_input(INPUT)
+
+    def score(self, output):
+        return self.scorer.score(self.parsed_input, output)
+
+    def test_example(self):
+        self.assertEqual(self.score(b"3\n0 2 3\n"), 16)
+
+    def test_empty(self):
+        self.assertEqual(self.score(b"0\n"), 0)
+
+    def test_invalid_outputs(self):
+        for output in [b"", b"4\n0 1 2 3\n", b"2\n0\n", b"2\n0 0\n",
+                       b"2\n0 4\n", b"3\n1 2 3\n"]:
+            with self.assertRaises(ScorerError, msg=output):
+                self.score(output)
+
+    def test_invalid_inputs(self):
+        for data in [b"17", b"17 4\n2 5 6\n", b"17 4\n2 5 6 18\n",
+                     b"17 4\n2 6 5 8\n"]:
+            with self.assertRaises(ScorerError, msg=data):
+                self.scorer.parse_input(data)
+
+
+@patch.dict("cms.grading.scorers.SCORERS", {"MorePizza": MorePizza})
+@patch.dict("cms.grading.scorers._parsed_inputs", clear=True)
+class TestScoreOutput(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.files = {"input": INPUT, "good": b"2\n0 3\n", "bad": b"2\n0 0\n"}
+        self.file_cacher = MagicMock()
+        self.file_cacher.get_file_content.side_effect = self.files.get
+
+    def test_success(self):
+        self.assertEqual(
+            score_output(self.file_cacher, "MorePizza", "input", "good"),
+            (10.0, ["[Output correct]: score = 10."]))
+
+    def test_invalid_output(self):
+        outcome, text = score_output(
+            self.file_cacher, "MorePizza", "input", "bad")
+        self.assertEqual(outcome, 0.0)
+        self.assertIn("Duplicate", text[0])
+
+    def test_input_parsed_once(self):
+        score_output(self.file_cacher, "MorePizza", "input", "good")
+        score_output(self.file_cacher, "MorePizza", "input", "bad")
+        requested = [args[0] for args, _
+                     in self.file_cacher.get_file_content.call_args_list]
+        self.assertEqual(requested, ["input", "good", "bad"])
+
+    def test_invalid_input(self):
+        self.files["input"] = b"17 4\n"
+        outcome, text = score_output(
+            self.file_cacher, "MorePizza", "input", "good")
+        self.assertEqual(outcome, 0.0)
+        self.assertIn("Input incorrect", text[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the utilities of the scorers."""
+
+import unittest
+import warnings
+
+from cms.grading.scorers.util import parse_integers
+
+
+class TestParseIntegers(unittest.TestCase):
+
+    def assertParsed(self, data, expected):
+        # Deprecated NumPy parsing would emit a warning.
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            result = parse_integers(data)
+        self.assertEqual(result.dtype.name, "int64")
+        self.assertEqual(result.tolist(), expected)
+
+    def test_integers(self):
+        self.assertParsed(b"3 -1\n+2\t4\n", [3, -1, 2, 4])
+        self.assertParsed(b"", [])
+        self.assertParsed(b" \n", [])
+
+    def test_stops_at_first_non_integer(self):
+        self.assertParsed(b"1 2 x 3\n", [1, 2])
+        self.assertParsed(b"1 2.5 3\n", [1])
+        self.assertParsed(b"1 1_0 3\n", [1])
+        self.assertParsed(b"x 1\n", [])
+
+    def test_stops_at_overflow(self):
+        self.assertParsed(b"1 9223372036854775807 9223372036854775808 2",
+                          [1, 9223372036854775807])
+
+
+if __name__ == "__main__":
+    unittest.main()
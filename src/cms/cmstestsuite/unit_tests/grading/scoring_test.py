@@ -26,7 +26,9 @@ from datetime import timedelta
 # Needs to be first to allow for monkey patching the DB connection string.
 from cmstestsuite.unit_tests.databasemixin import DatabaseMixin
 
-from cms.grading.scoring import task_score
+from cms.db import ParticipationTaskScore
+from cms.grading.scoring import cached_task_score, get_task_score_rows, \
+    task_score, update_task_score
 from cmscommon.constants import \
     SCORE_MODE_MAX, SCORE_MODE_MAX_SUBTASK, SCORE_MODE_MAX_TOKENED_LAST
 from cmscommon.datetime import make_datetime
@@ -382,5 +384,72 @@ class TestTaskScoreMax(TaskScoreMixin, unittest.TestCase):
         self.assertEqual(self.call(rounded=True), (44.44, False))
 
 
+class TestStoredTaskScore(TaskScoreMixin, unittest.TestCase):
+    """Tests for update_task_score() and cached_task_score()."""
+
+    def setUp(self):
+        super().setUp()
+        self.task.score_mode = SCORE_MODE_MAX
+        self.session.flush()
+
+    def update(self):
+        update_task_score(self.session, self.participation.id, self.task.id)
+        return get_task_score_rows(
+            self.session, participation_id=self.participation.id).get(
+                (self.participation.id, self.task.id))
+
+    def test_stored(self):
+        self.add_result(self.at(1), 44.4, tokened=True, public_score=4.4)
+        self.add_result(self.at(2), 66.6, tokened=False, public_score=6.6)
+        self.session.flush()
+        row = self.update()
+        self.assertEqual(row.dataset_id, self.task.active_dataset_id)
+        self.assertEqual(row.get_score(), (66.6, False))
+        self.assertEqual(row.get_score(public=True), (6.6, False))
+        self.assertEqual(row.get_score(only_tokened=True), (44.4, False))
+
+    def test_updated(self):
+        self.add_result(self.at(1), 44.4)
+        self.session.flush()
+        self.update()
+        self.add_result(self.at(2), 66.6)
+        self.session.flush()
+        self.assertEqual(self.update().get_score(), (66.6, False))
+
+    def test_invalidated(self):
+        self.add_result(self.at(1), 44.4)
+        self.session.flush()
+        self.update()
+        self.add_result(self.at(2), 66.6)
+        self.session.flush()
+        self.assertEqual(self.session.query(ParticipationTaskScore).count(),
+                         0)
+
+    def test_cached(self):
+        self.add_result(self.at(1), 44.44444)
+        self.session.flush()
+        row = self.update()
+        # The stored score is used even if the submissions say otherwise.
+        row.score = 11.11111
+        self.assertEqual(cached_task_score(
+            self.participation, self.task, row, rounded=True),
+            (11.11, False))
+
+    def test_cached_fallback(self):
+        self.add_result(self.at(1), 44.4)
+        self.session.flush()
+        self.assertEqual(
+            cached_task_score(self.participation, self.task, None),
+            (44.4, False))
+        row = self.update()
+        row.score = 11.1
+        dataset = self.add_dataset(task=self.task)
+        self.session.flush()
+        row.dataset_id = dataset.id
+        self.assertEqual(
+            cached_task_score(self.participation, self.task, row),
+            (44.4, False))
+
+
 if __name__ == "__main__":
     unittest.main()
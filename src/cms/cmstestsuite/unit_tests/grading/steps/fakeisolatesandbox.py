@@ -134,3 +134,6 @@ class FakeIsolateSandbox(IsolateSandbox):
 
     def cleanup(self):
         pass
+
+    def _cleanup_isolate(self):
+        pass
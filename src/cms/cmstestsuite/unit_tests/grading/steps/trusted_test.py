@@ -18,12 +18,16 @@
 
 """Tests for the trusted step."""
 
+import os
+import shutil
 import unittest
 from unittest.mock import ANY, MagicMock, call, patch
 
-from cms.grading.Sandbox import Sandbox
-from cms.grading.steps import extract_outcome_and_text, trusted_step, \
-    checker_step, trusted
+from cms import config
+from cms.db.filecacher import FileCacher
+from cms.grading.Sandbox import Sandbox, StupidSandbox
+from cms.grading.steps import ResidentChecker, extract_outcome_and_text, \
+    trusted_step, checker_step, trusted
 from cmstestsuite.unit_tests.grading.steps.fakeisolatesandbox \
     import FakeIsolateSandbox
 from cmstestsuite.unit_tests.grading.steps.stats_test import get_stats
@@ -357,5 +361,65 @@ class TestCheckerStep(unittest.TestCase):
         self.assertLoggedError()
 
 
+# A resident checker scoring the number of tokens in common between the
+# input and each user output; it exits when it sees the token "crash"
+# and loops forever when it sees "hang".
+RESIDENT_CHECKER = b"""#!/usr/bin/env python3
+import sys
+tokens = set(open(sys.argv[2]).read().split())
+for line in sys.stdin:
+    output = open(line.strip()).read().split()
+    if "crash" in output:
+        sys.exit(1)
+    if "hang" in output:
+        while True:
+            pass
+    print(len(tokens.intersection(output)))
+    print("translate:success")
+    sys.stdout.flush()
+"""
+
+
+class TestResidentChecker(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.file_cacher = FileCacher(null=True)
+        self.checker = ResidentChecker(
+            StupidSandbox(self.file_cacher,
+                          temp_dir=self.file_cacher.file_dir),
+            self.file_cacher.put_file_content(RESIDENT_CHECKER),
+            self.file_cacher.put_file_content(b"a b c d"),
+            self.file_cacher.put_file_content(b"correct"))
+
+    def tearDown(self):
+        self.checker.close()
+        shutil.rmtree(self.file_cacher.file_dir, ignore_errors=True)
+
+    def check(self, content):
+        return self.checker.check(self.file_cacher.put_file_content(content))
+
+    def test_many_outputs(self):
+        self.assertEqual(self.check(b"a b x"),
+                         (True, 2.0, ["Output is correct"]))
+        self.assertEqual(self.check(b"d"),
+                         (True, 1.0, ["Output is correct"]))
+        self.assertTrue(self.checker.is_alive())
+        # User outputs are removed after being checked.
+        self.assertFalse(any(
+            filename.startswith("user_output")
+            for filename in os.listdir(self.checker.sandbox.get_root_path())))
+
+    def test_crash(self):
+        self.assertEqual(self.check(b"crash"), (False, None, None))
+        self.assertFalse(self.checker.is_alive())
+        self.assertEqual(self.check(b"a"), (False, None, None))
+
+    @patch.object(config, "trusted_sandbox_max_time_s", 0.1)
+    def test_timeout(self):
+        self.assertEqual(self.check(b"hang"), (False, None, None))
+        self.assertFalse(self.checker.is_alive())
+
+
 if __name__ == "__main__":
     unittest.main()
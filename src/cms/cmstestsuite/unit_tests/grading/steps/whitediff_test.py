@@ -18,8 +18,10 @@
 
 """Tests for whitediff.py."""
 
+import random
 import unittest
 from io import BytesIO
+from unittest.mock import patch
 
 from cms.grading.steps import _WHITES, _white_diff
 
@@ -67,6 +69,71 @@ class TestWhiteDiff(unittest.TestCase):
         self.assertFalse(self._diff("1 2", "1\n2"))
         self.assertFalse(self._diff("1\n\n2", "1\n2"))
 
+    def test_blocks(self):
+        # Runs of whitespaces and tokens across the block boundaries.
+        with patch("cms.grading.steps.whitediff._BLOCK_SIZE", 4):
+            self.assertTrue(self._diff("1      \t  2\n", "1 2"))
+            self.assertTrue(self._diff("123456789 1", "123456789\t1\n\n"))
+            self.assertTrue(self._diff("1 \n       \n    \n", "1"))
+            self.assertTrue(self._diff("1\n   \n    2", "1\n\n2"))
+            self.assertFalse(self._diff("1234 5678", "12345678"))
+            self.assertFalse(self._diff("1\n\n     \n   2", "1\n\n2"))
+
+
+class TestWhiteDiffRandom(unittest.TestCase):
+    """Compare _white_diff with a line by line reference implementation
+    on random files.
+
+    """
+
+    @staticmethod
+    def _reference(output, res):
+        def canonicalize(line):
+            for char in _WHITES[1:]:
+                line = line.replace(char, b" ")
+            return b" ".join(x for x in line.split(b" ") if len(x) > 0)
+
+        lines_out = output.split(b"\n")
+        lines_res = res.split(b"\n")
+        for i in range(max(len(lines_out), len(lines_res))):
+            lout = canonicalize(lines_out[i]) if i < len(lines_out) else b""
+            lres = canonicalize(lines_res[i]) if i < len(lines_res) else b""
+            if lout != lres:
+                return False
+        return True
+
+    def _random_file(self):
+        pieces = [b"1", b"2", b"ab", b" ", b"\n"] + _WHITES
+        return b"".join(self.rng.choice(pieces)
+                        for _ in range(self.rng.randint(0, 20)))
+
+    def _perturb(self, data):
+        # Change a few whitespaces, so that the files often match.
+        data = bytearray(data)
+        for _ in range(self.rng.randint(0, 3)):
+            if len(data) == 0:
+                break
+            i = self.rng.randrange(len(data))
+            if bytes(data[i:i + 1]) in _WHITES:
+                data[i:i + 1] = self.rng.choice(_WHITES) * self.rng.randint(
+                    0, 3)
+            else:
+                data[i:i + 1] = self.rng.choice(_WHITES)
+        return bytes(data)
+
+    def test_random(self):
+        self.rng = random.Random(42)
+        for block_size in [1, 2, 3, 7, 1024]:
+            with patch("cms.grading.steps.whitediff._BLOCK_SIZE", block_size):
+                for _ in range(1000):
+                    output = self._random_file()
+                    res = self._perturb(output) \
+                        if self.rng.random() < 0.8 else self._random_file()
+                    self.assertEqual(
+                        _white_diff(BytesIO(output), BytesIO(res)),
+                        self._reference(output, res),
+                        (output, res, block_size))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -19,10 +19,12 @@
 """Tests for the OutputOnly task type."""
 
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
-from cms.db import File
+from cms.db import File, Manager
 from cms.grading.Job import EvaluationJob
+from cms.grading.scorers import SCORERS
+from cms.grading.scorers.MorePizza import MorePizza
 from cms.grading.tasktypes.OutputOnly import OutputOnly
 from cms.service.esoperations import ESOperation
 from cmstestsuite.unit_tests.grading.tasktypes.tasktypetestutils import \
@@ -76,7 +78,8 @@ class TestEvaluate(TaskTypeTestMixin, unittest.TestCase):
         tt.evaluate(job, self.file_cacher)
 
         self.eval_output.assert_called_once_with(
-            self.file_cacher, job, None, user_output_digest="digest of 023")
+            self.file_cacher, job, None, user_output_digest="digest of 023",
+            resident=False)
         self.assertResultsInJob(job, True, str(OUTCOME), TEXT, {})
 
     def test_diff_missing_file(self):
@@ -100,7 +103,8 @@ class TestEvaluate(TaskTypeTestMixin, unittest.TestCase):
         tt.evaluate(job, self.file_cacher)
 
         self.eval_output.assert_called_once_with(
-            self.file_cacher, job, None, user_output_digest="digest of 023")
+            self.file_cacher, job, None, user_output_digest="digest of 023",
+            resident=False)
         self.assertResultsInJob(job, False, None, None, None)
 
     def test_comparator_success(self):
@@ -113,9 +117,91 @@ class TestEvaluate(TaskTypeTestMixin, unittest.TestCase):
 
         self.eval_output.assert_called_once_with(
             self.file_cacher, job, "checker",
-            user_output_digest="digest of 023")
+            user_output_digest="digest of 023", resident=False)
         self.assertResultsInJob(job, True, str(OUTCOME), TEXT, {})
 
+    def test_resident_comparator_success(self):
+        tt, job = self.prepare(["resident_comparator"], {
+            "output_001.txt": FILE_001,
+            "output_023.txt": FILE_023
+        })
+
+        tt.evaluate(job, self.file_cacher)
+
+        self.eval_output.assert_called_once_with(
+            self.file_cacher, job, "checker",
+            user_output_digest="digest of 023", resident=True)
+        self.assertResultsInJob(job, True, str(OUTCOME), TEXT, {})
+
+    @patch.dict(OutputOnly._EVALUATION.values, {"scorer:MorePizza": ""})
+    @patch("cms.grading.tasktypes.OutputOnly.score_output")
+    def test_scorer_success(self, score_output):
+        score_output.return_value = (OUTCOME, TEXT)
+        tt, job = self.prepare(["scorer:MorePizza"], {
+            "output_001.txt": FILE_001,
+            "output_023.txt": FILE_023
+        })
+
+        tt.evaluate(job, self.file_cacher)
+
+        score_output.assert_called_once_with(
+            self.file_cacher, "MorePizza", "digest of input", "digest of 023")
+        self.eval_output.assert_not_called()
+        self.assertResultsInJob(job, True, str(OUTCOME), TEXT, {})
+
+
+class TestGetOutcomeCacheKey(unittest.TestCase):
+    """Tests for get_outcome_cache_key()."""
+
+    @staticmethod
+    def job(files, managers=None):
+        operation = ESOperation(ESOperation.EVALUATION, 1, 1, "023")
+        return EvaluationJob(input="digest of input",
+                             output="digest of correct output",
+                             files=files,
+                             managers=managers,
+                             operation=operation)
+
+    def test_diff(self):
+        tt = OutputOnly(["diff"])
+        job = self.job({"output_023.txt": FILE_023})
+
+        self.assertEqual(tt.get_outcome_cache_key(job),
+                         ("diff", "digest of input",
+                          "digest of correct output", "digest of 023"))
+
+    def test_comparator(self):
+        tt = OutputOnly(["comparator"])
+        job = self.job({"output_023.txt": FILE_023},
+                       {"checker": Manager("checker", "digest of checker")})
+
+        self.assertEqual(tt.get_outcome_cache_key(job),
+                         ("digest of checker", "digest of input",
+                          "digest of correct output", "digest of 023"))
+
+    @patch.dict(OutputOnly._EVALUATION.values, {"scorer:MorePizza": ""})
+    @patch.dict(SCORERS, {"MorePizza": MorePizza})
+    def test_scorer(self):
+        tt = OutputOnly(["scorer:MorePizza"])
+        job = self.job({"output_023.txt": FILE_023})
+
+        with patch.object(MorePizza, "VERSION", 3):
+            self.assertEqual(tt.get_outcome_cache_key(job),
+                             ("scorer:MorePizza@3", "digest of input",
+                              "digest of correct output", "digest of 023"))
+
+    def test_missing_file(self):
+        tt = OutputOnly(["diff"])
+        job = self.job({"output_001.txt": FILE_001})
+
+        self.assertIsNone(tt.get_outcome_cache_key(job))
+
+    def test_missing_checker(self):
+        tt = OutputOnly(["comparator"])
+        job = self.job({"output_023.txt": FILE_023})
+
+        self.assertIsNone(tt.get_outcome_cache_key(job))
+
 
 if __name__ == "__main__":
     unittest.main()
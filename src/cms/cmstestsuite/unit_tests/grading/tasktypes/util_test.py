@@ -19,9 +19,16 @@
 """Tests for the utilities for task types."""
 
 import unittest
+from collections import OrderedDict
+from unittest.mock import MagicMock, patch
 
+import gevent
+
+from cms import config
 from cms.grading import Language
 from cms.grading.tasktypes import is_manager_for_compilation
+from cms.grading.tasktypes.util import close_resident_checkers, \
+    get_resident_checker, set_sandbox_pool
 
 
 class TestLanguage(Language):
@@ -91,5 +98,111 @@ class TestIsManagerForCompilation(unittest.TestCase):
         self.assertIsNotForCompilation("test.srcext1.")
 
 
+class TestGetResidentChecker(unittest.TestCase):
+    """Test the function get_resident_checker."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = patch("cms.grading.tasktypes.util._resident_checkers",
+                        OrderedDict())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch(
+            "cms.grading.tasktypes.util._starting_resident_checkers", {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch("cms.grading.tasktypes.util.Sandbox")
+        self.sandbox = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch("cms.grading.tasktypes.util.ResidentChecker")
+        self.resident_checker = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_concurrent(self):
+        # Starting the checker yields to the other greenlet, which must
+        # wait for it instead of starting another one.
+        def start_checker(sandbox, *key):
+            gevent.sleep(0.01)
+            return MagicMock()
+        self.resident_checker.side_effect = start_checker
+
+        greenlets = [gevent.spawn(get_resident_checker, MagicMock(),
+                                  "checker", "input", "output")
+                     for _ in range(2)]
+        gevent.joinall(greenlets, raise_error=True)
+
+        self.resident_checker.assert_called_once()
+        self.sandbox.assert_called_once()
+        self.assertIs(greenlets[0].value, greenlets[1].value)
+
+    def test_concurrent_different_keys(self):
+        # Checkers for different testcases start at the same time.
+        running = []
+        max_running = []
+
+        def start_checker(sandbox, *key):
+            running.append(key)
+            max_running.append(len(running))
+            gevent.sleep(0.01)
+            running.remove(key)
+            return MagicMock()
+        self.resident_checker.side_effect = start_checker
+
+        greenlets = [gevent.spawn(get_resident_checker, MagicMock(),
+                                  "checker", input_, "output")
+                     for input_ in ("input1", "input2")]
+        gevent.joinall(greenlets, raise_error=True)
+
+        self.assertEqual(self.resident_checker.call_count, 2)
+        self.assertEqual(max(max_running), 2)
+
+    def test_concurrent_start_failure(self):
+        # The job waiting for the checker gets the error too.
+        def start_checker(sandbox, *key):
+            gevent.sleep(0.01)
+            raise OSError
+        self.resident_checker.side_effect = start_checker
+
+        greenlets = [gevent.spawn(get_resident_checker, MagicMock(),
+                                  "checker", "input", "output")
+                     for _ in range(2)]
+        gevent.joinall(greenlets)
+
+        self.resident_checker.assert_called_once()
+        for greenlet in greenlets:
+            self.assertIsInstance(greenlet.exception, OSError)
+
+    def test_start_failure(self):
+        self.resident_checker.side_effect = OSError
+        with self.assertRaises(OSError):
+            get_resident_checker(MagicMock(), "checker", "input", "output")
+        self.sandbox.return_value.cleanup.assert_called_once_with(
+            delete=True)
+
+    def test_not_from_pool(self):
+        # The checker deletes its sandbox itself, so it must not be one
+        # that the pool expects back.
+        file_cacher = MagicMock()
+        pool = MagicMock()
+        pool.file_cacher = file_cacher
+        set_sandbox_pool(pool)
+        self.addCleanup(set_sandbox_pool, None)
+        get_resident_checker(file_cacher, "checker", "input", "output")
+        pool.get.assert_not_called()
+        self.sandbox.assert_called_once_with(file_cacher, name="resident")
+
+    @patch.object(config, "keep_sandbox", False)
+    def test_close_resident_checkers(self):
+        self.resident_checker.side_effect = lambda *args: MagicMock()
+        checkers = [get_resident_checker(MagicMock(), "checker", input_, "o")
+                    for input_ in ("input1", "input2")]
+        close_resident_checkers()
+        for checker in checkers:
+            checker.close.assert_called_once_with(delete=True)
+        # They are started again when needed.
+        get_resident_checker(MagicMock(), "checker", "input1", "o")
+        self.assertEqual(self.resident_checker.call_count, 3)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -21,7 +21,9 @@
 
 """
 
+import json
 import unittest
+import zlib
 from unittest.mock import Mock, patch
 
 import gevent
@@ -418,6 +420,90 @@ class TestRPC(unittest.TestCase):
         self.assertFalse(self.servers[0].connected)
         sock.close()
 
+    def test_binary_framing(self):
+        client = self.get_client(ServiceCoord("Foo", 0))
+        # Larger than the limit of the line-based framing.
+        value = "x" * (2 * RemoteServiceClient.MAX_MESSAGE_SIZE)
+        result = client.echo(value=value)
+        result.wait()
+        self.assertTrue(result.successful())
+        self.assertEqual(result.value, value)
+        self.assertTrue(client._binary_framing)
+        self.assertEqual(client._compression, "zlib")
+        self.assertTrue(self.servers[0]._binary_framing)
+
+    def test_binary_framing_old_server(self):
+        with patch.object(RemoteServiceServer, "BINARY_FRAMING", False):
+            client = self.get_client(ServiceCoord("Foo", 0))
+            result = client.echo(value=42)
+            result.wait()
+        self.assertTrue(result.successful())
+        self.assertEqual(result.value, 42)
+        self.assertFalse(client._binary_framing)
+        self.assertFalse(self.servers[0]._binary_framing)
+
+    def test_binary_framing_old_client(self):
+        with patch.object(RemoteServiceClient, "BINARY_FRAMING", False):
+            client = self.get_client(ServiceCoord("Foo", 0))
+            result = client.echo(value=42)
+            result.wait()
+        self.assertTrue(result.successful())
+        self.assertEqual(result.value, 42)
+        self.assertFalse(client._binary_framing)
+        self.assertFalse(self.servers[0]._binary_framing)
+
+    def test_binary_framing_no_reply(self):
+        # The server swallows the negotiation request without replying:
+        # the client cannot know which framing the server will use, so
+        # it closes the connection.
+        with patch.object(RemoteServiceServer, "_negotiate_framing",
+                          return_value=True), \
+                patch.object(RemoteServiceClient,
+                             "NEGOTIATE_FRAMING_TIMEOUT", 0.01):
+            client = self.get_client(ServiceCoord("Foo", 0))
+            # Sent after the negotiation, which fails.
+            result = client.echo(value=42)
+            result.wait()
+            self.sleep()
+        self.assertFalse(result.successful())
+        self.assertFalse(client.connected)
+        self.assertFalse(self.servers[0].connected)
+
+    def test_send_invalid_frame(self):
+        sock = gevent.socket.create_connection((self.host, self.port))
+        sock.sendall(json.dumps({
+            "__id": "foo",
+            "__method": RemoteServiceServer.NEGOTIATE_FRAMING_METHOD,
+            "__data": {"compressions": ["zlib"]}}).encode("utf-8") + b"\r\n")
+        self.sleep()
+        self.assertTrue(self.servers[0]._binary_framing)
+        # A frame flagged as compressed, which is not.
+        sock.sendall(RemoteServiceServer._FRAME_HEADER.pack(
+            RemoteServiceServer._FRAME_FLAG_ZLIB, 3) + b"foo")
+        self.sleep()
+        # Malformed messages cause the connection to be closed.
+        self.assertFalse(self.servers[0].connected)
+        sock.close()
+
+
+    def test_send_truncated_frame(self):
+        sock = gevent.socket.create_connection((self.host, self.port))
+        sock.sendall(json.dumps({
+            "__id": "foo",
+            "__method": RemoteServiceServer.NEGOTIATE_FRAMING_METHOD,
+            "__data": {"compressions": ["zlib"]}}).encode("utf-8") + b"\r\n")
+        self.sleep()
+        self.assertTrue(self.servers[0]._binary_framing)
+        # A compressed frame whose stream is cut short.
+        data = zlib.compress(b'{"__id": "bar", "__method": "echo", '
+                             b'"__data": {"value": 42}}')[:-4]
+        sock.sendall(RemoteServiceServer._FRAME_HEADER.pack(
+            RemoteServiceServer._FRAME_FLAG_ZLIB, len(data)) + data)
+        self.sleep()
+        # Malformed messages cause the connection to be closed.
+        self.assertFalse(self.servers[0].connected)
+        sock.close()
+
 
 if __name__ == "__main__":
     unittest.main()
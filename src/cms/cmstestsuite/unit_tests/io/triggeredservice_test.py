@@ -68,6 +68,24 @@ class FakeBatchExecutor(FakeExecutor):
         super().execute(operations[0])
 
 
+class FakeCostBatchExecutor(FakeBatchExecutor):
+    def __init__(self, notifier, costs, max_cost):
+        super().__init__(notifier)
+        self._costs = costs
+        self._max_cost = max_cost
+        self.batches = []
+
+    def max_cost_per_batch(self):
+        return self._max_cost
+
+    def operation_cost(self, item):
+        return self._costs[str(item)]
+
+    def execute(self, operations):
+        self.batches.append([str(entry.item) for entry in operations])
+        super().execute(operations)
+
+
 class FakeTriggeredService(TriggeredService):
     def __init__(self, shard, timeout):
         super().__init__(shard)
@@ -170,6 +188,19 @@ class TestTriggeredService(unittest.TestCase):
         # Just one call to the batch executor.
         self.assertEqual(batch_notifier.get_notifications(), 1)
 
+    def test_batch_max_cost(self):
+        """Test a batch executor limiting the cost of each batch."""
+        self.setUpService()
+        executor = FakeCostBatchExecutor(
+            Notifier(), {"op 0": 2, "op 1": 2, "op 2": 1, "op 3": 5}, 3)
+        self.service.add_executor(executor)
+        for i in range(4):
+            self.service.enqueue(FakeQueueItem("op %d" % i))
+        gevent.sleep(0.01)
+        # The first operation of a batch is taken regardless of its cost.
+        self.assertEqual(executor.batches,
+                         [["op 0"], ["op 1", "op 2"], ["op 3"]])
+
 
 if __name__ == "__main__":
     unittest.main()
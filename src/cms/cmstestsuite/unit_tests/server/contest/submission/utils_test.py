@@ -17,6 +17,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import pickle
 import stat
 import unittest
 from datetime import timedelta
@@ -29,6 +30,7 @@ from cms import config
 from cms.db import Submission, UserTest
 from cms.server.contest.submission import \
     fetch_file_digests_from_previous_submission, StorageFailed, store_local_copy
+from cms.server.upload_middleware import UploadedFile
 from cmscommon.datetime import make_datetime
 from cmstestsuite.unit_tests.filesystemmixin import FileSystemMixin
 from cmstestsuite.unit_tests.testidgenerator import unique_digest, \
@@ -237,6 +239,26 @@ class TestStoreLocalCopy(DatabaseMixin, FileSystemMixin, unittest.TestCase):
         self.assertSomeFileContains(content,
                                     in_=os.path.join(self.base_dir, "bar"))
 
+    def test_success_uploaded_files(self):
+        # Files streamed to disk are copied in the same format.
+        content_a = self.generate_content()
+        content_b = self.generate_content()
+        file_cacher = MagicMock()
+        file_cacher.temp_dir = self.base_dir
+        uploaded_file = UploadedFile(file_cacher, "foo.c")
+        uploaded_file.write(content_a)
+        uploaded_file.finish()
+        directory = os.path.join(self.base_dir, "foo")
+        store_local_copy(directory, self.participation, self.task,
+                         self.timestamp,
+                         {"foo.%l": uploaded_file, "bar.txt": content_b})
+        path = os.path.join(directory, self.participation.user.username,
+                            "%s" % self.timestamp)
+        with open(path, "rb") as f:
+            self.assertEqual(pickle.load(f), (
+                self.contest.id, self.participation.user.id, self.task.id,
+                {"foo.%l": content_a, "bar.txt": content_b}))
+
     def test_failure(self):
         # Make read-only.
         os.chmod(self.base_dir, stat.S_IRUSR)
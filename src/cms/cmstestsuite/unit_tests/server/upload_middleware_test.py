@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import io
+import os
+import random
+import unittest
+from unittest.mock import Mock
+
+from werkzeug.test import Client, EnvironBuilder
+from werkzeug.wrappers import Request, Response
+from werkzeug.wsgi import responder
+
+from cms.server.upload_middleware import UploadMiddleware
+from cmscommon.digest import bytes_digest
+from cmstestsuite.unit_tests.filesystemmixin import FileSystemMixin
+
+
+class TestUploadMiddleware(FileSystemMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Choose a size that is larger than the buffers of the parser.
+        self.content = \
+            bytes(random.getrandbits(8) for _ in range(100 * 1024))
+
+        self.file_cacher = Mock()
+        self.file_cacher.temp_dir = self.base_dir
+        self.file_cacher.put_file_from_temp_path = Mock(
+            side_effect=self.fake_put_file_from_temp_path)
+        self.stored = dict()
+
+        self.store = False
+        self.wsgi_app = UploadMiddleware(
+            self.file_cacher, self.wrapped_wsgi_app, r"/submit$")
+        self.client = Client(self.wsgi_app, Response)
+
+    def fake_put_file_from_temp_path(self, path, digest, unused_desc=""):
+        with open(path, "rb") as f:
+            self.stored[digest] = f.read()
+        os.remove(path)
+        return digest
+
+    @responder
+    def wrapped_wsgi_app(self, environ, unused_start_response):
+        self.request = Request(environ)
+        self.form = self.request.form.to_dict(flat=False)
+        self.body_files = self.request.files.to_dict(flat=False)
+        key = self.request.headers.get(UploadMiddleware.UPLOADS_HEADER)
+        self.uploads = \
+            self.wsgi_app.get_uploads(key) if key is not None else None
+        if self.uploads is not None:
+            self.upload_paths = [f.path for files in self.uploads.values()
+                                 for f in files]
+            if self.store:
+                for files in self.uploads.values():
+                    for f in files:
+                        f.store()
+        return Response(b"ok")
+
+    def post(self, path, data, headers=None):
+        builder = EnvironBuilder(path, method="POST", data=data,
+                                 headers=headers)
+        return self.client.open(builder.get_environ())
+
+    def test_success(self):
+        response = self.post("/tasks/foo/submit", {
+            "language": "C",
+            "foo.%l": (io.BytesIO(self.content), "foo.c"),
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.form, {"language": ["C"]})
+        self.assertEqual(self.body_files, {})
+        self.assertEqual(list(self.uploads), ["foo.%l"])
+        uploaded_file, = self.uploads["foo.%l"]
+        self.assertEqual(uploaded_file.filename, "foo.c")
+        self.assertEqual(len(uploaded_file), len(self.content))
+        self.assertEqual(uploaded_file.digest, bytes_digest(self.content))
+        # The files not stored are deleted after the request.
+        self.assertFalse(os.path.exists(uploaded_file.path))
+        self.assertEqual(os.listdir(self.base_dir), [])
+
+    def test_store(self):
+        self.store = True
+        self.post("/tasks/foo/submit", {
+            "a": (io.BytesIO(self.content), "a.txt"),
+            "b": (io.BytesIO(b"other content"), "b.txt"),
+        })
+
+        self.assertEqual(self.stored, {
+            bytes_digest(self.content): self.content,
+            bytes_digest(b"other content"): b"other content",
+        })
+        self.assertEqual(os.listdir(self.base_dir), [])
+
+    def test_empty_filename_ignored(self):
+        self.post("/tasks/foo/submit", {
+            "a": (io.BytesIO(b""), ""),
+        })
+
+        self.assertEqual(self.uploads, {})
+        self.assertEqual(os.listdir(self.base_dir), [])
+
+    def test_path_not_matching(self):
+        self.post("/tasks/foo/other", {
+            "a": (io.BytesIO(self.content), "a.txt"),
+        })
+
+        self.assertIsNone(self.uploads)
+        self.assertIn("a", self.body_files)
+
+    def test_header_stripped(self):
+        # Clients cannot make the handler use the files of someone else.
+        self.post("/tasks/foo/other", {"language": "C"},
+                  headers={UploadMiddleware.UPLOADS_HEADER: "some key"})
+
+        self.assertIsNone(self.uploads)
+
+    def test_invalid_key(self):
+        with self.assertRaises(KeyError):
+            self.wsgi_app.get_uploads("some key")
+
+
+if __name__ == "__main__":
+    unittest.main()
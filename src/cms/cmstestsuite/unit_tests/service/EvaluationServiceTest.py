@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the queries used by the evaluation service to write
+results.
+
+"""
+
+import unittest
+
+# Needs to be first to allow for monkey patching the DB connection string.
+from cmstestsuite.unit_tests.databasemixin import DatabaseMixin
+
+from cms.db import SubmissionResult, UserTestResult
+from cms.service.EvaluationService import EvaluationService
+
+
+class TestWriteResultsQueries(DatabaseMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.task = self.add_task()
+        self.dataset = self.add_dataset(task=self.task)
+        self.testcases = [self.add_testcase(self.dataset) for _ in range(3)]
+        self.other_dataset = self.add_dataset(task=self.task)
+        self.other_testcase = self.add_testcase(self.other_dataset)
+
+    def add_result(self, dataset, testcases):
+        submission = self.add_submission(task=self.task)
+        result = self.add_submission_result(submission, dataset)
+        for testcase in testcases:
+            self.add_evaluation(result, testcase)
+        return result
+
+    @staticmethod
+    def key(result):
+        return (result.submission_id, result.dataset_id)
+
+    def test_get_completed_evaluations(self):
+        complete = self.add_result(self.dataset, self.testcases)
+        partial = self.add_result(self.dataset, self.testcases[:2])
+        empty = self.add_result(self.dataset, [])
+        other = self.add_result(self.other_dataset, [self.other_testcase])
+        # Complete, but not among those to check.
+        self.add_result(self.dataset, self.testcases)
+        self.session.commit()
+
+        self.assertEqual(
+            EvaluationService.get_completed_evaluations(
+                self.session,
+                {self.key(r) for r in [complete, partial, empty, other]}),
+            {self.key(complete), self.key(other)})
+
+    def test_get_completed_evaluations_empty(self):
+        self.assertEqual(
+            EvaluationService.get_completed_evaluations(self.session, set()),
+            set())
+
+    def test_get_results(self):
+        first = self.add_result(self.dataset, [])
+        second = self.add_result(self.other_dataset, [])
+        self.add_result(self.dataset, [])
+        user_test_result = self.add_user_test_result(dataset=self.dataset)
+        self.session.commit()
+
+        self.assertEqual(
+            EvaluationService.get_results(
+                self.session, SubmissionResult,
+                SubmissionResult.submission_id,
+                {self.key(first), self.key(second), (-1, -1)}),
+            {self.key(first): first, self.key(second): second})
+        self.assertEqual(
+            EvaluationService.get_results(
+                self.session, UserTestResult, UserTestResult.user_test_id,
+                {(user_test_result.user_test_id,
+                  user_test_result.dataset_id)}),
+            {(user_test_result.user_test_id, user_test_result.dataset_id):
+                user_test_result})
+
+
+if __name__ == "__main__":
+    unittest.main()
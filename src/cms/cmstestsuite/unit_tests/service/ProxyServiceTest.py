@@ -25,6 +25,7 @@
 import gevent.monkey
 gevent.monkey.patch_all()  # noqa
 
+import json
 import unittest
 from unittest.mock import patch, PropertyMock
 
@@ -49,7 +50,7 @@ class TestProxyService(DatabaseMixin, unittest.TestCase):
         self.score_type.max_score = 100
         self.score_type.ranking_headers = ["100"]
 
-        patcher = patch("requests.put")
+        patcher = patch("requests.Session.put")
         self.requests_put = patcher.start()
         self.addCleanup(patcher.stop)
         self.requests_put.return_value.status_code = 200
@@ -70,7 +71,7 @@ class TestProxyService(DatabaseMixin, unittest.TestCase):
                                                     team=self.team)
 
         self.new_sr_unscored()
-        self.new_sr_scored()
+        self.scored = self.new_sr_scored()
         result = self.new_sr_scored()
         self.add_token(submission=result.submission)
 
@@ -100,14 +101,34 @@ class TestProxyService(DatabaseMixin, unittest.TestCase):
 
         gevent.sleep(0.1)
 
-        urls = [args[0] for args, _ in self.requests_put.call_args_list]
+        requests = [(args[0], json.loads(args[1]))
+                    for args, _ in self.requests_put.call_args_list]
 
-        self.assertTrue(urls[0].endswith("contests/"))
-        self.assertTrue(any(urls[i].endswith("users/") for i in [1, 2, 3]))
-        self.assertTrue(any(urls[i].endswith("teams/") for i in [1, 2, 3]))
-        self.assertTrue(any(urls[i].endswith("tasks/") for i in [1, 2, 3]))
-        self.assertTrue(urls[4].endswith("submissions/"))
-        self.assertTrue(urls[5].endswith("subchanges/"))
+        # Everything is sent in one request per batch, the basic data
+        # before the submissions.
+        self.assertTrue(all(url.endswith("bulk/") for url, _ in requests))
+        self.assertCountEqual(requests[0][1].keys(),
+                              ["contests", "teams", "users", "tasks"])
+        self.assertTrue(any("submissions" in data and "subchanges" in data
+                            for _, data in requests[1:]))
+
+    def test_submissions_scored(self):
+        """Test that the scores of many submissions are sent together."""
+        service = ProxyService(0, self.contest.id)
+        gevent.sleep(0.1)
+        self.requests_put.reset_mock()
+
+        submission_id = self.scored.submission_id
+        service.submissions_scored([submission_id, submission_id + 1000])
+        gevent.sleep(0.1)
+
+        requests = [json.loads(args[1])
+                    for args, _ in self.requests_put.call_args_list]
+        self.assertEqual(len(requests), 1)
+        self.assertEqual(list(requests[0]["submissions"].keys()),
+                         ["%d" % submission_id])
+        subchange, = requests[0]["subchanges"].values()
+        self.assertEqual(subchange["score"], 100)
 
 
 if __name__ == "__main__":
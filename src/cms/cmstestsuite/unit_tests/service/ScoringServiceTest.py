@@ -121,6 +121,26 @@ class TestScoringService(DatabaseMixin, unittest.TestCase):
                               [(sr_a.submission_id, sr_a.dataset_id),
                                (sr_b.submission_id, sr_b.dataset_id)])
 
+    def test_new_evaluation_batch_with_errors(self):
+        """Results that cannot be scored don't affect the others.
+
+        """
+        sr_a = self.new_sr_to_score()
+        sr_b = self.new_sr_scored()
+        self.session.commit()
+
+        service = ScoringService(0)
+        service.new_evaluation(sr_a.submission_id + 1000, sr_a.dataset_id)
+        service.new_evaluation(sr_b.submission_id, sr_b.dataset_id)
+        service.new_evaluation(sr_a.submission_id, sr_a.dataset_id)
+
+        gevent.sleep(0.1)  # Needed to trigger the score loop.
+
+        self.assertCountEqual(self.call_args,
+                              [(sr_a.submission_id, sr_a.dataset_id)])
+        self.session.expire(sr_a)
+        self.assertEqual(sr_a.score, self.score_info[0])
+
     def test_new_evaluation_already_scored(self):
         """One submission is not re-scored if already scored.
 
@@ -22,11 +22,12 @@
 """
 
 import unittest
-from unittest.mock import Mock, call
+from unittest.mock import Mock, call, patch
 
 import gevent
 
 import cms.service.Worker
+from cms import config
 from cms.grading import JobException
 from cms.grading.Job import JobGroup, EvaluationJob
 from cms.service.Worker import Worker
@@ -38,6 +39,9 @@ from cmstestsuite.unit_tests.testidgenerator import \
 class TestWorker(unittest.TestCase):
 
     def setUp(self):
+        patcher = patch.object(config, "sandbox_pool_size", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
         self.service = Worker(0)
 
     # Testing execute_job.
@@ -129,6 +133,40 @@ class TestWorker(unittest.TestCase):
         cms.service.Worker.get_task_type.assert_has_calls(calls_b)
         self.assertEquals(task_type_b.call_count, n_jobs_b)
 
+    def test_execute_job_subsequent_queued(self):
+        """Executes a long job, then another one that should wait for
+        the first one, warming the cache in the meantime.
+
+        """
+        # Because of how gevent works, the interval here can be very small.
+        task_type = FakeTaskType([0.01, True])
+        cms.service.Worker.get_task_type = Mock(return_value=task_type)
+        self.service.file_cacher = Mock()
+
+        jobs_a, calls_a = TestWorker.new_jobs(1, prefix="a")
+        jobs_b, calls_b = TestWorker.new_jobs(1, prefix="b")
+        jobs_b[0].input = "digest of input"
+
+        def first_call():
+            job_group = JobGroup([jobs_a[0]])
+            return JobGroup.import_from_dict(
+                self.service.execute_job_group(job_group.export_to_dict()))
+
+        first_greenlet = gevent.spawn(first_call)
+        gevent.sleep(0)  # To ensure we call jobgroup_a first.
+
+        with patch.object(config, "worker_prefetch_depth", 1):
+            job_group = JobGroup([jobs_b[0]])
+            result_b = JobGroup.import_from_dict(
+                self.service.execute_job_group(job_group.export_to_dict()))
+
+        # The first one has finished before the second one.
+        self.assertTrue(first_greenlet.ready())
+        self.assertTrue(result_b.jobs[0].success)
+        self.service.file_cacher.load.assert_called_once_with(
+            "digest of input", if_needed=True)
+        cms.service.Worker.get_task_type.assert_has_calls(calls_a + calls_b)
+
     def test_execute_job_subsequent_locked(self):
         """Executes a long job, then another one that should fail
         because of the lock.
@@ -149,16 +187,53 @@ class TestWorker(unittest.TestCase):
         first_greenlet = gevent.spawn(first_call)
         gevent.sleep(0)  # To ensure we call jobgroup_a first.
 
-        with self.assertRaises(JobException):
-            job_group = JobGroup([jobs_b[0]])
-            JobGroup.import_from_dict(
-                self.service.execute_job_group(job_group.export_to_dict()))
+        # Without prefetching, ES never sends a job group to a busy
+        # worker.
+        with patch.object(config, "worker_prefetch_depth", 0):
+            with self.assertRaises(JobException):
+                job_group = JobGroup([jobs_b[0]])
+                JobGroup.import_from_dict(
+                    self.service.execute_job_group(
+                        job_group.export_to_dict()))
 
         first_greenlet.get()
         self.assertNotIn(calls_b[0],
                          cms.service.Worker.get_task_type.mock_calls)
         cms.service.Worker.get_task_type.assert_has_calls(calls_a)
 
+    def test_execute_job_concurrent_slots(self):
+        """Executes a long job, then another one that should run at the
+        same time in the second slot.
+
+        """
+        self.service = Worker(0, slots=2)
+        self.assertEqual(self.service.get_execution_slots(), 2)
+        # Because of how gevent works, the interval here can be very small.
+        task_type = FakeTaskType([0.01, True])
+        cms.service.Worker.get_task_type = Mock(return_value=task_type)
+
+        jobs_a, calls_a = TestWorker.new_jobs(1, prefix="a")
+        jobs_b, calls_b = TestWorker.new_jobs(1, prefix="b")
+
+        def first_call():
+            job_group = JobGroup([jobs_a[0]])
+            return JobGroup.import_from_dict(
+                self.service.execute_job_group(job_group.export_to_dict()))
+
+        first_greenlet = gevent.spawn(first_call)
+        gevent.sleep(0)  # To ensure we call jobgroup_a first.
+
+        with patch.object(config, "worker_prefetch_depth", 0):
+            job_group = JobGroup([jobs_b[0]])
+            result_b = JobGroup.import_from_dict(
+                self.service.execute_job_group(job_group.export_to_dict()))
+
+        # The second one did not wait for the first one.
+        self.assertFalse(first_greenlet.ready())
+        self.assertTrue(result_b.jobs[0].success)
+        self.assertTrue(first_greenlet.get().jobs[0].success)
+        cms.service.Worker.get_task_type.assert_has_calls(calls_a + calls_b)
+
     def test_execute_job_failure_releases_lock(self):
         """After a failure, the worker should be able to accept another job.
 
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the cost model module."""
+
+import unittest
+
+from cms.service.costmodel import CostModel
+from cms.service.esoperations import ESOperation
+
+
+def evaluation(dataset_id, testcase_codename):
+    return ESOperation(ESOperation.EVALUATION, 1, dataset_id,
+                       testcase_codename)
+
+
+class TestCostModel(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.model = CostModel()
+
+    def test_default(self):
+        self.assertEqual(self.model.get_cost(evaluation(1, "a")),
+                         CostModel.DEFAULT_COST)
+        self.assertFalse(self.model.is_known(evaluation(1, "a")))
+        self.assertEqual(self.model.get_speed(0), 1.0)
+
+    def test_record(self):
+        self.model.record(0, [evaluation(1, "a")], 4.0)
+        self.assertEqual(self.model.get_cost(evaluation(1, "a")), 4.0)
+        self.assertTrue(self.model.is_known(evaluation(1, "a")))
+
+        self.model.record(0, [evaluation(1, "a")], 2.0)
+        self.assertAlmostEqual(self.model.get_cost(evaluation(1, "a")),
+                               4.0 + CostModel.SMOOTHING * (2.0 - 4.0))
+
+    def test_fallbacks(self):
+        self.model.record(0, [evaluation(1, "a")], 4.0)
+        # Same dataset, other testcase.
+        self.assertEqual(self.model.get_cost(evaluation(1, "b")), 4.0)
+        self.assertFalse(self.model.is_known(evaluation(1, "b")))
+        # Other dataset, same operation type.
+        self.assertEqual(self.model.get_cost(evaluation(2, "a")), 4.0)
+        self.assertEqual(
+            self.model.get_cost(ESOperation(ESOperation.COMPILATION, 1, 1)),
+            CostModel.DEFAULT_COST)
+
+    def test_batch_split_by_estimates(self):
+        self.model.record(0, [evaluation(1, "a")], 3.0)
+        self.model.record(0, [evaluation(1, "b")], 1.0)
+        self.model.record(0, [evaluation(1, "a"), evaluation(1, "b")], 8.0)
+        # Estimates were 3.0 + 1.0 = 4.0, but it took 8.0 seconds.
+        self.assertAlmostEqual(self.model.get_speed(0), 0.5)
+        self.assertAlmostEqual(
+            self.model.get_cost(evaluation(1, "a")),
+            3.0 + CostModel.SMOOTHING * (8.0 * 0.75 - 3.0))
+        self.assertAlmostEqual(
+            self.model.get_cost(evaluation(1, "b")),
+            1.0 + CostModel.SMOOTHING * (8.0 * 0.25 - 1.0))
+
+    def test_speed_needs_known_costs(self):
+        self.model.record(0, [evaluation(1, "a")], 3.0)
+        self.model.record(1, [evaluation(1, "a"), evaluation(1, "b")], 1.0)
+        self.assertEqual(self.model.get_speed(1), 1.0)
+
+    def test_speed_per_worker(self):
+        self.model.record(0, [evaluation(1, "a")], 2.0)
+        for _ in range(20):
+            self.model.record(1, [evaluation(1, "a")], 1.0)
+            self.model.record(0, [evaluation(1, "a")], 2.0)
+        self.assertGreater(self.model.get_speed(1), self.model.get_speed(0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -26,9 +26,10 @@ import unittest
 # Needs to be first to allow for monkey patching the DB connection string.
 from cmstestsuite.unit_tests.databasemixin import DatabaseMixin
 
+from cms.db import Submission, UserTest
 from cms.io.priorityqueue import PriorityQueue
 from cms.service.esoperations import ESOperation, get_submissions_operations, \
-    get_user_tests_operations
+    get_sweep_range, get_user_tests_operations
 
 
 class TestESOperations(DatabaseMixin, unittest.TestCase):
@@ -240,6 +241,33 @@ class TestESOperations(DatabaseMixin, unittest.TestCase):
             set(get_submissions_operations(self.session, self.contest.id)),
             expected_operations)
 
+    def test_get_submissions_operations_min_id(self):
+        """Test that submissions with smaller ids are ignored."""
+        self.add_submission(self.tasks[0], self.participation)
+        self.session.flush()
+        submission = self.add_submission(self.tasks[0], self.participation)
+        self.session.flush()
+
+        expected_operations = set(
+            self.submission_compilation_operation(submission, dataset)
+            for dataset in submission.task.datasets if self.to_judge(dataset))
+
+        self.assertEqual(
+            set(get_submissions_operations(self.session, self.contest.id,
+                                           min_id=submission.id)),
+            expected_operations)
+        self.assertEqual(
+            get_sweep_range(self.session, Submission, self.contest.id),
+            (2, submission.id))
+        self.assertEqual(
+            get_sweep_range(self.session, Submission, self.contest.id,
+                            min_id=submission.id),
+            (1, submission.id))
+        self.assertEqual(
+            get_sweep_range(self.session, Submission, self.contest.id,
+                            min_id=submission.id + 1),
+            (0, None))
+
     def submission_compilation_operation(
             self, submission, dataset, result=None):
         active_priority = PriorityQueue.PRIORITY_HIGH \
@@ -395,6 +423,26 @@ class TestESOperations(DatabaseMixin, unittest.TestCase):
             set(get_user_tests_operations(self.session, self.contest.id)),
             expected_operations)
 
+    def test_get_user_tests_operations_min_id(self):
+        """Test that user tests with smaller ids are ignored."""
+        self.add_user_test(self.tasks[0], self.participation)
+        self.session.flush()
+        user_test = self.add_user_test(self.tasks[0], self.participation)
+        self.session.flush()
+
+        expected_operations = set(
+            self.user_test_compilation_operation(user_test, dataset)
+            for dataset in user_test.task.datasets if self.to_judge(dataset))
+
+        self.assertEqual(
+            set(get_user_tests_operations(self.session, self.contest.id,
+                                          min_id=user_test.id)),
+            expected_operations)
+        self.assertEqual(
+            get_sweep_range(self.session, UserTest, self.contest.id,
+                            min_id=user_test.id),
+            (1, user_test.id))
+
     def user_test_compilation_operation(self, user_test, dataset, result=None):
         active_priority = PriorityQueue.PRIORITY_HIGH \
             if result is None or result.compilation_tries == 0 \
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the outcome cache module."""
+
+import os
+import unittest
+
+from cms.service.outcomecache import OutcomeCache
+from cmstestsuite.unit_tests.filesystemmixin import FileSystemMixin
+
+
+KEY = ("digest of checker", "digest of input", "digest of output",
+       "digest of user output")
+
+
+class TestOutcomeCache(FileSystemMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.path = self.get_path("outcome-cache")
+        self.cache = OutcomeCache(self.path)
+
+    def test_miss(self):
+        self.assertIsNone(self.cache.get(KEY))
+        self.assertEqual(self.cache.get_status(),
+                         {"entries": 0, "hits": 0, "misses": 1, "stores": 0,
+                          "evictions": 0})
+
+    def test_hit(self):
+        self.cache.put(KEY, "0.5", ["Output is partially correct"])
+
+        self.assertEqual(self.cache.get(KEY),
+                         ("0.5", ["Output is partially correct"]))
+        self.assertEqual(self.cache.get_status(),
+                         {"entries": 1, "hits": 1, "misses": 0, "stores": 1,
+                          "evictions": 0})
+
+    def test_different_keys(self):
+        self.cache.put(KEY, "0.5", ["Output is partially correct"])
+
+        self.assertIsNone(self.cache.get(KEY[:3] + ("another digest",)))
+
+    def test_persistent(self):
+        self.cache.put(KEY, "1.0", ["Output is correct"])
+
+        other_cache = OutcomeCache(self.path)
+        self.assertEqual(other_cache.get(KEY), ("1.0", ["Output is correct"]))
+
+    def test_max_entries(self):
+        cache = OutcomeCache(self.path, max_entries=10)
+        keys = [KEY[:3] + ("digest %d" % i,) for i in range(11)]
+        for i, key in enumerate(keys[:10]):
+            cache.put(key, "1.0", ["Output is correct"])
+            # Modification times might have a coarse resolution.
+            os.utime(cache._entry_path(key), (i, i))
+        # The first entry becomes the most recently used.
+        self.assertIsNotNone(cache.get(keys[0]))
+
+        cache.put(keys[10], "1.0", ["Output is correct"])
+        self.assertEqual(cache.get_status()["entries"], 9)
+        self.assertEqual(cache.get_status()["evictions"], 2)
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertIsNone(cache.get(keys[2]))
+        self.assertIsNotNone(cache.get(keys[3]))
+        self.assertEqual(OutcomeCache(self.path).get_status()["entries"], 9)
+
+    def test_corrupted_entry(self):
+        self.cache.put(KEY, "1.0", ["Output is correct"])
+        for filename in os.listdir(self.path):
+            self.write_file(os.path.join("outcome-cache", filename), b"{")
+
+        self.assertIsNone(self.cache.get(KEY))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the executor sending data to a ranking."""
+
+import json
+import unittest
+from unittest.mock import Mock, patch
+
+from cms.io import QueueEntry
+from cms.service.ProxyService import ProxyExecutor, ProxyOperation
+
+
+def entry(type_, data):
+    return QueueEntry(ProxyOperation(type_, data), None, None, None)
+
+
+def response(status_code):
+    res = Mock()
+    res.status_code = status_code
+    return res
+
+
+class TestProxyExecutor(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.executor = ProxyExecutor("http://u:p@localhost:8890/")
+        self.put = Mock(return_value=response(204))
+        self.executor._session.put = self.put
+        patcher = patch("gevent.sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.users = entry(ProxyExecutor.USER_TYPE, {"u1": {"f_name": "A"}})
+        self.tasks = entry(ProxyExecutor.TASK_TYPE, {"t1": {"name": "T"}})
+
+    def sent(self):
+        return [(args[0], json.loads(args[1]))
+                for args, _ in self.put.call_args_list]
+
+    def test_bulk(self):
+        self.executor.execute([self.users, self.tasks])
+        self.assertEqual(self.sent(), [
+            ("http://u:p@localhost:8890/bulk/",
+             {"users": {"u1": {"f_name": "A"}},
+              "tasks": {"t1": {"name": "T"}}})])
+        self.assertFalse(self.executor._pending())
+
+    def test_combined(self):
+        newer = entry(ProxyExecutor.USER_TYPE, {"u1": {"f_name": "B"}})
+        self.executor.execute([self.users, newer])
+        self.assertEqual(self.sent()[0][1], {"users": {"u1": {"f_name": "B"}}})
+
+    def test_fallback_by_type(self):
+        self.put.side_effect = [response(404), response(204), response(204),
+                                response(204)]
+        self.executor.execute([self.users, self.tasks])
+        self.assertEqual([url for url, _ in self.sent()], [
+            "http://u:p@localhost:8890/bulk/",
+            "http://u:p@localhost:8890/tasks/",
+            "http://u:p@localhost:8890/users/"])
+        # The bulk endpoint is not tried again.
+        self.executor.execute([self.users])
+        self.assertEqual(self.sent()[-1][0],
+                         "http://u:p@localhost:8890/users/")
+        self.sleep.assert_not_called()
+
+    def test_retry(self):
+        newer = entry(ProxyExecutor.TASK_TYPE, {"t2": {"name": "T2"}})
+        self.put.side_effect = [response(503), response(503), response(204)]
+        # What is queued while waiting is sent with the retry.
+        self.sleep.side_effect = lambda wait: \
+            self.executor.enqueue(newer.item)
+        self.executor.execute([self.users])
+        self.assertEqual(self.put.call_count, 3)
+        self.assertEqual(self.sent()[2][1], {
+            "users": {"u1": {"f_name": "A"}},
+            "tasks": {"t2": {"name": "T2"}}})
+        self.assertEqual(self.sleep.call_count, 2)
+        self.assertEqual(self.executor._failures, 0)
+
+    def test_backoff(self):
+        waits = list()
+        for failures in range(1, 10):
+            self.executor._failures = failures
+            waits.append(self.executor._failure_wait())
+        self.assertTrue(0.5 <= waits[0] <= 1.0)
+        self.assertTrue(1.0 <= waits[1] <= 2.0)
+        for wait in waits:
+            self.assertTrue(wait <= ProxyExecutor.MAX_FAILURE_WAIT)
+        self.assertTrue(waits[-1] >= ProxyExecutor.MAX_FAILURE_WAIT / 2)
+
+    def test_rejected(self):
+        self.put.return_value = response(400)
+        self.executor.execute([self.users])
+        self.assertEqual(self.put.call_count, 1)
+        self.assertFalse(self.executor._pending())
+        self.sleep.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
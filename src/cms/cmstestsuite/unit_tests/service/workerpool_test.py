@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+# Contest Management System - http://cms-dev.github.io/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for the worker pool."""
+
+import unittest
+from datetime import timedelta
+from unittest.mock import MagicMock, Mock, patch
+
+from cms import ServiceCoord, config
+from cms.service.esoperations import ESOperation
+from cms.service.workerpool import WorkerPool
+
+
+def evaluation(testcase_codename):
+    return ESOperation(ESOperation.EVALUATION, 1, 1, testcase_codename)
+
+
+class TestWorkerPoolPrefetch(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = patch("cms.service.workerpool.SessionGen", MagicMock())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch("cms.service.workerpool.JobGroup")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(config, "worker_prefetch_depth", 1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.service = Mock()
+        self.workers = dict()
+        self.service.connect_to = Mock(side_effect=self.connect_to)
+        self.pool = WorkerPool(self.service)
+
+        self.a = [evaluation("a1"), evaluation("a2")]
+        self.b = [evaluation("b1")]
+        self.c = [evaluation("c1")]
+
+    def connect_to(self, coord, on_connect=None):
+        worker = Mock()
+        worker.connected = True
+        self.workers[coord.shard] = worker
+        return worker
+
+    def add_workers(self, number):
+        for shard in range(number):
+            self.pool.add_worker(ServiceCoord("Worker", shard))
+
+    def test_prefetch(self):
+        self.add_workers(1)
+        self.assertEqual(self.pool.acquire_worker(self.a), 0)
+        start_time = self.pool._start_time[0]
+        # Sent in advance, while the worker is busy.
+        self.assertEqual(self.pool.acquire_worker(self.b), 0)
+        self.assertEqual(self.workers[0].execute_job_group.call_count, 2)
+        self.assertIs(self.pool._start_time[0], start_time)
+        self.assertIsNone(self.pool.acquire_worker(self.c))
+        for operation in self.a + self.b:
+            self.assertIn(operation, self.pool)
+
+        # The first results are for the first group; the worker goes on
+        # with the second, and can prefetch another one.
+        self.assertFalse(self.pool.release_worker(0))
+        for operation in self.a:
+            self.assertNotIn(operation, self.pool)
+        self.assertIn(self.b[0], self.pool)
+        self.assertIsNotNone(self.pool._start_time[0])
+        self.assertEqual(self.pool.acquire_worker(self.c), 0)
+
+        self.assertFalse(self.pool.release_worker(0))
+        self.assertFalse(self.pool.release_worker(0))
+        self.assertEqual(self.pool._operations[0], WorkerPool.WORKER_INACTIVE)
+        self.assertIsNone(self.pool._start_time[0])
+
+    def test_prefetch_disabled(self):
+        self.add_workers(1)
+        with patch.object(config, "worker_prefetch_depth", 0):
+            self.assertEqual(self.pool.acquire_worker(self.a), 0)
+            self.assertIsNone(self.pool.acquire_worker(self.b))
+
+    def test_idle_workers_first(self):
+        self.add_workers(2)
+        shard = self.pool.acquire_worker(self.a)
+        self.assertEqual(self.pool.acquire_worker(self.b), 1 - shard)
+
+    def test_ignore_prefetched(self):
+        self.add_workers(1)
+        self.pool.acquire_worker(self.a)
+        self.pool.acquire_worker(self.b)
+        self.pool.ignore_operation(self.b[0])
+        self.assertFalse(self.pool.release_worker(0))
+        self.assertEqual(self.pool.release_worker(0), self.b)
+
+    def test_disable(self):
+        self.add_workers(1)
+        self.pool.acquire_worker(self.a)
+        self.pool.acquire_worker(self.b)
+        self.assertCountEqual(self.pool.disable_worker(0), self.a + self.b)
+        self.assertEqual(self.pool._operations[0], WorkerPool.WORKER_DISABLED)
+        # Results arriving later are ignored.
+        self.assertTrue(self.pool.release_worker(0))
+        self.assertTrue(self.pool.release_worker(0))
+        self.pool.enable_worker(0)
+        self.assertEqual(self.pool.acquire_worker(self.c), 0)
+
+    def test_timeout(self):
+        self.add_workers(1)
+        self.pool.acquire_worker(self.a)
+        self.pool.acquire_worker(self.b)
+        self.assertEqual(self.pool.check_timeouts(), [])
+        # Only the group being executed counts for the timeout.
+        self.pool.release_worker(0)
+        self.pool._start_time[0] -= \
+            WorkerPool.WORKER_TIMEOUT + timedelta(seconds=1)
+        self.assertEqual(self.pool.check_timeouts(), self.b)
+        self.assertEqual(self.pool._operations[0], WorkerPool.WORKER_DISABLED)
+
+    def test_slots(self):
+        self.add_workers(1)
+        self.pool._execution_slots_received(2, 0)
+        self.assertEqual(self.pool.get_live_slots(), 2)
+        # Two groups are executed at once, and one is prefetched.
+        self.assertEqual(self.pool.acquire_worker(self.a), 0)
+        self.assertEqual(self.pool.acquire_worker(self.b), 0)
+        self.assertEqual(self.pool.acquire_worker(self.c), 0)
+        self.assertIsNone(self.pool.acquire_worker([evaluation("d1")]))
+        groups = list(self.pool._groups[0])
+        self.assertIsNotNone(groups[1].start_time)
+        self.assertIsNone(groups[2].start_time)
+
+        # The second group finishes first; the third takes its slot.
+        group_id = self.workers[0].execute_job_group.call_args_list[1][1][
+            "callback"].keywords["group_id"]
+        self.assertFalse(self.pool.release_worker(0, group_id=group_id))
+        self.assertNotIn(self.b[0], self.pool)
+        for operation in self.a + self.c:
+            self.assertIn(operation, self.pool)
+        self.assertIsNotNone(groups[2].start_time)
+        # Results for a group the worker does not have are ignored.
+        self.assertTrue(self.pool.release_worker(0, group_id=group_id))
+
+    def test_slots_unknown(self):
+        self.add_workers(1)
+        self.pool._execution_slots_received(None, 0, error="No such method.")
+        self.assertEqual(self.pool.get_live_slots(), 1)
+
+    def test_most_free_slots_first(self):
+        self.add_workers(2)
+        self.pool._execution_slots_received(3, 1)
+        self.assertEqual(self.pool.acquire_worker(self.a), 1)
+        self.assertEqual(self.pool.acquire_worker(self.b), 1)
+        # Both have one free slot now.
+        shard = self.pool.acquire_worker(self.c)
+        self.assertEqual(self.pool.acquire_worker([evaluation("d1")]),
+                         1 - shard)
+
+    def test_connection_lost(self):
+        self.add_workers(1)
+        self.pool.acquire_worker(self.a)
+        self.pool.acquire_worker(self.b)
+        self.workers[0].connected = False
+        self.assertCountEqual(self.pool.check_connections(), self.a + self.b)
+        self.assertEqual(self.pool._operations[0], WorkerPool.WORKER_INACTIVE)
+        for operation in self.a + self.b:
+            self.assertNotIn(operation, self.pool)
+
+
+if __name__ == "__main__":
+    unittest.main()
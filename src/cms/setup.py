@@ -150,6 +150,8 @@ setup(
             "cmsAddTeam=cmscontrib.AddTeam:main",
             "cmsAddTestcases=cmscontrib.AddTestcases:main",
             "cmsAddUser=cmscontrib.AddUser:main",
+            "cmsCacheReport=cmscontrib.CacheReport:main",
+            "cmsCheckTaskScores=cmscontrib.CheckTaskScores:main",
             "cmsCleanFiles=cmscontrib.CleanFiles:main",
             "cmsDumpExporter=cmscontrib.DumpExporter:main",
             "cmsDumpImporter=cmscontrib.DumpImporter:main",
@@ -175,6 +177,11 @@ setup(
             "OutputOnly=cms.grading.tasktypes.OutputOnly:OutputOnly",
             "TwoSteps=cms.grading.tasktypes.TwoSteps:TwoSteps",
         ],
+        "cms.grading.scorers": [
+            "BookScanning=cms.grading.scorers.BookScanning:BookScanning",
+            "EvenMorePizza=cms.grading.scorers.EvenMorePizza:EvenMorePizza",
+            "MorePizza=cms.grading.scorers.MorePizza:MorePizza",
+        ],
         "cms.grading.scoretypes": [
             "Sum=cms.grading.scoretypes.Sum:Sum",
             "GroupMin=cms.grading.scoretypes.GroupMin:GroupMin",